@@ -12,12 +12,16 @@ This module implements configuration management for the application
 """
 
 import os
-import time
 import logging
 import importlib
+import threading
 # App imports
 from toolbox import general
+from toolbox.timeouts import TimeoutHistory, TIMEOUT_HISTORY_FILE_NAME
 from exceptions import AppConfigException, ConfigManagerException
+from session_manager.manager import SessionManager, SessionRetentionPolicy, generate_session_id
+from session_manager.results import ResultsStore, RESULTS_STORE_FILE_NAME
+from executor import pool as executor_pool
 
 # Application defaults - NORMAL OPERATION MODE
 _folder_bin = os.path.abspath('bin')
@@ -127,7 +131,7 @@ class AppConfigManager(ConfigurationManager):
         global _log_level
         global _logger_formatters
         # Session ID
-        self.__session_id = time.strftime('%Y.%m.%d_%H.%M') + "-session"
+        self.__session_id = generate_session_id()
         # TODO config, folder_run, etc.
         self.__session_working_dir = os.path.abspath(os.path.join(self.get_folder_run(), self.get_session_id()))
         # TODO check and create folders (if needed)
@@ -138,6 +142,8 @@ class AppConfigManager(ConfigurationManager):
                             self.get_session_working_dir(),
                             ]
         general.check_create_folders(folders_to_check)
+        # 'latest' symlink in the 'run' folder always points to the most recent session
+        general.create_latest_symlink_overwrite(self.get_session_working_dir())
         # Prepare Logging subsystem
         if "loglevel" in configuration_object["logger"]:
             _log_level = configuration_object["logger"]["loglevel"]
@@ -160,6 +166,43 @@ class AppConfigManager(ConfigurationManager):
             # Add the handlers to my own logger
             self._logger.addHandler(lhandler)
         self._logger.debug("Logging system initialized")
+        # Session lifecycle management
+        session_manager_config = self._get_value_for_key_with_default('session_manager', {})
+        self.__session_compactor_interval = session_manager_config.get('compactor_interval_seconds')
+        self.__session_manager = SessionManager(self.get_folder_run(),
+                                                self.get_session_id(),
+                                                SessionRetentionPolicy.from_config(
+                                                    session_manager_config.get('retention', {})),
+                                                self.get_logger_for("{}.{}".format(__name__,
+                                                                                   SessionManager.__name__)),
+                                                archive=session_manager_config.get('archive', True))
+        self.__session_manager.lock_current_session()
+        # Process wide executor pools, shared by every subsystem running work in the background
+        self.__executor_pool_sizes = self._get_value_for_key_with_default('executor', {}).get('pool_sizes', {})
+        executor_pool.configure_pool_sizes(self.__executor_pool_sizes)
+        # Distributed execution of command line runners, enabled when a coordinator address is given
+        self.__parallel_coordinator_config = self._get_value_for_key_with_default('parallel', {}).get('coordinator', {})
+        # Peer download caches, this node serves its downloads to its peers when an address to serve on is given
+        self.__download_peer_cache_config = self._get_value_for_key_with_default('download_manager', {}) \
+            .get('peer_cache', {})
+        # Maximum number of download agents in flight for every download manager
+        self.__download_max_agents_in_flight = self._get_value_for_key_with_default('download_manager', {}) \
+            .get('max_agents_in_flight')
+        # Downloads from equivalent mirrors
+        self.__download_mirrors_config = self._get_value_for_key_with_default('download_manager', {}) \
+            .get('mirrors', {})
+        # Session profiling, disabled unless profiling modes are given
+        self.__profiling_config = self._get_value_for_key_with_default('profiling', {})
+        # Live session status endpoint, enabled when an address to serve on is given
+        self.__status_server_config = self._get_value_for_key_with_default('status_server', {})
+        # Session results store, created when the first result is reported
+        self.__results_store_config = self._get_value_for_key_with_default('results_store', {})
+        self.__results_store = None
+        self.__results_store_lock = threading.Lock()
+        # Adaptive timeouts, their history is kept across sessions, it is loaded when first needed
+        self.__timeouts_config = self._get_value_for_key_with_default('timeouts', {})
+        self.__timeout_history = None
+        self.__timeout_history_lock = threading.Lock()
         # TODO to be completed
 
     def _get_log_handlers(self):
@@ -204,6 +247,116 @@ class AppConfigManager(ConfigurationManager):
     def get_session_id(self):
         return self.__session_id
 
+    def get_session_manager(self):
+        return self.__session_manager
+
+    def get_session_compactor_interval(self):
+        """
+        Get the number of seconds between session garbage collection rounds for the background compactor
+        :return: the number of seconds, or None if the background compactor is disabled
+        """
+        return self.__session_compactor_interval
+
+    def get_executor_pool_sizes(self):
+        """
+        Get the configured size of the process wide executor pools
+        :return: a dictionary pool name -> number of worker threads, pools not in there use their default size
+        """
+        return dict(self.__executor_pool_sizes)
+
+    def get_parallel_coordinator_config(self):
+        """
+        Get the configuration for the coordinator of distributed command line runners
+        :return: a dictionary with 'address', i.e. 'host:port' or 'unix:<path>', 'token', shared by the coordinator and
+        its workers, 'heartbeat_timeout_seconds' and 'max_job_attempts', or without 'address' if runners should run
+        locally
+        """
+        return dict(self.__parallel_coordinator_config)
+
+    def get_download_peer_cache_config(self):
+        """
+        Get the configuration for peer download caches
+        :return: a dictionary with 'serve_address', i.e. 'host:port' this node serves its downloads on, 'folder' its
+        served downloads must be within, any download destination folder if not given, and 'peers', the list of peer
+        caches, 'host:port', tried before going upstream
+        """
+        return dict(self.__download_peer_cache_config)
+
+    def get_download_max_agents_in_flight(self):
+        """
+        Get the maximum number of download agents every download manager has in flight, new ones are launched as
+        earlier ones finish
+        :return: the maximum number of download agents, or None for the download managers default
+        """
+        return self.__download_max_agents_in_flight
+
+    def get_download_mirrors_config(self):
+        """
+        Get the configuration for downloads from equivalent mirrors
+        :return: a dictionary with 'ewma_alpha', i.e. weight of the latest transfer when ranking mirrors by throughput,
+        'hedge', whether to hedge transfers falling behind, 'hedge_percentile', 'hedge_grace_period_seconds' and
+        'hedge_min_samples', see 'download_manager.failover.FailoverAgent'
+        """
+        return dict(self.__download_mirrors_config)
+
+    def get_profiling_config(self):
+        """
+        Get the configuration for session profiling
+        :return: a dictionary with 'modes', i.e. a list of 'toolbox.profiling.PROFILING_MODES',
+        'tracemalloc_interval_seconds', 'tracemalloc_top' and 'sampling_interval_seconds'
+        """
+        return dict(self.__profiling_config)
+
+    def get_status_server_config(self):
+        """
+        Get the configuration for the live session status endpoint
+        :return: a dictionary with 'address', i.e. 'host:port' or 'unix:<path>' to serve the session status on, or
+        without it if the session status should not be served
+        """
+        return dict(self.__status_server_config)
+
+    def get_results_store(self):
+        """
+        Get the session results store, where parallel runners and downloads report their results
+        :return: the results store, or None if it has been disabled
+        """
+        if not self.__results_store_config.get('enabled', True):
+            return None
+        with self.__results_store_lock:
+            if self.__results_store is None:
+                self.__results_store = ResultsStore(os.path.join(self.get_session_working_dir(),
+                                                                 RESULTS_STORE_FILE_NAME),
+                                                    batch_size=self.__results_store_config.get('batch_size', 500),
+                                                    flush_interval=self.__results_store_config
+                                                    .get('flush_interval_seconds', 1))
+            return self.__results_store
+
+    def get_timeouts_config(self):
+        """
+        Get the configuration for adaptive timeouts
+        :return: a dictionary with 'history', i.e. 'enabled', 'file' and 'max_samples', 'download' and 'runner', with
+        their stall detection settings, see 'toolbox.timeouts.build_stall_detector', and, for runners, the settings for
+        estimating their timeouts, see 'toolbox.timeouts.TimeoutHistory.estimate_timeout'
+        """
+        return {key: dict(value) if isinstance(value, dict) else value for key, value in self.__timeouts_config.items()}
+
+    def get_timeout_history(self):
+        """
+        Get the history of durations and throughputs adaptive timeouts are estimated from, it is kept across sessions,
+        in the 'run' folder by default
+        :return: the timeout history, or None if it has been disabled
+        """
+        history_config = self.__timeouts_config.get('history', {})
+        if not history_config.get('enabled', True):
+            return None
+        with self.__timeout_history_lock:
+            if self.__timeout_history is None:
+                history_file = history_config.get('file') \
+                    or os.path.join(self.get_folder_run(), TIMEOUT_HISTORY_FILE_NAME)
+                self.__timeout_history = TimeoutHistory(history_file,
+                                                        max_samples=history_config.get('max_samples', 200))
+            return self.__timeout_history
+
 
 if __name__ == '__main__':
     print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
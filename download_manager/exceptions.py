@@ -19,10 +19,35 @@ class ManagerException(AppException):
         super().__init__(value)
 
 
+class ManifestException(ManagerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+class PeerCacheException(ManagerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+class MirrorException(ManagerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
 class AgentException(AppException):
     def __init__(self, value):
         super().__init__(value)
 
 
+class StreamingPipelineException(AgentException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+class DownloadWriterException(AgentException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
 if __name__ == '__main__':
     print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,441 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 08:30
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Downloads of files available from several equivalent mirrors, i.e. mirrors are ranked by the throughput observed on
+previous transfers, a failed transfer fails over to the next mirror straight away, and, optionally, a transfer that
+falls behind is hedged, i.e. a second transfer, from another mirror, is started, and whichever finishes first is kept.
+"""
+
+import os
+import time
+import random
+import threading
+import collections
+import urllib.parse
+# App imports
+import config_manager
+from toolbox import general
+from toolbox.timeouts import build_stall_detector, get_download_history_key, percentile
+from executor.pool import PooledTask, EXECUTOR_QUEUE_IO
+from .planner import get_filename_for_url
+from .writer import PART_FILE_EXTENSION
+
+# Part file for hedged transfers, the first transfer uses the usual part file
+HEDGE_PART_FILE_EXTENSION = '.hedge' + PART_FILE_EXTENSION
+# WARNING! - MAGIC NUMBER AHEAD!!! - Seconds between checks on the transfers in progress
+_TRANSFER_POLL_INTERVAL = 0.1
+# WARNING! - MAGIC NUMBER AHEAD!!! - Cap, in seconds, of the back off between rounds over all the mirrors
+_MAX_ROUND_BACKOFF = 30
+
+
+def get_mirror_key(url):
+    """
+    Mirrors are told apart by scheme and host, i.e. the same mirror serves many files
+    :param url: URL of a file in a mirror
+    :return: mirror key, 'scheme://host:port'
+    """
+    url_parts = urllib.parse.urlsplit(url)
+    return "{}://{}".format(url_parts.scheme, url_parts.netloc)
+
+
+class MirrorRanker:
+    """
+    This class ranks mirrors by an exponentially weighted moving average of the throughput of their transfers, failed
+    transfers count as zero throughput. Mirrors without transfers yet are ranked first, in the order they are given,
+    so every mirror gets a chance. It also keeps the throughput of the latest transfers, for hedging decisions.
+
+    Rankers are thread safe, the same ranker is meant to be shared by all the downloads from the same set of mirrors
+    """
+
+    def __init__(self, ewma_alpha=0.3, throughput_samples=1000):
+        """
+        :param ewma_alpha: weight of the latest transfer in the moving average, between 0 and 1
+        :param throughput_samples: number of latest transfer throughputs kept
+        """
+        self.__ewma_alpha = ewma_alpha
+        self.__ewma = {}
+        self.__transfers = collections.Counter()
+        self.__failures = collections.Counter()
+        self.__throughputs = collections.deque(maxlen=throughput_samples)
+        self.__lock = threading.Lock()
+
+    def __update(self, mirror_key, throughput):
+        if mirror_key in self.__ewma:
+            self.__ewma[mirror_key] += self.__ewma_alpha * (throughput - self.__ewma[mirror_key])
+        else:
+            self.__ewma[mirror_key] = throughput
+
+    def record_success(self, url, transferred_bytes, duration):
+        throughput = transferred_bytes / max(duration, 1e-3)
+        with self.__lock:
+            self.__update(get_mirror_key(url), throughput)
+            self.__transfers[get_mirror_key(url)] += 1
+            self.__throughputs.append(throughput)
+
+    def record_failure(self, url):
+        with self.__lock:
+            self.__update(get_mirror_key(url), 0)
+            self.__transfers[get_mirror_key(url)] += 1
+            self.__failures[get_mirror_key(url)] += 1
+
+    def rank(self, urls):
+        """
+        Sort the given URLs, of the same file in different mirrors, best mirror first
+        :param urls: URLs of the same file in different mirrors
+        :return: list of URLs
+        """
+        with self.__lock:
+            ewma = dict(self.__ewma)
+        indexed_urls = list(enumerate(urls))
+        # Mirrors not tried yet first, in the given order, the rest by throughput, fastest first
+        indexed_urls.sort(key=lambda indexed_url: (get_mirror_key(indexed_url[1]) in ewma,
+                                                   -ewma.get(get_mirror_key(indexed_url[1]), 0),
+                                                   indexed_url[0]))
+        return [url for _, url in indexed_urls]
+
+    def get_throughput_percentile(self, percentile_rank, min_samples=5):
+        """
+        Get a percentile of the throughput of the latest successful transfers, from any mirror
+        :param percentile_rank: percentile, between 0 and 100
+        :param min_samples: minimum number of transfers for the percentile to be meaningful
+        :return: throughput, in bytes per second, or None if there are not enough transfers yet
+        """
+        with self.__lock:
+            throughputs = list(self.__throughputs)
+        if len(throughputs) < max(1, min_samples):
+            return None
+        return percentile(throughputs, percentile_rank)
+
+    def get_stats(self):
+        """
+        Get the statistics of every mirror
+        :return: a dictionary mirror key -> dictionary with 'throughput_ewma', 'transfers' and 'failures'
+        """
+        with self.__lock:
+            return {mirror_key: {'throughput_ewma': self.__ewma[mirror_key],
+                                 'transfers': self.__transfers[mirror_key],
+                                 'failures': self.__failures[mirror_key]}
+                    for mirror_key in self.__ewma}
+
+
+class _Transfer:
+    """
+    A curl process downloading the file from one of the mirrors
+    """
+
+    def __init__(self, url, part_filename, dst_folder, stall_detector=None):
+        self.url = url
+        self.stall_detector = stall_detector
+        self.part_file = os.path.join(dst_folder, part_filename)
+        self.initial_size = self.get_part_file_size()
+        self.started_at = time.monotonic()
+        self.process = general.spawn_subprocess(['curl', '-L', '--fail', '-sS', '-o', part_filename, '-C', '-', url],
+                                                cwd=dst_folder)
+
+    def get_part_file_size(self):
+        try:
+            return os.path.getsize(self.part_file)
+        except OSError:
+            return 0
+
+    def get_elapsed(self):
+        return time.monotonic() - self.started_at
+
+    def get_transferred_bytes(self):
+        return max(0, self.get_part_file_size() - self.initial_size)
+
+    def get_throughput(self):
+        return self.get_transferred_bytes() / max(self.get_elapsed(), 1e-3)
+
+    def is_stalled(self):
+        if self.stall_detector is None:
+            return False
+        self.stall_detector.update(self.get_transferred_bytes())
+        return self.stall_detector.is_stalled()
+
+    def stop(self, grace_period=0):
+        general.terminate_process_group(self.process, grace_period=grace_period)
+        return self.process.communicate()
+
+
+class FailoverAgent(PooledTask):
+    """
+    Download agent for a file available from several equivalent mirrors, it offers the same interface as 'Agent' to
+    the download manager.
+
+    Mirrors are tried in the order given by the ranker, failed or timed out transfers fail over to the next mirror
+    straight away, all the mirrors being tried once makes a download attempt, with a short back off between attempts.
+    When hedging, a transfer slower than the given percentile of the throughput of previous transfers, after a grace
+    period, gets a second transfer, from the next mirror, started, the first of them to finish wins, and the other one
+    is stopped.
+    """
+    # Downloads spend most of their time waiting on the network
+    executor_queue = EXECUTOR_QUEUE_IO
+
+    def __init__(self,
+                 urls,
+                 dst_folder,
+                 mirror_ranker,
+                 download_attempts=32,
+                 download_timeout=None,
+                 hedge=False,
+                 hedge_percentile=95,
+                 hedge_grace_period=2,
+                 hedge_min_samples=5):
+        """
+        :param urls: URLs of the file in the different mirrors, the file name is taken from the first one
+        :param dst_folder: download destination folder
+        :param mirror_ranker: mirror ranker, shared by all the downloads from the same mirrors
+        :param download_attempts: rounds over all the mirrors
+        :param download_timeout: seconds every transfer is given to complete, if any, stalled transfers are stopped
+        whatever their size
+        :param hedge: whether to hedge transfers that fall behind
+        :param hedge_percentile: transfers slower than this percentile of the previous transfers, i.e. slower than
+        (100 - hedge_percentile)% of them, are hedged
+        :param hedge_grace_period: seconds a transfer runs before it can be hedged
+        :param hedge_min_samples: previous transfers needed before hedging
+        """
+        super(FailoverAgent, self).__init__()
+        self.__urls = list(urls)
+        self.__dst_folder = dst_folder
+        self.__dst_filename = get_filename_for_url(self.__urls[0])
+        self.__mirror_ranker = mirror_ranker
+        self.__download_attempts = download_attempts
+        self.__download_timeout = download_timeout
+        self.__hedge = hedge and (len(self.__urls) > 1)
+        self.__hedge_percentile = hedge_percentile
+        self.__hedge_grace_period = hedge_grace_period
+        self.__hedge_min_samples = hedge_min_samples
+        self.__result = {'msg': '', 'success': True, 'url': str(self.__urls[0]), 'mirrors': list(self.__urls)}
+        self.__cancelled = threading.Event()
+        self.__transfers = []
+        self.__transfers_lock = threading.Lock()
+        self.__hedged = False
+        self.__stall_config = config_manager.get_app_config_manager().get_timeouts_config().get('download', {})
+        self.__timeout_history = config_manager.get_app_config_manager().get_timeout_history()
+        # We have everything we need, auto-start the agent on the shared executor pool
+        self.start()
+
+    def _build_result(self, msg, success=True):
+        self.__result['msg'] = self.__result['msg'] + "\n" + msg
+        self.__result['success'] = self.__result['success'] and success
+
+    def __start_transfer(self, url, part_filename):
+        with self.__transfers_lock:
+            if self.is_cancelled():
+                return None
+            transfer = _Transfer(url,
+                                 part_filename,
+                                 self.get_dst_folder(),
+                                 stall_detector=build_stall_detector(self.__stall_config,
+                                                                     self.__timeout_history,
+                                                                     get_download_history_key(url)))
+            self.__transfers.append(transfer)
+        self._build_result("Downloading '{}' from '{}', part file '{}'"
+                           .format(self.get_dst_filename(), url, part_filename))
+        return transfer
+
+    def __remove_transfer(self, transfer):
+        with self.__transfers_lock:
+            self.__transfers.remove(transfer)
+
+    def __get_next_url(self, tried_urls):
+        busy_urls = [transfer.url for transfer in self.__transfers]
+        for url in self.__mirror_ranker.rank(self.__urls):
+            if (url not in tried_urls) and (url not in busy_urls):
+                return url
+        return None
+
+    def __is_behind(self, transfer):
+        if (not self.__hedge) or (len(self.__transfers) > 1) or (transfer.get_elapsed() < self.__hedge_grace_period):
+            return False
+        threshold = self.__mirror_ranker.get_throughput_percentile(100 - self.__hedge_percentile,
+                                                                   min_samples=self.__hedge_min_samples)
+        return (threshold is not None) and (transfer.get_throughput() < threshold)
+
+    def __finish_transfer(self, transfer, success, reason):
+        """
+        Account for a finished transfer, whatever the outcome
+        :return: no value is returned
+        """
+        self.__remove_transfer(transfer)
+        stdout, stderr = transfer.stop() if reason in ('timeout', 'stalled', 'lost') \
+            else transfer.process.communicate()
+        if success:
+            if transfer.get_transferred_bytes() > 0:
+                # Resumed transfers with nothing left to download say nothing about the mirror
+                self.__mirror_ranker.record_success(transfer.url,
+                                                    transfer.get_transferred_bytes(),
+                                                    transfer.get_elapsed())
+                if self.__timeout_history is not None:
+                    self.__timeout_history.record(get_download_history_key(transfer.url), transfer.get_throughput())
+            self._build_result("SUCCESSFUL transfer of '{}' from '{}', #{} bytes in {:.3f} seconds"
+                               .format(self.get_dst_filename(), transfer.url, transfer.get_transferred_bytes(),
+                                       transfer.get_elapsed()))
+        elif reason == 'lost':
+            # Another mirror was faster, this one didn't fail
+            self._build_result("Hedged transfer of '{}' from '{}' STOPPED, another mirror finished first"
+                               .format(self.get_dst_filename(), transfer.url))
+        elif self.is_cancelled():
+            self._build_result("Transfer of '{}' from '{}' CANCELLED".format(self.get_dst_filename(), transfer.url))
+        else:
+            self.__mirror_ranker.record_failure(transfer.url)
+            self._build_result("FAILED transfer of '{}' from '{}' ({}), STDERR XXX> {} <XXX"
+                               .format(self.get_dst_filename(), transfer.url, reason,
+                                       (stderr or b'').decode('utf8', errors='replace')))
+
+    def __complete_download(self, winner):
+        """
+        Move the part file of the winning transfer in place, and get rid of any other part file
+        :return: no value is returned
+        """
+        os.replace(winner.part_file, os.path.join(self.get_dst_folder(), self.get_dst_filename()))
+        for extension in (PART_FILE_EXTENSION, HEDGE_PART_FILE_EXTENSION):
+            part_file = os.path.join(self.get_dst_folder(), self.get_dst_filename() + extension)
+            if os.path.exists(part_file):
+                os.remove(part_file)
+
+    def __download_round(self):
+        """
+        Try every mirror, at most once, failing over to the next mirror as soon as a transfer fails
+        :return: the winning transfer, or None if no mirror could provide the file
+        """
+        tried_urls = []
+        while not self.is_cancelled():
+            if not self.__transfers:
+                url = self.__get_next_url(tried_urls)
+                if url is None:
+                    return None
+                tried_urls.append(url)
+                if self.__start_transfer(url, self.get_dst_filename() + PART_FILE_EXTENSION) is None:
+                    return None
+            for transfer in list(self.__transfers):
+                return_code = transfer.process.poll()
+                if return_code == 0:
+                    self.__finish_transfer(transfer, True, 'completed')
+                    for loser in list(self.__transfers):
+                        self.__finish_transfer(loser, False, 'lost')
+                    return transfer
+                if return_code is not None:
+                    self.__finish_transfer(transfer, False, "return code {}".format(return_code))
+                elif (self.get_download_timeout() is not None) \
+                        and (transfer.get_elapsed() > self.get_download_timeout()):
+                    self.__finish_transfer(transfer, False, 'timeout')
+                elif transfer.is_stalled():
+                    self.__finish_transfer(transfer, False, 'stalled')
+                elif self.__is_behind(transfer):
+                    url = self.__get_next_url(tried_urls)
+                    if url is not None:
+                        self._build_result("HEDGING transfer of '{}' from '{}', {:.0f} bytes/second, with '{}'"
+                                           .format(self.get_dst_filename(), transfer.url, transfer.get_throughput(),
+                                                   url))
+                        tried_urls.append(url)
+                        self.__hedged = True
+                        self.__start_transfer(url, self.get_dst_filename() + HEDGE_PART_FILE_EXTENSION)
+            self.__cancelled.wait(_TRANSFER_POLL_INTERVAL)
+        return None
+
+    def run(self):
+        """
+        This is the main thread for the download agent
+        :return: no value is returned
+        """
+        self.__result['started_at'] = time.time()
+        winner = None
+        attempt_counter = 0
+        try:
+            while (winner is None) and (attempt_counter < self.get_download_attempts()) and not self.is_cancelled():
+                if attempt_counter > 0:
+                    # Every mirror failed, they may be having a hard time, back off for a short while
+                    self.__cancelled.wait(random.uniform(0, min(_MAX_ROUND_BACKOFF, 2 ** attempt_counter)))
+                attempt_counter += 1
+                self._build_result("Downloading '{}', download attempt #{} out of #{}, over #{} mirrors"
+                                   .format(self.get_dst_filename(), attempt_counter, self.get_download_attempts(),
+                                           len(self.__urls)))
+                winner = self.__download_round()
+            if winner is not None:
+                self.__complete_download(winner)
+                self.__result['mirror'] = winner.url
+        except Exception as e:
+            winner = None
+            self._build_result("ERROR downloading '{}' ---> {}".format(self.get_dst_filename(), e), False)
+            self.__result.setdefault('error_type', 'download_failed')
+        finally:
+            with self.__transfers_lock:
+                transfers, self.__transfers = self.__transfers, []
+            for transfer in transfers:
+                transfer.stop()
+        self.__result['hedged'] = self.__hedged
+        if winner is not None:
+            self._build_result("Download for '{}' COMPLETED, from mirror '{}', on download attempt #{} out of #{}"
+                               .format(self.get_dst_filename(), winner.url, attempt_counter,
+                                       self.get_download_attempts()))
+        else:
+            self.__result.setdefault('error_type', 'cancelled' if self.is_cancelled() else 'download_failed')
+            self._build_result("Download for '{}' FAILED, on download attempt #{} out of #{}, from #{} mirrors"
+                               .format(self.get_dst_filename(), attempt_counter, self.get_download_attempts(),
+                                       len(self.__urls)),
+                               False)
+        self.__result['finished_at'] = time.time()
+
+    def cancel(self, wait=True, grace_period=5):
+        """
+        Cancel the download, no more transfers are started, and the transfers in progress are terminated.
+        :param wait: whether to wait for this agent to finish
+        :param grace_period: seconds given to the transfers in progress to terminate before killing them
+        :return: no value is returned
+        """
+        self.__cancelled.set()
+        with self.__transfers_lock:
+            for transfer in self.__transfers:
+                general.terminate_process_group(transfer.process, grace_period=grace_period)
+        if wait:
+            self.join()
+
+    def is_cancelled(self):
+        return self.__cancelled.is_set()
+
+    def wait(self):
+        """
+        Wait for this agent to finish its job, and get the result object.
+        :return: result object with information on the finished download process
+        """
+        self.join()
+        return self.get_result()
+
+    def get_result(self):
+        return self.__result
+
+    def get_progress(self):
+        """
+        Get the progress of the download, i.e. the size of the part file of the transfer furthest along
+        :return: progress, in bytes
+        """
+        # Copying the list of transfers is atomic under the GIL, no need to hold up transfers for it
+        return max([transfer.get_part_file_size() for transfer in list(self.__transfers)], default=0)
+
+    def get_urls(self):
+        return self.__urls
+
+    def get_dst_folder(self):
+        return self.__dst_folder
+
+    def get_dst_filename(self):
+        return self.__dst_filename
+
+    def get_download_attempts(self):
+        return self.__download_attempts
+
+    def get_download_timeout(self):
+        return self.__download_timeout
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
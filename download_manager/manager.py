@@ -11,20 +11,49 @@
 Download manager and its helper agents
 """
 
+import os
 import time
+import uuid
 import random
+import shutil
 import threading
 import subprocess
+import collections
+# App imports
+import config_manager
+from toolbox import general
+from toolbox.timeouts import build_stall_detector, get_download_history_key
+from executor.pool import PooledTask, get_executor_pool, EXECUTOR_QUEUE_IO
+from executor.exceptions import ExecutorShutdownException
+from session_manager.results import Result, SUBSYSTEM_DOWNLOAD
+from session_manager.exceptions import ResultsStoreException
+from session_manager.status import register_status_source, STATUS_SOURCE_DOWNLOADS
+from .failover import FailoverAgent, MirrorRanker
+from .manifest import Manifest
+from .peer_cache import get_peer_url, get_peer_cache_server
+from .planner import DOWNLOAD_STRATEGY_SKIP, get_filename_for_url
+from .streaming import StreamingAgent, StreamingPipeline
+from .writer import DownloadFileWriter, FsyncBatcher, WriteFileStage, DEFAULT_WRITE_BUFFER_SIZE, FSYNC_POLICY_BATCH, \
+    PART_FILE_EXTENSION
 
 
-class Agent(threading.Thread):
-    def __init__(self, url, dst_folder, download_attempts=32, timeout_attempts=3, download_timeout=600):
+class Agent(PooledTask):
+    # Downloads spend most of their time waiting on the network
+    executor_queue = EXECUTOR_QUEUE_IO
+
+    def __init__(self, url, dst_folder, download_attempts=32, timeout_attempts=3, download_timeout=None,
+                 peer_caches=None):
         super(Agent, self).__init__()
         self.__download_url = url
         self.__dst_folder = dst_folder
         self.__download_attempts = download_attempts
         self.__timeout_attempts = timeout_attempts
+        # Wall clock limit for every download attempt, if any, stalled downloads are stopped whatever their size
         self.__download_timeout = download_timeout
+        self.__stall_config = config_manager.get_app_config_manager().get_timeouts_config().get('download', {})
+        self.__timeout_history = config_manager.get_app_config_manager().get_timeout_history()
+        # Peer caches are tried, in order, before going upstream
+        self.__peer_caches = list(peer_caches or [])
         # Compute destination file name, using the same file name as in the given URL
         self.__dst_filename = url[url.rfind("/") + 1:]
         # Prepare standard output and error output
@@ -32,9 +61,13 @@ class Agent(threading.Thread):
         self.__stderr = b' '
         # Result object
         self.__result = {'msg': '', 'success': True, 'url': str(self.__download_url)}
+        # Cancellation
+        self.__cancelled = threading.Event()
+        self.__download_subprocess = None
+        self.__download_subprocess_lock = threading.Lock()
         # Seed random module
         random.seed(time.time())
-        # We have everything we need, auto-start the thread
+        # We have everything we need, auto-start the agent on the shared executor pool
         self.start()
 
     def _build_result(self, msg, success=True):
@@ -50,30 +83,118 @@ class Agent(threading.Thread):
         self.__result['msg'] = self.__result['msg'] + "\n" + msg
         self.__result['success'] = self.__result['success'] and success
 
-    def __download_with_timeout(self):
+    def _get_download_command(self):
+        """
+        Build the command that downloads the file, it runs within the destination folder. Subclasses downloading things
+        in a different way override this method.
+
+        The file is downloaded to a part file, moved in place by '_complete_download', so nobody, e.g. peer caches,
+        takes it for a complete file while it is being downloaded. HTTP errors must make the command fail, so an error
+        page never replaces the file
+        :return: the command, as a list of arguments
+        """
+        return ['curl', '-L', '--fail', '-o', self.get_dst_filename() + PART_FILE_EXTENSION, '-C', '-',
+                str(self.get_download_url())]
+
+    def _get_peer_download_command(self, peer_url):
+        """
+        Build the command that downloads the file from a peer cache, it runs within the destination folder. Missing
+        files must make the command fail, so the agent moves on to the next source
+        :param peer_url: URL of the file in the peer cache
+        :return: the command, as a list of arguments, or None if this agent can't download from peer caches
+        """
+        return ['curl', '--fail', '-sS', '-o', self.get_dst_filename() + PART_FILE_EXTENSION, '-C', '-', peer_url]
+
+    def _get_progress_files(self):
+        """
+        Files, within the destination folder, the download command writes to, their growth is the download progress
+        :return: list of file names
+        """
+        return [self.get_dst_filename() + PART_FILE_EXTENSION]
+
+    def get_progress(self):
         """
-        This is a helper method that will download the given URL setting a timeout limit.
+        Get the progress of the download, i.e. the size of the files the download command writes to
+        :return: progress, in bytes
+        """
+        progress = 0
+        for progress_file in self._get_progress_files():
+            try:
+                progress += os.path.getsize(os.path.join(self.get_dst_folder(), progress_file))
+            except OSError:
+                pass
+        return progress
+
+    def _complete_download(self):
+        """
+        Called once the file has been downloaded, it moves the part file in place
+        :return: no value is returned
+        """
+        os.replace(os.path.join(self.get_dst_folder(), self.get_dst_filename() + PART_FILE_EXTENSION),
+                   os.path.join(self.get_dst_folder(), self.get_dst_filename()))
+
+    def __download_from_peer_caches(self):
+        """
+        Try to download the file from the peer caches, in order, a single attempt on every one of them
+        :return: True if a peer cache had the file
+        """
+        for peer_cache in self.get_peer_caches():
+            if self.is_cancelled():
+                return False
+            peer_url = get_peer_url(peer_cache, self.get_download_url())
+            download_command = self._get_peer_download_command(peer_url)
+            if download_command is None:
+                return False
+            self._build_result("Downloading '{}' from peer cache '{}'".format(self.get_download_url(), peer_cache))
+            try:
+                if self.__download_with_timeout(download_command, get_download_history_key(peer_url)):
+                    return True
+            except subprocess.TimeoutExpired:
+                self._build_result("Download of '{}' from peer cache '{}' TIMED OUT"
+                                   .format(self.get_download_url(), peer_cache))
+        return False
+
+    def __download_with_timeout(self, download_command, history_key):
+        """
+        This is a helper method that will download the given URL, stopping the download if it stalls, i.e. its
+        throughput drops below the floor for the host, or if it goes over the time limit, if any.
+        :param download_command: command that downloads the file
+        :param history_key: timeout history key for the host the file is downloaded from
         :return: True if success
-        :except: a subprocess.TimeoutExpired exception is raised if the download can't be completed within the given
-        temporal constraints
-        """
-        download_command = "cd " + str(self.get_dst_folder()) + "; curl -L -O -C - " + str(self.get_download_url())
-        download_subprocess = subprocess.Popen(download_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                               shell=True)
-        stdout = b' '
-        stderr = b' '
-        try:
-            self._build_result("Downloading '{}' with timeout set to {} seconds"
-                               .format(self.get_download_url(),
-                                       self.get_download_timeout()))
-            (stdout, stderr) = download_subprocess.communicate(timeout=self.get_download_timeout())
-        except subprocess.TimeoutExpired as exception_download_timeout:
-            self._build_result("Timeout ({} seconds) ERROR downloading '{}', STDOUT: |||> {} <|||, STDERR XXX> {} <XXX"
-                               .format(self.get_download_timeout(),
-                                       self.get_download_url(),
-                                       stdout.decode('utf8'),
-                                       stderr.decode('utf8')))
-            raise
+        :except: a subprocess.TimeoutExpired exception is raised if the download stalled, or it can't be completed
+        within the given temporal constraints
+        """
+        with self.__download_subprocess_lock:
+            if self.is_cancelled():
+                self._build_result("Download of '{}' CANCELLED".format(self.get_download_url()), False)
+                return False
+            # The download leads its own process group, so cancelling it takes down the whole process tree
+            download_subprocess = general.spawn_subprocess(download_command, cwd=self.get_dst_folder())
+            self.__download_subprocess = download_subprocess
+        stall_detector = build_stall_detector(self.__stall_config, self.__timeout_history, history_key)
+        initial_progress = self.get_progress()
+        started_at = time.monotonic()
+        self._build_result("Downloading '{}' with timeout set to {} seconds, stall floor {} bytes/second over {} "
+                           "seconds".format(self.get_download_url(),
+                                            self.get_download_timeout(),
+                                            stall_detector.get_min_rate() if stall_detector else None,
+                                            stall_detector.get_window() if stall_detector else None))
+        (stdout, stderr, stop_reason) = \
+            general.communicate_with_progress(download_subprocess,
+                                              progress=lambda output_bytes: self.get_progress(),
+                                              stall_detector=stall_detector,
+                                              timeout=self.get_download_timeout())
+        if (stop_reason is not None) and not self.is_cancelled():
+            self._build_result("{} ERROR downloading '{}', timeout {} seconds, STDOUT: |||> {} <|||, "
+                               "STDERR XXX> {} <XXX".format(stop_reason.upper(),
+                                                            self.get_download_url(),
+                                                            self.get_download_timeout(),
+                                                            stdout.decode('utf8'),
+                                                            stderr.decode('utf8')))
+            raise subprocess.TimeoutExpired(download_command, self.get_download_timeout(), stdout, stderr)
+        if self.is_cancelled():
+            self._build_result("Download of '{}' CANCELLED while in progress".format(self.get_download_url()), False)
+            return False
         # Let's check the result from downloading the file
         if download_subprocess.poll() is not None:
             if download_subprocess.returncode != 0:
@@ -85,6 +206,10 @@ class Agent(threading.Thread):
                                            stderr.decode('utf8')))
                 return False
             # SUCCESS
+            transferred_bytes = self.get_progress() - initial_progress
+            if (self.__timeout_history is not None) and (transferred_bytes > 0):
+                self.__timeout_history.record(history_key,
+                                              transferred_bytes / max(time.monotonic() - started_at, 1e-3))
             self._build_result("SUCCESSFUL download for '{}', STDOUT: |||> {} <|||, STDERR XXX> {} <XXX"
                                .format(self.get_download_timeout(),
                                        self.get_download_url(),
@@ -110,22 +235,23 @@ class Agent(threading.Thread):
         :return: True if success, False if we reached the maximum number of attempts
         """
         timeout_attempt_counter = 0
-        while timeout_attempt_counter < self.get_timeout_attempts():
+        while (timeout_attempt_counter < self.get_timeout_attempts()) and not self.is_cancelled():
             self._build_result("Downloading '{}', timeout attempt #{} out of #{}"
                                .format(self.get_download_url(),
                                        timeout_attempt_counter,
                                        self.get_timeout_attempts()))
             timeout_attempt_counter += 1
             try:
-                return self.__download_with_timeout()
+                return self.__download_with_timeout(self._get_download_command(),
+                                                    get_download_history_key(self.get_download_url()))
             except subprocess.TimeoutExpired as exception_download_timeout:
                 self._build_result("Download of '{}' TIMED OUT, timeout attempt #{} out of #{}"
                                    .format(self.get_download_url(),
                                            timeout_attempt_counter,
                                            self.get_timeout_attempts()))
-                # wait for a random amount of time before retrying the download
+                # wait for a random amount of time before retrying the download, unless we get cancelled
                 # WARNING! - MAGIC NUMBER AHEAD!!!
-                time.sleep(random.randint(0, 60))
+                self.__cancelled.wait(random.randint(0, 60))
         return False
 
     def run(self):
@@ -134,9 +260,17 @@ class Agent(threading.Thread):
         :return: no value is returned
         """
         # TODO - Validate URL
+        self.__result['started_at'] = time.time()
         attempt_counter = 0
         download_completion = False
-        while attempt_counter < self.get_download_attempts():
+        try:
+            download_completion = self.__download_from_peer_caches()
+        except Exception as e:
+            self._build_result("ERROR downloading '{}' from peer caches, ERROR: {}"
+                               .format(self.get_download_url(), str(e)))
+        while (not download_completion) \
+                and (attempt_counter < self.get_download_attempts()) \
+                and not self.is_cancelled():
             attempt_counter += 1
             self._build_result("Downloading '{}', download attempt #{} out of #{}"
                                .format(self.get_download_url(),
@@ -153,6 +287,14 @@ class Agent(threading.Thread):
                                            attempt_counter,
                                            self.get_download_attempts(),
                                            str(e)))
+        if download_completion:
+            try:
+                self._complete_download()
+            except OSError as e:
+                download_completion = False
+                self.__result['error_type'] = 'completion_failed'
+                self._build_result("ERROR moving in place the download of '{}' ---> {}"
+                                   .format(self.get_download_url(), e), False)
         if download_completion:
             self._build_result("Download for '{}' COMPLETED, on download attempt #{} out of #{}"
                                .format(self.get_download_url(),
@@ -160,24 +302,35 @@ class Agent(threading.Thread):
                                        self.get_download_attempts()),
                                True)
         else:
+            if 'error_type' not in self.__result:
+                self.__result['error_type'] = 'cancelled' if self.is_cancelled() else 'download_failed'
             self._build_result("Download for '{}' FAILED, on download attempt #{} out of #{}"
                                .format(self.get_download_url(),
                                        attempt_counter,
                                        self.get_download_attempts()),
                                False)
+        self.__result['finished_at'] = time.time()
 
-    def cancel(self):
+    def cancel(self, wait=True, grace_period=5):
         """
-        I think this is the way to stop the thread, but I'm not sure, because the documentation about it is a little bit
-        tricky, or I didn't find the right documentation.
+        Cancel the download, no more download attempts are made, and the download in progress, if any, is terminated.
+        :param wait: whether to wait for this agent to finish
+        :param grace_period: seconds given to the download in progress to terminate before killing it
         :return: no value is returned
         """
-        self.alive = False
-        self.join()
+        self.__cancelled.set()
+        with self.__download_subprocess_lock:
+            if self.__download_subprocess is not None:
+                general.terminate_process_group(self.__download_subprocess, grace_period=grace_period)
+        if wait:
+            self.join()
+
+    def is_cancelled(self):
+        return self.__cancelled.is_set()
 
     def wait(self):
         """
-        Wait for this thread to finish its job (download a file), and get the result object.
+        Wait for this agent to finish its job (download a file), and get the result object.
         :return: result object with information on the finished download process
         """
         self.join()
@@ -195,6 +348,9 @@ class Agent(threading.Thread):
     def get_dst_folder(self):
         return self.__dst_folder
 
+    def get_dst_filename(self):
+        return self.__dst_filename
+
     def get_download_timeout(self):
         return self.__download_timeout
 
@@ -207,27 +363,326 @@ class Agent(threading.Thread):
     def get_download_attempts(self):
         return self.__download_attempts
 
+    def get_peer_caches(self):
+        return self.__peer_caches
+
+
+class RangeAgent(Agent):
+    """
+    Download agent for a byte range of a remote file, written to its own part file
+    """
+
+    def __init__(self, url, dst_folder, first_byte, last_byte, part_filename, download_attempts=32, timeout_attempts=3,
+                 download_timeout=None, peer_caches=None):
+        # The agent starts as soon as it is built, so the range must be there before
+        self.__first_byte = first_byte
+        self.__last_byte = last_byte
+        self.__part_filename = part_filename
+        super(RangeAgent, self).__init__(url,
+                                         dst_folder,
+                                         download_attempts=download_attempts,
+                                         timeout_attempts=timeout_attempts,
+                                         download_timeout=download_timeout,
+                                         peer_caches=peer_caches)
+
+    def _get_download_command(self):
+        return ['curl', '-L', '--fail',
+                '-r', "{}-{}".format(self.__first_byte, self.__last_byte),
+                '-o', self.__part_filename,
+                str(self.get_download_url())]
+
+    def _get_peer_download_command(self, peer_url):
+        return ['curl', '--fail', '-sS',
+                '-r', "{}-{}".format(self.__first_byte, self.__last_byte),
+                '-o', self.__part_filename,
+                peer_url]
+
+    def _get_progress_files(self):
+        return [self.__part_filename]
+
+    def _complete_download(self):
+        # Segments are put together by the segmented download
+        pass
+
+    def get_part_file(self):
+        return os.path.join(self.get_dst_folder(), self.__part_filename)
+
+    def get_expected_size(self):
+        return self.__last_byte - self.__first_byte + 1
+
+
+class BatchAgent(Agent):
+    """
+    Download agent for a batch of, usually small, files, all of them downloaded by the same curl process, so they reuse
+    the same connection
+    """
+
+    def __init__(self, urls, dst_folder, download_attempts=32, timeout_attempts=3, download_timeout=None):
+        self.__urls = list(urls)
+        super(BatchAgent, self).__init__(self.__urls[0],
+                                         dst_folder,
+                                         download_attempts=download_attempts,
+                                         timeout_attempts=timeout_attempts,
+                                         download_timeout=download_timeout)
+
+    def _get_download_command(self):
+        download_command = ['curl', '-L', '--fail']
+        for url in self.__urls:
+            download_command += [str(url), '-o', get_filename_for_url(url) + PART_FILE_EXTENSION]
+        return download_command
+
+    def _get_peer_download_command(self, peer_url):
+        # Batches go upstream over a single connection
+        return None
+
+    def _get_progress_files(self):
+        return [get_filename_for_url(url) + PART_FILE_EXTENSION for url in self.__urls]
+
+    def _complete_download(self):
+        for url in self.__urls:
+            os.replace(os.path.join(self.get_dst_folder(), get_filename_for_url(url) + PART_FILE_EXTENSION),
+                       os.path.join(self.get_dst_folder(), get_filename_for_url(url)))
+
+    def get_download_urls(self):
+        return self.__urls
+
+
+class SegmentedDownload:
+    """
+    Download of a big file as several byte ranges, in parallel, the parts are put together when waiting for the
+    download to finish. It offers the same interface as 'Agent' to the download manager
+    """
+
+    def __init__(self, url, dst_folder, segments, download_attempts=32, timeout_attempts=3, download_timeout=None,
+                 peer_caches=None):
+        self.__url = url
+        self.__dst_folder = dst_folder
+        self.__dst_filename = get_filename_for_url(url)
+        self.__result = None
+        self.__agents = [RangeAgent(url,
+                                    dst_folder,
+                                    first_byte,
+                                    last_byte,
+                                    "{}.segment{:04d}".format(self.__dst_filename, index),
+                                    download_attempts=download_attempts,
+                                    timeout_attempts=timeout_attempts,
+                                    download_timeout=download_timeout,
+                                    peer_caches=peer_caches)
+                         for index, (first_byte, last_byte) in enumerate(segments)]
+
+    def __merge_parts(self):
+        """
+        Put the downloaded parts together into the destination file, which is moved in place atomically
+        :return: no value is returned
+        """
+        dst_file = os.path.join(self.__dst_folder, self.__dst_filename)
+        dst_file_tmp = "{}.{}.tmp".format(dst_file, uuid.uuid4().hex[:8])
+        try:
+            with open(dst_file_tmp, 'wb') as dst:
+                for agent in self.__agents:
+                    with open(agent.get_part_file(), 'rb') as part:
+                        # WARNING! - MAGIC NUMBER AHEAD!!! - Big buffers for big files
+                        shutil.copyfileobj(part, dst, 8 * 1024 * 1024)
+            os.replace(dst_file_tmp, dst_file)
+        except Exception:
+            if os.path.exists(dst_file_tmp):
+                os.remove(dst_file_tmp)
+            raise
+        for agent in self.__agents:
+            os.remove(agent.get_part_file())
+
+    def wait(self):
+        """
+        Wait for all the segments to be downloaded, and put them together
+        :return: result object with information on the finished download process
+        """
+        if self.__result is not None:
+            return self.__result
+        results = [agent.wait() for agent in self.__agents]
+        self.__result = {'msg': "\n".join([result['msg'] for result in results]),
+                         'success': all([result['success'] for result in results]),
+                         'url': str(self.__url),
+                         'started_at': min([result.get('started_at', time.time()) for result in results]),
+                         'finished_at': max([result.get('finished_at', 0) for result in results])}
+        failed_results = [result for result in results if not result['success']]
+        if failed_results:
+            self.__result['error_type'] = failed_results[0].get('error_type')
+        if self.__result['success']:
+            wrong_size_parts = [agent.get_part_file() for agent in self.__agents
+                                if os.path.getsize(agent.get_part_file()) != agent.get_expected_size()]
+            if wrong_size_parts:
+                # The server did not honor the byte ranges
+                self.__result['success'] = False
+                self.__result['error_type'] = 'wrong_size'
+                self.__result['msg'] += "\nSegmented download of '{}' FAILED, WRONG SIZE for parts '{}'" \
+                    .format(self.__url, wrong_size_parts)
+            else:
+                try:
+                    self.__merge_parts()
+                    self.__result['msg'] += "\nSegmented download of '{}' COMPLETED, #{} segments" \
+                        .format(self.__url, len(self.__agents))
+                except OSError as e:
+                    self.__result['success'] = False
+                    self.__result['error_type'] = 'merge_failed'
+                    self.__result['msg'] += "\nERROR putting together the segments of '{}' ---> {}" \
+                        .format(self.__url, e)
+        return self.__result
+
+    def add_done_callback(self, done_callback):
+        """
+        Register a callback to call, with this download as parameter, when all its segments are over, they are put
+        together when waiting for the download
+        :param done_callback: callable
+        :return: no value is returned
+        """
+        pending_segments = [len(self.__agents)]
+        pending_segments_lock = threading.Lock()
+
+        def on_segment_done(agent):
+            with pending_segments_lock:
+                pending_segments[0] -= 1
+                if pending_segments[0]:
+                    return
+            done_callback(self)
+
+        if not self.__agents:
+            done_callback(self)
+        for agent in self.__agents:
+            agent.add_done_callback(on_segment_done)
+
+    def cancel(self, wait=True, grace_period=5):
+        for agent in self.__agents:
+            agent.cancel(wait=False, grace_period=grace_period)
+        if wait:
+            for agent in self.__agents:
+                agent.join()
+
+    def get_part_files(self):
+        return [agent.get_part_file() for agent in self.__agents]
+
+    def get_progress(self):
+        return sum([agent.get_progress() for agent in self.__agents])
+
+    def get_result(self):
+        """
+        Get the result object, once the parts have been put together, or, while the segments are being downloaded, a
+        partial one, with when the first segment started and, once they are all done, when the last one finished
+        :return: result object
+        """
+        if self.__result is not None:
+            return self.__result
+        results = [agent.get_result() for agent in self.__agents]
+        result = {'msg': '', 'success': True, 'url': str(self.__url)}
+        started = [agent_result['started_at'] for agent_result in results if 'started_at' in agent_result]
+        if started:
+            result['started_at'] = min(started)
+        if all(['finished_at' in agent_result for agent_result in results]):
+            result['finished_at'] = max([agent_result['finished_at'] for agent_result in results])
+        return result
+
 
 class Manager:
     def __init__(self, urls, download_destination_folder, logger, download_attempts=32, timeout_attempts=3,
-                 download_timeout=120):
-        self.__urls = urls
+                 download_timeout=None, peer_caches=None, mirror_ranker=None, max_agents_in_flight=None):
+        # URLs can be given as any iterable, e.g. a manifest, it is consumed lazily, in order, when starting downloads
+        self.__urls = urls.urls() if isinstance(urls, Manifest) else urls
         self.__download_destination_folder = download_destination_folder
         self.__logger = logger
         self.__download_attempts = download_attempts
         self.__timeout_attempts = timeout_attempts
         self.__download_timeout = download_timeout
+        # Peer caches, 'host:port', tried before going upstream, by default, those configured for the application
+        self.__peer_caches = list(peer_caches) if peer_caches is not None \
+            else config_manager.get_app_config_manager().get_download_peer_cache_config().get('peers', [])
+        # Downloads from equivalent mirrors, ranked by their observed throughput, see 'start_mirrored_downloads'
+        self.__mirrors_config = config_manager.get_app_config_manager().get_download_mirrors_config()
+        self.__mirror_ranker = mirror_ranker if mirror_ranker is not None \
+            else MirrorRanker(ewma_alpha=self.__mirrors_config.get('ewma_alpha', 0.3))
+        # Download agents in flight, finished ones are dropped as soon as their result has been collected, only the
+        # results of failed downloads are kept, see 'wait_all'
         self.__agents = {}
+        self.__agents_condition = threading.Condition()
+        self.__failed_results = {}
+        self.__finished_count = 0
+        self.__error_types = collections.Counter()
+        # Files completed under batched or deferred fsync policies are served to peers once flushed, see 'wait_all'
+        self.__downloaded_pending_flush = []
+        # Whether the downloads end up as files in the download destination folder, so they can be served to peers
+        self.__downloads_to_files = True
+        # Download agents in flight are bounded, new ones are launched as earlier ones finish, by default, there are
+        # enough of them to keep the I/O executor pool busy
+        self.__max_agents_in_flight = max_agents_in_flight \
+            or config_manager.get_app_config_manager().get_download_max_agents_in_flight() \
+            or (2 * get_executor_pool(EXECUTOR_QUEUE_IO).get_size())
+        self.__agent_slots = threading.Semaphore(self.__max_agents_in_flight)
         self.__success = True
+        # Once shutting down, the manager doesn't launch any more download agents
+        self.__shutdown = False
+        self.__signal_handlers = None
+        # Download plan, if the downloads were planned, and when they started, for forecasting their completion
+        self.__plan = None
+        self.__start_time = None
+        # Completion of files written by this process, see 'start_direct_downloads'
+        self.__fsync_batcher = None
+        # Every finished download is reported to the session results store, if enabled
+        self.__results_store = config_manager.get_app_config_manager().get_results_store()
+        # The session status can ask for this manager status at any time
+        register_status_source(STATUS_SOURCE_DOWNLOADS, self)
 
     def __add_agent_for_url(self, url, agent):
-        self.__agents[url] = agent
+        with self.__agents_condition:
+            self.__agents[url] = agent
 
     def __get_count_of_running_agents(self):
         return len(self.__agents)
 
     def __get_agent_entries(self):
-        return [(url, self.__agents[url]) for url in self.__agents]
+        with self.__agents_condition:
+            return [(url, self.__agents[url]) for url in self.__agents]
+
+    def __on_agent_done(self, key, agent):
+        # Done callbacks are called from within the finishing agent, collecting its result means waiting for it
+        try:
+            get_executor_pool(EXECUTOR_QUEUE_IO).submit(self.__collect_result, key, agent)
+        except ExecutorShutdownException:
+            self.__collect_result(key, agent)
+
+    def __collect_result(self, key, agent):
+        """
+        Collect the result of a finished download agent, i.e. log it, store it, and register the downloaded files with
+        the peer cache, the agent is then dropped, making room for another one
+        :param key: URL, or tuple of URLs for batches, the agent was launched for
+        :param agent: the finished agent
+        :return: no value is returned
+        """
+        try:
+            result = agent.wait()
+            if result['success']:
+                self.__logger.debug(result['msg'])
+                if self.__fsync_batcher is None:
+                    self.__add_to_peer_cache(key)
+                else:
+                    with self.__agents_condition:
+                        self.__downloaded_pending_flush.append(key)
+            else:
+                self.__logger.error(result['msg'])
+                self.__set_fail()
+            self.__store_result(key, result)
+        except Exception as e:
+            result = {'msg': "ERROR collecting the result of download agent for '{}' ---> {}".format(key, e),
+                      'success': False,
+                      'error_type': 'error'}
+            self.__logger.error(result['msg'])
+            self.__set_fail()
+        with self.__agents_condition:
+            self.__agents.pop(key, None)
+            self.__finished_count += 1
+            if not result['success']:
+                self.__error_types[result.get('error_type', 'error')] += 1
+                # Batches of files are downloaded by the same agent, every file gets its own result
+                self.__failed_results.update({url: result for url in (list(key) if isinstance(key, tuple) else [key])})
+            self.__agents_condition.notify_all()
+        self.__agent_slots.release()
 
     def __set_success(self):
         self.__success = self.__success and True
@@ -239,27 +694,326 @@ class Manager:
 
     def start_downloads(self):
         for url in self.get_urls_to_download():
-            self.__logger.debug("Launching download agent for URL '{}'".format(url))
-            self.__add_agent_for_url(url,
-                                     Agent(url,
-                                           self.get_download_destination_folder(),
-                                           download_attempts=self.get_download_attempts(),
-                                           timeout_attempts=self.get_timeout_attempts(),
-                                           download_timeout=self.get_download_timeout()))
+            self.__launch_agent(url,
+                                lambda: Agent(url,
+                                              self.get_download_destination_folder(),
+                                              download_attempts=self.get_download_attempts(),
+                                              timeout_attempts=self.get_timeout_attempts(),
+                                              download_timeout=self.get_download_timeout(),
+                                              peer_caches=self.get_peer_caches()))
+
+    def start_streaming_downloads(self, pipeline_factory):
+        """
+        Start downloads that, instead of writing files to the download destination folder, feed the downloaded data into
+        streaming pipelines, as it arrives
+        :param pipeline_factory: callable that, given a URL, builds the streaming pipeline for it
+        :return: no value is returned
+        """
+        self.__downloads_to_files = False
+        for url in self.get_urls_to_download():
+            self.__launch_agent(url,
+                                lambda: StreamingAgent(url,
+                                                       pipeline_factory(url),
+                                                       download_attempts=self.get_download_attempts(),
+                                                       download_timeout=self.get_download_timeout()))
+
+    def start_direct_downloads(self,
+                               sizes=None,
+                               write_buffer_size=DEFAULT_WRITE_BUFFER_SIZE,
+                               fsync_policy=FSYNC_POLICY_BATCH,
+                               preallocate=True):
+        """
+        Start downloads where this process, instead of curl, writes the files, i.e. they are preallocated, written with
+        large buffers to '.part' files, and moved in place, following the given fsync policy, only when complete
+        :param sizes: dictionary URL -> file size, for preallocating and checking the files, e.g. from a download plan
+        :param write_buffer_size: size, in bytes, of the write buffers
+        :param fsync_policy: one of 'download_manager.writer.FSYNC_POLICIES'
+        :param preallocate: whether to preallocate files of known size
+        :return: no value is returned
+        """
+        sizes = sizes or {}
+        self.__fsync_batcher = FsyncBatcher(fsync_policy)
+        for url in self.get_urls_to_download():
+            def build_agent():
+                writer = DownloadFileWriter(os.path.join(self.get_download_destination_folder(),
+                                                         get_filename_for_url(url)),
+                                            expected_size=sizes.get(url),
+                                            buffer_size=write_buffer_size,
+                                            fsync_batcher=self.__fsync_batcher,
+                                            preallocate=preallocate)
+                return StreamingAgent(url,
+                                      StreamingPipeline([WriteFileStage(writer)],
+                                                        start_offset=writer.get_written_bytes()),
+                                      download_attempts=self.get_download_attempts(),
+                                      download_timeout=self.get_download_timeout())
+            self.__launch_agent(url, build_agent)
+
+    def start_mirrored_downloads(self, mirror_urls, hedge=None):
+        """
+        Start downloads of files available from several equivalent mirrors, i.e. every file is downloaded from the best
+        ranked mirror, failing over to the next one as soon as a transfer fails, and, when hedging, a transfer falling
+        behind gets a second one, from another mirror, started, whichever finishes first is kept
+        :param mirror_urls: iterable of lists of URLs, every list has the URLs of the same file in different mirrors
+        :param hedge: whether to hedge transfers that fall behind, as configured for the application if not given
+        :return: no value is returned
+        """
+        hedge = self.__mirrors_config.get('hedge', False) if hedge is None else hedge
+        for urls in mirror_urls:
+            urls = list(urls)
+            self.__launch_agent(urls[0],
+                                lambda: FailoverAgent(urls,
+                                                      self.get_download_destination_folder(),
+                                                      self.get_mirror_ranker(),
+                                                      download_attempts=self.get_download_attempts(),
+                                                      download_timeout=self.get_download_timeout(),
+                                                      hedge=hedge,
+                                                      hedge_percentile=self.__mirrors_config.get('hedge_percentile',
+                                                                                                 95),
+                                                      hedge_grace_period=self.__mirrors_config
+                                                      .get('hedge_grace_period_seconds', 2),
+                                                      hedge_min_samples=self.__mirrors_config
+                                                      .get('hedge_min_samples', 5)))
+
+    def __launch_agent(self, key, agent_builder):
+        # Wait for an agent in flight to finish, if there are too many of them
+        self.__agent_slots.acquire()
+        if self.__shutdown:
+            self.__agent_slots.release()
+            result = {'msg': "Shutting down, NOT launching download agent for '{}'".format(key),
+                      'success': False,
+                      'error_type': 'cancelled'}
+            self.__logger.warning(result['msg'])
+            self.__set_fail()
+            with self.__agents_condition:
+                self.__failed_results.update({url: result for url in (list(key) if isinstance(key, tuple) else [key])})
+            return
+        self.__logger.debug("Launching download agent for '{}'".format(key))
+        try:
+            agent = agent_builder()
+        except BaseException:
+            self.__agent_slots.release()
+            raise
+        self.__add_agent_for_url(key, agent)
+        agent.add_done_callback(lambda finished_agent: self.__on_agent_done(key, finished_agent))
+
+    def start_planned_downloads(self, plan):
+        """
+        Start the downloads following a download plan, i.e. files already present are skipped, big files are downloaded
+        in segments, and small files in batches
+        :param plan: download plan, see 'download_manager.planner'
+        :return: no value is returned
+        """
+        self.__plan = plan
+        self.__start_time = time.monotonic()
+        for planned in plan.get_skipped():
+            self.__logger.info("SKIPPING '{}', it is already present".format(planned.get_url()))
+        for planned in plan.get_single():
+            self.__launch_agent(planned.get_url(),
+                                lambda: Agent(planned.get_url(),
+                                              self.get_download_destination_folder(),
+                                              download_attempts=self.get_download_attempts(),
+                                              timeout_attempts=self.get_timeout_attempts(),
+                                              download_timeout=self.get_download_timeout(),
+                                              peer_caches=self.get_peer_caches()))
+        for planned in plan.get_segmented():
+            self.__launch_agent(planned.get_url(),
+                                lambda: SegmentedDownload(planned.get_url(),
+                                                          self.get_download_destination_folder(),
+                                                          planned.segments,
+                                                          download_attempts=self.get_download_attempts(),
+                                                          timeout_attempts=self.get_timeout_attempts(),
+                                                          download_timeout=self.get_download_timeout(),
+                                                          peer_caches=self.get_peer_caches()))
+        for batch in plan.get_batches():
+            urls = tuple([planned.get_url() for planned in batch])
+            self.__launch_agent(urls,
+                                lambda: BatchAgent(urls,
+                                                   self.get_download_destination_folder(),
+                                                   download_attempts=self.get_download_attempts(),
+                                                   timeout_attempts=self.get_timeout_attempts(),
+                                                   download_timeout=self.get_download_timeout()))
+
+    def __get_downloaded_bytes(self, planned):
+        dst_file = os.path.join(self.get_download_destination_folder(), get_filename_for_url(planned.get_url()))
+        candidate_files = [dst_file, dst_file + PART_FILE_EXTENSION] \
+            + ["{}.segment{:04d}".format(dst_file, index) for index in range(len(planned.segments))]
+        downloaded_bytes = 0
+        for candidate_file in candidate_files:
+            try:
+                downloaded_bytes += os.path.getsize(candidate_file)
+            except OSError:
+                pass
+        return min(downloaded_bytes, planned.info.size or 0)
+
+    def get_download_forecast(self):
+        """
+        Forecast the completion of planned downloads, from the bytes already in the download destination folder
+        :return: a dictionary with 'total_bytes', 'downloaded_bytes', 'throughput_bytes_per_second' and 'eta_seconds',
+        the last two are None until there is enough information, or None if the downloads were not planned
+        """
+        if self.__plan is None:
+            return None
+        planned_downloads = [planned for planned in self.__plan.get_planned_downloads()
+                             if planned.strategy != DOWNLOAD_STRATEGY_SKIP]
+        total_bytes = self.__plan.get_total_bytes()
+        downloaded_bytes = sum([self.__get_downloaded_bytes(planned) for planned in planned_downloads])
+        elapsed = time.monotonic() - self.__start_time
+        throughput = (downloaded_bytes / elapsed) if (elapsed > 0) and downloaded_bytes else None
+        return {'total_bytes': total_bytes,
+                'downloaded_bytes': downloaded_bytes,
+                'throughput_bytes_per_second': throughput,
+                'eta_seconds': ((total_bytes - downloaded_bytes) / throughput) if throughput else None}
+
+    def get_status(self):
+        """
+        Get a snapshot of the downloads of this manager, for the session status. No locks are taken, the download agents
+        container is copied in one step, which is atomic under the GIL, and agents are asked for their result and
+        progress so far, so the snapshot may be slightly out of date, but it never holds up the downloads
+        :return: a dictionary with the number of downloads by state, the error rate, by error type, the elapsed time,
+        progress and throughput of every download in flight, the forecast for planned downloads, see
+        'get_download_forecast', and the throughput of every mirror, see 'MirrorRanker.get_stats'
+        """
+        now = time.time()
+        queued = 0
+        finished = self.__finished_count
+        error_types = collections.Counter(self.__error_types)
+        in_flight = []
+        for key, agent in list(self.__agents.items()):
+            result = agent.get_result()
+            if 'finished_at' in result:
+                # Finished, its result is counted once collected
+                continue
+            elif 'started_at' not in result:
+                # Waiting for a worker of its executor pool
+                queued += 1
+            else:
+                elapsed = now - result['started_at']
+                progress = agent.get_progress()
+                in_flight.append({'download': list(key) if isinstance(key, tuple) else str(key),
+                                  'elapsed_seconds': elapsed,
+                                  'progress_bytes': progress,
+                                  'throughput_bytes_per_second': (progress / elapsed) if elapsed > 0 else None})
+        failed = sum(error_types.values())
+        return {'destination_folder': self.get_download_destination_folder(),
+                'queued': queued,
+                'running': len(in_flight),
+                'finished': finished,
+                'failed': failed,
+                'error_rate': (failed / finished) if finished else None,
+                'error_types': dict(error_types),
+                'throughput_bytes_per_second': sum([download['throughput_bytes_per_second'] or 0
+                                                    for download in in_flight]),
+                'shutdown': self.__shutdown,
+                'in_flight': in_flight,
+                'forecast': self.get_download_forecast(),
+                'mirrors': self.__mirror_ranker.get_stats()}
 
     def wait_all(self):
+        """
+        Wait for all the download agents to finish, their results are collected as they finish
+        :return: the result of every download that failed, or was never launched, by URL
+        """
         self.__logger.debug("Waiting for #{} download agents to finish"
-                                 .format(self.__get_count_of_running_agents()))
-        for (url, agent) in self.__get_agent_entries():
-            self.__logger.debug("Checking on Download Agent for '{}'".format(url))
-            result = agent.wait()
-            if result['success']:
-                self.__logger.debug(result['msg'])
-                self.__set_success()
-            else:
-                self.__logger.error(result['msg'])
-                self.__set_fail()
+                            .format(self.__get_count_of_running_agents()))
+        with self.__agents_condition:
+            self.__agents_condition.wait_for(lambda: not self.__agents)
+            failed_results = dict(self.__failed_results)
+        if self.__fsync_batcher is not None:
+            # Files completed under batched or deferred fsync policies are not in place until flushed
+            self.__logger.debug("Flushed #{} downloaded files to disk".format(self.__fsync_batcher.flush()))
+        # Only files in place can be served to peers
+        with self.__agents_condition:
+            downloaded, self.__downloaded_pending_flush = self.__downloaded_pending_flush, []
+        for key in downloaded:
+            self.__add_to_peer_cache(key)
+        if self.__results_store is not None:
+            try:
+                self.__results_store.flush()
+            except ResultsStoreException as e:
+                self.__logger.warning(e.value)
+        timeout_history = config_manager.get_app_config_manager().get_timeout_history()
+        if timeout_history is not None:
+            try:
+                timeout_history.save()
+            except OSError as e:
+                self.__logger.warning("Timeout history '{}' could NOT be saved ---> {}"
+                                      .format(timeout_history.get_history_file(), e))
         self.__set_success()
+        return failed_results
+
+    def __add_to_peer_cache(self, key):
+        peer_cache_server = get_peer_cache_server()
+        if (peer_cache_server is None) or not self.__downloads_to_files:
+            return
+        # Batches of files are downloaded by the same agent, every file is served on its own
+        for url in (list(key) if isinstance(key, tuple) else [key]):
+            peer_cache_server.add_file(url,
+                                       os.path.join(self.get_download_destination_folder(), get_filename_for_url(url)))
+
+    def __store_result(self, key, result):
+        if self.__results_store is None:
+            return
+        # Batches of files are downloaded by the same agent, every file gets its own result
+        urls = list(key) if isinstance(key, tuple) else [key]
+        started_at = result.get('started_at')
+        finished_at = result.get('finished_at')
+        for url in urls:
+            self.__results_store.add(Result(SUBSYSTEM_DOWNLOAD,
+                                            str(url),
+                                            result['success'],
+                                            error_type=None if result['success'] else result.get('error_type', 'error'),
+                                            error_message=None if result['success'] else result['msg'],
+                                            duration=(finished_at - started_at) if started_at and finished_at
+                                            else None,
+                                            started_at=started_at,
+                                            finished_at=finished_at,
+                                            details=self.__get_result_details(urls, result)))
+
+    @staticmethod
+    def __get_result_details(urls, result):
+        details = {}
+        if len(urls) > 1:
+            details['batch_size'] = len(urls)
+        if 'mirror' in result:
+            details['mirror'] = result['mirror']
+            details['hedged'] = result.get('hedged', False)
+        return details or None
+
+    def get_results_store(self):
+        return self.__results_store
+
+    def drain(self):
+        """
+        Stop launching download agents, those agents already downloading are left alone to finish their job
+        :return: no value is returned
+        """
+        self.__logger.warning("DRAINING download agents")
+        self.__shutdown = True
+
+    def cancel_all(self):
+        """
+        Stop launching download agents, and cancel those that are downloading, without waiting for them to finish
+        :return: no value is returned
+        """
+        self.__shutdown = True
+        agent_entries = self.__get_agent_entries()
+        self.__logger.warning("CANCELLING #{} download agents".format(len(agent_entries)))
+        for (url, agent) in agent_entries:
+            agent.cancel(wait=False)
+
+    def install_signal_handlers(self, drain_deadline):
+        """
+        Handle SIGINT and SIGTERM by draining the download agents, and cancelling those still downloading once the
+        drain deadline expires, or on a second signal. This method must be called from the main thread.
+        :param drain_deadline: seconds to wait for the downloads in progress to finish before cancelling them
+        :return: no value is returned
+        """
+        self.__signal_handlers = general.install_shutdown_signal_handlers(self.drain, self.cancel_all, drain_deadline)
+
+    def restore_signal_handlers(self):
+        if self.__signal_handlers is not None:
+            general.restore_signal_handlers(self.__signal_handlers)
+            self.__signal_handlers = None
 
     def is_success(self):
         return self.__success
@@ -279,6 +1033,15 @@ class Manager:
     def get_download_timeout(self):
         return self.__download_timeout
 
+    def get_peer_caches(self):
+        return self.__peer_caches
+
+    def get_mirror_ranker(self):
+        return self.__mirror_ranker
+
+    def get_max_agents_in_flight(self):
+        return self.__max_agents_in_flight
+
 
 if __name__ == '__main__':
     print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,178 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 01:05
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Download manifests, i.e. the list of files to download, read lazily from a file or any iterator, with priority ordering
+and deterministic sharding, so several processes, or hosts, can split the same manifest without talking to each other
+"""
+
+import heapq
+import hashlib
+import itertools
+# App imports
+from toolbox import readers
+from .exceptions import ManifestException
+
+# Manifest ordering
+ORDER_MANIFEST = 'manifest'
+ORDER_PRIORITY = 'priority'
+ORDER_LARGEST_FIRST = 'largest_first'
+# Lines starting with this prefix are comments in manifest files
+_COMMENT_PREFIX = '#'
+
+
+class ManifestEntry:
+    """
+    A file to download, higher priority entries are downloaded first
+    """
+
+    def __init__(self, url, priority=0, size=None):
+        self.url = url
+        self.priority = priority
+        self.size = size
+
+    @staticmethod
+    def from_line(line):
+        """
+        Build a manifest entry from a manifest file line, either a plain URL, or a JSON object with 'url', and,
+        optionally, 'priority' and 'size'
+        :param line: manifest file line
+        :return: manifest entry, or None if the line is empty or a comment
+        :except: ManifestException if the line is not valid
+        """
+        line = line.strip()
+        if (not line) or line.startswith(_COMMENT_PREFIX):
+            return None
+        if not line.startswith('{'):
+            return ManifestEntry(line)
+        try:
+            entry = readers.json_loads(line)
+            return ManifestEntry(entry['url'], priority=entry.get('priority', 0), size=entry.get('size'))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ManifestException("INVALID manifest line '{}' ---> {}".format(line, e)) from e
+
+
+def parse_shard(shard):
+    """
+    Parse a shard specification
+    :param shard: 'i/N', i.e. shard 'i', starting at 0, out of 'N' shards
+    :return: (shard index, shard count)
+    :except: ManifestException if the specification is not valid
+    """
+    try:
+        shard_index, shard_count = [int(value) for value in shard.split('/')]
+    except ValueError as e:
+        raise ManifestException("INVALID shard '{}', expected 'i/N'".format(shard)) from e
+    if (shard_count < 1) or not (0 <= shard_index < shard_count):
+        raise ManifestException("INVALID shard '{}', shard index must be within [0, {})".format(shard, shard_count))
+    return shard_index, shard_count
+
+
+def get_shard_for_url(url, shard_count):
+    """
+    Deterministically assign a URL to a shard, every process gets the same answer for the same URL
+    :param url: URL
+    :param shard_count: number of shards
+    :return: shard index
+    """
+    return int.from_bytes(hashlib.blake2b(url.encode('utf8'), digest_size=8).digest(), 'big') % shard_count
+
+
+def iter_manifest_file(manifest_file):
+    """
+    Read the entries of a manifest file, lazily
+    :param manifest_file: path to the manifest file, one entry per line
+    :return: a generator of manifest entries
+    """
+    with open(manifest_file) as f:
+        for line in f:
+            entry = ManifestEntry.from_line(line)
+            if entry is not None:
+                yield entry
+
+
+class Manifest:
+    """
+    This class models a download manifest, it is read lazily, only entries in the selected shard are kept, and they are
+    ordered by priority, or size, within a window of 'window_size' entries, so the manifest is never loaded in memory
+    as a whole, unless the window size is 'None', for a total ordering.
+    """
+
+    def __init__(self, source, order=ORDER_MANIFEST, shard_index=0, shard_count=1, window_size=100000):
+        """
+        :param source: path to a manifest file, or an iterable of URLs or manifest entries
+        :param order: ORDER_MANIFEST, ORDER_PRIORITY or ORDER_LARGEST_FIRST
+        :param shard_index: index of the shard to keep
+        :param shard_count: number of shards the manifest is split into
+        :param window_size: number of entries ordered at once, 'None' for ordering the whole manifest
+        """
+        if order not in (ORDER_MANIFEST, ORDER_PRIORITY, ORDER_LARGEST_FIRST):
+            raise ManifestException("UNKNOWN manifest order '{}'".format(order))
+        if (shard_count < 1) or not (0 <= shard_index < shard_count):
+            raise ManifestException("INVALID shard #{} out of #{}".format(shard_index, shard_count))
+        self.__source = source
+        self.__order = order
+        self.__shard_index = shard_index
+        self.__shard_count = shard_count
+        self.__window_size = window_size
+
+    def __iter_source(self):
+        entries = iter_manifest_file(self.__source) if isinstance(self.__source, str) else self.__source
+        for entry in entries:
+            if not isinstance(entry, ManifestEntry):
+                entry = ManifestEntry(entry)
+            if (self.__shard_count == 1) \
+                    or (get_shard_for_url(entry.url, self.__shard_count) == self.__shard_index):
+                yield entry
+
+    def __get_sort_key(self, entry):
+        if self.__order == ORDER_PRIORITY:
+            return -(entry.priority or 0)
+        # Entries of unknown size go last
+        return -(entry.size if entry.size is not None else -1)
+
+    def __iter__(self):
+        """
+        Iterate over the entries of this manifest, in order
+        :return: a generator of manifest entries
+        """
+        entries = self.__iter_source()
+        if self.__order == ORDER_MANIFEST:
+            yield from entries
+            return
+        # Ties are broken by position in the manifest, so the ordering is stable
+        keyed_entries = ((self.__get_sort_key(entry), position, entry) for position, entry in enumerate(entries))
+        if self.__window_size is None:
+            for key, position, entry in sorted(keyed_entries, key=lambda item: item[:2]):
+                yield entry
+            return
+        window = list(itertools.islice(keyed_entries, self.__window_size))
+        heapq.heapify(window)
+        for keyed_entry in keyed_entries:
+            yield heapq.heappushpop(window, keyed_entry)[2]
+        while window:
+            yield heapq.heappop(window)[2]
+
+    def urls(self):
+        """
+        Iterate over the URLs of this manifest, in order
+        :return: a generator of URLs
+        """
+        for entry in self:
+            yield entry.url
+
+    def get_shard(self):
+        return self.__shard_index, self.__shard_count
+
+    def get_order(self):
+        return self.__order
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,305 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 07:50
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Incremental mirroring of remote directories, i.e. a remote directory index is crawled, or a listing of URLs is given,
+remote files are probed for their size, ETag and modification time, and compared with what was downloaded by the
+previous sync, kept in a state file within the local folder, so only new and changed files are downloaded. Files that
+are gone from the remote directory can, optionally, be deleted.
+"""
+
+import os
+import json
+import html.parser
+import urllib.parse
+import requests
+# App imports
+from .exceptions import MirrorException
+from .manager import Manager
+from .planner import build_session, probe_urls
+from .writer import PART_FILE_EXTENSION
+
+# Name of the mirror state file, within the local folder
+MIRROR_STATE_FILE_NAME = '.mirror_state.json'
+
+
+class _IndexLinkParser(html.parser.HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            href = dict(attrs).get('href')
+            if href:
+                self.links.append(href)
+
+
+def parse_index_links(index_html, index_url):
+    """
+    Get the links to files and subfolders in a directory index page, as those produced by Apache, nginx or FTP
+    servers behind an HTTP front end. Links out of the directory, i.e. to parent folders, other hosts, or sorting
+    queries, are left out
+    :param index_html: HTML of the index page
+    :param index_url: URL of the index page, it must end with '/'
+    :return: (list of file URLs, list of subfolder URLs)
+    """
+    parser = _IndexLinkParser()
+    parser.feed(index_html)
+    file_urls = []
+    folder_urls = []
+    for href in parser.links:
+        url = urllib.parse.urljoin(index_url, href)
+        url_parts = urllib.parse.urlsplit(url)
+        if url_parts.query or url_parts.fragment or (not url.startswith(index_url)) or (url == index_url):
+            continue
+        if url.endswith('/'):
+            folder_urls.append(url)
+        else:
+            file_urls.append(url)
+    # Indexes often link every entry twice, e.g. icon and name
+    return list(dict.fromkeys(file_urls)), list(dict.fromkeys(folder_urls))
+
+
+def crawl_index(index_url, recursive=True, max_depth=16, timeout=30):
+    """
+    Crawl a remote directory index
+    :param index_url: URL of the directory index
+    :param recursive: whether to crawl subfolders
+    :param max_depth: maximum depth of subfolders crawled
+    :param timeout: seconds to wait for every index page
+    :return: list of file URLs
+    :except: MirrorException if any index page can't be fetched
+    """
+    index_url = index_url if index_url.endswith('/') else index_url + '/'
+    session = build_session()
+    file_urls = []
+    pending_folders = [(index_url, 0)]
+    try:
+        while pending_folders:
+            folder_url, depth = pending_folders.pop()
+            try:
+                response = session.get(folder_url, timeout=timeout)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                raise MirrorException("Directory index '{}' could NOT be fetched ---> {}".format(folder_url, e)) from e
+            folder_file_urls, subfolder_urls = parse_index_links(response.text, folder_url)
+            file_urls.extend(folder_file_urls)
+            if recursive and (depth < max_depth):
+                pending_folders.extend([(subfolder_url, depth + 1) for subfolder_url in subfolder_urls])
+    finally:
+        session.close()
+    return sorted(file_urls)
+
+
+class MirrorReport:
+    """
+    Outcome of a mirror sync, as relative paths within the local folder
+    """
+
+    def __init__(self):
+        self.new = []
+        self.changed = []
+        self.unchanged = []
+        self.deleted = []
+        self.failed = []
+
+    def get_transferred_count(self):
+        return len(self.new) + len(self.changed) - len(self.failed)
+
+    def to_dict(self):
+        return {'new': self.new,
+                'changed': self.changed,
+                'unchanged': self.unchanged,
+                'deleted': self.deleted,
+                'failed': self.failed}
+
+
+class Mirror:
+    """
+    This class models the mirror of a remote directory in a local folder.
+
+    A remote file is considered unchanged when the local copy is there, with the remote size, and the remote ETag, or,
+    if the server doesn't give ETags, the remote modification time, is the same as it was when it was downloaded.
+    Only files downloaded by the mirror are ever deleted, anything else in the local folder is left alone.
+    """
+
+    def __init__(self,
+                 base_url,
+                 dst_folder,
+                 logger,
+                 listing=None,
+                 recursive=True,
+                 delete=False,
+                 max_connections=16,
+                 download_attempts=32,
+                 timeout_attempts=3,
+                 download_timeout=None):
+        """
+        :param base_url: URL of the remote directory
+        :param dst_folder: local folder
+        :param logger: logger
+        :param listing: URLs of the remote files, all of them within 'base_url', if not given, the directory index at
+        'base_url' is crawled
+        :param recursive: whether to crawl subfolders, when crawling the directory index
+        :param delete: whether to delete local files that are gone from the remote directory
+        :param max_connections: maximum number of concurrent requests probing remote files
+        :param download_attempts: see download manager
+        :param timeout_attempts: see download manager
+        :param download_timeout: see download manager
+        """
+        self.__base_url = base_url if base_url.endswith('/') else base_url + '/'
+        self.__dst_folder = dst_folder
+        self.__logger = logger
+        self.__listing = listing
+        self.__recursive = recursive
+        self.__delete = delete
+        self.__max_connections = max_connections
+        self.__download_attempts = download_attempts
+        self.__timeout_attempts = timeout_attempts
+        self.__download_timeout = download_timeout
+        self.__state_file = os.path.join(dst_folder, MIRROR_STATE_FILE_NAME)
+
+    def get_state_file(self):
+        return self.__state_file
+
+    def __load_state(self):
+        if not os.path.isfile(self.__state_file):
+            return {}
+        try:
+            with open(self.__state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            # Without state, every file is checked against the remote directory again, nothing is lost
+            self.__logger.warning("Mirror state '{}' could NOT be read, starting over ---> {}"
+                                  .format(self.__state_file, e))
+            return {}
+
+    def __save_state(self, state):
+        state_file_tmp = "{}.tmp".format(self.__state_file)
+        with open(state_file_tmp, 'w') as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(state_file_tmp, self.__state_file)
+
+    def __get_relative_path(self, url):
+        if not url.startswith(self.__base_url):
+            raise MirrorException("URL '{}' is NOT within the mirrored directory '{}'".format(url, self.__base_url))
+        relative_path = urllib.parse.unquote(url[len(self.__base_url):])
+        if any([part in ('', '.', '..') for part in relative_path.split('/')]):
+            raise MirrorException("URL '{}' does NOT map to a file within the local folder".format(url))
+        return relative_path
+
+    def __get_local_file(self, relative_path):
+        return os.path.join(self.__dst_folder, *relative_path.split('/'))
+
+    def __is_unchanged(self, relative_path, info, previous_state):
+        local_file = self.__get_local_file(relative_path)
+        if (previous_state is None) or (not os.path.isfile(local_file)):
+            return False
+        if (info.size is None) or (previous_state.get('size') != info.size):
+            return False
+        if os.path.getsize(local_file) != info.size:
+            return False
+        if info.etag:
+            return previous_state.get('etag') == info.etag
+        if info.last_modified:
+            return previous_state.get('last_modified') == info.last_modified
+        # Only the size to go by
+        return True
+
+    def __download(self, relative_paths, urls):
+        """
+        Download the given files, every local subfolder gets its own download manager, as files are named after their
+        URL within their download destination folder
+        :return: the result of every download that failed, by URL
+        """
+        managers = {}
+        for relative_path in relative_paths:
+            local_file = self.__get_local_file(relative_path)
+            local_folder = os.path.dirname(local_file)
+            os.makedirs(local_folder, exist_ok=True)
+            # The previous version must not be resumed as if it was the new one
+            if os.path.isfile(local_file) and os.path.isfile(local_file + PART_FILE_EXTENSION):
+                os.remove(local_file + PART_FILE_EXTENSION)
+            managers.setdefault(local_folder, []).append(urls[relative_path])
+        for local_folder in managers:
+            managers[local_folder] = Manager(managers[local_folder],
+                                             local_folder,
+                                             self.__logger,
+                                             download_attempts=self.__download_attempts,
+                                             timeout_attempts=self.__timeout_attempts,
+                                             download_timeout=self.__download_timeout)
+            managers[local_folder].start_downloads()
+        failed_results = {}
+        for manager in managers.values():
+            failed_results.update(manager.wait_all())
+        return failed_results
+
+    def sync(self, dry_run=False):
+        """
+        Bring the local folder up to date with the remote directory
+        :param dry_run: only compare, and report what would be done, without downloading or deleting anything
+        :return: mirror report
+        :except: MirrorException if the remote directory could not be listed
+        """
+        urls = list(self.__listing) if self.__listing is not None \
+            else crawl_index(self.__base_url, recursive=self.__recursive)
+        urls = {self.__get_relative_path(url): url for url in urls}
+        self.__logger.info("Mirror of '{}' into '{}', #{} remote files"
+                           .format(self.__base_url, self.__dst_folder, len(urls)))
+        infos = probe_urls(list(urls.values()), max_connections=self.__max_connections)
+        state = self.__load_state()
+        report = MirrorReport()
+        for relative_path, url in sorted(urls.items()):
+            info = infos[url]
+            if info.error is not None:
+                self.__logger.warning("Remote file '{}' could NOT be probed, it will be downloaded ---> {}"
+                                      .format(url, info.error))
+            if self.__is_unchanged(relative_path, info, state.get(relative_path)):
+                report.unchanged.append(relative_path)
+            elif os.path.isfile(self.__get_local_file(relative_path)):
+                report.changed.append(relative_path)
+            else:
+                report.new.append(relative_path)
+        if self.__delete:
+            report.deleted = sorted([relative_path for relative_path in state if relative_path not in urls])
+        self.__logger.info("Mirror of '{}', #{} new, #{} changed, #{} unchanged, #{} to delete"
+                           .format(self.__base_url, len(report.new), len(report.changed), len(report.unchanged),
+                                   len(report.deleted)))
+        if dry_run:
+            return report
+        failed_results = self.__download(report.new + report.changed, urls)
+        for relative_path in report.new + report.changed:
+            info = infos[urls[relative_path]]
+            local_file = self.__get_local_file(relative_path)
+            # A file on disk may still be the previous copy, only the download result tells whether it was synced
+            synced = (urls[relative_path] not in failed_results) and os.path.isfile(local_file)
+            if synced and ((info.size is None) or (os.path.getsize(local_file) == info.size)):
+                state[relative_path] = {'url': info.url,
+                                        'size': os.path.getsize(local_file),
+                                        'etag': info.etag,
+                                        'last_modified': info.last_modified}
+            else:
+                report.failed.append(relative_path)
+                state.pop(relative_path, None)
+        for relative_path in report.deleted:
+            try:
+                os.remove(self.__get_local_file(relative_path))
+            except FileNotFoundError:
+                pass
+            state.pop(relative_path)
+        self.__save_state(state)
+        if report.failed:
+            self.__logger.error("Mirror of '{}', #{} files FAILED to download, '{}'"
+                                .format(self.__base_url, len(report.failed), report.failed))
+        return report
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,291 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 04:20
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Peer download caches, i.e. a node serves the files it has downloaded to other nodes, over HTTP, with zero copy
+'sendfile' and byte range support, so nodes downloading the same files can get them from a peer in the local network
+before going upstream.
+
+Files are looked up by a hash of the URL they were downloaded from, so files with the same name, from different URLs,
+are never mistaken for each other. Only files that have been added to the peer cache, i.e. completed downloads, are
+served, and only for as long as they are not modified, nothing else in their folder is ever exposed.
+"""
+
+import os
+import re
+import hashlib
+import threading
+import http.server
+import email.utils
+import urllib.parse
+# App imports
+import config_manager
+from .exceptions import PeerCacheException
+from .planner import get_filename_for_url
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+# WARNING! - MAGIC NUMBER AHEAD!!! - Maximum number of bytes handed to the kernel on every 'sendfile' call
+_SENDFILE_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Process wide peer cache server
+_peer_cache_server = None
+_peer_cache_server_lock = threading.Lock()
+
+
+def get_peer_cache_key(url):
+    """
+    Get the key files downloaded from the given URL are looked up by in peer caches
+    :param url: upstream URL of the file
+    :return: peer cache key
+    """
+    return hashlib.sha256(str(url).encode('utf8')).hexdigest()
+
+
+def get_peer_url(peer, url):
+    """
+    Get the URL of a file in a peer cache, i.e. its key followed, for humans reading logs, by its file name
+    :param peer: peer cache address, 'host:port', or its base URL, 'http://host:port'
+    :param url: upstream URL of the file
+    :return: URL of the file in the peer cache
+    """
+    base_url = peer if '://' in peer else "http://{}".format(peer)
+    return "{}/{}/{}".format(base_url.rstrip('/'),
+                             get_peer_cache_key(url),
+                             urllib.parse.quote(get_filename_for_url(url)))
+
+
+def parse_range(range_header, size):
+    """
+    Parse an HTTP 'Range' header, only single byte ranges are supported
+    :param range_header: value of the 'Range' header
+    :param size: size of the file, in bytes
+    :return: (first byte, last byte), both included, None if the header is not a single byte range, in which case the
+    whole file should be served
+    :except: ValueError if the range can't be satisfied
+    """
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range, i.e. the last 'n' bytes
+        first, last = max(0, size - int(last)), size - 1
+    else:
+        first, last = int(first), min(int(last), size - 1) if last else size - 1
+    if (first >= size) or (first > last):
+        raise ValueError("Range '{}' NOT SATISFIABLE for #{} bytes".format(range_header, size))
+    return first, last
+
+
+def get_peer_cache_server():
+    """
+    Get the process wide peer cache server, it is started the first time it is requested, if an address to serve on has
+    been configured for the application. It serves the files completed by the download managers of this process, in
+    their download destination folders, unless a folder is configured, in which case only files within it are served
+    :return: the peer cache server, or None if this node is not configured to serve a peer cache
+    """
+    global _peer_cache_server
+    with _peer_cache_server_lock:
+        if _peer_cache_server is None:
+            peer_cache_config = config_manager.get_app_config_manager().get_download_peer_cache_config()
+            if peer_cache_config.get('serve_address'):
+                _peer_cache_server = PeerCacheServer(peer_cache_config.get('folder'),
+                                                     peer_cache_config['serve_address'])
+                _peer_cache_server.start()
+        return _peer_cache_server
+
+
+class _PeerCacheRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def __get_file_path(self):
+        # The file name, after the key, is just informative
+        key = urllib.parse.urlsplit(self.path).path.lstrip('/').partition('/')[0]
+        return self.server.peer_cache.get_file(key)
+
+    def __send_file(self, send_body):
+        file_path = self.__get_file_path()
+        if file_path is None:
+            self.send_error(404)
+            return
+        try:
+            f = open(file_path, 'rb')
+        except OSError:
+            self.send_error(404)
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            try:
+                byte_range = parse_range(self.headers.get('Range', ''), stat.st_size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header('Content-Range', "bytes */{}".format(stat.st_size))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            first, last = byte_range if byte_range is not None else (0, stat.st_size - 1)
+            self.send_response(206 if byte_range is not None else 200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(last - first + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('Last-Modified', email.utils.formatdate(stat.st_mtime, usegmt=True))
+            self.send_header('ETag', '"{:x}-{:x}"'.format(stat.st_size, stat.st_mtime_ns))
+            if byte_range is not None:
+                self.send_header('Content-Range', "bytes {}-{}/{}".format(first, last, stat.st_size))
+            self.end_headers()
+            if send_body:
+                self.wfile.flush()
+                self.server.peer_cache._count_served(self.__sendfile(f, first, last - first + 1))
+
+    def __sendfile(self, f, offset, count):
+        # Zero copy, file pages go straight from the page cache to the socket
+        sent_bytes = 0
+        while sent_bytes < count:
+            sent = os.sendfile(self.connection.fileno(),
+                               f.fileno(),
+                               offset + sent_bytes,
+                               min(count - sent_bytes, _SENDFILE_CHUNK_SIZE))
+            if sent == 0:
+                # The file got truncated while we were serving it
+                self.close_connection = True
+                break
+            sent_bytes += sent
+        return sent_bytes
+
+    def do_GET(self):
+        try:
+            self.__send_file(send_body=True)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def do_HEAD(self):
+        self.__send_file(send_body=False)
+
+    def log_message(self, format, *args):
+        self.server.peer_cache._logger.debug("Peer '{}' - {}".format(self.client_address[0], format % args))
+
+
+class PeerCacheServer:
+    """
+    This class models a peer cache server, it serves the files added to it, i.e. completed downloads, keyed by the URL
+    they were downloaded from, to other nodes, in a background thread
+    """
+
+    def __init__(self, folder=None, address='0.0.0.0:0'):
+        """
+        :param folder: only files within this folder can be served, None for no restriction
+        :param address: 'host:port' to listen on, port '0' picks a free port
+        """
+        self._logger = config_manager \
+            .get_app_config_manager() \
+            .get_logger_for("{}.{}".format(__name__, type(self).__name__))
+        self.__folder = os.path.realpath(folder) if folder else None
+        # Served files, key -> (path, size, modification time), files modified after being added are not served
+        self.__files = {}
+        self.__files_lock = threading.Lock()
+        host, _, port = address.rpartition(':')
+        try:
+            self.__socket_address = (host, int(port))
+        except ValueError as e:
+            raise PeerCacheException("INVALID peer cache address '{}', expected 'host:port'".format(address)) from e
+        self.__server = None
+        self.__server_thread = None
+        self.__stats_lock = threading.Lock()
+        self.__served_requests = 0
+        self.__served_bytes = 0
+
+    def start(self):
+        """
+        Start serving files
+        :return: no return value
+        :except: PeerCacheException if the server could not bind to its address
+        """
+        try:
+            self.__server = http.server.ThreadingHTTPServer(self.__socket_address, _PeerCacheRequestHandler)
+        except OSError as e:
+            raise PeerCacheException("Peer cache could NOT listen on '{}:{}' ---> {}"
+                                     .format(self.__socket_address[0], self.__socket_address[1], e)) from e
+        self.__server.peer_cache = self
+        self.__server_thread = threading.Thread(target=self.__server.serve_forever, name='PeerCacheServer', daemon=True)
+        self.__server_thread.start()
+        self._logger.info("Peer cache serving downloads within '{}' on '{}'"
+                          .format(self.get_folder() or '/', self.get_address()))
+
+    def stop(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+    def add_file(self, url, file_path):
+        """
+        Add a file to this peer cache, to be served for requests of the given URL
+        :param url: URL the file was downloaded from
+        :param file_path: path to the file
+        :return: True if the file was added, False if it doesn't exist or it is outside the folder of this peer cache
+        """
+        file_path = os.path.realpath(file_path)
+        if (self.__folder is not None) and (os.path.commonpath([self.__folder, file_path]) != self.__folder):
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        with self.__files_lock:
+            self.__files[get_peer_cache_key(url)] = (file_path, stat.st_size, stat.st_mtime_ns)
+        return True
+
+    def get_file(self, key):
+        """
+        Get the file to serve for the given key
+        :param key: peer cache key, see 'get_peer_cache_key'
+        :return: path to the file, or None if there is no file for the key, or it has been modified since it was added
+        """
+        with self.__files_lock:
+            entry = self.__files.get(key)
+        if entry is None:
+            return None
+        file_path, size, mtime_ns = entry
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+            return None
+        return file_path
+
+    def _count_served(self, served_bytes):
+        with self.__stats_lock:
+            self.__served_requests += 1
+            self.__served_bytes += served_bytes
+
+    def get_stats(self):
+        """
+        Get the number of files, or ranges, served by this peer cache, and their size
+        :return: a dictionary with 'served_requests' and 'served_bytes'
+        """
+        with self.__stats_lock:
+            return {'served_requests': self.__served_requests, 'served_bytes': self.__served_bytes}
+
+    def get_folder(self):
+        return self.__folder
+
+    def get_address(self):
+        """
+        Get the address peers should use, i.e. with the actual port if the server was bound to port 0
+        :return: 'host:port'
+        """
+        host, port = self.__server.server_address[:2] if self.__server is not None else self.__socket_address
+        return "{}:{}".format(host, port)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,261 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 02:00
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Planning of download batches, i.e. remote files are probed with concurrent HEAD requests, over pooled connections, for
+their size, ETag and byte range support, and, with that information, files already present are skipped, big files are
+split into segments downloaded in parallel, and small files are batched together over the same connection
+"""
+
+import os
+import requests
+import requests.adapters
+# App imports
+from executor.pool import get_executor_pool, EXECUTOR_QUEUE_IO
+
+# Download strategies
+DOWNLOAD_STRATEGY_SKIP = 'skip'
+DOWNLOAD_STRATEGY_SINGLE = 'single'
+DOWNLOAD_STRATEGY_SEGMENTED = 'segmented'
+DOWNLOAD_STRATEGY_BATCHED = 'batched'
+
+
+class RemoteFileInfo:
+    """
+    What we know about a remote file, from its HEAD response
+    """
+
+    def __init__(self, url, size=None, etag=None, last_modified=None, accepts_ranges=False, error=None):
+        self.url = url
+        self.size = size
+        self.etag = etag
+        self.last_modified = last_modified
+        self.accepts_ranges = accepts_ranges
+        self.error = error
+
+    @staticmethod
+    def from_response(url, response):
+        content_length = response.headers.get('Content-Length')
+        return RemoteFileInfo(url,
+                              size=int(content_length) if content_length and content_length.isdigit() else None,
+                              etag=response.headers.get('ETag'),
+                              last_modified=response.headers.get('Last-Modified'),
+                              accepts_ranges=response.headers.get('Accept-Ranges', '').lower() == 'bytes')
+
+
+def get_filename_for_url(url):
+    # Same naming as 'curl -O', i.e. the last component of the URL
+    return url[url.rfind("/") + 1:]
+
+
+def build_session(max_connections=16):
+    """
+    Build an HTTP session whose connection pool is big enough for the given number of concurrent requests
+    :param max_connections: maximum number of connections per host
+    :return: HTTP session
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_connections,
+                                            pool_maxsize=max_connections,
+                                            pool_block=True)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def probe_url(session, url, timeout=30):
+    """
+    Probe a remote file with a HEAD request, redirects are followed
+    :param session: HTTP session
+    :param url: URL of the remote file
+    :param timeout: seconds to wait for the response
+    :return: remote file information, with 'error' set if the file could not be probed
+    """
+    try:
+        response = session.head(url, allow_redirects=True, timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        return RemoteFileInfo(url, error=str(e))
+    return RemoteFileInfo.from_response(url, response)
+
+
+def probe_urls(urls, max_connections=16, timeout=30):
+    """
+    Probe remote files concurrently, on the I/O executor pool, over pooled connections
+    :param urls: URLs of the remote files
+    :param max_connections: maximum number of concurrent requests per host
+    :param timeout: seconds to wait for every response
+    :return: a dictionary URL -> remote file information
+    """
+    session = build_session(max_connections)
+    try:
+        pool = get_executor_pool(EXECUTOR_QUEUE_IO)
+        tasks = [(url, pool.submit(probe_url, session, url, timeout)) for url in urls]
+        return {url: task.get_result() for url, task in tasks}
+    finally:
+        session.close()
+
+
+def split_into_segments(size, segment_size):
+    """
+    Split a file into byte ranges
+    :param size: file size, in bytes
+    :param segment_size: size of every segment, the last one may be smaller
+    :return: list of (first byte, last byte), both included, as in HTTP ranges
+    """
+    return [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+
+
+class PlannedDownload:
+    """
+    A file in a download plan, and how it is going to be downloaded
+    """
+
+    def __init__(self, info, strategy, segments=None):
+        self.info = info
+        self.strategy = strategy
+        self.segments = segments or []
+
+    def get_url(self):
+        return self.info.url
+
+
+class DownloadPlan:
+    """
+    This class models the plan for downloading a batch of files, and forecasts how long it is going to take
+    """
+
+    def __init__(self, planned_downloads, batches):
+        self.__planned_downloads = planned_downloads
+        self.__batches = batches
+
+    def get_planned_downloads(self):
+        return self.__planned_downloads
+
+    def __get_by_strategy(self, strategy):
+        return [planned for planned in self.__planned_downloads if planned.strategy == strategy]
+
+    def get_skipped(self):
+        return self.__get_by_strategy(DOWNLOAD_STRATEGY_SKIP)
+
+    def get_single(self):
+        return self.__get_by_strategy(DOWNLOAD_STRATEGY_SINGLE)
+
+    def get_segmented(self):
+        return self.__get_by_strategy(DOWNLOAD_STRATEGY_SEGMENTED)
+
+    def get_batches(self):
+        """
+        Get the batches of small files, every batch is downloaded over the same connection
+        :return: list of lists of planned downloads
+        """
+        return self.__batches
+
+    def get_total_bytes(self):
+        """
+        Get the number of bytes to download, files of unknown size don't count
+        :return: bytes to download
+        """
+        return sum([planned.info.size or 0
+                    for planned in self.__planned_downloads if planned.strategy != DOWNLOAD_STRATEGY_SKIP])
+
+    def get_unknown_size_count(self):
+        return len([planned for planned in self.__planned_downloads
+                    if (planned.strategy != DOWNLOAD_STRATEGY_SKIP) and (planned.info.size is None)])
+
+    def get_request_count(self):
+        return len(self.get_single()) \
+               + sum([len(planned.segments) for planned in self.get_segmented()]) \
+               + sum([len(batch) for batch in self.get_batches()])
+
+    def get_largest_transfer_bytes(self):
+        """
+        Get the size of the largest transfer, i.e. file or segment, in this plan, it bounds how long the plan takes
+        however many connections are used
+        :return: size, in bytes
+        """
+        transfers = [planned.info.size or 0 for planned in self.get_single()] \
+            + [last - first + 1 for planned in self.get_segmented() for first, last in planned.segments] \
+            + [planned.info.size or 0 for batch in self.get_batches() for planned in batch]
+        return max(transfers, default=0)
+
+    def estimate_duration(self, throughput_bytes_per_second, concurrency=1, request_latency=0.1):
+        """
+        Forecast how long downloading this plan takes
+        :param throughput_bytes_per_second: aggregated throughput of all the connections
+        :param concurrency: number of concurrent connections
+        :param request_latency: seconds every request spends before the data starts flowing
+        :return: seconds
+        """
+        per_connection_throughput = throughput_bytes_per_second / concurrency
+        bandwidth_bound = (self.get_total_bytes() / throughput_bytes_per_second) \
+            + (self.get_request_count() * request_latency / concurrency)
+        tail_bound = request_latency + (self.get_largest_transfer_bytes() / per_connection_throughput)
+        return max(bandwidth_bound, tail_bound)
+
+
+class DownloadPlanner:
+    """
+    This class models a download planner, files already present in the destination folder, with the same size as the
+    remote ones, are skipped, files bigger than the segmentation threshold, on servers supporting byte ranges, are split
+    into segments, and files smaller than the small file threshold are batched together
+    """
+
+    def __init__(self,
+                 dst_folder,
+                 segment_threshold_mb=256,
+                 segment_size_mb=64,
+                 small_file_threshold_kb=1024,
+                 small_files_batch_size=64,
+                 max_connections=16,
+                 timeout=30):
+        self.__dst_folder = dst_folder
+        self.__segment_threshold = segment_threshold_mb * 1024 * 1024
+        self.__segment_size = segment_size_mb * 1024 * 1024
+        self.__small_file_threshold = small_file_threshold_kb * 1024
+        self.__small_files_batch_size = small_files_batch_size
+        self.__max_connections = max_connections
+        self.__timeout = timeout
+
+    def __is_present(self, info):
+        if info.size is None:
+            return False
+        try:
+            return os.path.getsize(os.path.join(self.__dst_folder, get_filename_for_url(info.url))) == info.size
+        except OSError:
+            return False
+
+    def __plan_download(self, info):
+        if self.__is_present(info):
+            return PlannedDownload(info, DOWNLOAD_STRATEGY_SKIP)
+        if (info.size is not None) and info.accepts_ranges and (info.size > self.__segment_threshold):
+            return PlannedDownload(info,
+                                   DOWNLOAD_STRATEGY_SEGMENTED,
+                                   segments=split_into_segments(info.size, self.__segment_size))
+        if (info.size is not None) and (info.size < self.__small_file_threshold):
+            return PlannedDownload(info, DOWNLOAD_STRATEGY_BATCHED)
+        # Files we could not probe fall here too, they are downloaded the usual way
+        return PlannedDownload(info, DOWNLOAD_STRATEGY_SINGLE)
+
+    def plan(self, urls):
+        """
+        Build the download plan for the given URLs
+        :param urls: URLs to download
+        :return: download plan
+        """
+        infos = probe_urls(urls, max_connections=self.__max_connections, timeout=self.__timeout)
+        planned_downloads = [self.__plan_download(infos[url]) for url in infos]
+        small_files = [planned for planned in planned_downloads if planned.strategy == DOWNLOAD_STRATEGY_BATCHED]
+        batches = [small_files[index:index + self.__small_files_batch_size]
+                   for index in range(0, len(small_files), self.__small_files_batch_size)]
+        return DownloadPlan(planned_downloads, batches)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
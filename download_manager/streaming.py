@@ -0,0 +1,427 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 00:10
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Download to process streaming, i.e. downloaded bytes are piped through a chain of processing stages (decompression,
+checksum, line splitting, parsing, tee to disk...) as they arrive, so there is no need to write the whole file to disk,
+decompress it, and read it back again
+"""
+
+import os
+import time
+import zlib
+import uuid
+import random
+import hashlib
+import selectors
+import threading
+# App imports
+import config_manager
+from toolbox import general, readers
+from toolbox.timeouts import build_stall_detector, get_download_history_key
+from executor.pool import PooledTask, EXECUTOR_QUEUE_IO
+from .exceptions import StreamingPipelineException
+
+# Size of the chunks read from the download
+_CHUNK_SIZE = 1024 * 1024
+# zlib window bits for decompressing either gzip or zlib streams, with automatic header detection
+_ZLIB_AUTO_HEADER_WBITS = zlib.MAX_WBITS | 32
+
+
+def random_backoff(attempt):
+    """
+    Exponential backoff, with jitter, between download attempts
+    :param attempt: number of the attempt that just failed, starting at 1
+    :return: seconds to wait
+    """
+    # WARNING! - MAGIC NUMBER AHEAD!!!
+    return random.uniform(0, min(60, 2 ** attempt))
+
+
+class StreamStage:
+    """
+    Processing stage of a streaming pipeline, stages get the data as it arrives, and pass on whatever they produce to
+    the next stage. This base stage passes data on untouched
+    """
+
+    def process(self, data):
+        """
+        Process a chunk of data
+        :param data: chunk of data, as bytes
+        :return: data for the next stage
+        """
+        return data
+
+    def finish(self):
+        """
+        Called when there is no more data
+        :return: any remaining data for the next stage
+        """
+        return b''
+
+    def abort(self):
+        """
+        Called when the stream is aborted, e.g. because the download failed
+        :return: no return value
+        """
+        pass
+
+
+class DecompressStage(StreamStage):
+    """
+    Decompress gzip or zlib data, concatenated gzip members, e.g. those written by parallel compressors, are supported
+    """
+
+    def __init__(self, wbits=_ZLIB_AUTO_HEADER_WBITS):
+        self.__wbits = wbits
+        self.__decompressor = zlib.decompressobj(wbits)
+
+    def process(self, data):
+        output = []
+        while data:
+            output.append(self.__decompressor.decompress(data))
+            if not self.__decompressor.eof:
+                break
+            # End of a gzip member, whatever comes after it is the next member
+            data = self.__decompressor.unused_data
+            self.__decompressor = zlib.decompressobj(self.__wbits)
+        return b''.join(output)
+
+    def finish(self):
+        return self.__decompressor.flush()
+
+
+class ChecksumStage(StreamStage):
+    """
+    Compute a checksum of the data going through this stage, and, optionally, verify it when the stream is over
+    """
+
+    def __init__(self, algorithm='sha256', expected_checksum=None):
+        self.__hash = hashlib.new(algorithm)
+        self.__expected_checksum = expected_checksum
+
+    def process(self, data):
+        self.__hash.update(data)
+        return data
+
+    def finish(self):
+        if (self.__expected_checksum is not None) and (self.get_checksum() != self.__expected_checksum.lower()):
+            raise StreamingPipelineException("Checksum MISMATCH, expected '{}', got '{}'"
+                                             .format(self.__expected_checksum, self.get_checksum()))
+        return b''
+
+    def get_checksum(self):
+        return self.__hash.hexdigest()
+
+
+class SplitLinesStage(StreamStage):
+    """
+    Split the data going through this stage into lines, and hand every line, without its separator, to a callback. Data
+    is passed on untouched
+    """
+
+    def __init__(self, on_line, separator=b'\n'):
+        self.__on_line = on_line
+        self.__separator = separator
+        self.__pending = b''
+        self.__line_count = 0
+
+    def process(self, data):
+        lines = (self.__pending + data).split(self.__separator)
+        self.__pending = lines.pop()
+        for line in lines:
+            self._handle_line(line)
+        return data
+
+    def finish(self):
+        if self.__pending:
+            self._handle_line(self.__pending)
+            self.__pending = b''
+        return b''
+
+    def _handle_line(self, line):
+        self.__line_count += 1
+        self.__on_line(line)
+
+    def get_line_count(self):
+        return self.__line_count
+
+
+class ParseLinesStage(SplitLinesStage):
+    """
+    Split the data going through this stage into lines, parse every non empty line, JSON by default, and hand the
+    parsed record to a callback
+    """
+
+    def __init__(self, on_record, parse=readers.json_loads, separator=b'\n'):
+        super().__init__(self.__parse_line, separator=separator)
+        self.__on_record = on_record
+        self.__parse = parse
+
+    def __parse_line(self, line):
+        if line.strip():
+            self.__on_record(self.__parse(line))
+
+
+class TeeToFileStage(StreamStage):
+    """
+    Write a copy of the data going through this stage to a file, the file is written to a temporary file, and moved in
+    place only when the stream finishes successfully
+    """
+
+    def __init__(self, destination_file):
+        self.__destination_file = destination_file
+        self.__temporary_file = "{}.{}.part".format(destination_file, uuid.uuid4().hex[:8])
+        self.__file = open(self.__temporary_file, 'wb')
+
+    def process(self, data):
+        self.__file.write(data)
+        return data
+
+    def finish(self):
+        self.__file.close()
+        os.replace(self.__temporary_file, self.__destination_file)
+        return b''
+
+    def abort(self):
+        self.__file.close()
+        try:
+            os.remove(self.__temporary_file)
+        except FileNotFoundError:
+            pass
+
+    def get_destination_file(self):
+        return self.__destination_file
+
+
+class StreamingPipeline:
+    """
+    Chain of stream stages, data fed into the pipeline goes through every stage in order. Pipelines resuming a stream,
+    e.g. from a partially written file, start at the given offset, and downloads feeding them start from there
+    """
+
+    def __init__(self, stages, start_offset=0):
+        self.__stages = list(stages)
+        self.__bytes_fed = start_offset
+
+    def get_stages(self):
+        return self.__stages
+
+    def get_bytes_fed(self):
+        return self.__bytes_fed
+
+    def __feed_from(self, index, data):
+        for stage in self.__stages[index:]:
+            if not data:
+                return
+            data = stage.process(data)
+
+    def feed(self, data):
+        """
+        Feed a chunk of data into the pipeline
+        :param data: chunk of data, as bytes
+        :return: no return value
+        """
+        self.__bytes_fed += len(data)
+        self.__feed_from(0, data)
+
+    def finish(self):
+        """
+        Finish the stream, every stage flushes whatever it is holding into the next stages, in order
+        :return: no return value
+        """
+        for index, stage in enumerate(self.__stages):
+            self.__feed_from(index + 1, stage.finish())
+
+    def abort(self):
+        for stage in self.__stages:
+            stage.abort()
+
+
+class StreamingAgent(PooledTask):
+    """
+    Download agent that, instead of writing the downloaded file to disk, feeds it into a streaming pipeline as it
+    arrives. When a download attempt fails, the next one resumes from the last byte fed into the pipeline, so stages see
+    the stream only once, servers must support byte ranges for this to work.
+
+    Its interface mirrors the one of 'Agent', so the download manager handles both of them the same way.
+    """
+    executor_queue = EXECUTOR_QUEUE_IO
+
+    def __init__(self, url, pipeline, download_attempts=32, download_timeout=None):
+        super().__init__()
+        self.__download_url = url
+        self.__pipeline = pipeline
+        self.__download_attempts = download_attempts
+        # Wall clock limit for every download attempt, if any, stalled downloads are stopped whatever their size
+        self.__download_timeout = download_timeout
+        self.__stall_config = config_manager.get_app_config_manager().get_timeouts_config().get('download', {})
+        self.__timeout_history = config_manager.get_app_config_manager().get_timeout_history()
+        self.__result = {'msg': '', 'success': True, 'url': str(url)}
+        self.__cancelled = threading.Event()
+        self.__download_subprocess = None
+        self.__download_subprocess_lock = threading.Lock()
+        # We have everything we need, auto-start the agent on the shared executor pool
+        self.start()
+
+    def _build_result(self, msg, success=True):
+        self.__result['msg'] = self.__result['msg'] + "\n" + msg
+        self.__result['success'] = self.__result['success'] and success
+
+    def __get_download_command(self):
+        download_command = ['curl', '-L', '-sS', '--fail']
+        offset = self.__pipeline.get_bytes_fed()
+        if offset:
+            download_command += ['-C', str(offset)]
+        return download_command + [str(self.get_download_url())]
+
+    def __stream_download(self):
+        """
+        Run one download attempt, feeding the pipeline with the downloaded data
+        :return: True if the download completed
+        """
+        with self.__download_subprocess_lock:
+            if self.is_cancelled():
+                return False
+            download_subprocess = general.spawn_subprocess(self.__get_download_command())
+            self.__download_subprocess = download_subprocess
+        history_key = get_download_history_key(self.get_download_url())
+        stall_detector = build_stall_detector(self.__stall_config, self.__timeout_history, history_key)
+        started_at = time.monotonic()
+        initial_bytes_fed = self.__pipeline.get_bytes_fed()
+        deadline = (started_at + self.get_download_timeout()) if self.get_download_timeout() is not None else None
+        stderr = []
+        open_streams = {download_subprocess.stdout.fileno(), download_subprocess.stderr.fileno()}
+        try:
+            with selectors.DefaultSelector() as selector:
+                for fd in open_streams:
+                    selector.register(fd, selectors.EVENT_READ)
+                while open_streams:
+                    now = time.monotonic()
+                    if (deadline is not None) and (now >= deadline):
+                        self._build_result("Timeout ({} seconds) ERROR streaming '{}'"
+                                           .format(self.get_download_timeout(), self.get_download_url()))
+                        return False
+                    if stall_detector is not None:
+                        stall_detector.update(self.__pipeline.get_bytes_fed(), now)
+                        if stall_detector.is_stalled(now):
+                            self._build_result("STALLED streaming '{}', slower than {} bytes/second over {} seconds"
+                                               .format(self.get_download_url(),
+                                                       stall_detector.get_min_rate(),
+                                                       stall_detector.get_window()))
+                            return False
+                    for key, events in selector.select(timeout=min(deadline - now, 1) if deadline is not None else 1):
+                        data = os.read(key.fd, _CHUNK_SIZE)
+                        if not data:
+                            selector.unregister(key.fd)
+                            open_streams.discard(key.fd)
+                        elif key.fd == download_subprocess.stdout.fileno():
+                            self.__pipeline.feed(data)
+                        else:
+                            stderr.append(data)
+            download_subprocess.wait()
+        finally:
+            if download_subprocess.poll() is None:
+                general.terminate_process_group(download_subprocess, grace_period=0)
+                download_subprocess.wait()
+            download_subprocess.stdout.close()
+            download_subprocess.stderr.close()
+        if self.is_cancelled():
+            return False
+        if download_subprocess.returncode != 0:
+            self._build_result("ERROR streaming '{}', return code '{}', after #{} bytes, STDERR XXX> {} <XXX"
+                               .format(self.get_download_url(),
+                                       download_subprocess.returncode,
+                                       self.__pipeline.get_bytes_fed(),
+                                       b''.join(stderr).decode('utf8', errors='replace')))
+            return False
+        transferred_bytes = self.__pipeline.get_bytes_fed() - initial_bytes_fed
+        if (self.__timeout_history is not None) and (transferred_bytes > 0):
+            self.__timeout_history.record(history_key, transferred_bytes / max(time.monotonic() - started_at, 1e-3))
+        return True
+
+    def run(self):
+        self.__result['started_at'] = time.time()
+        attempt_counter = 0
+        download_completion = False
+        try:
+            while (attempt_counter < self.get_download_attempts()) and not self.is_cancelled():
+                attempt_counter += 1
+                self._build_result("Streaming '{}', download attempt #{} out of #{}, from byte #{}"
+                                   .format(self.get_download_url(),
+                                           attempt_counter,
+                                           self.get_download_attempts(),
+                                           self.__pipeline.get_bytes_fed()))
+                download_completion = self.__stream_download()
+                if download_completion:
+                    break
+                self.__cancelled.wait(random_backoff(attempt_counter))
+            if download_completion:
+                self.__pipeline.finish()
+        except Exception as e:
+            self.__result['error_type'] = 'pipeline_failed'
+            self._build_result("ERROR streaming '{}' ---> {}".format(self.get_download_url(), e), False)
+            download_completion = False
+        if download_completion:
+            self._build_result("Streaming of '{}' COMPLETED, #{} bytes, on download attempt #{} out of #{}"
+                               .format(self.get_download_url(),
+                                       self.__pipeline.get_bytes_fed(),
+                                       attempt_counter,
+                                       self.get_download_attempts()))
+        else:
+            self.__pipeline.abort()
+            if 'error_type' not in self.__result:
+                self.__result['error_type'] = 'cancelled' if self.is_cancelled() else 'download_failed'
+            self._build_result("Streaming of '{}' FAILED, on download attempt #{} out of #{}"
+                               .format(self.get_download_url(), attempt_counter, self.get_download_attempts()),
+                               False)
+        self.__result['finished_at'] = time.time()
+
+    def cancel(self, wait=True, grace_period=5):
+        """
+        Cancel the download, the pipeline is aborted
+        :param wait: whether to wait for this agent to finish
+        :param grace_period: seconds given to the download in progress to terminate before killing it
+        :return: no value is returned
+        """
+        self.__cancelled.set()
+        with self.__download_subprocess_lock:
+            if self.__download_subprocess is not None:
+                general.terminate_process_group(self.__download_subprocess, grace_period=grace_period)
+        if wait:
+            self.join()
+
+    def is_cancelled(self):
+        return self.__cancelled.is_set()
+
+    def wait(self):
+        self.join()
+        return self.get_result()
+
+    def get_result(self):
+        return self.__result
+
+    def get_pipeline(self):
+        return self.__pipeline
+
+    def get_progress(self):
+        return self.__pipeline.get_bytes_fed()
+
+    def get_download_url(self):
+        return self.__download_url
+
+    def get_download_attempts(self):
+        return self.__download_attempts
+
+    def get_download_timeout(self):
+        return self.__download_timeout
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,253 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 03:10
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Write path for downloaded files, i.e. files are preallocated from their known size, written with large buffered writes
+to a '.part' file, and moved in place with an atomic rename only once they are complete, with a configurable policy on
+when to flush them to disk
+"""
+
+import os
+import json
+import threading
+# App imports
+from toolbox import general, readers
+from .exceptions import DownloadWriterException
+from .streaming import StreamStage
+
+# Fsync policies
+# Every completed file is flushed to disk, renamed, and its folder flushed, before moving on
+FSYNC_POLICY_ALWAYS = 'always'
+# Completed files are flushed, and renamed, in batches, by number of files or time
+FSYNC_POLICY_BATCH = 'batch'
+# Completed files are flushed, and renamed, when explicitly requested, e.g. when all the downloads are over
+FSYNC_POLICY_DEFERRED = 'deferred'
+# Completed files are renamed straight away, the operating system decides when they reach the disk
+FSYNC_POLICY_NONE = 'none'
+FSYNC_POLICIES = (FSYNC_POLICY_ALWAYS, FSYNC_POLICY_BATCH, FSYNC_POLICY_DEFERRED, FSYNC_POLICY_NONE)
+
+PART_FILE_EXTENSION = '.part'
+# Sidecar for preallocated part files, their size tells nothing about how much has been written
+PREALLOCATION_MARKER_EXTENSION = '.prealloc'
+# WARNING! - MAGIC NUMBER AHEAD!!! - Big writes keep fragmentation down when many files grow at the same time
+DEFAULT_WRITE_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+def _fsync_file(file_path):
+    file_fd = os.open(file_path, os.O_RDONLY)
+    try:
+        os.fsync(file_fd)
+    finally:
+        os.close(file_fd)
+
+
+class FsyncBatcher:
+    """
+    This class models the completion of downloaded files following an fsync policy. For batched and deferred policies,
+    completed part files are queued, and, when flushing, all of them are flushed to disk, renamed to their final name,
+    and every folder involved is flushed once, so files never show up complete before their data is on disk
+    """
+
+    def __init__(self, fsync_policy=FSYNC_POLICY_BATCH, max_batch_files=64, max_batch_delay=5):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise DownloadWriterException("UNKNOWN fsync policy '{}', valid policies are '{}'"
+                                          .format(fsync_policy, FSYNC_POLICIES))
+        self.__fsync_policy = fsync_policy
+        self.__max_batch_files = max_batch_files
+        self.__max_batch_delay = max_batch_delay
+        self.__pending = []
+        self.__lock = threading.Lock()
+        self.__timer = None
+
+    def get_fsync_policy(self):
+        return self.__fsync_policy
+
+    def complete(self, part_file, dst_file):
+        """
+        Complete a downloaded file, i.e. move its part file to its final name, following the fsync policy
+        :param part_file: path to the complete part file
+        :param dst_file: final path for the file
+        :return: no return value
+        """
+        if self.__fsync_policy == FSYNC_POLICY_NONE:
+            os.replace(part_file, dst_file)
+            return
+        if self.__fsync_policy == FSYNC_POLICY_ALWAYS:
+            _fsync_file(part_file)
+            os.replace(part_file, dst_file)
+            general.fsync_folder(os.path.dirname(os.path.abspath(dst_file)))
+            return
+        with self.__lock:
+            self.__pending.append((part_file, dst_file))
+            flush_now = (self.__fsync_policy == FSYNC_POLICY_BATCH) and (len(self.__pending) >= self.__max_batch_files)
+            if (self.__fsync_policy == FSYNC_POLICY_BATCH) and (not flush_now) and (self.__timer is None):
+                self.__timer = threading.Timer(self.__max_batch_delay, self.flush)
+                self.__timer.daemon = True
+                self.__timer.start()
+        if flush_now:
+            self.flush()
+
+    def flush(self):
+        """
+        Flush, and rename, every completed file still pending
+        :return: number of files flushed
+        """
+        with self.__lock:
+            pending = self.__pending
+            self.__pending = []
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+        for part_file, dst_file in pending:
+            _fsync_file(part_file)
+        for part_file, dst_file in pending:
+            os.replace(part_file, dst_file)
+        for folder in set([os.path.dirname(os.path.abspath(dst_file)) for part_file, dst_file in pending]):
+            general.fsync_folder(folder)
+        return len(pending)
+
+    def get_pending_count(self):
+        with self.__lock:
+            return len(self.__pending)
+
+
+class DownloadFileWriter:
+    """
+    This class models the writing of a downloaded file. Data goes to '<file>.part', preallocated when the size of the
+    file is known, and, once complete, it is handed to an fsync batcher to be moved in place. If a part file is already
+    there from a previous attempt, writing resumes at its end, see 'get_written_bytes'
+    """
+
+    def __init__(self,
+                 dst_file,
+                 expected_size=None,
+                 buffer_size=DEFAULT_WRITE_BUFFER_SIZE,
+                 fsync_batcher=None,
+                 preallocate=True):
+        self.__dst_file = dst_file
+        self.__part_file = dst_file + PART_FILE_EXTENSION
+        self.__marker_file = self.__part_file + PREALLOCATION_MARKER_EXTENSION
+        self.__expected_size = expected_size
+        self.__buffer_size = buffer_size
+        self.__preallocate = preallocate
+        self.__fsync_batcher = fsync_batcher or FsyncBatcher(FSYNC_POLICY_NONE)
+        self.__written_bytes = self.__get_resume_offset()
+        # The part file is opened on the first write, so there are no open files for downloads that have not started
+        self.__file = None
+
+    def __get_resume_offset(self):
+        if not os.path.exists(self.__part_file):
+            return 0
+        if os.path.exists(self.__marker_file):
+            try:
+                marker = readers.load_json_file(self.__marker_file)
+                if marker.get('expected_size') == self.__expected_size:
+                    return marker['written_bytes']
+            except (OSError, ValueError, KeyError):
+                pass
+            # We can't tell how much of a preallocated file has been written, so we start over
+            return 0
+        return os.path.getsize(self.__part_file)
+
+    def __open(self):
+        self.__file = open(self.__part_file, 'r+b' if os.path.exists(self.__part_file) else 'wb',
+                           buffering=self.__buffer_size)
+        if self.__preallocate and self.__expected_size and (self.__written_bytes == 0):
+            self.__preallocate_file()
+        self.__file.seek(self.__written_bytes)
+
+    def __preallocate_file(self):
+        try:
+            os.posix_fallocate(self.__file.fileno(), 0, self.__expected_size)
+        except OSError:
+            # Not supported by this file system, the file grows as it is written
+            return
+        self.__write_marker()
+
+    def __write_marker(self):
+        marker_file_tmp = "{}.tmp".format(self.__marker_file)
+        with open(marker_file_tmp, 'w') as f:
+            json.dump({'expected_size': self.__expected_size, 'written_bytes': self.__written_bytes}, f)
+        os.replace(marker_file_tmp, self.__marker_file)
+
+    def get_written_bytes(self):
+        return self.__written_bytes
+
+    def get_dst_file(self):
+        return self.__dst_file
+
+    def get_part_file(self):
+        return self.__part_file
+
+    def write(self, data):
+        if self.__file is None:
+            self.__open()
+        self.__file.write(data)
+        self.__written_bytes += len(data)
+
+    def commit(self):
+        """
+        The file is complete, it is closed, trimmed to the written size, and handed to the fsync batcher to be moved in
+        place
+        :return: no return value
+        :except: DownloadWriterException if the file is not of the expected size
+        """
+        if self.__file is None:
+            # Nothing was written in this attempt, e.g. empty files, or part files complete from a previous attempt
+            self.__open()
+        self.__file.flush()
+        if (self.__expected_size is not None) and (self.__written_bytes != self.__expected_size):
+            self.abort()
+            raise DownloadWriterException("INCOMPLETE download for '{}', #{} bytes written out of #{} expected"
+                                          .format(self.__dst_file, self.__written_bytes, self.__expected_size))
+        # Preallocation may have made the file bigger than what was written
+        self.__file.truncate(self.__written_bytes)
+        self.__file.close()
+        if os.path.exists(self.__marker_file):
+            os.remove(self.__marker_file)
+        self.__fsync_batcher.complete(self.__part_file, self.__dst_file)
+
+    def abort(self):
+        """
+        Stop writing the file, the part file is kept, so a later attempt can resume it
+        :return: no return value
+        """
+        if (self.__file is None) or self.__file.closed:
+            return
+        self.__file.flush()
+        self.__file.close()
+        if os.path.exists(self.__marker_file):
+            self.__write_marker()
+
+
+class WriteFileStage(StreamStage):
+    """
+    Streaming pipeline stage that writes the data going through it with a download file writer
+    """
+
+    def __init__(self, writer):
+        self.__writer = writer
+
+    def process(self, data):
+        self.__writer.write(data)
+        return data
+
+    def finish(self):
+        self.__writer.commit()
+        return b''
+
+    def abort(self):
+        self.__writer.abort()
+
+    def get_writer(self):
+        return self.__writer
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
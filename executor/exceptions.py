@@ -0,0 +1,33 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 21:50
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Exceptions related to the executor subsystem
+"""
+
+from exceptions import AppException
+
+
+class ExecutorException(AppException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+class ExecutorShutdownException(ExecutorException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+class TaskCancelledException(ExecutorException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
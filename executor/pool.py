@@ -0,0 +1,468 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 21:55
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Process wide executor subsystem, i.e. named pools of worker threads, with work stealing, where the application
+subsystems submit their tasks, so total concurrency is governed in one place
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+import traceback
+import collections
+# App imports
+from .exceptions import ExecutorShutdownException, TaskCancelledException
+
+# Named queues
+EXECUTOR_QUEUE_IO = 'io'
+EXECUTOR_QUEUE_CPU = 'cpu'
+EXECUTOR_QUEUE_RUNNERS = 'runners'
+
+# Process wide pools, by name, and their sizes
+_pools = {}
+_pool_sizes = {}
+_pools_lock = threading.Lock()
+
+
+def _get_default_pool_size(name):
+    cpu_count = os.cpu_count() or 1
+    if name == EXECUTOR_QUEUE_IO:
+        # WARNING! - MAGIC NUMBER AHEAD!!! - I/O bound tasks spend most of their time waiting
+        return max(32, 4 * cpu_count)
+    if name == EXECUTOR_QUEUE_RUNNERS:
+        # WARNING! - MAGIC NUMBER AHEAD!!! - Command runners spend their time waiting for their command, which is where
+        # the work is done, how many commands run at the same time is up to their admission controller, if any
+        return max(8, 2 * cpu_count)
+    return cpu_count
+
+
+def configure_pool_sizes(pool_sizes):
+    """
+    Set the size of the named pools, it has no effect on pools that have already been created
+    :param pool_sizes: dictionary pool name -> number of worker threads
+    :return: no return value
+    """
+    with _pools_lock:
+        _pool_sizes.update({name: size for name, size in pool_sizes.items() if size})
+
+
+def get_executor_pool(name):
+    """
+    Get the process wide pool with the given name, creating it if needed
+    :param name: pool name, e.g. EXECUTOR_QUEUE_IO or EXECUTOR_QUEUE_CPU
+    :return: the work stealing thread pool
+    """
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = WorkStealingThreadPool(name, _pool_sizes.get(name) or _get_default_pool_size(name))
+        return _pools[name]
+
+
+def get_executor_metrics():
+    """
+    Get the metrics of all the process wide pools
+    :return: dictionary pool name -> metrics
+    """
+    with _pools_lock:
+        pools = dict(_pools)
+    return {name: pool.get_metrics() for name, pool in pools.items()}
+
+
+class Task:
+    """
+    A unit of work submitted to a pool.
+
+    Waiting for a task from within a pool worker, e.g. a task waiting for the tasks it submitted, runs the task right
+    there if no worker has picked it up yet, otherwise, with every worker blocked waiting for tasks that are still
+    queued, the pool would deadlock
+    """
+
+    def __init__(self, function, args, kwargs, pool=None):
+        self.__function = function
+        self.__args = args
+        self.__kwargs = kwargs
+        self.__pool = pool
+        self.__finished = threading.Event()
+        self.__state_lock = threading.Lock()
+        # Whether a worker, or a thread waiting for the task, has taken the task for running it
+        self.__claimed = False
+        self.__started = False
+        self.__cancelled = False
+        self.__result = None
+        self.__exception = None
+        self.submission_time = time.monotonic()
+        self.start_time = None
+
+    def _run(self):
+        """
+        Run the task, called by the pool workers
+        :return: None if the task has already been taken for running somewhere else, False if the task was cancelled
+        before it could run, True otherwise
+        """
+        with self.__state_lock:
+            if self.__claimed:
+                return None
+            self.__claimed = True
+            if self.__cancelled:
+                return False
+            self.__started = True
+        self.start_time = time.monotonic()
+        try:
+            self.__result = self.__function(*self.__args, **self.__kwargs)
+        except BaseException as e:
+            self.__exception = e
+        finally:
+            # Idle workers hold on to the last task they ran, it must not keep its arguments alive
+            self.__function = self.__args = self.__kwargs = None
+            self.__finished.set()
+        return True
+
+    def cancel(self):
+        """
+        Cancel the task, only if it has not started running yet
+        :return: True if the task was cancelled
+        """
+        with self.__state_lock:
+            if self.__started:
+                return False
+            self.__cancelled = True
+        self.__finished.set()
+        return True
+
+    def is_cancelled(self):
+        return self.__cancelled
+
+    def is_done(self):
+        return self.__finished.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the task to finish, when called from a worker of the pool the task was submitted to, the task is run
+        inline if it is still queued, regardless of the timeout. Workers of other pools just wait, so tasks never run
+        outside the pool sized for them
+        :param timeout: maximum number of seconds to wait, 'None' to wait for as long as it takes
+        :return: True if the task finished
+        """
+        if (not self.__finished.is_set()) \
+                and (self.__pool is not None) \
+                and self.__pool._is_own_worker(threading.current_thread()):
+            self.__pool._run_task(self)
+        return self.__finished.wait(timeout)
+
+    def get_result(self, timeout=None):
+        """
+        Wait for the task to finish and get its result
+        :param timeout: maximum number of seconds to wait, 'None' to wait for as long as it takes
+        :return: the value returned by the task
+        :except: the exception raised by the task, if any, or TaskCancelledException if it was cancelled
+        """
+        self.wait(timeout)
+        if self.__cancelled:
+            raise TaskCancelledException("The task was CANCELLED")
+        if self.__exception is not None:
+            raise self.__exception
+        return self.__result
+
+    def get_exception(self):
+        return self.__exception
+
+
+class Worker(threading.Thread):
+    """
+    Pool worker thread, it runs tasks from its own queue, in order of submission, and, when its queue is empty, it
+    steals the most recently submitted tasks from other workers
+    """
+
+    def __init__(self, pool, index):
+        super().__init__(name="Executor-{}-{}".format(pool.get_name(), index), daemon=True)
+        self.__pool = pool
+        self.tasks = collections.deque()
+
+    def run(self):
+        while True:
+            task = self.__pool._get_next_task(self)
+            if task is None:
+                return
+            self.__pool._run_task(task)
+
+
+class WorkStealingThreadPool:
+    """
+    This class models a fixed size pool of worker threads, every worker has its own queue of tasks, so submissions and
+    workers don't contend on a single queue, and idle workers steal tasks from busy ones.
+
+    Tasks submitted from within a worker of the pool go to that worker's queue, otherwise they are distributed among
+    the workers in a round robin fashion.
+    """
+
+    def __init__(self, name, size):
+        self.__name = name
+        self.__size = size
+        self.__logger = logging.getLogger("{}.{}-{}".format(__name__, type(self).__name__, name))
+        self.__work_available = threading.Condition()
+        self.__shutdown = False
+        self.__next_worker = 0
+        # Metrics
+        self.__metrics_lock = threading.Lock()
+        self.__submitted = 0
+        self.__completed = 0
+        self.__failed = 0
+        self.__cancelled = 0
+        self.__stolen = 0
+        self.__running = 0
+        self.__total_wait_time = 0.0
+        self.__max_wait_time = 0.0
+        self.__workers = [Worker(self, index) for index in range(size)]
+        for worker in self.__workers:
+            worker.start()
+
+    def get_name(self):
+        return self.__name
+
+    def get_size(self):
+        return self.__size
+
+    def _is_own_worker(self, thread):
+        return isinstance(thread, Worker) and (thread in self.__workers)
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Submit a task to this pool
+        :param function: callable to run
+        :param args: positional arguments for the callable
+        :param kwargs: keyword arguments for the callable
+        :return: the submitted task
+        :except: ExecutorShutdownException if the pool has been shut down
+        """
+        if self.__shutdown:
+            raise ExecutorShutdownException("Executor pool '{}' is SHUT DOWN".format(self.get_name()))
+        task = Task(function, args, kwargs, pool=self)
+        current_thread = threading.current_thread()
+        with self.__work_available:
+            if self._is_own_worker(current_thread):
+                worker = current_thread
+            else:
+                worker = self.__workers[self.__next_worker]
+                self.__next_worker = (self.__next_worker + 1) % self.__size
+            worker.tasks.append(task)
+            with self.__metrics_lock:
+                self.__submitted += 1
+            self.__work_available.notify()
+        return task
+
+    def __steal_task(self, thief):
+        victims = [worker for worker in self.__workers if (worker is not thief) and worker.tasks]
+        if not victims:
+            return None
+        try:
+            task = random.choice(victims).tasks.pop()
+        except IndexError:
+            # The victim ran out of tasks in the meantime
+            return None
+        with self.__metrics_lock:
+            self.__stolen += 1
+        return task
+
+    def _get_next_task(self, worker):
+        """
+        Get the next task for the given worker, waiting for one if there is none
+        :param worker: pool worker
+        :return: the next task, or None if the pool has been shut down
+        """
+        while True:
+            try:
+                return worker.tasks.popleft()
+            except IndexError:
+                pass
+            task = self.__steal_task(worker)
+            if task is not None:
+                return task
+            with self.__work_available:
+                if self.__shutdown:
+                    return None
+                if not any([other.tasks for other in self.__workers]):
+                    # WARNING! - MAGIC NUMBER AHEAD!!! - The timeout is just a safety net for missed notifications
+                    self.__work_available.wait(timeout=1)
+
+    def _run_task(self, task):
+        with self.__metrics_lock:
+            self.__running += 1
+        try:
+            started = task._run()
+        finally:
+            with self.__metrics_lock:
+                self.__running -= 1
+        if started is None:
+            # Taken for running somewhere else, e.g. inline, by a worker waiting for it
+            return
+        with self.__metrics_lock:
+            if not started:
+                self.__cancelled += 1
+                return
+            wait_time = task.start_time - task.submission_time
+            self.__total_wait_time += wait_time
+            self.__max_wait_time = max(self.__max_wait_time, wait_time)
+            self.__completed += 1
+            if task.get_exception() is not None:
+                self.__failed += 1
+        if task.get_exception() is not None:
+            self.__logger.error("Task FAILED in executor pool '{}' ---> {}"
+                                .format(self.get_name(),
+                                        "".join(traceback.format_exception(type(task.get_exception()),
+                                                                           task.get_exception(),
+                                                                           task.get_exception().__traceback__))))
+
+    def get_queue_depth(self):
+        return sum([len(worker.tasks) for worker in self.__workers])
+
+    def get_metrics(self):
+        """
+        Get the metrics for this pool
+        :return: a dictionary with the metrics
+        """
+        with self.__metrics_lock:
+            started = self.__completed
+            return {'size': self.__size,
+                    'queue_depth': self.get_queue_depth(),
+                    'running': self.__running,
+                    'submitted': self.__submitted,
+                    'completed': self.__completed,
+                    'failed': self.__failed,
+                    'cancelled': self.__cancelled,
+                    'stolen': self.__stolen,
+                    'wait_time_avg': (self.__total_wait_time / started) if started else 0.0,
+                    'wait_time_max': self.__max_wait_time}
+
+    def shutdown(self, wait=True):
+        """
+        Shut down this pool, queued tasks are still run, but no more tasks are accepted
+        :param wait: whether to wait for the workers to finish
+        :return: no return value
+        """
+        with self.__work_available:
+            self.__shutdown = True
+            self.__work_available.notify_all()
+        if wait and (threading.current_thread() not in self.__workers):
+            for worker in self.__workers:
+                worker.join()
+
+
+class PooledTask:
+    """
+    Base class for objects that used to be threads on their own, it provides the thread-like 'start', 'run', 'join' and
+    'is_alive' methods, but 'run' is executed as a task on the process wide executor pool named by 'executor_queue'.
+
+    A pooled task waiting for something external, e.g. a remote job, doesn't need to hold a pool worker while waiting,
+    'run' can '_suspend' the pooled task, and return, and the rest of the work is submitted to the pool, via the
+    returned 'resume' callable, when what it waits for is over. The pooled task is not done until its last
+    continuation is.
+    """
+    executor_queue = EXECUTOR_QUEUE_CPU
+
+    def __init__(self):
+        self.__task = None
+        self.__finished = threading.Event()
+        self.__state_lock = threading.Lock()
+        # Number of continuations that have been promised, and have not run yet
+        self.__suspensions = 0
+        self.__done_callbacks = []
+
+    def run(self):
+        """
+        Work to do, defined by subclasses
+        :return: no return value
+        """
+        pass
+
+    def __run(self, function):
+        try:
+            function()
+        finally:
+            with self.__state_lock:
+                # A continuation is still to run, or it ran already, and it is still this one to finish
+                suspended = self.__suspensions > 0
+                if suspended:
+                    self.__suspensions -= 1
+            if not suspended:
+                self.__set_finished()
+
+    def __set_finished(self):
+        with self.__state_lock:
+            self.__finished.set()
+            done_callbacks = list(self.__done_callbacks)
+            self.__done_callbacks.clear()
+        for done_callback in done_callbacks:
+            done_callback(self)
+
+    def add_done_callback(self, done_callback):
+        """
+        Register a callback to call, with this pooled task as parameter, when it is done, or it won't run. If it is
+        already done, the callback is called straight away
+        :param done_callback: callable
+        :return: no return value
+        """
+        with self.__state_lock:
+            if not self.__finished.is_set():
+                self.__done_callbacks.append(done_callback)
+                return
+        done_callback(self)
+
+    def _suspend(self):
+        """
+        Suspend this pooled task, i.e. it is not done when the current 'run', or continuation, returns, but when the
+        continuation given to the returned 'resume' callable does. It must be called from 'run', or a continuation, and
+        'resume' must be called exactly once, from any thread
+        :return: 'resume' callable, taking the continuation to run on the executor pool
+        """
+        with self.__state_lock:
+            self.__suspensions += 1
+
+        def resume(continuation):
+            try:
+                self.__task = get_executor_pool(self.executor_queue).submit(self.__run, continuation)
+            except ExecutorShutdownException:
+                # There is no pool to go back to, the continuation runs right here
+                self.__run(continuation)
+
+        return resume
+
+    def start(self):
+        if self.__task is not None:
+            raise RuntimeError("Pooled tasks can only be started once")
+        self.__task = get_executor_pool(self.executor_queue).submit(self.__run, self.run)
+
+    def join(self, timeout=None):
+        if self.__task is None:
+            raise RuntimeError("Cannot join a pooled task before it is started")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Waiting for the task runs it inline, when called from a pool worker, if no worker has picked it up yet
+        self.__task.wait(timeout)
+        self.__finished.wait(None if deadline is None else max(0, deadline - time.monotonic()))
+
+    def is_alive(self):
+        return (self.__task is not None) and not self.__finished.is_set()
+
+    def cancel_pending(self):
+        """
+        Remove this task from its executor pool queue, if it has not started running yet
+        :return: True if the task won't run
+        """
+        if self.__task is None:
+            return False
+        if self.__task.cancel():
+            self.__set_finished()
+            return True
+        return False
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
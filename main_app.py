@@ -11,11 +11,21 @@
 Application bootstrap script
 """
 
+import os
+import json
 import nose
 import argparse
 import unittest
 # Application modules
 import config_manager
+from parallel.distributed import Worker
+from toolbox import general
+from download_manager.manager import Manager as DownloadManager
+from download_manager.manifest import Manifest, parse_shard
+from download_manager.peer_cache import get_peer_cache_server
+from toolbox.profiling import SessionProfiler, parse_profiling_modes
+from session_manager.results import ResultsStore, RESULTS_STORE_FILE_NAME
+from session_manager.status import get_status_server
 
 __DEFAULT_CONFIG_FILE = "config_default.json"
 
@@ -25,6 +35,10 @@ __run_test_mode = False
 __logger = None
 # Command line arguments
 __args = None
+# Download manifest shard for this process, as (shard index, shard count)
+__shard = (0, 1)
+# Session profiler, if profiling has been requested
+__profiler = None
 
 
 def get_cmdl():
@@ -34,6 +48,30 @@ def get_cmdl():
     parser.add_argument('-d', dest='testmode', action='store_true', help='Run unit tests')
     parser.add_argument('-c', "--config_file",
                         help='Application configuration file')
+    parser.add_argument('-w', '--worker',
+                        help="Run as a worker daemon for the distributed runners coordinator at the given address, "
+                             "i.e. 'host:port' or 'unix:<path>'")
+    parser.add_argument('-m', '--manifest',
+                        help="Download the files listed in the given download manifest")
+    parser.add_argument('-o', '--download_folder',
+                        help="Download destination folder for the manifest downloads, 'downloads' within the session "
+                             "working directory by default")
+    parser.add_argument('-s', '--shard',
+                        help="Process only shard 'i' out of 'N' of the download manifests, given as 'i/N'")
+    parser.add_argument('-p', '--profile',
+                        help="Profile the session, given as a comma separated list of profiling modes, i.e. "
+                             "'cprofile', 'tracemalloc' and 'sampling', outputs go to the session working directory")
+    parser.add_argument('-q', '--query_results',
+                        help="Query the results store of a session, given as the path to its session working directory "
+                             "or to its results store, results are printed as JSON lines")
+    parser.add_argument('--status', help="Results query, only results with this status, i.e. 'success' or 'error'")
+    parser.add_argument('--subsystem', help="Results query, only results from this subsystem, i.e. 'runner' or "
+                                            "'download'")
+    parser.add_argument('--error_type', help="Results query, only results with this error type")
+    parser.add_argument('--name_contains', help="Results query, only results whose command or URL contains this text")
+    parser.add_argument('--slowest', type=int, help="Results query, only the given number of slowest results")
+    parser.add_argument('--summary', action='store_true',
+                        help="Results query, count results by subsystem, status and error type")
     parser.add_argument('-v', '--version',
                         help='display version information',
                         action='version',
@@ -46,6 +84,7 @@ def app_bootstrap():
     global __run_test_mode
     global __logger
     global __args
+    global __shard
     __args = get_cmdl()
     # Initialize configuration module
     if __args.config_file:
@@ -54,6 +93,8 @@ def app_bootstrap():
         config_manager.set_application_config_file(__DEFAULT_CONFIG_FILE)
     if __args.testmode:
         __run_test_mode = True
+    if __args.shard:
+        __shard = parse_shard(__args.shard)
     # Request the main logger
     __logger = config_manager.get_app_config_manager().get_logger_for(__name__)
     if __run_test_mode:
@@ -64,9 +105,61 @@ def app_bootstrap():
             "Session '{}' STARTED".format(config_manager.get_app_config_manager().get_session_id()))
 
 
+def get_shard():
+    """
+    Get the download manifest shard this process should work on, so several processes can split the same manifest
+    :return: (shard index, shard count)
+    """
+    return __shard
+
+
 def modules_bootstrap():
+    # Session lifecycle management, old sessions are archived and removed in the background
+    session_compactor_interval = config_manager.get_app_config_manager().get_session_compactor_interval()
+    if session_compactor_interval:
+        __logger.debug("Starting session compactor, every #{} seconds".format(session_compactor_interval))
+        config_manager.get_app_config_manager().get_session_manager().start_compactor(session_compactor_interval)
+    # Peer download cache, this node serves its downloads to its peers, if configured to do so
+    peer_cache_server = get_peer_cache_server()
+    if peer_cache_server is not None:
+        __logger.info("Serving downloads to peers on '{}'".format(peer_cache_server.get_address()))
+    # Live session status, served on a local address, if configured to do so
+    status_server = get_status_server()
+    if status_server is not None:
+        __logger.info("Serving the session status on '{}'".format(status_server.get_address()))
     # TODO
-    pass
+
+
+def start_profiling():
+    """
+    Start profiling the session, if profiling modes have been given on the command line or in the configuration file
+    :return: no value is returned
+    """
+    global __profiler
+    profiling_config = config_manager.get_app_config_manager().get_profiling_config()
+    profiling_modes = parse_profiling_modes(__args.profile if __args.profile else profiling_config.get('modes', []))
+    if not profiling_modes:
+        return
+    __profiler = SessionProfiler(profiling_modes,
+                                 os.path.join(config_manager.get_app_config_manager().get_session_working_dir(),
+                                              'profiling'),
+                                 tracemalloc_interval=profiling_config.get('tracemalloc_interval_seconds', 60),
+                                 tracemalloc_top=profiling_config.get('tracemalloc_top', 25),
+                                 sampling_interval=profiling_config.get('sampling_interval_seconds', 0.01))
+    __logger.info("PROFILING session, modes '{}', outputs at '{}'"
+                  .format(",".join(profiling_modes), __profiler.get_output_folder()))
+    __profiler.start()
+
+
+def stop_profiling():
+    if __profiler is not None:
+        __logger.info("Profiling outputs written, '{}'".format(",".join(__profiler.stop())))
+
+
+def stop_status_server():
+    status_server = get_status_server()
+    if status_server is not None:
+        status_server.stop()
 
 
 def run_unit_tests():
@@ -76,14 +169,69 @@ def run_unit_tests():
     nose.run(suite=test_suite)
 
 
+def run_worker():
+    __logger.info("Running as a WORKER for the coordinator at '{}'".format(__args.worker))
+    Worker(__args.worker,
+           config_manager.get_app_config_manager().get_parallel_coordinator_config().get('token')).run()
+
+
+def run_manifest_downloads():
+    shard_index, shard_count = get_shard()
+    download_folder = __args.download_folder \
+        or os.path.join(config_manager.get_app_config_manager().get_session_working_dir(), 'downloads')
+    general.check_create_folders([download_folder])
+    __logger.info("Downloading shard #{} out of #{} of manifest '{}' to '{}'"
+                  .format(shard_index, shard_count, __args.manifest, download_folder))
+    download_manager = DownloadManager(Manifest(__args.manifest, shard_index=shard_index, shard_count=shard_count),
+                                       download_folder,
+                                       __logger)
+    download_manager.start_downloads()
+    download_manager.wait_all()
+    if not download_manager.is_success():
+        __logger.error("Downloads from manifest '{}' FAILED, see the session results".format(__args.manifest))
+
+
+def run_results_query():
+    results_store_file = __args.query_results
+    if os.path.isdir(results_store_file):
+        results_store_file = os.path.join(results_store_file, RESULTS_STORE_FILE_NAME)
+    if not os.path.isfile(results_store_file):
+        __logger.error("Results store '{}' NOT FOUND".format(results_store_file))
+        return
+    results_store = ResultsStore(results_store_file)
+    if __args.summary:
+        results = results_store.get_summary()
+    else:
+        results = results_store.query(subsystem=__args.subsystem,
+                                      status=__args.status,
+                                      error_type=__args.error_type,
+                                      name_contains=__args.name_contains,
+                                      order_by='duration' if __args.slowest else 'id',
+                                      descending=bool(__args.slowest),
+                                      limit=__args.slowest)
+    for result in results:
+        print(json.dumps(result))
+
+
 def main():
     app_bootstrap()
     modules_bootstrap()
-    if __run_test_mode:
-        run_unit_tests()
-    else:
-        # TODO - Implement what to run in normal mode
-        pass
+    start_profiling()
+    try:
+        if __run_test_mode:
+            run_unit_tests()
+        elif __args.worker:
+            run_worker()
+        elif __args.query_results:
+            run_results_query()
+        elif __args.manifest:
+            run_manifest_downloads()
+        else:
+            # TODO - Implement what to run in normal mode
+            pass
+    finally:
+        stop_profiling()
+        stop_status_server()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,204 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 20:30
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Resource accounting for parallel runners and the subprocesses they run, i.e. wall time, CPU time, peak memory and block
+I/O
+"""
+
+import os
+import time
+import threading
+import subprocess
+
+# Block size used by the kernel for reporting block I/O operations
+_BLOCK_SIZE = 512
+# Seconds between checks on a child process when waiting for it with a timeout
+_WAIT_POLL_INTERVAL = 0.05
+
+
+class ResourceUsage:
+    """
+    Resources used by a runner, any of them can be 'None' if it could not be measured
+    """
+
+    def __init__(self,
+                 wall_time=None,
+                 user_cpu_time=None,
+                 system_cpu_time=None,
+                 max_rss_kb=None,
+                 block_input_operations=None,
+                 block_output_operations=None):
+        self.wall_time = wall_time
+        self.user_cpu_time = user_cpu_time
+        self.system_cpu_time = system_cpu_time
+        self.max_rss_kb = max_rss_kb
+        self.block_input_operations = block_input_operations
+        self.block_output_operations = block_output_operations
+
+    @staticmethod
+    def from_rusage(wall_time, rusage):
+        """
+        Build a resource usage object from a 'resource.struct_rusage', as returned by 'os.wait4'
+        :param wall_time: wall time in seconds
+        :param rusage: resource usage structure
+        :return: resource usage object
+        """
+        return ResourceUsage(wall_time=wall_time,
+                             user_cpu_time=rusage.ru_utime,
+                             system_cpu_time=rusage.ru_stime,
+                             max_rss_kb=rusage.ru_maxrss,
+                             block_input_operations=rusage.ru_inblock,
+                             block_output_operations=rusage.ru_oublock)
+
+    @staticmethod
+    def from_concurrent(wall_time, resource_usages):
+        """
+        Build a resource usage object for processes that ran at the same time, e.g. the stages of a pipeline, i.e. their
+        CPU times, block I/O and peak memory add up
+        :param wall_time: wall time in seconds
+        :param resource_usages: resource usage objects, 'None' for processes that could not be measured
+        :return: resource usage object
+        """
+        def add_up(attribute):
+            values = [getattr(resource_usage, attribute) if resource_usage is not None else None
+                      for resource_usage in resource_usages]
+            if (not values) or any(value is None for value in values):
+                return None
+            return sum(values)
+
+        return ResourceUsage(wall_time=wall_time,
+                             user_cpu_time=add_up('user_cpu_time'),
+                             system_cpu_time=add_up('system_cpu_time'),
+                             max_rss_kb=add_up('max_rss_kb'),
+                             block_input_operations=add_up('block_input_operations'),
+                             block_output_operations=add_up('block_output_operations'))
+
+    def get_cpu_time(self):
+        if (self.user_cpu_time is None) or (self.system_cpu_time is None):
+            return None
+        return self.user_cpu_time + self.system_cpu_time
+
+    def to_dict(self):
+        return {'wall_time': self.wall_time,
+                'user_cpu_time': self.user_cpu_time,
+                'system_cpu_time': self.system_cpu_time,
+                'max_rss_kb': self.max_rss_kb,
+                'block_input_bytes': None if self.block_input_operations is None
+                else self.block_input_operations * _BLOCK_SIZE,
+                'block_output_bytes': None if self.block_output_operations is None
+                else self.block_output_operations * _BLOCK_SIZE}
+
+
+class AccountedPopen(subprocess.Popen):
+    """
+    subprocess.Popen that reaps its child process via 'os.wait4', so the resources used by that child, and only that
+    child (unlike 'resource.getrusage(RUSAGE_CHILDREN)', which accounts for every child of the process), are recorded.
+
+    Waiting and polling check whether the child has exited without reaping it, i.e. 'os.waitid' with 'WNOWAIT', and then
+    reap it with 'os.wait4', the exit status ends up in 'returncode', so Popen never waits for the child on its own.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.__start_time = time.monotonic()
+        self.__resource_usage = None
+        self.__reap_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def __has_exited(self, block):
+        try:
+            return os.waitid(os.P_PID, self.pid, os.WEXITED | os.WNOWAIT | (0 if block else os.WNOHANG)) is not None
+        except ChildProcessError:
+            # Already reaped, e.g. by another thread
+            return True
+
+    def __reap(self):
+        with self.__reap_lock:
+            if self.returncode is not None:
+                # Another thread reaped the child while we were acquiring the lock
+                return
+            try:
+                (_, status, rusage) = os.wait4(self.pid, 0)
+            except ChildProcessError:
+                # Waiting for child processes has been disabled for our process, the child is dead, and we can't get its
+                # status (same behaviour as subprocess.Popen)
+                self.returncode = 0
+                return
+            self.__resource_usage = ResourceUsage.from_rusage(time.monotonic() - self.__start_time, rusage)
+            self.returncode = os.waitstatus_to_exitcode(status)
+
+    def poll(self):
+        if (self.returncode is None) and self.__has_exited(block=False):
+            self.__reap()
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is not None:
+            return self.returncode
+        if timeout is None:
+            self.__has_exited(block=True)
+        else:
+            deadline = time.monotonic() + timeout
+            while not self.__has_exited(block=False):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(self.args, timeout)
+                time.sleep(min(remaining, _WAIT_POLL_INTERVAL))
+        self.__reap()
+        return self.returncode
+
+    def get_resource_usage(self):
+        """
+        Get the resources used by the child process, available once it has been waited for
+        :return: resource usage object, or None if the child is still running
+        """
+        return self.__resource_usage
+
+
+class ResourceUsageAggregator:
+    """
+    Aggregation of the resources used by a collection of runners
+    """
+
+    def __init__(self):
+        self.__count = 0
+        self.__totals = {'wall_time': 0.0,
+                         'user_cpu_time': 0.0,
+                         'system_cpu_time': 0.0,
+                         'block_input_bytes': 0,
+                         'block_output_bytes': 0}
+        self.__max_rss_kb = 0
+        self.__max_wall_time = 0.0
+
+    def add(self, resource_usage):
+        if resource_usage is None:
+            return
+        self.__count += 1
+        for key, value in resource_usage.to_dict().items():
+            if (key in self.__totals) and (value is not None):
+                self.__totals[key] += value
+        if resource_usage.max_rss_kb is not None:
+            self.__max_rss_kb = max(self.__max_rss_kb, resource_usage.max_rss_kb)
+        if resource_usage.wall_time is not None:
+            self.__max_wall_time = max(self.__max_wall_time, resource_usage.wall_time)
+
+    def get_summary(self):
+        """
+        Get the summary of the resources used by the runners added so far
+        :return: a dictionary with the summary
+        """
+        summary = {'runners': self.__count,
+                   'max_rss_kb': self.__max_rss_kb,
+                   'max_wall_time': self.__max_wall_time}
+        summary.update({"total_{}".format(key): value for key, value in self.__totals.items()})
+        return summary
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of an application and it is not meant to be run in stand alone mode")
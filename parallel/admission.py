@@ -0,0 +1,207 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 21:05
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Admission control for parallel runners, i.e. runners declare the resources they need, and they don't start running
+their kernel until the system has those resources available
+"""
+
+import os
+import time
+import threading
+import collections
+
+# System information sources
+_PROC_MEMINFO = '/proc/meminfo'
+_PROC_LOADAVG = '/proc/loadavg'
+
+
+def read_meminfo():
+    """
+    Read the system memory information
+    :return: a dictionary with the memory information, in kB, e.g. 'MemAvailable', or an empty dictionary if it is not
+    available in this system
+    """
+    meminfo = {}
+    try:
+        with open(_PROC_MEMINFO) as f:
+            for line in f:
+                key, value = line.split(':', 1)
+                meminfo[key] = int(value.split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    return meminfo
+
+
+def get_available_memory_mb():
+    """
+    Get the memory available for starting new processes without swapping
+    :return: available memory, in MB, or None if it is not known
+    """
+    meminfo = read_meminfo()
+    if 'MemAvailable' not in meminfo:
+        return None
+    return meminfo['MemAvailable'] / 1024
+
+
+def get_load_average():
+    """
+    Get the 1 minute load average of the system
+    :return: load average, or None if it is not known
+    """
+    try:
+        with open(_PROC_LOADAVG) as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class AdmissionController:
+    """
+    This class models an admission controller shared by parallel runners. A runner acquires admission before running
+    its kernel, and it releases it when it is done. Runners are admitted in order of arrival, as long as the available
+    memory, minus a reserve, covers the memory they declare to need, the load average per CPU stays below its limit, and
+    the number of admitted runners is below the concurrency limit. One runner is always admitted when there are none
+    running, so the system can't stall.
+
+    The available memory reported by the system doesn't account for runners that have just been admitted and have not
+    allocated their memory yet, so the memory declared by runners admitted within the last 'warmup_seconds' is taken as
+    already used.
+
+    When a runner is killed because the system ran out of memory, the concurrency limit is lowered, and it is raised
+    back, one runner at a time, after every 'recovery_runs' runners that complete their kernel successfully, up to its
+    original value.
+    """
+
+    def __init__(self,
+                 memory_reserve_mb=512,
+                 max_load_per_cpu=1.0,
+                 max_concurrency=None,
+                 check_interval=1,
+                 warmup_seconds=30,
+                 recovery_runs=10):
+        self.__memory_reserve_mb = memory_reserve_mb
+        self.__max_load_per_cpu = max_load_per_cpu
+        self.__max_concurrency = max_concurrency
+        self.__configured_max_concurrency = max_concurrency
+        # Concurrency limit to recover after running out of memory, i.e. the configured one or, if there was none, the
+        # number of runners that were admitted when the system ran out of memory, 'None' when there's nothing to recover
+        self.__recovery_max_concurrency = None
+        self.__recovery_runs = recovery_runs
+        self.__successful_runs_since_limit_change = 0
+        self.__check_interval = check_interval
+        self.__warmup_seconds = warmup_seconds
+        self.__cpu_count = os.cpu_count() or 1
+        self.__condition = threading.Condition()
+        self.__waiting = collections.deque()
+        # Admitted runners, and the time they were admitted
+        self.__admitted = {}
+
+    def get_max_concurrency(self):
+        return self.__max_concurrency
+
+    def get_admitted_count(self):
+        with self.__condition:
+            return len(self.__admitted)
+
+    def get_waiting_count(self):
+        with self.__condition:
+            return len(self.__waiting)
+
+    def __get_warming_up_memory_mb(self, now):
+        return sum([runner.required_memory_mb or 0
+                    for runner, admission_time in self.__admitted.items()
+                    if (now - admission_time) < self.__warmup_seconds])
+
+    def __can_admit(self, runner):
+        if not self.__admitted:
+            return True
+        if (self.__max_concurrency is not None) and (len(self.__admitted) >= self.__max_concurrency):
+            return False
+        available_memory_mb = get_available_memory_mb()
+        if available_memory_mb is not None:
+            available_memory_mb -= self.__memory_reserve_mb + self.__get_warming_up_memory_mb(time.monotonic())
+            if (runner.required_memory_mb or 0) > available_memory_mb:
+                return False
+        load_average = get_load_average()
+        if (self.__max_load_per_cpu is not None) and (load_average is not None):
+            if ((load_average + (runner.required_cpus or 0)) / self.__cpu_count) > self.__max_load_per_cpu:
+                return False
+        return True
+
+    def acquire(self, runner, is_cancelled=None):
+        """
+        Wait for the given runner to be admitted
+        :param runner: parallel runner, declaring the resources it needs via 'required_memory_mb' and 'required_cpus'
+        :param is_cancelled: callable telling whether the runner gave up on waiting
+        :return: True if the runner has been admitted, False if it gave up
+        """
+        with self.__condition:
+            self.__waiting.append(runner)
+            try:
+                while True:
+                    if (is_cancelled is not None) and is_cancelled():
+                        return False
+                    if (self.__waiting[0] is runner) and self.__can_admit(runner):
+                        self.__admitted[runner] = time.monotonic()
+                        return True
+                    # System resources change with no notification, so they are checked periodically
+                    self.__condition.wait(timeout=self.__check_interval)
+            finally:
+                self.__waiting.remove(runner)
+                self.__condition.notify_all()
+
+    def release(self, runner):
+        """
+        Release the admission of the given runner
+        :param runner: parallel runner
+        :return: no return value
+        """
+        with self.__condition:
+            self.__admitted.pop(runner, None)
+            self.__condition.notify_all()
+
+    def report_out_of_memory(self, runner):
+        """
+        Report that the given admitted runner was killed because the system ran out of memory, the concurrency limit is
+        lowered to half the number of runners that were admitted
+        :param runner: parallel runner
+        :return: the new concurrency limit
+        """
+        with self.__condition:
+            if self.__recovery_max_concurrency is None:
+                self.__recovery_max_concurrency = self.__configured_max_concurrency or len(self.__admitted)
+            self.__max_concurrency = max(1, len(self.__admitted) // 2)
+            self.__successful_runs_since_limit_change = 0
+            return self.__max_concurrency
+
+    def report_success(self, runner):
+        """
+        Report that the given admitted runner completed its kernel successfully, which gradually raises the concurrency
+        limit back after it was lowered because the system ran out of memory
+        :param runner: parallel runner
+        :return: the current concurrency limit
+        """
+        with self.__condition:
+            if self.__recovery_max_concurrency is None:
+                return self.__max_concurrency
+            self.__successful_runs_since_limit_change += 1
+            if self.__successful_runs_since_limit_change >= self.__recovery_runs:
+                self.__successful_runs_since_limit_change = 0
+                self.__max_concurrency += 1
+                if self.__max_concurrency >= self.__recovery_max_concurrency:
+                    # Fully recovered
+                    self.__max_concurrency = self.__configured_max_concurrency
+                    self.__recovery_max_concurrency = None
+                self.__condition.notify_all()
+            return self.__max_concurrency
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of an application and it is not meant to be run in stand alone mode")
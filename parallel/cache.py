@@ -0,0 +1,229 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 19:45
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+On disk cache for the results of running commands, so the same command, run in the same conditions, doesn't need to be
+run again
+"""
+
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import threading
+# App imports
+from toolbox import general, readers
+from .exceptions import CommandResultCacheException
+
+# Cache entry content
+_ENTRY_RESULT_FILE = 'result.json'
+_ENTRY_STDOUT_FILE = 'stdout'
+_ENTRY_STDERR_FILE = 'stderr'
+_ENTRY_OUTPUTS_FOLDER = 'outputs'
+
+
+class CachedCommandResult:
+    """
+    Result of a command, as stored in the cache
+    """
+
+    def __init__(self, return_code, stdout, stderr, output_files):
+        self.return_code = return_code
+        self.stdout = stdout
+        self.stderr = stderr
+        # List of (path of the output file, path of its copy in the cache)
+        self.output_files = output_files
+
+
+class CommandResultCache:
+    """
+    This class models a cache of command results, i.e. return code, standard output and error, and output files,
+    keyed by the command, its current working directory, the value of selected environment variables, and the
+    fingerprint of its input files.
+
+    Every entry lives in its own folder, and it is published with an atomic rename, so readers never see half written
+    entries. When the cache grows over its size limit, the least recently used entries are evicted.
+
+    The size of the cache is tracked as entries are stored, so it is only walked when it first needs to be known, and
+    when it has gone over its size limit.
+    """
+
+    def __init__(self, cache_folder, max_size_mb=1024, use_content_hash=False):
+        self.__cache_folder = cache_folder
+        self.__max_size_bytes = max_size_mb * 1024 * 1024
+        self.__use_content_hash = use_content_hash
+        self.__eviction_lock = threading.Lock()
+        # Total size of the cache entries, 'None' until the cache has been walked for the first time
+        self.__total_size_bytes = None
+        general.check_create_folders([cache_folder])
+
+    def get_cache_folder(self):
+        return self.__cache_folder
+
+    def compute_key(self, command, current_working_directory=None, env_keys=None, input_files=None):
+        """
+        Compute the cache key for running a command in the given conditions
+        :param command: command to run
+        :param current_working_directory: working directory for the command
+        :param env_keys: names of the environment variables the result of the command depends on
+        :param input_files: files the result of the command depends on
+        :return: cache key
+        """
+        key_data = [command,
+                    os.path.abspath(current_working_directory) if current_working_directory else None,
+                    {key: os.environ.get(key) for key in (env_keys or [])},
+                    general.compute_files_fingerprint(input_files or [], use_content_hash=self.__use_content_hash)]
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf8')).hexdigest()
+
+    def __get_entry_folder(self, key):
+        return os.path.join(self.get_cache_folder(), key[:2], key)
+
+    @staticmethod
+    def __get_folder_size(folder):
+        size = 0
+        for root, folders, files in os.walk(folder):
+            for file in files:
+                try:
+                    size += os.stat(os.path.join(root, file)).st_size
+                except FileNotFoundError:
+                    # Removed while we were walking the folder
+                    continue
+        return size
+
+    def get_size(self):
+        """
+        Get the size of the cache, as tracked by this cache object
+        :return: size of the cache entries in bytes
+        """
+        with self.__eviction_lock:
+            if self.__total_size_bytes is None:
+                self.__scan_entries()
+            return self.__total_size_bytes
+
+    def get(self, key):
+        """
+        Look up the cache for the given key, a hit counts as a use of the entry for the LRU eviction policy
+        :param key: cache key
+        :return: the cached command result, or None if it is not in the cache
+        """
+        entry_folder = self.__get_entry_folder(key)
+        result_file = os.path.join(entry_folder, _ENTRY_RESULT_FILE)
+        try:
+            result = readers.load_json_file(result_file)
+            with open(os.path.join(entry_folder, _ENTRY_STDOUT_FILE), 'rb') as f:
+                stdout = f.read()
+            with open(os.path.join(entry_folder, _ENTRY_STDERR_FILE), 'rb') as f:
+                stderr = f.read()
+            os.utime(result_file)
+        except FileNotFoundError:
+            # Not there, or evicted while we were reading it
+            return None
+        return CachedCommandResult(result['return_code'],
+                                   stdout,
+                                   stderr,
+                                   [(output_file, os.path.join(entry_folder, _ENTRY_OUTPUTS_FOLDER, str(index)))
+                                    for index, output_file in enumerate(result['output_files'])])
+
+    def restore_output_files(self, cached_result):
+        """
+        Copy the output files of a cached command result back to their original location
+        :param cached_result: cached command result
+        :return: no return value
+        :except: CommandResultCacheException if the output files could not be restored
+        """
+        try:
+            for output_file, cached_output_file in cached_result.output_files:
+                output_folder = os.path.dirname(output_file)
+                if output_folder:
+                    general.check_create_folders([output_folder])
+                shutil.copy2(cached_output_file, output_file)
+        except Exception as e:
+            raise CommandResultCacheException("ERROR restoring cached output files ---> {}".format(e)) from e
+
+    def put(self, key, return_code, stdout, stderr, output_files=None):
+        """
+        Store a command result in the cache
+        :param key: cache key
+        :param return_code: command return code
+        :param stdout: command standard output
+        :param stderr: command standard error
+        :param output_files: absolute paths to the output files of the command
+        :return: no return value
+        :except: CommandResultCacheException if the result could not be stored
+        """
+        output_files = [os.path.abspath(output_file) for output_file in (output_files or [])]
+        entry_folder = self.__get_entry_folder(key)
+        entry_folder_tmp = os.path.join(self.get_cache_folder(), ".{}.{}.tmp".format(key, uuid.uuid4().hex))
+        try:
+            os.makedirs(os.path.join(entry_folder_tmp, _ENTRY_OUTPUTS_FOLDER))
+            for index, output_file in enumerate(output_files):
+                shutil.copy2(output_file, os.path.join(entry_folder_tmp, _ENTRY_OUTPUTS_FOLDER, str(index)))
+            with open(os.path.join(entry_folder_tmp, _ENTRY_STDOUT_FILE), 'wb') as f:
+                f.write(stdout)
+            with open(os.path.join(entry_folder_tmp, _ENTRY_STDERR_FILE), 'wb') as f:
+                f.write(stderr)
+            with open(os.path.join(entry_folder_tmp, _ENTRY_RESULT_FILE), 'w') as f:
+                json.dump({'return_code': return_code, 'output_files': output_files}, f)
+            entry_size = self.__get_folder_size(entry_folder_tmp)
+            general.check_create_folders([os.path.dirname(entry_folder)])
+            # Replace any previous entry for the same key
+            previous_entry_size = self.__get_folder_size(entry_folder)
+            general.remove_folders_async([entry_folder])
+            os.rename(entry_folder_tmp, entry_folder)
+        except Exception as e:
+            shutil.rmtree(entry_folder_tmp, ignore_errors=True)
+            raise CommandResultCacheException("ERROR storing command result in the cache ---> {}".format(e)) from e
+        with self.__eviction_lock:
+            if self.__total_size_bytes is not None:
+                self.__total_size_bytes += entry_size - previous_entry_size
+                if self.__total_size_bytes <= self.__max_size_bytes:
+                    return
+        self.evict()
+
+    def evict(self):
+        """
+        Evict the least recently used entries until the cache size is within its limit
+        :return: number of evicted entries
+        """
+        with self.__eviction_lock:
+            entries = self.__scan_entries()
+            evicted = 0
+            for last_used, size, entry_folder in sorted(entries):
+                if self.__total_size_bytes <= self.__max_size_bytes:
+                    break
+                general.remove_folders_async([entry_folder])
+                self.__total_size_bytes -= size
+                evicted += 1
+            return evicted
+
+    def __scan_entries(self):
+        # Walk the cache, skipping the entries being written and the ones moved aside for removal, i.e. hidden folders,
+        # to list its entries as (last used, size, entry folder), and to refresh its total size
+        entries = []
+        total_size = 0
+        for prefix_entry in os.scandir(self.get_cache_folder()):
+            if prefix_entry.name.startswith('.') or not prefix_entry.is_dir():
+                continue
+            for entry in os.scandir(prefix_entry.path):
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    last_used = os.stat(os.path.join(entry.path, _ENTRY_RESULT_FILE)).st_mtime
+                except FileNotFoundError:
+                    continue
+                size = self.__get_folder_size(entry.path)
+                entries.append((last_used, size, entry.path))
+                total_size += size
+        self.__total_size_bytes = total_size
+        return entries
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of an application and it is not meant to be run in stand alone mode")
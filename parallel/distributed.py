@@ -0,0 +1,806 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 22:45
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Distributed execution of commands, i.e. a coordinator holding a queue of command jobs, and worker daemons, on any number
+of nodes, that connect to it over TCP or a Unix socket, pull jobs, run them, and stream their results back.
+
+Coordinator and workers talk a newline delimited JSON protocol, where binary data, i.e. command output, is base64
+encoded. Every message is a JSON object with a 'type' attribute:
+
+    worker -> coordinator
+        'hello'         {'worker_id', 'nonce'}, first message on every connection
+        'authenticate'  {'proof'}, proof that the worker knows the shared token, for the coordinator nonce
+        'request_job'   asks for a job, the coordinator answers with 'job' or, when there is none, 'no_job'
+        'heartbeat'     {'job_id'}, keeps the lease on a job alive, the coordinator answers with 'heartbeat_ack'
+                        {'cancel'}, telling the worker whether the job has been cancelled
+        'output'        {'job_id', 'stream', 'data'}, chunk of the standard output / error of the job
+        'result'        {'job_id', 'return_code', 'timed_out', 'resource_usage', 'error'}
+
+    coordinator -> worker
+        'hello'         {'nonce', 'proof'}, answer to the worker 'hello', proof that the coordinator knows the shared
+                        token, for the worker nonce
+
+Coordinator and workers share a token, from the application configuration, and every connection starts with both of
+them proving they know it, i.e. an HMAC of the nonce sent by the other side, so nobody without the token can take jobs
+or post results, and workers never run commands sent by anyone but their coordinator.
+
+Jobs whose worker stops sending heartbeats, or loses its connection, are put back at the front of the queue.
+"""
+
+import os
+import hmac
+import time
+import uuid
+import json
+import base64
+import hashlib
+import signal
+import socket
+import selectors
+import threading
+import subprocess
+import collections
+import socketserver
+# App imports
+import config_manager
+from toolbox import general, readers
+from .accounting import AccountedPopen
+from .exceptions import DistributedRunnerException
+
+# Protocol messages
+MESSAGE_HELLO = 'hello'
+MESSAGE_AUTHENTICATE = 'authenticate'
+MESSAGE_REQUEST_JOB = 'request_job'
+MESSAGE_JOB = 'job'
+MESSAGE_NO_JOB = 'no_job'
+MESSAGE_HEARTBEAT = 'heartbeat'
+MESSAGE_HEARTBEAT_ACK = 'heartbeat_ack'
+MESSAGE_OUTPUT = 'output'
+MESSAGE_RESULT = 'result'
+# Roles proving they know the shared token
+_ROLE_COORDINATOR = 'coordinator'
+_ROLE_WORKER = 'worker'
+# Addresses starting with this prefix are Unix socket paths, otherwise they are 'host:port'
+UNIX_SOCKET_ADDRESS_PREFIX = 'unix:'
+
+# Job status
+JOB_STATUS_PENDING = 'pending'
+JOB_STATUS_LEASED = 'leased'
+JOB_STATUS_FINISHED = 'finished'
+JOB_STATUS_FAILED = 'failed'
+JOB_STATUS_CANCELLED = 'cancelled'
+
+# Output streams
+STREAM_STDOUT = 'stdout'
+STREAM_STDERR = 'stderr'
+# Size of the output chunks streamed back to the coordinator
+_OUTPUT_CHUNK_SIZE = 64 * 1024
+
+# Process wide coordinator, created on demand from the application configuration
+_coordinator = None
+_coordinator_lock = threading.Lock()
+
+
+def parse_address(address):
+    """
+    Parse a coordinator address
+    :param address: 'unix:<path>' for Unix sockets, 'host:port' for TCP, the local host if no host is given
+    :return: (socket family, socket address)
+    :except: DistributedRunnerException if the address is not valid
+    """
+    if address.startswith(UNIX_SOCKET_ADDRESS_PREFIX):
+        return socket.AF_UNIX, address[len(UNIX_SOCKET_ADDRESS_PREFIX):]
+    host, separator, port = address.rpartition(':')
+    if not separator:
+        raise DistributedRunnerException("INVALID coordinator address '{}', "
+                                         "expected 'host:port' or '{}<path>'".format(address,
+                                                                                     UNIX_SOCKET_ADDRESS_PREFIX))
+    try:
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    except ValueError as e:
+        raise DistributedRunnerException("INVALID port in coordinator address '{}'".format(address)) from e
+
+
+def format_address(family, socket_address):
+    if family == socket.AF_UNIX:
+        return "{}{}".format(UNIX_SOCKET_ADDRESS_PREFIX, socket_address)
+    return "{}:{}".format(socket_address[0], socket_address[1])
+
+
+def check_token(token):
+    """
+    Check the token shared by the coordinator and its workers
+    :param token: shared token
+    :return: the token
+    :except: DistributedRunnerException if there is no token
+    """
+    if not token:
+        raise DistributedRunnerException("A token shared by the coordinator and its workers is REQUIRED, "
+                                         "see 'parallel.coordinator.token' in the configuration")
+    return token
+
+
+def get_proof(token, role, nonce):
+    """
+    Build the proof that the given role knows the shared token
+    :param token: shared token
+    :param role: who is proving it knows the token, i.e. the coordinator or a worker
+    :param nonce: nonce sent by the other side
+    :return: proof, as an hexadecimal string
+    """
+    return hmac.new(token.encode('utf8'), "{}:{}".format(role, nonce).encode('utf8'), hashlib.sha256).hexdigest()
+
+
+def is_valid_proof(token, role, nonce, proof):
+    return isinstance(proof, str) and hmac.compare_digest(get_proof(token, role, nonce), proof)
+
+
+def worker_handshake(stream, worker_id, token):
+    """
+    Open a worker connection, i.e. say hello to the coordinator, and make sure it knows the shared token, before
+    proving this worker knows it as well
+    :param stream: binary file object on the connection
+    :param worker_id: worker ID
+    :param token: shared token
+    :return: no return value
+    :except: ConnectionError if the coordinator could not prove it knows the shared token
+    """
+    nonce = uuid.uuid4().hex
+    send_message(stream, {'type': MESSAGE_HELLO, 'worker_id': worker_id, 'nonce': nonce})
+    hello = receive_message(stream)
+    if (hello is None) \
+            or (hello.get('type') != MESSAGE_HELLO) \
+            or not is_valid_proof(token, _ROLE_COORDINATOR, nonce, hello.get('proof')):
+        raise ConnectionError("The coordinator could NOT prove it knows the shared token")
+    send_message(stream, {'type': MESSAGE_AUTHENTICATE,
+                          'proof': get_proof(token, _ROLE_WORKER, hello.get('nonce'))})
+
+
+def send_message(stream, message):
+    """
+    Send a protocol message
+    :param stream: binary file object on the connection
+    :param message: dictionary with the message
+    :return: no return value
+    """
+    stream.write(json.dumps(message).encode('utf8') + b'\n')
+    stream.flush()
+
+
+def receive_message(stream):
+    """
+    Receive a protocol message
+    :param stream: binary file object on the connection
+    :return: dictionary with the message, or None if the connection was closed
+    """
+    line = stream.readline()
+    if not line:
+        return None
+    return readers.json_loads(line)
+
+
+def get_coordinator():
+    """
+    Get the process wide coordinator, it is started the first time it is requested, if a coordinator address has been
+    configured for the application
+    :return: the coordinator, or None if distributed execution has not been configured
+    """
+    global _coordinator
+    with _coordinator_lock:
+        if _coordinator is None:
+            coordinator_config = config_manager.get_app_config_manager().get_parallel_coordinator_config()
+            if coordinator_config.get('address'):
+                _coordinator = Coordinator(coordinator_config['address'],
+                                           coordinator_config.get('token'),
+                                           heartbeat_timeout=coordinator_config.get('heartbeat_timeout_seconds', 30),
+                                           max_job_attempts=coordinator_config.get('max_job_attempts', 3))
+                _coordinator.start()
+        return _coordinator
+
+
+class DistributedJob:
+    """
+    A command job, as held by the coordinator
+    """
+
+    def __init__(self, command, use_shell=False, current_working_directory=None, timeout=None):
+        self.job_id = uuid.uuid4().hex
+        self.command = command
+        self.use_shell = use_shell
+        self.current_working_directory = current_working_directory
+        self.timeout = timeout
+        self.status = JOB_STATUS_PENDING
+        self.attempts = 0
+        # Worker currently holding the lease on this job, and when we last heard from it
+        self.worker_id = None
+        self.last_heartbeat = None
+        self.stdout = bytearray()
+        self.stderr = bytearray()
+        self.return_code = None
+        self.timed_out = False
+        self.resource_usage = None
+        self.error = None
+        self.__done = threading.Event()
+        self.__done_callbacks = []
+        self.__done_callbacks_lock = threading.Lock()
+
+    def to_message(self):
+        return {'type': MESSAGE_JOB,
+                'job_id': self.job_id,
+                'command': self.command,
+                'use_shell': self.use_shell,
+                'current_working_directory': self.current_working_directory,
+                'timeout': self.timeout}
+
+    def _set_done(self):
+        with self.__done_callbacks_lock:
+            self.__done.set()
+            done_callbacks = list(self.__done_callbacks)
+            self.__done_callbacks.clear()
+        for done_callback in done_callbacks:
+            done_callback(self)
+
+    def add_done_callback(self, done_callback):
+        """
+        Register a callback to call, with this job as parameter, when the job is over. If the job is already over, the
+        callback is called straight away
+        :param done_callback: callable
+        :return: no return value
+        """
+        with self.__done_callbacks_lock:
+            if not self.__done.is_set():
+                self.__done_callbacks.append(done_callback)
+                return
+        done_callback(self)
+
+    def is_done(self):
+        return self.__done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Wait for the job to be over, i.e. finished, failed or cancelled
+        :param timeout: maximum number of seconds to wait, 'None' to wait for as long as it takes
+        :return: True if the job is over
+        """
+        return self.__done.wait(timeout)
+
+
+class _CoordinatorRequestHandler(socketserver.StreamRequestHandler):
+    """
+    Handler for a worker connection, it lives for as long as the connection does
+    """
+
+    def __handshake(self, token):
+        """
+        Prove the coordinator knows the shared token, and make sure the worker knows it as well
+        :param token: shared token
+        :return: the worker 'hello' message, or None if the worker is not accepted
+        """
+        hello = receive_message(self.rfile)
+        if (hello is None) or (hello.get('type') != MESSAGE_HELLO):
+            return None
+        nonce = uuid.uuid4().hex
+        send_message(self.wfile, {'type': MESSAGE_HELLO,
+                                  'nonce': nonce,
+                                  'proof': get_proof(token, _ROLE_COORDINATOR, hello.get('nonce'))})
+        authentication = receive_message(self.rfile)
+        if (authentication is None) \
+                or (authentication.get('type') != MESSAGE_AUTHENTICATE) \
+                or not is_valid_proof(token, _ROLE_WORKER, nonce, authentication.get('proof')):
+            self.server.coordinator._logger.warning("Worker '{}' REJECTED, it could NOT prove it knows the shared "
+                                                    "token".format(hello.get('worker_id')))
+            return None
+        return hello
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        try:
+            hello = self.__handshake(coordinator._get_token())
+        except (OSError, ValueError, AttributeError) as e:
+            coordinator._logger.warning("Worker connection BROKEN before it was accepted ---> {}".format(e))
+            return
+        if hello is None:
+            return
+        # Workers may reconnect, or reuse their ID, so every connection is a different worker for the coordinator
+        worker_id = "{}#{}".format(hello.get('worker_id'), uuid.uuid4().hex[:8])
+        coordinator._register_worker(worker_id, self.connection)
+        try:
+            while True:
+                message = receive_message(self.rfile)
+                if message is None:
+                    break
+                coordinator._touch_worker(worker_id)
+                message_type = message.get('type')
+                if message_type == MESSAGE_REQUEST_JOB:
+                    job = coordinator._lease_job(worker_id)
+                    send_message(self.wfile, job.to_message() if job is not None else {'type': MESSAGE_NO_JOB})
+                elif message_type == MESSAGE_HEARTBEAT:
+                    cancel = coordinator._renew_lease(worker_id, message['job_id'])
+                    send_message(self.wfile, {'type': MESSAGE_HEARTBEAT_ACK, 'cancel': cancel})
+                elif message_type == MESSAGE_OUTPUT:
+                    coordinator._append_output(worker_id,
+                                               message['job_id'],
+                                               message['stream'],
+                                               base64.b64decode(message['data']))
+                elif message_type == MESSAGE_RESULT:
+                    coordinator._complete_job(worker_id, message)
+        except (OSError, ValueError) as e:
+            # Whatever the worker was running is re-queued when unregistering it
+            coordinator._logger.warning("Worker '{}' connection BROKEN ---> {}".format(worker_id, e))
+        finally:
+            coordinator._unregister_worker(worker_id)
+
+
+class _ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _ThreadingUnixStreamServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Coordinator:
+    """
+    This class models the coordinator of a pool of worker daemons. It holds the queue of command jobs, leases them to
+    the workers asking for work, and collects their results.
+
+    Leases are kept alive by the worker heartbeats, if the coordinator doesn't hear from a worker for
+    'heartbeat_timeout' seconds, or its connection is lost, the jobs leased to it are put back at the front of the
+    queue, up to 'max_job_attempts' times, after that, the job fails.
+
+    Only workers that prove they know the shared 'token' are accepted
+    """
+
+    def __init__(self, address, token, heartbeat_timeout=30, max_job_attempts=3, poll_interval=5):
+        self._logger = config_manager \
+            .get_app_config_manager() \
+            .get_logger_for("{}.{}".format(__name__, type(self).__name__))
+        self.__family, self.__socket_address = parse_address(address)
+        self.__token = check_token(token)
+        self.__heartbeat_timeout = heartbeat_timeout
+        self.__max_job_attempts = max_job_attempts
+        self.__poll_interval = poll_interval
+        self.__condition = threading.Condition()
+        self.__pending_jobs = collections.deque()
+        self.__jobs = {}
+        # Worker ID -> (connection, last time we heard from it)
+        self.__workers = {}
+        self.__server = None
+        self.__server_thread = None
+        self.__monitor_thread = None
+        self.__shutdown = threading.Event()
+
+    def start(self):
+        """
+        Start listening for workers
+        :return: no return value
+        :except: DistributedRunnerException if the coordinator could not bind to its address
+        """
+        try:
+            if self.__family == socket.AF_UNIX:
+                if os.path.exists(self.__socket_address):
+                    os.remove(self.__socket_address)
+                self.__server = _ThreadingUnixStreamServer(self.__socket_address, _CoordinatorRequestHandler)
+            else:
+                self.__server = _ThreadingTCPServer(self.__socket_address, _CoordinatorRequestHandler)
+        except OSError as e:
+            raise DistributedRunnerException("Coordinator could NOT listen on '{}' ---> {}"
+                                             .format(format_address(self.__family, self.__socket_address), e)) from e
+        self.__server.coordinator = self
+        self.__server_thread = threading.Thread(target=self.__server.serve_forever,
+                                                name='CoordinatorServer',
+                                                daemon=True)
+        self.__server_thread.start()
+        self.__monitor_thread = threading.Thread(target=self.__monitor_leases, name='CoordinatorMonitor', daemon=True)
+        self.__monitor_thread.start()
+        self._logger.info("Coordinator listening on '{}'".format(self.get_address()))
+
+    def stop(self):
+        """
+        Stop the coordinator, worker connections are closed, and jobs that are not over fail
+        :return: no return value
+        """
+        self.__shutdown.set()
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+        with self.__condition:
+            for connection, last_heartbeat in self.__workers.values():
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            for job in self.__jobs.values():
+                if not job.is_done():
+                    job.status = JOB_STATUS_FAILED
+                    job.error = "Coordinator STOPPED"
+                    job._set_done()
+            self.__pending_jobs.clear()
+            self.__condition.notify_all()
+        if (self.__family == socket.AF_UNIX) and os.path.exists(self.__socket_address):
+            os.remove(self.__socket_address)
+
+    def get_address(self):
+        """
+        Get the address workers should connect to, i.e. with the actual port if the coordinator was bound to port 0
+        :return: coordinator address
+        """
+        if self.__server is None:
+            return format_address(self.__family, self.__socket_address)
+        return format_address(self.__family, self.__server.server_address)
+
+    def _get_token(self):
+        return self.__token
+
+    def get_worker_count(self):
+        with self.__condition:
+            return len(self.__workers)
+
+    def get_pending_job_count(self):
+        with self.__condition:
+            return len(self.__pending_jobs)
+
+    def get_job_count(self):
+        """
+        Get the number of jobs this coordinator keeps track of, i.e. those neither finished, failed nor cancelled
+        :return: number of jobs
+        """
+        with self.__condition:
+            return len(self.__jobs)
+
+    def submit(self, command, use_shell=False, current_working_directory=None, timeout=None):
+        """
+        Queue a command job
+        :param command: command, as a string or a list of arguments
+        :param use_shell: whether to run the command through a shell
+        :param current_working_directory: working directory for the command, on the worker node
+        :param timeout: seconds the command is given to run, 'None' for no timeout
+        :return: the job
+        :except: DistributedRunnerException if the coordinator has been stopped
+        """
+        if self.__shutdown.is_set():
+            raise DistributedRunnerException("Coordinator is STOPPED, no more jobs are accepted")
+        job = DistributedJob(command, use_shell, current_working_directory, timeout)
+        with self.__condition:
+            self.__jobs[job.job_id] = job
+            self.__pending_jobs.append(job)
+            self.__condition.notify_all()
+        return job
+
+    def cancel_job(self, job):
+        """
+        Cancel a job, if it is running on a worker, the worker is told to stop it on its next heartbeat
+        :param job: the job
+        :return: no return value
+        """
+        with self.__condition:
+            if job.is_done():
+                return
+            if job.status == JOB_STATUS_PENDING:
+                self.__pending_jobs.remove(job)
+            job.status = JOB_STATUS_CANCELLED
+            job._set_done()
+            # The worker running it, if any, finds out on its next heartbeat that it doesn't hold the job anymore
+            self.__jobs.pop(job.job_id, None)
+
+    def __get_leased_job(self, worker_id, job_id):
+        job = self.__jobs.get(job_id)
+        if (job is None) or (job.worker_id != worker_id):
+            # Results from a worker that lost its lease are discarded
+            return None
+        return job
+
+    def _register_worker(self, worker_id, connection):
+        with self.__condition:
+            self.__workers[worker_id] = (connection, time.monotonic())
+        self._logger.debug("Worker '{}' CONNECTED".format(worker_id))
+
+    def _unregister_worker(self, worker_id):
+        with self.__condition:
+            self.__workers.pop(worker_id, None)
+            for job in list(self.__jobs.values()):
+                if (job.worker_id == worker_id) and (job.status == JOB_STATUS_LEASED):
+                    self.__requeue_job(job, "worker '{}' connection LOST".format(worker_id))
+        self._logger.debug("Worker '{}' DISCONNECTED".format(worker_id))
+
+    def _touch_worker(self, worker_id):
+        with self.__condition:
+            if worker_id in self.__workers:
+                self.__workers[worker_id] = (self.__workers[worker_id][0], time.monotonic())
+
+    def _lease_job(self, worker_id):
+        """
+        Lease the next pending job to a worker, waiting up to the poll interval for one
+        :param worker_id: ID of the worker
+        :return: the job, or None if there is no job for the worker
+        """
+        deadline = time.monotonic() + self.__poll_interval
+        with self.__condition:
+            while not self.__pending_jobs:
+                remaining = deadline - time.monotonic()
+                if (remaining <= 0) or self.__shutdown.is_set():
+                    return None
+                self.__condition.wait(remaining)
+            job = self.__pending_jobs.popleft()
+            job.status = JOB_STATUS_LEASED
+            job.worker_id = worker_id
+            job.last_heartbeat = time.monotonic()
+            job.attempts += 1
+            return job
+
+    def _renew_lease(self, worker_id, job_id):
+        """
+        Renew the lease of a worker on a job
+        :param worker_id: ID of the worker
+        :param job_id: ID of the job
+        :return: True if the worker should stop running the job
+        """
+        with self.__condition:
+            job = self.__get_leased_job(worker_id, job_id)
+            if (job is None) or (job.status != JOB_STATUS_LEASED):
+                return True
+            job.last_heartbeat = time.monotonic()
+            return False
+
+    def _append_output(self, worker_id, job_id, stream, data):
+        with self.__condition:
+            job = self.__get_leased_job(worker_id, job_id)
+            if (job is None) or (job.status != JOB_STATUS_LEASED):
+                return
+            job.last_heartbeat = time.monotonic()
+            if stream == STREAM_STDOUT:
+                job.stdout.extend(data)
+            else:
+                job.stderr.extend(data)
+
+    def _complete_job(self, worker_id, result):
+        with self.__condition:
+            job = self.__get_leased_job(worker_id, result['job_id'])
+            if (job is None) or (job.status != JOB_STATUS_LEASED):
+                return
+            job.return_code = result.get('return_code')
+            job.timed_out = result.get('timed_out', False)
+            job.resource_usage = result.get('resource_usage')
+            job.error = result.get('error')
+            job.status = JOB_STATUS_FINISHED if job.error is None else JOB_STATUS_FAILED
+            job._set_done()
+            # Finished jobs are not needed by the coordinator anymore, their runners hold them
+            self.__jobs.pop(job.job_id, None)
+
+    def __requeue_job(self, job, reason):
+        """
+        Put a leased job back at the front of the queue, or fail it if it has run out of attempts. It must be called
+        with the condition held
+        :param job: the job
+        :param reason: why the job lost its lease
+        :return: no return value
+        """
+        job.worker_id = None
+        job.stdout = bytearray()
+        job.stderr = bytearray()
+        if job.attempts >= self.__max_job_attempts:
+            self._logger.error("Job '{}' FAILED, {}, and it has run out of attempts".format(job.job_id, reason))
+            job.status = JOB_STATUS_FAILED
+            job.error = "Job LOST #{} times, last time because {}".format(job.attempts, reason)
+            job._set_done()
+            self.__jobs.pop(job.job_id, None)
+            return
+        self._logger.warning("Job '{}' RE-QUEUED, {}".format(job.job_id, reason))
+        job.status = JOB_STATUS_PENDING
+        self.__pending_jobs.appendleft(job)
+        self.__condition.notify_all()
+
+    def __monitor_leases(self):
+        while not self.__shutdown.wait(self.__heartbeat_timeout / 3):
+            now = time.monotonic()
+            with self.__condition:
+                for job in list(self.__jobs.values()):
+                    if (job.status == JOB_STATUS_LEASED) and ((now - job.last_heartbeat) > self.__heartbeat_timeout):
+                        self.__requeue_job(job, "NO HEARTBEAT from worker '{}' for #{} seconds"
+                                           .format(job.worker_id, self.__heartbeat_timeout))
+
+
+class Worker(threading.Thread):
+    """
+    This class models a worker daemon, it connects to a coordinator, pulls command jobs from it, runs them, and streams
+    their output and result back, while sending heartbeats for the job it is running. If the connection is lost, it
+    reconnects.
+
+    Workers only take jobs from a coordinator that proves it knows the shared 'token'
+    """
+
+    def __init__(self, address, token, worker_id=None, heartbeat_interval=5, reconnect_interval=5):
+        super().__init__(name="Worker-{}".format(worker_id), daemon=True)
+        self._logger = config_manager \
+            .get_app_config_manager() \
+            .get_logger_for("{}.{}".format(__name__, type(self).__name__))
+        self.__family, self.__socket_address = parse_address(address)
+        self.__token = check_token(token)
+        self.__worker_id = worker_id or "{}-{}".format(socket.gethostname(), os.getpid())
+        self.__heartbeat_interval = heartbeat_interval
+        self.__reconnect_interval = reconnect_interval
+        self.__stop_event = threading.Event()
+        self.__connection = None
+        self.__stream = None
+        # Every message exchange on the connection holds this lock, so heartbeats and output don't interleave
+        self.__stream_lock = threading.Lock()
+        self.__jobs_run = 0
+
+    def get_worker_id(self):
+        return self.__worker_id
+
+    def get_jobs_run(self):
+        return self.__jobs_run
+
+    def stop(self):
+        """
+        Stop this worker, the job it is running, if any, is killed, and the coordinator will re-queue it
+        :return: no return value
+        """
+        self.__stop_event.set()
+        connection = self.__connection
+        if connection is not None:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def run(self):
+        while not self.__stop_event.is_set():
+            try:
+                self.__connection = socket.socket(self.__family, socket.SOCK_STREAM)
+                self.__connection.connect(self.__socket_address)
+                self.__stream = self.__connection.makefile('rwb')
+                worker_handshake(self.__stream, self.__worker_id, self.__token)
+                self._logger.info("Worker '{}' CONNECTED to coordinator at '{}'"
+                                  .format(self.__worker_id, format_address(self.__family, self.__socket_address)))
+                self.__serve()
+            except (OSError, ValueError) as e:
+                if not self.__stop_event.is_set():
+                    self._logger.warning("Worker '{}' LOST its connection to the coordinator ---> {}"
+                                         .format(self.__worker_id, e))
+            finally:
+                self.__close_connection()
+            self.__stop_event.wait(self.__reconnect_interval)
+
+    def __close_connection(self):
+        for closeable in (self.__stream, self.__connection):
+            if closeable is not None:
+                try:
+                    closeable.close()
+                except OSError:
+                    pass
+        self.__stream = None
+        self.__connection = None
+
+    def __exchange(self, message, reply_expected=True):
+        with self.__stream_lock:
+            send_message(self.__stream, message)
+            if not reply_expected:
+                return None
+            reply = receive_message(self.__stream)
+        if reply is None:
+            raise ConnectionError("Connection closed by the coordinator")
+        return reply
+
+    def __serve(self):
+        while not self.__stop_event.is_set():
+            job = self.__exchange({'type': MESSAGE_REQUEST_JOB})
+            if job.get('type') != MESSAGE_JOB:
+                continue
+            result = self.__run_job(job)
+            self.__exchange(result, reply_expected=False)
+            self.__jobs_run += 1
+
+    def __send_heartbeats(self, job_id, process, done):
+        while not done.wait(self.__heartbeat_interval):
+            try:
+                ack = self.__exchange({'type': MESSAGE_HEARTBEAT, 'job_id': job_id})
+            except (OSError, ValueError):
+                # The main loop will find out about the lost connection
+                return
+            if ack.get('cancel'):
+                self._logger.warning("Job '{}' CANCELLED by the coordinator".format(job_id))
+                general.terminate_process_group(process)
+                return
+
+    def __run_job(self, job):
+        """
+        Run a command job, streaming its output to the coordinator
+        :param job: job message
+        :return: result message
+        """
+        job_id = job['job_id']
+        result = {'type': MESSAGE_RESULT,
+                  'job_id': job_id,
+                  'return_code': None,
+                  'timed_out': False,
+                  'resource_usage': None,
+                  'error': None}
+        self._logger.debug("Worker '{}' RUNNING job '{}', command '{}'"
+                           .format(self.__worker_id, job_id, job['command']))
+        try:
+            process = general.spawn_subprocess(job['command'],
+                                               shell=job['use_shell'],
+                                               cwd=job['current_working_directory'],
+                                               popen_class=AccountedPopen)
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            result['error'] = "Command could NOT be started ---> {}".format(e)
+            return result
+        done = threading.Event()
+        heartbeat_thread = threading.Thread(target=self.__send_heartbeats,
+                                            args=(job_id, process, done),
+                                            name="Heartbeat-{}".format(job_id),
+                                            daemon=True)
+        heartbeat_thread.start()
+        try:
+            result['timed_out'] = self.__stream_output(job_id, process, job['timeout'])
+            process.wait()
+        finally:
+            if process.poll() is None:
+                # The connection was lost, or the worker stopped, while streaming output
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
+            done.set()
+            heartbeat_thread.join()
+        result['return_code'] = process.returncode
+        if process.get_resource_usage() is not None:
+            result['resource_usage'] = vars(process.get_resource_usage())
+        return result
+
+    def __stream_output(self, job_id, process, timeout):
+        """
+        Stream the output of a running command to the coordinator, until the command closes its output or times out
+        :param job_id: ID of the job
+        :param process: the command process
+        :param timeout: seconds the command is given to run, 'None' for no timeout
+        :return: True if the command timed out, and it was killed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        streams = {process.stdout.fileno(): STREAM_STDOUT, process.stderr.fileno(): STREAM_STDERR}
+        with selectors.DefaultSelector() as selector:
+            for fd in streams:
+                selector.register(fd, selectors.EVENT_READ)
+            while streams:
+                if self.__stop_event.is_set():
+                    raise ConnectionError("Worker STOPPED")
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        try:
+                            os.killpg(process.pid, signal.SIGKILL)
+                        except ProcessLookupError:
+                            pass
+                        return True
+                    wait_time = min(remaining, self.__heartbeat_interval)
+                else:
+                    wait_time = self.__heartbeat_interval
+                for key, events in selector.select(timeout=wait_time):
+                    data = os.read(key.fd, _OUTPUT_CHUNK_SIZE)
+                    if not data:
+                        selector.unregister(key.fd)
+                        del streams[key.fd]
+                        continue
+                    self.__exchange({'type': MESSAGE_OUTPUT,
+                                     'job_id': job_id,
+                                     'stream': streams[key.fd],
+                                     'data': base64.b64encode(data).decode('ascii')},
+                                    reply_expected=False)
+        return False
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of an application and it is not meant to be run in stand alone mode")
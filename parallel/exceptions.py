@@ -25,6 +25,11 @@ class NoMoreAliveRunnersException(ParallelRunnerManagerException):
         super().__init__(value)
 
 
+class WorkflowManagerException(ParallelRunnerManagerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
 class ParallelRunnerException(AppException):
     def __init__(self, value):
         super().__init__(value)
@@ -35,6 +40,11 @@ class CommandLineRunnerException(ParallelRunnerException):
         super().__init__(value)
 
 
+class CommandResultCacheException(ParallelRunnerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
 class CommandIsNotDoneYet(CommandLineRunnerException):
     def __init__(self, value):
         super().__init__(value)
@@ -45,10 +55,25 @@ class CommandLineRunnerAsThreadException(CommandLineRunnerException):
         super().__init__(value)
 
 
+class CommandLineRunnerPipelineException(CommandLineRunnerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
 class CommandLineRunnerOnHpcException(CommandLineRunnerException):
     def __init__(self, value):
         super().__init__(value)
 
 
+class RemoteCommandLineRunnerException(CommandLineRunnerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+class DistributedRunnerException(ParallelRunnerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
 if __name__ == '__main__':
     print("ERROR: This script is part of an application and it is not meant to be run in stand alone mode")
@@ -11,17 +11,37 @@
 This file contains different models for the execution of subprocesses / external processes, e.g. via the command line
 """
 
+import os
 import abc
+import json
 import time
-import random
+import shlex
+import signal
 import threading
 import subprocess
+import collections
 # App imports
 import config_manager
+from toolbox import general
+from toolbox.timeouts import get_command_history_key, HISTORY_KEY_COMMAND
+from executor.pool import PooledTask, EXECUTOR_QUEUE_CPU, EXECUTOR_QUEUE_IO, EXECUTOR_QUEUE_RUNNERS
+from session_manager.results import Result, SUBSYSTEM_RUNNER
+from session_manager.exceptions import ResultsStoreException
+from session_manager.status import register_status_source, STATUS_SOURCE_RUNNERS
+from . import distributed
+from .accounting import AccountedPopen, ResourceUsage, ResourceUsageAggregator
 from .exceptions import ParallelRunnerException, \
     CommandLineRunnerAsThreadException, \
+    CommandLineRunnerPipelineException, \
     NoMoreAliveRunnersException, \
-    CommandIsNotDoneYet
+    CommandIsNotDoneYet, \
+    CommandResultCacheException, \
+    RemoteCommandLineRunnerException
+
+# Resource usage report, within the session working directory
+RESOURCE_USAGE_REPORT_FILE_NAME = 'resource_usage.jsonl'
+# Returned by parallel kernels waiting for something without holding an executor pool worker
+_KERNEL_WAITING = object()
 
 
 # Abstract Factories
@@ -32,8 +52,11 @@ class CommandLineRunnerFactory:
         This method will 'autoselect' the right command line runner to instantiate.
         :return: a CommandLineRunner instance
         """
-        # This is the automatic selector between command line runners
-        # TODO - This Factory is creating only local runners in the first iteration
+        # This is the automatic selector between command line runners, commands are sent to remote workers when a
+        # coordinator has been configured, otherwise, they run locally
+        coordinator = distributed.get_coordinator()
+        if coordinator is not None:
+            return RemoteCommandLineRunner(coordinator)
         return CommandLineRunnerAsThread()
 
     # Having the following two methods allows the application to use a multithreaded command line runner in an HPC
@@ -43,16 +66,25 @@ class CommandLineRunnerFactory:
     def get_multithread_command_line_runner():
         return CommandLineRunnerAsThread()
 
+    @staticmethod
+    def get_command_line_runner_pipeline():
+        # Pipelines always run locally, as their stages are connected through OS pipes
+        return CommandLineRunnerPipeline()
+
     @staticmethod
     def get_hpc_command_line_runner():
         return CommandLineRunnerOnHpc()
 
+    @staticmethod
+    def get_remote_command_line_runner(coordinator=None):
+        return RemoteCommandLineRunner(coordinator or distributed.get_coordinator())
+
 
 class ParallelRunnerManagerFactory:
     @staticmethod
-    def get_parallel_runner_manager():
+    def get_parallel_runner_manager(admission_controller=None):
         # TODO - This factory is creating only one kind of Parallel Runner Manager, more complex ones to come ...
-        return ParallelRunnerManager()
+        return ParallelRunnerManager(admission_controller=admission_controller)
 
 
 # Parallel Runner Managers
@@ -62,16 +94,34 @@ class ParallelRunnerManager:
     runners, waiting for them to finish or getting the next one that finished.
     """
     # TODO - Include an 'auto_start' flag to start runners as they are added to the manager
-    def __init__(self):
+    def __init__(self, admission_controller=None):
         self._logger = config_manager \
             .get_app_config_manager() \
             .get_logger_for("{}.{}".format(__name__, type(self).__name__))
         self.__runners = set()
         self.__alive_runners = set()
         self.__finished_runners = set()
+        # Runners started by this manager don't run their kernel until they are admitted by the admission controller
+        self.__admission_controller = admission_controller
+        # Runners notify the manager when they finish
+        self.__runner_finished = threading.Condition()
+        # Once shutting down, the manager doesn't start any more runners
+        self.__shutdown = False
+        self.__signal_handlers = None
+        # Resource accounting, every finished runner is reported to the session resource usage report
+        self.__resource_usage_aggregator = ResourceUsageAggregator()
+        self.__resource_usage_report_file = os.path.join(config_manager.get_app_config_manager()
+                                                         .get_session_working_dir(),
+                                                         RESOURCE_USAGE_REPORT_FILE_NAME)
+        # Every finished runner is reported to the session results store, if enabled
+        self.__results_store = config_manager.get_app_config_manager().get_results_store()
+        # When the first runner was started, as seconds since the epoch, and the session status can ask for this
+        # manager status at any time
+        self.__started_at = None
+        register_status_source(STATUS_SOURCE_RUNNERS, self)
 
     def add_runners(self, runners):
-        self.__runners.union(set(runners))
+        self.__runners.update(runners)
 
     def add_runner(self, runner):
         self.__runners.add(runner)
@@ -82,12 +132,25 @@ class ParallelRunnerManager:
         :return: no return value
         """
         self._logger.debug("Starting #{} Runners".format(len(self.__runners)))
+        if self.__started_at is None:
+            self.__started_at = time.time()
         for runner in self.__runners:
+            runner.add_done_callback(self.__notify_runner_finished)
+            if (self.__admission_controller is not None) and (runner.admission_controller is None):
+                runner.admission_controller = self.__admission_controller
+            if self.__shutdown:
+                # The runner is started anyway, so it goes through its normal life cycle, but it won't run its kernel
+                runner.cancel()
+            with self.__runner_finished:
+                self.__alive_runners.add(runner)
             runner.start()
-            self.__alive_runners.add(runner)
         self._logger.debug("Runners started, clearing out the runners container")
         self.__runners.clear()
 
+    def __notify_runner_finished(self, runner):
+        with self.__runner_finished:
+            self.__runner_finished.notify_all()
+
     def get_next_finished_runner(self):
         """
         Get the next runner that finishes
@@ -98,24 +161,69 @@ class ParallelRunnerManager:
             raise NoMoreAliveRunnersException("No more runners left! They've all finished")
         runner_found = None
         counter = 1
-        while True:
-            self._logger.debug("Searching for the next finished runner among #{} runners, ROUND #{}"
-                               .format(len(self.__alive_runners),
-                                       counter))
-            for runner in self.__alive_runners:
-                if runner.is_done():
-                    runner_found = runner
+        with self.__runner_finished:
+            while True:
+                self._logger.debug("Searching for the next finished runner among #{} runners, ROUND #{}"
+                                   .format(len(self.__alive_runners),
+                                           counter))
+                for runner in self.__alive_runners:
+                    if runner.is_done():
+                        runner_found = runner
+                        break
+                if runner_found:
+                    self.__alive_runners.remove(runner_found)
+                    self.__finished_runners.add(runner_found)
                     break
-            if runner_found:
-                self.__alive_runners.remove(runner_found)
-                self.__finished_runners.add(runner_found)
-                break
-            # WARNING! - MAGIC NUMBER AHEAD!!!
-            # We haven't found any runner on this round, let's wait a random amount of time before we try again
-            time.sleep(random.randint(0, 10))
-            counter += 1
+                # We haven't found any runner on this round, wait for the next runner to notify that it finished. The
+                # timeout is just a safety net for runners that were started out of this manager
+                # WARNING! - MAGIC NUMBER AHEAD!!!
+                self.__runner_finished.wait(timeout=10)
+                counter += 1
+        self.__account_for_runner(runner_found)
         return runner_found
 
+    def __account_for_runner(self, runner):
+        """
+        Add the resources used by the given finished runner to the aggregated resource usage, and to the session
+        resource usage report, a JSON-lines file, with one line per runner
+        :param runner: finished runner
+        :return: no return value
+        """
+        resource_usage = runner.get_resource_usage()
+        self.__resource_usage_aggregator.add(resource_usage)
+        report_entry = {'runner': runner.get_description(),
+                        'error': runner.is_error(),
+                        'resource_usage': resource_usage.to_dict() if resource_usage else None}
+        try:
+            with open(self.__resource_usage_report_file, 'a') as report_file:
+                report_file.write(json.dumps(report_entry) + "\n")
+        except Exception as e:
+            self._logger.warning("Resource usage report '{}' could not be written ---> {}"
+                                 .format(self.__resource_usage_report_file, e))
+        if self.__results_store is not None:
+            self.__results_store.add(Result(SUBSYSTEM_RUNNER,
+                                            runner.get_description(),
+                                            not runner.is_error(),
+                                            error_type=runner.get_error_type(),
+                                            error_message="\n".join(runner.get_error_messages()) or None,
+                                            duration=resource_usage.wall_time if resource_usage else None,
+                                            started_at=runner.get_started_at(),
+                                            finished_at=runner.get_finished_at(),
+                                            details=runner.get_result_details()))
+
+    def get_resource_usage_summary(self):
+        """
+        Get the aggregated resource usage for all the runners that finished in this manager
+        :return: a dictionary with the resource usage summary
+        """
+        return self.__resource_usage_aggregator.get_summary()
+
+    def get_resource_usage_report_file(self):
+        return self.__resource_usage_report_file
+
+    def get_admission_controller(self):
+        return self.__admission_controller
+
     def wait_all(self):
         """
         Wait for all runners to finish.
@@ -127,6 +235,101 @@ class ParallelRunnerManager:
                 self.get_next_finished_runner()
         except NoMoreAliveRunnersException as e:
             self._logger.debug("All runners are (should be) finished")
+        self._logger.info("Resource usage summary: {}".format(json.dumps(self.get_resource_usage_summary())))
+        if self.__results_store is not None:
+            try:
+                self.__results_store.flush()
+            except ResultsStoreException as e:
+                self._logger.warning(e.value)
+        timeout_history = config_manager.get_app_config_manager().get_timeout_history()
+        if timeout_history is not None:
+            try:
+                timeout_history.save()
+            except OSError as e:
+                self._logger.warning("Timeout history '{}' could NOT be saved ---> {}"
+                                     .format(timeout_history.get_history_file(), e))
+
+    def get_results_store(self):
+        return self.__results_store
+
+    def drain(self):
+        """
+        Stop starting runners, those runners already running are left alone to finish their job
+        :return: no return value
+        """
+        self._logger.warning("DRAINING runners, #{} runners still running".format(len(self.get_alive_runners())))
+        self.__shutdown = True
+
+    def cancel_all(self):
+        """
+        Stop starting runners, and cancel those that are running. This method doesn't wait for the runners to finish
+        :return: no return value
+        """
+        self.__shutdown = True
+        alive_runners = self.get_alive_runners()
+        self._logger.warning("CANCELLING #{} running runners".format(len(alive_runners)))
+        for runner in alive_runners:
+            runner.cancel()
+
+    def install_signal_handlers(self, drain_deadline):
+        """
+        Handle SIGINT and SIGTERM by draining the runners, and cancelling those still running once the drain deadline
+        expires, or on a second signal. This method must be called from the main thread.
+        :param drain_deadline: seconds to wait for the running runners to finish before cancelling them
+        :return: no return value
+        """
+        self.__signal_handlers = general.install_shutdown_signal_handlers(self.drain, self.cancel_all, drain_deadline)
+
+    def restore_signal_handlers(self):
+        if self.__signal_handlers is not None:
+            general.restore_signal_handlers(self.__signal_handlers)
+            self.__signal_handlers = None
+
+    def is_shutdown(self):
+        return self.__shutdown
+
+    def get_status(self):
+        """
+        Get a snapshot of the runners in this manager, for the session status. No locks are taken, the runner containers
+        are copied in one step each, which is atomic under the GIL, so the snapshot may be slightly out of date, but it
+        never holds up the runners
+        :return: a dictionary with the number of runners by state, the error rate, by error type, the number of runners
+        finished per second, and the elapsed time and progress of every running runner
+        """
+        now = time.time()
+        queued = len(self.__runners)
+        alive_runners = list(self.__alive_runners)
+        finished_runners = list(self.__finished_runners)
+        in_flight = []
+        for runner in alive_runners:
+            started_at = runner.get_started_at()
+            if runner.is_done():
+                finished_runners.append(runner)
+            elif started_at is None:
+                # Waiting for a worker of its executor pool
+                queued += 1
+            else:
+                elapsed = now - started_at
+                progress = runner.get_progress()
+                in_flight.append({'runner': runner.get_description(),
+                                  'elapsed_seconds': elapsed,
+                                  'progress_bytes': progress,
+                                  'throughput_bytes_per_second': (progress / elapsed)
+                                  if (progress is not None) and (elapsed > 0) else None})
+        error_types = collections.Counter([runner.get_error_type() for runner in finished_runners
+                                           if runner.is_error()])
+        failed = sum(error_types.values())
+        elapsed = (now - self.__started_at) if self.__started_at is not None else None
+        return {'queued': queued,
+                'running': len(in_flight),
+                'finished': len(finished_runners),
+                'failed': failed,
+                'error_rate': (failed / len(finished_runners)) if finished_runners else None,
+                'error_types': dict(error_types),
+                'elapsed_seconds': elapsed,
+                'finished_per_second': (len(finished_runners) / elapsed) if elapsed else None,
+                'shutdown': self.__shutdown,
+                'in_flight': in_flight}
 
     def get_not_started_runners(self):
         """
@@ -140,7 +343,8 @@ class ParallelRunnerManager:
         Get those runners that are running
         :return: a set of runners
         """
-        return set(self.__alive_runners)
+        with self.__runner_finished:
+            return set(self.__alive_runners)
 
     def get_finished_runners(self):
         """
@@ -151,10 +355,14 @@ class ParallelRunnerManager:
 
 
 # Parallel Runners
-class ParallelRunner(threading.Thread, metaclass=abc.ABCMeta):
+class ParallelRunner(PooledTask, metaclass=abc.ABCMeta):
     """
-    This class models a thread that executes a parallel kernel, confined within a method delegated to subclasses.
+    This class models a task that executes a parallel kernel, confined within a method delegated to subclasses.
+
+    Runners don't have a thread on their own, they run on the process wide executor pool named by 'executor_queue'.
     """
+    executor_queue = EXECUTOR_QUEUE_CPU
+
     # TODO - Refactor This, as responsibilities are a little bit mixed up
     def __init__(self):
         super().__init__()
@@ -167,6 +375,21 @@ class ParallelRunner(threading.Thread, metaclass=abc.ABCMeta):
         self._shutdown = False
         # Return information (this could be an entity on its own in the next iteration)
         self._error_messages = []
+        # Resources used by the parallel kernel
+        self._resource_usage = None
+        # When the runner started and finished, as seconds since the epoch
+        self._started_at = None
+        self._finished_at = None
+        # Progress of the parallel kernel, e.g. bytes written so far, if subclasses keep track of it
+        self._progress = None
+        # Resources the parallel kernel needs, the runner waits for them to be available, before running its kernel,
+        # when it is under the control of an admission controller
+        self.required_memory_mb = 0
+        self.required_cpus = 1
+        self.admission_controller = None
+        # Callbacks to call when the runner is done
+        self.__done_callbacks = []
+        self.__done_callbacks_lock = threading.Lock()
 
     @abc.abstractmethod
     def _run(self):
@@ -178,11 +401,31 @@ class ParallelRunner(threading.Thread, metaclass=abc.ABCMeta):
 
     def run(self):
         self._logger.debug("--- START ---")
+        self.__start_time = time.monotonic()
+        self._started_at = time.time()
+        self.__run_kernel_step(None)
+
+    def __run_kernel_step(self, continuation):
+        """
+        Run the parallel kernel or, for a kernel waiting without a worker, its continuation, and finish the runner,
+        unless the kernel is waiting (again)
+        :param continuation: continuation of the parallel kernel, None for running the kernel from the start
+        :return: no return value
+        """
+        suspended = False
         try:
-            if not self._shutdown:
-                self._run()
-            else:
+            if (continuation is None) and (self._shutdown or not self.__acquire_admission()):
                 self._logger.warning("--- ABORTED ---")
+                self._error_messages.append("Parallel Runner ABORTED, it was cancelled before it started")
+                self._error = True
+            else:
+                try:
+                    suspended = (continuation or self._run)() is _KERNEL_WAITING
+                    if (not suspended) and (self.admission_controller is not None):
+                        self.admission_controller.report_success(self)
+                finally:
+                    if not suspended:
+                        self.__release_admission()
         except ParallelRunnerException as e:
             # This code is running on a separated thread, so this class, as top level 'client', must log the error for
             # the application
@@ -191,16 +434,89 @@ class ParallelRunner(threading.Thread, metaclass=abc.ABCMeta):
             self._logger.error(error_message)
             self._error = True
         finally:
+            if not suspended:
+                self.__finish()
+
+    def __finish(self):
+        if self._resource_usage is None:
+            # Subclasses account for the resources used by their kernel, otherwise, only wall time is available
+            self._resource_usage = ResourceUsage(wall_time=time.monotonic() - self.__start_time)
+        self._finished_at = time.time()
+        with self.__done_callbacks_lock:
             self._done = True
+            done_callbacks = list(self.__done_callbacks)
+        for done_callback in done_callbacks:
+            done_callback(self)
+
+    def _wait_without_worker(self, add_done_callback, continuation):
+        """
+        Let the parallel kernel wait for something external, e.g. a remote job, without holding an executor pool worker.
+        The kernel must return the value returned by this method straight away, and 'continuation', i.e. the rest of the
+        kernel, is run on the executor pool when what it waits for is over. The runner stays admitted while waiting
+        :param add_done_callback: callable registering the callback to call when what the kernel waits for is over
+        :param continuation: callable, the rest of the parallel kernel
+        :return: the value for the parallel kernel to return
+        """
+        resume = self._suspend()
+        add_done_callback(lambda *args: resume(lambda: self.__run_kernel_step(continuation)))
+        return _KERNEL_WAITING
+
+    def __acquire_admission(self):
+        """
+        Wait for the admission controller, if any, to admit this runner
+        :return: True if admitted, False if the runner was cancelled while waiting
+        """
+        if self.admission_controller is None:
+            return True
+        return self.admission_controller.acquire(self, is_cancelled=lambda: self._shutdown)
+
+    def __release_admission(self):
+        if self.admission_controller is not None:
+            self.admission_controller.release(self)
+
+    def _readmit_after_out_of_memory(self):
+        """
+        Report that the kernel was killed because the system ran out of memory, and wait to be admitted again, with
+        the lowered concurrency limit, before retrying
+        :return: True if admitted again, False if the runner was cancelled while waiting
+        """
+        if self.admission_controller is None:
+            return True
+        concurrency = self.admission_controller.report_out_of_memory(self)
+        self._logger.warning("OUT OF MEMORY, concurrency lowered to #{}, waiting to be admitted again"
+                             .format(concurrency))
+        self.admission_controller.release(self)
+        return self.__acquire_admission()
+
+    def add_done_callback(self, done_callback):
+        """
+        Register a callback to call, with this runner as parameter, when the runner is done. If the runner is already
+        done, the callback is called straight away
+        :param done_callback: callable
+        :return: no return value
+        """
+        with self.__done_callbacks_lock:
+            if not self._done:
+                self.__done_callbacks.append(done_callback)
+                return
+        done_callback(self)
 
     def cancel(self):
         """
-        'Try' to cancel the current running kernel
+        Cancel the parallel kernel, if it has not started yet, it won't, and if it is running, it is stopped via
+        '_cancel'. This method doesn't wait for the runner to finish, use 'wait' for that
         :return: no return value
         """
         self._logger.debug("--- CANCEL ---")
         self._shutdown = True
-        self._stop()
+        self._cancel()
+
+    def _cancel(self):
+        """
+        Stop the running parallel kernel, subclasses running things that can be stopped should override this method
+        :return: no return value
+        """
+        pass
 
     def wait(self):
         """
@@ -216,12 +532,72 @@ class ParallelRunner(threading.Thread, metaclass=abc.ABCMeta):
     def is_error(self):
         return self._error
 
+    def get_resource_usage(self):
+        """
+        Get the resources used by this runner, available once it is done
+        :return: resource usage object
+        """
+        return self._resource_usage
+
+    def get_description(self):
+        """
+        Get a human readable description of the work done by this runner
+        :return: description
+        """
+        return type(self).__name__
+
+    def get_error_messages(self):
+        return list(self._error_messages)
+
+    def get_error_type(self):
+        """
+        Get the kind of error that made this runner fail, subclasses refine it
+        :return: error type, or None if the runner didn't fail
+        """
+        if not self.is_error():
+            return None
+        return 'cancelled' if self._shutdown else 'error'
+
+    def get_started_at(self):
+        return self._started_at
+
+    def get_finished_at(self):
+        return self._finished_at
+
+    def get_progress(self):
+        """
+        Get the progress of the parallel kernel, for the session status
+        :return: progress, e.g. in bytes, or None if it is not known
+        """
+        return self._progress
+
+    def get_result_details(self):
+        """
+        Get the details of the result of this runner, for the session results store
+        :return: JSON serializable dictionary
+        """
+        return {'runner': type(self).__name__,
+                'resource_usage': self._resource_usage.to_dict() if self._resource_usage else None}
+
+    def get_fingerprint_data(self):
+        """
+        Get the data that identifies the work done by this runner, e.g. for deciding whether the result of a previous
+        run of the same work can be reused
+        :return: JSON serializable data
+        """
+        return [type(self).__name__]
+
 
 # Execution of commands
 class CommandLineRunner(ParallelRunner):
     """
-    This class models a parallel kernel that executes a command
+    This class models a parallel kernel that executes a command.
+
+    Command runners run on their own executor pool, as they spend their time waiting for their command, its size is not
+    tied to the number of CPUs.
     """
+    executor_queue = EXECUTOR_QUEUE_RUNNERS
+
     def __init__(self):
         super().__init__()
         self._logger = config_manager \
@@ -229,11 +605,178 @@ class CommandLineRunner(ParallelRunner):
             .get_logger_for("{}.{}".format(__name__, type(self).__name__))
         self._stdout = b' '
         self._stderr = b' '
+        # The command can be given as a list of arguments, or as a string, that is split following shell quoting rules.
+        # It is run through a shell only if 'use_shell' is set
         self.command = None
+        self.use_shell = False
+        # Closing inherited file descriptors in the child is safer, but slower to spawn
+        self.close_fds = True
         self.command_success = False
         self.command_return_code = 0
+        runner_timeouts_config = config_manager.get_app_config_manager().get_timeouts_config().get('runner', {})
+        # Wall clock limit for the command, if not given, it is estimated from the history of previous runs under the
+        # same 'timeout_key', when there is enough of it. Commands without a 'timeout_key' have no history, unless
+        # 'timeout_history_by_program' is set, then they share the history of the program they run, shell commands
+        # excluded, as they all run the same program, i.e. the shell
         self.timeout = None
+        self.timeout_key = None
+        self.timeout_history_by_program = runner_timeouts_config.get('history_by_program', False)
+        # Stall detection, commands whose output, i.e. standard output, standard error and 'output_files', grows slower
+        # than 'stall_min_rate' bytes per second over 'stall_window' seconds are stopped, disabled if no window is given
+        self.stall_window = runner_timeouts_config.get('stall_window_seconds')
+        self.stall_min_rate = runner_timeouts_config.get('stall_min_rate_bytes_per_second', 1)
         self.current_working_directory = None
+        # Seconds given to the command to terminate when cancelled, before killing it
+        self.cancel_grace_period = 5
+        # Commands killed by the system running out of memory are retried, when under admission control
+        self.max_out_of_memory_retries = 2
+        self._timed_out = False
+        self._stalled = False
+        # Opt-in result caching, the cache key is made of the command, its working directory, the environment variables
+        # listed in 'cache_env_keys' and the fingerprint of 'input_files'. 'output_files' are stored with the result
+        self.result_cache = None
+        self.cache_env_keys = []
+        self.input_files = []
+        self.output_files = []
+        self.cache_hit = False
+
+    def get_fingerprint_data(self):
+        return super().get_fingerprint_data() + [self.command, self.use_shell, self.current_working_directory]
+
+    def is_out_of_memory_killed(self):
+        """
+        Tell whether the command was, most likely, killed by the kernel OOM killer, i.e. it got SIGKILL, or it exited
+        with the code a shell reports for a child that got SIGKILL (128 + 9), and it was neither cancelled nor timed out
+        :return: True if the command was killed because the system ran out of memory
+        """
+        return (self.command_return_code in (-signal.SIGKILL, 128 + signal.SIGKILL)) \
+            and not self._shutdown \
+            and not self._timed_out
+
+    def get_description(self):
+        return "{} '{}' at '{}'".format(type(self).__name__, self.command, self.current_working_directory)
+
+    def get_error_type(self):
+        if not self.is_error():
+            return None
+        if self._shutdown:
+            return 'cancelled'
+        if self._stalled:
+            return 'stalled'
+        if self._timed_out:
+            return 'timeout'
+        if self.is_out_of_memory_killed():
+            return 'out_of_memory'
+        if self.command_return_code != 0:
+            return 'return_code'
+        return 'error'
+
+    def get_result_details(self):
+        details = super().get_result_details()
+        details.update({'command': self.command,
+                        'current_working_directory': self.current_working_directory,
+                        'return_code': self.command_return_code,
+                        'timed_out': self._timed_out,
+                        'stalled': self._stalled,
+                        'cache_hit': self.cache_hit})
+        return details
+
+    def get_timeout_key(self):
+        """
+        Get the timeout history key for this command, its 'timeout_key', or the program it runs, if
+        'timeout_history_by_program' is set
+        :return: timeout history key, or None if the command has no timeout history
+        """
+        if self.timeout_key is not None:
+            return self.timeout_key
+        if (not self.timeout_history_by_program) or self.use_shell:
+            return None
+        return get_command_history_key(self.command)
+
+    def _get_effective_timeout(self):
+        """
+        Get the wall clock limit for the command, the given one, or, if none was given, the one estimated from the
+        durations of previous runs under the same timeout history key
+        :return: timeout, in seconds, or None if there is no time limit
+        """
+        if self.timeout is not None:
+            return self.timeout
+        timeout_history = config_manager.get_app_config_manager().get_timeout_history()
+        if (timeout_history is None) or (self.get_timeout_key() is None):
+            return None
+        runner_timeouts_config = config_manager.get_app_config_manager().get_timeouts_config().get('runner', {})
+        return timeout_history.estimate_timeout(self.get_timeout_key(),
+                                                percentile_rank=runner_timeouts_config.get('history_percentile', 99),
+                                                multiplier=runner_timeouts_config.get('history_multiplier', 3),
+                                                min_samples=runner_timeouts_config.get('history_min_samples', 10),
+                                                min_timeout=runner_timeouts_config.get('min_timeout_seconds', 60))
+
+    def _get_output_progress(self, output_bytes):
+        """
+        Progress of the command, for stall detection, i.e. its output so far, including the size of its output files
+        :param output_bytes: bytes written by the command to its standard output and error
+        :return: progress, in bytes
+        """
+        progress = output_bytes
+        for output_file in self.output_files:
+            try:
+                progress += os.path.getsize(self._resolve_path(output_file))
+            except OSError:
+                pass
+        return progress
+
+    def _track_output_progress(self, output_bytes):
+        """
+        Keep track of the progress of the command, see '_get_output_progress'
+        :param output_bytes: bytes written by the command to its standard output and error
+        :return: progress, in bytes
+        """
+        self._progress = self._get_output_progress(output_bytes)
+        return self._progress
+
+    def _resolve_path(self, path):
+        """
+        Resolve the given path relative to the command working directory
+        :param path: path to resolve
+        :return: absolute path
+        """
+        return os.path.abspath(os.path.join(self.current_working_directory or os.getcwd(), path))
+
+    def _get_result_cache_key(self):
+        return self.result_cache.compute_key(self.command,
+                                             current_working_directory=self.current_working_directory,
+                                             env_keys=self.cache_env_keys,
+                                             input_files=[self._resolve_path(file) for file in self.input_files])
+
+    def _restore_cached_result(self, cache_key):
+        """
+        Finish this runner with the cached result for the given key, if there is one
+        :param cache_key: result cache key
+        :return: True if the result has been restored from the cache, False otherwise
+        """
+        cached_result = self.result_cache.get(cache_key)
+        if cached_result is None:
+            return False
+        try:
+            self.result_cache.restore_output_files(cached_result)
+        except CommandResultCacheException as e:
+            self._logger.warning("Cached result for command '{}' could NOT BE RESTORED, running it ---> {}"
+                                 .format(self.command, e.value))
+            return False
+        self._stdout = cached_result.stdout
+        self._stderr = cached_result.stderr
+        self.command_return_code = cached_result.return_code
+        self.command_success = True
+        self.cache_hit = True
+        return True
+
+    def _store_result_in_cache(self, cache_key):
+        try:
+            self.result_cache.put(cache_key, self.command_return_code, self._stdout, self._stderr,
+                                  output_files=[self._resolve_path(file) for file in self.output_files])
+        except CommandResultCacheException as e:
+            # The command did its job, not being able to cache its result is not an error
+            self._logger.warning("Result for command '{}' could NOT BE CACHED ---> {}".format(self.command, e.value))
 
     def get_stdout(self):
         """
@@ -262,37 +805,108 @@ class CommandLineRunnerAsThread(CommandLineRunner):
         self._logger = config_manager \
             .get_app_config_manager() \
             .get_logger_for("{}.{}-{}".format(__name__, type(self).__name__, threading.current_thread().getName()))
+        self.__subprocess = None
+        self.__subprocess_lock = threading.Lock()
+
+    def _cancel(self):
+        with self.__subprocess_lock:
+            if self.__subprocess is not None:
+                general.terminate_process_group(self.__subprocess, grace_period=self.cancel_grace_period)
 
     def _run(self):
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self._get_result_cache_key()
+            if self._restore_cached_result(cache_key):
+                self._logger.debug("Command '{}', current working directory at '{}', result RESTORED FROM CACHE"
+                                   .format(self.command, self.current_working_directory))
+                return
+        out_of_memory_retries = 0
+        while True:
+            try:
+                self.__run_command()
+                break
+            except CommandLineRunnerAsThreadException:
+                if (not self.is_out_of_memory_killed()) \
+                        or (self.admission_controller is None) \
+                        or (out_of_memory_retries >= self.max_out_of_memory_retries):
+                    raise
+            out_of_memory_retries += 1
+            self._logger.warning("Command '{}' KILLED, out of memory, retry #{} out of #{}"
+                                 .format(self.command, out_of_memory_retries, self.max_out_of_memory_retries))
+            if not self._readmit_after_out_of_memory():
+                raise CommandLineRunnerAsThreadException("CANCELLED before retrying command '{}'"
+                                                         .format(self.command))
+        # I don't think I really need this flag over here, as any other situation would throw an exception but, it looks
+        # good and, keep into account that whatever you do with a possible exception is independent than whatever you
+        # can express by the combination of flags '_done' and 'command_success'. This allows you to react by capturing
+        # the exception (that also provides the return code for the command) but still keep the information that the
+        # process finished Ok, but the command failed, and you also have the stdout and stderr content for further
+        # analysis
+        self.command_success = True
+        # Only successful results are cached, so failed commands are always run again
+        if cache_key is not None:
+            self._store_result_in_cache(cache_key)
+
+    def __run_command(self):
+        """
+        Run the command, once
+        :return: no return value
+        :except: CommandLineRunnerAsThreadException if the command could not be run successfully
+        """
+        self.command_return_code = 0
         self._logger.debug("Preparing for running command '{}', "
                            "current working directory at '{}', "
                            "timeout '{}s'".format(self.command,
                                                   self.current_working_directory,
                                                   self.timeout))
-        command_subprocess = subprocess.Popen(self.command,
-                                              cwd=self.current_working_directory,
-                                              stdout=subprocess.PIPE,
-                                              stderr=subprocess.PIPE,
-                                              shell=True)
+        with self.__subprocess_lock:
+            if self._shutdown:
+                raise CommandLineRunnerAsThreadException("CANCELLED before running command '{}'".format(self.command))
+            # The command leads its own process group, so cancelling it takes down any process it spawns as well
+            command_subprocess = general.spawn_subprocess(self.command,
+                                                          shell=self.use_shell,
+                                                          cwd=self.current_working_directory,
+                                                          close_fds=self.close_fds,
+                                                          popen_class=AccountedPopen)
+            self.__subprocess = command_subprocess
+        timeout = self._get_effective_timeout()
+        stall_detector = general.StallDetector(self.stall_min_rate, self.stall_window) \
+            if self.stall_window is not None else None
         self._logger.debug("Communicating with subprocess for command '{}', "
                            "current working directory at '{}', "
-                           "timeout '{}s'".format(self.command,
-                                                  self.current_working_directory,
-                                                  self.timeout))
-        try:
-            self._stdout, self._stderr = command_subprocess.communicate(timeout=self.timeout)
-        except subprocess.TimeoutExpired as e:
-            command_subprocess.kill()
+                           "timeout '{}s', stall window '{}s'".format(self.command,
+                                                                      self.current_working_directory,
+                                                                      timeout,
+                                                                      self.stall_window))
+        started_at = time.monotonic()
+        self._stdout, self._stderr, stop_reason = \
+            general.communicate_with_progress(command_subprocess,
+                                              progress=self._track_output_progress,
+                                              stall_detector=stall_detector,
+                                              timeout=timeout)
+        self._resource_usage = command_subprocess.get_resource_usage()
+        if (stop_reason is not None) and not self._shutdown:
+            self._timed_out = True
+            self._stalled = stop_reason == general.STOP_REASON_STALLED
             raise CommandLineRunnerAsThreadException("Communicating with subprocess for command '{}', "
                                                      "current working directory at '{}', "
-                                                     "timeout '{}s'".format(self.command,
-                                                                            self.current_working_directory,
-                                                                            self.timeout)) from e
+                                                     "{} after '{:.1f}s', timeout '{}s'"
+                                                     .format(self.command,
+                                                             self.current_working_directory,
+                                                             stop_reason.upper(),
+                                                             time.monotonic() - started_at,
+                                                             timeout))
         self._logger.debug("Polling command '{}', "
                            "current working directory at '{}', "
                            "timeout '{}s'".format(self.command,
                                                   self.current_working_directory,
                                                   self.timeout))
+        if self._shutdown:
+            self.command_return_code = command_subprocess.returncode
+            raise CommandLineRunnerAsThreadException("CANCELLED while running command '{}', "
+                                                     "current working directory at '{}'"
+                                                     .format(self.command, self.current_working_directory))
         if command_subprocess.poll() and (command_subprocess.returncode != 0):
             self.command_return_code = command_subprocess.returncode
             raise CommandLineRunnerAsThreadException("ERROR - Return Code '{}' for command '{}', "
@@ -300,14 +914,320 @@ class CommandLineRunnerAsThread(CommandLineRunner):
                                                      "timeout '{}s'".format(command_subprocess.returncode,
                                                                             self.command,
                                                                             self.current_working_directory,
-                                                                            self.timeout))
-        # I don't think I really need this flag over here, as any other situation would throw an exception but, it looks
-        # good and, keep into account that whatever you do with a possible exception is independent than whatever you
-        # can express by the combination of flags '_done' and 'command_success'. This allows you to react by capturing
-        # the exception (that also provides the return code for the command) but still keep the information that the
-        # process finished Ok, but the command failed, and you also have the stdout and stderr content for further
-        # analysis
+                                                                            timeout))
+        timeout_history = config_manager.get_app_config_manager().get_timeout_history()
+        if (timeout_history is not None) and (self.get_timeout_key() is not None):
+            timeout_history.record(self.get_timeout_key(), time.monotonic() - started_at)
+
+
+class PipelineStage:
+    """
+    This class models a stage of a command line runner pipeline, i.e. a command that reads the standard output of the
+    previous stage, through its standard input, and writes, through its standard output, the standard input of the
+    next stage. Once the pipeline is done, the stage holds the outcome of its command
+    """
+
+    def __init__(self, command, use_shell=False, timeout=None):
+        self.command = command
+        self.use_shell = use_shell
+        # Wall clock limit for this stage only
+        self.timeout = timeout
+        self.return_code = None
+        self.stderr = b''
+        self.timed_out = False
+        self.stalled = False
+        self.resource_usage = None
+
+    def to_dict(self):
+        return {'command': self.command,
+                'return_code': self.return_code,
+                'timed_out': self.timed_out,
+                'stalled': self.stalled}
+
+
+class CommandLineRunnerPipeline(CommandLineRunner):
+    """
+    This class models a command line runner that executes a pipeline of commands, like a shell pipeline does, i.e. the
+    standard output of every stage is connected to the standard input of the next one through an OS pipe, and the
+    standard input of the first stage and the standard output of the last one can be files. Data flows from one stage
+    to the next within the kernel, it never goes through this process, so pipelines stream with constant memory and no
+    intermediate files.
+
+    Every stage keeps its own return code, standard error and, optionally, timeout, see 'PipelineStage', while the
+    pipeline timeout and stall detection apply to the pipeline as a whole. Results of pipelines are not cached
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._logger = config_manager \
+            .get_app_config_manager() \
+            .get_logger_for("{}.{}-{}".format(__name__, type(self).__name__, threading.current_thread().getName()))
+        self.stages = []
+        # Files for the standard input of the first stage, no standard input if not given, and the standard output of
+        # the last stage, collected as for any other command line runner, if not given
+        self.stdin_file = None
+        self.stdout_file = None
+        self.__subprocesses = []
+        self.__subprocesses_lock = threading.Lock()
+
+    def add_stage(self, command, use_shell=False, timeout=None):
+        """
+        Add a stage at the end of the pipeline
+        :param command: command, as a list of arguments, or a string
+        :param use_shell: whether to run the command through a shell
+        :param timeout: wall clock limit for this stage, no limit other than the pipeline one if not given
+        :return: the new stage
+        """
+        stage = PipelineStage(command, use_shell=use_shell, timeout=timeout)
+        self.stages.append(stage)
+        self.command = " | ".join([stage.command if isinstance(stage.command, str)
+                                   else shlex.join([str(argument) for argument in stage.command])
+                                   for stage in self.stages])
+        return stage
+
+    def get_stage_return_codes(self):
+        return [stage.return_code for stage in self.stages]
+
+    def get_result_details(self):
+        details = super().get_result_details()
+        details['stages'] = [stage.to_dict() for stage in self.stages]
+        return details
+
+    def get_timeout_key(self):
+        if self.timeout_key is not None:
+            return self.timeout_key
+        if (not self.timeout_history_by_program) or any(stage.use_shell for stage in self.stages):
+            return None
+        # Pipelines are told apart by the programs all their stages run
+        programs = [get_command_history_key(stage.command).split(':', 1)[1] for stage in self.stages]
+        return "{}:{}".format(HISTORY_KEY_COMMAND, '|'.join(programs))
+
+    def _get_output_progress(self, output_bytes):
+        progress = super()._get_output_progress(output_bytes)
+        if self.stdout_file is not None:
+            try:
+                progress += os.path.getsize(self._resolve_path(self.stdout_file))
+            except OSError:
+                pass
+        return progress
+
+    def _cancel(self):
+        with self.__subprocesses_lock:
+            for stage_subprocess in self.__subprocesses:
+                general.terminate_process_group(stage_subprocess, grace_period=self.cancel_grace_period)
+
+    @staticmethod
+    def __close(stream):
+        # Standard streams are given to subprocesses as file objects, file descriptors, or special values like
+        # 'subprocess.DEVNULL', that are negative
+        if stream is None:
+            return
+        if isinstance(stream, int):
+            if stream >= 0:
+                os.close(stream)
+        else:
+            stream.close()
+
+    def __spawn_stages(self):
+        """
+        Spawn the subprocesses for all the stages, connected through OS pipes. The parent closes its copy of every pipe
+        end once it has been given to a stage, so stages see the end of their input, or get SIGPIPE, when their
+        neighbours finish
+        :return: the list of subprocesses, one per stage
+        """
+        stage_subprocesses = []
+        stage_stdin = open(self._resolve_path(self.stdin_file), 'rb') \
+            if self.stdin_file is not None else subprocess.DEVNULL
+        try:
+            pipeline_stdout = open(self._resolve_path(self.stdout_file), 'wb') \
+                if self.stdout_file is not None else subprocess.PIPE
+        except OSError:
+            self.__close(stage_stdin)
+            raise
+        try:
+            for index, stage in enumerate(self.stages):
+                next_stage_stdin, stage_stdout = (None, pipeline_stdout) \
+                    if index == len(self.stages) - 1 else os.pipe()
+                try:
+                    # Every stage leads its own process group, so cancelling it takes down any process it spawns
+                    stage_subprocesses.append(general.spawn_subprocess(stage.command,
+                                                                       shell=stage.use_shell,
+                                                                       cwd=self.current_working_directory,
+                                                                       stdin=stage_stdin,
+                                                                       stdout=stage_stdout,
+                                                                       close_fds=self.close_fds,
+                                                                       popen_class=AccountedPopen))
+                except Exception:
+                    self.__close(next_stage_stdin)
+                    raise
+                finally:
+                    self.__close(stage_stdin)
+                    if stage_stdout is not pipeline_stdout:
+                        self.__close(stage_stdout)
+                stage_stdin = next_stage_stdin
+        except Exception:
+            for stage_subprocess in stage_subprocesses:
+                general.terminate_process_group(stage_subprocess, grace_period=0)
+                stage_subprocess.wait()
+            raise
+        finally:
+            if self.stdout_file is not None:
+                self.__close(pipeline_stdout)
+        return stage_subprocesses
+
+    def __is_stage_success(self, index):
+        """
+        Tell whether a stage succeeded, a stage killed by SIGPIPE, i.e. it kept on writing after the next stage was
+        done reading, as in 'zcat big_file.gz | head', is fine as long as every stage after it succeeded
+        :param index: stage index
+        :return: True if the stage succeeded
+        """
+        return_code = self.stages[index].return_code
+        if return_code == 0:
+            return True
+        return (return_code == -signal.SIGPIPE) \
+            and all([stage.return_code == 0 for stage in self.stages[index + 1:]])
+
+    def _run(self):
+        if not self.stages:
+            raise CommandLineRunnerPipelineException("Pipeline with NO STAGES, nothing to run")
+        self.command_return_code = 0
+        self._logger.debug("Preparing for running pipeline '{}', "
+                           "current working directory at '{}', "
+                           "#{} stages".format(self.command, self.current_working_directory, len(self.stages)))
+        started_at = time.monotonic()
+        with self.__subprocesses_lock:
+            if self._shutdown:
+                raise CommandLineRunnerPipelineException("CANCELLED before running pipeline '{}'".format(self.command))
+            try:
+                self.__subprocesses = self.__spawn_stages()
+            except (OSError, ValueError) as e:
+                raise CommandLineRunnerPipelineException("Pipeline '{}', current working directory at '{}', "
+                                                         "could NOT BE STARTED ---> {}"
+                                                         .format(self.command, self.current_working_directory, e))
+        timeout = self._get_effective_timeout()
+        stall_detector = general.StallDetector(self.stall_min_rate, self.stall_window) \
+            if self.stall_window is not None else None
+        outputs, stop_reasons = general.communicate_all_with_progress(self.__subprocesses,
+                                                                      progress=self._track_output_progress,
+                                                                      stall_detector=stall_detector,
+                                                                      timeout=timeout,
+                                                                      timeouts=[stage.timeout
+                                                                                for stage in self.stages])
+        for stage, stage_subprocess, (stage_stdout, stage_stderr), stop_reason in \
+                zip(self.stages, self.__subprocesses, outputs, stop_reasons):
+            stage.return_code = stage_subprocess.returncode
+            stage.stderr = stage_stderr
+            stage.timed_out = stop_reason is not None
+            stage.stalled = stop_reason == general.STOP_REASON_STALLED
+            stage.resource_usage = stage_subprocess.get_resource_usage()
+        self._stdout = outputs[-1][0] if outputs[-1][0] is not None else b''
+        self._stderr = b''.join([stage.stderr for stage in self.stages])
+        self._resource_usage = ResourceUsage.from_concurrent(time.monotonic() - started_at,
+                                                             [stage.resource_usage for stage in self.stages])
+        if self._shutdown:
+            raise CommandLineRunnerPipelineException("CANCELLED while running pipeline '{}', "
+                                                     "current working directory at '{}'"
+                                                     .format(self.command, self.current_working_directory))
+        failed_stages = [index for index in range(len(self.stages)) if not self.__is_stage_success(index)]
+        if failed_stages:
+            # The first stage that failed is, most likely, the one that made the following ones fail
+            self.command_return_code = self.stages[failed_stages[0]].return_code
+            self._timed_out = any([stage.timed_out for stage in self.stages])
+            self._stalled = any([stage.stalled for stage in self.stages])
+            failures = ["#{} '{}' {}".format(index,
+                                             self.stages[index].command,
+                                             'TIMED OUT' if self.stages[index].timed_out
+                                             else "Return Code '{}'".format(self.stages[index].return_code))
+                        for index in failed_stages]
+            raise CommandLineRunnerPipelineException("ERROR - Pipeline '{}', current working directory at '{}', "
+                                                     "timeout '{}s', FAILED stages {}"
+                                                     .format(self.command,
+                                                             self.current_working_directory,
+                                                             timeout,
+                                                             ", ".join(failures)))
+        self.command_success = True
+        timeout_history = config_manager.get_app_config_manager().get_timeout_history()
+        if (timeout_history is not None) and (self.get_timeout_key() is not None):
+            timeout_history.record(self.get_timeout_key(), time.monotonic() - started_at)
+
+
+class RemoteCommandLineRunner(CommandLineRunner):
+    """
+    This class models a command line runner that executes a command on a remote worker, via a coordinator, the runner
+    just waits for the result to come back, without holding an executor pool worker while the job is running
+    """
+    executor_queue = EXECUTOR_QUEUE_IO
+
+    def __init__(self, coordinator):
+        super().__init__()
+        self._logger = config_manager \
+            .get_app_config_manager() \
+            .get_logger_for("{}.{}-{}".format(__name__, type(self).__name__, threading.current_thread().getName()))
+        self.__coordinator = coordinator
+        self.__job = None
+        self.__job_lock = threading.Lock()
+
+    def _cancel(self):
+        with self.__job_lock:
+            if self.__job is not None:
+                self.__coordinator.cancel_job(self.__job)
+
+    def get_worker_id(self):
+        """
+        Get the ID of the worker that ran the command
+        :return: worker ID, or None if the command has not been run by any worker
+        """
+        if self.__job is None:
+            return None
+        return self.__job.worker_id
+
+    def _run(self):
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self._get_result_cache_key()
+            if self._restore_cached_result(cache_key):
+                self._logger.debug("Command '{}', current working directory at '{}', result RESTORED FROM CACHE"
+                                   .format(self.command, self.current_working_directory))
+                return
+        with self.__job_lock:
+            if self._shutdown:
+                raise RemoteCommandLineRunnerException("CANCELLED before running command '{}'".format(self.command))
+            self.__job = self.__coordinator.submit(self.command,
+                                                   use_shell=self.use_shell,
+                                                   current_working_directory=self.current_working_directory,
+                                                   timeout=self._get_effective_timeout())
+        self._logger.debug("Command '{}', current working directory at '{}', SUBMITTED as job '{}'"
+                           .format(self.command, self.current_working_directory, self.__job.job_id))
+        return self._wait_without_worker(self.__job.add_done_callback, lambda: self.__collect_job_result(cache_key))
+
+    def __collect_job_result(self, cache_key):
+        self._stdout = bytes(self.__job.stdout)
+        self._stderr = bytes(self.__job.stderr)
+        if self.__job.resource_usage is not None:
+            self._resource_usage = ResourceUsage(**self.__job.resource_usage)
+        self._timed_out = self.__job.timed_out
+        if self.__job.status == distributed.JOB_STATUS_CANCELLED:
+            raise RemoteCommandLineRunnerException("CANCELLED while running command '{}', "
+                                                   "current working directory at '{}'"
+                                                   .format(self.command, self.current_working_directory))
+        if self.__job.status == distributed.JOB_STATUS_FAILED:
+            raise RemoteCommandLineRunnerException("Job for command '{}' FAILED ---> {}"
+                                                   .format(self.command, self.__job.error))
+        self.command_return_code = self.__job.return_code
+        if self._timed_out:
+            raise RemoteCommandLineRunnerException("TIMEOUT '{}s' for command '{}', on worker '{}'"
+                                                   .format(self.timeout, self.command, self.__job.worker_id))
+        if self.command_return_code != 0:
+            raise RemoteCommandLineRunnerException("ERROR - Return Code '{}' for command '{}', "
+                                                   "current working directory at '{}', "
+                                                   "on worker '{}'".format(self.command_return_code,
+                                                                           self.command,
+                                                                           self.current_working_directory,
+                                                                           self.__job.worker_id))
         self.command_success = True
+        if cache_key is not None:
+            self._store_result_in_cache(cache_key)
 
 
 class CommandLineRunnerOnHpc(CommandLineRunner):
@@ -0,0 +1,239 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 18:05
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Dependency aware workflows on top of parallel runners, i.e. runners are declared together with the runners they depend
+on, and every runner is started as soon as all its dependencies have finished
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import threading
+# App imports
+import config_manager
+from toolbox import general, readers
+from .models import ParallelRunnerManagerFactory
+from .exceptions import WorkflowManagerException, NoMoreAliveRunnersException
+
+# Workflow step status
+STEP_STATUS_PENDING = 'pending'
+STEP_STATUS_RUNNING = 'running'
+STEP_STATUS_FINISHED = 'finished'
+STEP_STATUS_CACHED = 'cached'
+STEP_STATUS_FAILED = 'failed'
+STEP_STATUS_CANCELLED = 'cancelled'
+
+
+class WorkflowStep:
+    """
+    A runner within a workflow, together with its dependencies and the input files its result depends on
+    """
+
+    def __init__(self, name, runner, depends_on, input_files):
+        self.name = name
+        self.runner = runner
+        self.depends_on = list(depends_on)
+        self.input_files = list(input_files)
+        self.status = STEP_STATUS_PENDING
+        self.fingerprint = None
+
+    def is_completed(self):
+        return self.status in (STEP_STATUS_FINISHED, STEP_STATUS_CACHED)
+
+
+class FingerprintStore:
+    """
+    Persistent store of the fingerprints of successfully finished workflow steps
+    """
+
+    def __init__(self, store_file):
+        self.__store_file = store_file
+        self.__fingerprints = {}
+        self.__lock = threading.Lock()
+        if os.path.isfile(store_file):
+            self.__fingerprints = readers.load_json_file(store_file)
+
+    def get(self, step_name):
+        with self.__lock:
+            return self.__fingerprints.get(step_name)
+
+    def put(self, step_name, fingerprint):
+        """
+        Store the fingerprint for the given step, the store file is rewritten atomically
+        :param step_name: name of the workflow step
+        :param fingerprint: fingerprint of the step
+        :return: no return value
+        """
+        with self.__lock:
+            self.__fingerprints[step_name] = fingerprint
+            store_file_tmp = "{}.{}.tmp".format(self.__store_file, uuid.uuid4().hex)
+            with open(store_file_tmp, 'w') as f:
+                json.dump(self.__fingerprints, f, indent=2, sort_keys=True)
+            os.replace(store_file_tmp, self.__store_file)
+
+
+class WorkflowManager:
+    """
+    This class models a workflow of parallel runners, where runners can depend on other runners. Runners are started as
+    soon as their dependencies finish successfully, so there are no stage barriers, and runners whose dependencies fail
+    are cancelled.
+
+    If a fingerprint store file is given, steps that finished successfully in a previous run are skipped as long as
+    their fingerprint, i.e. the work they do and the state of their input files, has not changed.
+    """
+
+    def __init__(self, fingerprint_store_file=None, use_content_hash=False):
+        self._logger = config_manager \
+            .get_app_config_manager() \
+            .get_logger_for("{}.{}".format(__name__, type(self).__name__))
+        self.__parallel_runner_manager = ParallelRunnerManagerFactory.get_parallel_runner_manager()
+        self.__fingerprint_store = None
+        if fingerprint_store_file is not None:
+            self.__fingerprint_store = FingerprintStore(fingerprint_store_file)
+        self.__use_content_hash = use_content_hash
+        self.__steps = {}
+        self.__steps_by_runner = {}
+
+    def add_runner(self, name, runner, depends_on=None, input_files=None):
+        """
+        Add a runner to the workflow
+        :param name: unique name for the runner within the workflow
+        :param runner: parallel runner
+        :param depends_on: names of the runners that must finish successfully before this one can start
+        :param input_files: files the result of this runner depends on, used for skipping it if nothing changed
+        :return: no return value
+        """
+        if name in self.__steps:
+            raise WorkflowManagerException("Duplicated workflow step '{}'".format(name))
+        step = WorkflowStep(name, runner, depends_on or [], input_files or [])
+        self.__steps[name] = step
+        self.__steps_by_runner[runner] = step
+
+    def __check_dependencies(self):
+        """
+        Check that every dependency is part of the workflow, and there are no dependency cycles
+        :return: no return value
+        :except: WorkflowManagerException if the workflow is not a directed acyclic graph
+        """
+        for step in self.__steps.values():
+            missing_dependencies = [name for name in step.depends_on if name not in self.__steps]
+            if missing_dependencies:
+                raise WorkflowManagerException("Workflow step '{}' depends on UNKNOWN steps '{}'"
+                                               .format(step.name, missing_dependencies))
+        # Kahn's algorithm, if we can't sort all the steps topologically, there is a cycle
+        pending_dependencies = {step.name: len(set(step.depends_on)) for step in self.__steps.values()}
+        dependants = self.__get_dependants()
+        sorted_steps = [name for name, count in pending_dependencies.items() if count == 0]
+        for name in sorted_steps:
+            for dependant in dependants[name]:
+                pending_dependencies[dependant] -= 1
+                if pending_dependencies[dependant] == 0:
+                    sorted_steps.append(dependant)
+        if len(sorted_steps) != len(self.__steps):
+            raise WorkflowManagerException("Workflow has dependency CYCLES among steps '{}'"
+                                           .format(sorted(set(self.__steps) - set(sorted_steps))))
+
+    def __get_dependants(self):
+        dependants = {name: set() for name in self.__steps}
+        for step in self.__steps.values():
+            for name in step.depends_on:
+                dependants[name].add(step.name)
+        return dependants
+
+    def __compute_fingerprint(self, step):
+        # The fingerprint covers the work done by the step, its input files and the fingerprints of its dependencies,
+        # so a change propagates downstream
+        fingerprint_data = [step.runner.get_fingerprint_data(),
+                            general.compute_files_fingerprint(step.input_files,
+                                                              use_content_hash=self.__use_content_hash),
+                            [self.__steps[name].fingerprint for name in sorted(step.depends_on)]]
+        return hashlib.sha256(json.dumps(fingerprint_data, sort_keys=True).encode('utf8')).hexdigest()
+
+    def __schedule_ready_steps(self):
+        """
+        Start every pending step whose dependencies are all completed, cancel those with failed dependencies, and skip
+        those whose fingerprint matches a previous successful run
+        :return: number of steps started
+        """
+        steps_started = 0
+        progress = True
+        while progress:
+            progress = False
+            for step in self.__steps.values():
+                if step.status != STEP_STATUS_PENDING:
+                    continue
+                dependencies = [self.__steps[name] for name in step.depends_on]
+                if any([dependency.status in (STEP_STATUS_FAILED, STEP_STATUS_CANCELLED)
+                        for dependency in dependencies]):
+                    self._logger.warning("Workflow step '{}' CANCELLED, because some of its dependencies failed"
+                                         .format(step.name))
+                    step.status = STEP_STATUS_CANCELLED
+                    progress = True
+                    continue
+                if not all([dependency.is_completed() for dependency in dependencies]):
+                    continue
+                step.fingerprint = self.__compute_fingerprint(step)
+                if (self.__fingerprint_store is not None) \
+                        and (self.__fingerprint_store.get(step.name) == step.fingerprint):
+                    self._logger.info("Workflow step '{}' SKIPPED, its fingerprint has not changed".format(step.name))
+                    step.status = STEP_STATUS_CACHED
+                    # Dependants of this step may be ready now
+                    progress = True
+                    continue
+                self._logger.debug("Workflow step '{}' READY, starting it".format(step.name))
+                step.status = STEP_STATUS_RUNNING
+                self.__parallel_runner_manager.add_runner(step.runner)
+                steps_started += 1
+        if steps_started:
+            self.__parallel_runner_manager.start_runners()
+        return steps_started
+
+    def run(self):
+        """
+        Run the workflow, returning when all its steps are over
+        :return: True if all the steps completed successfully, False otherwise
+        """
+        self.__check_dependencies()
+        self._logger.debug("Running workflow with #{} steps".format(len(self.__steps)))
+        self.__schedule_ready_steps()
+        while True:
+            try:
+                runner = self.__parallel_runner_manager.get_next_finished_runner()
+            except NoMoreAliveRunnersException:
+                break
+            step = self.__steps_by_runner[runner]
+            if runner.is_error():
+                self._logger.error("Workflow step '{}' FAILED".format(step.name))
+                step.status = STEP_STATUS_FAILED
+            else:
+                self._logger.debug("Workflow step '{}' FINISHED".format(step.name))
+                step.status = STEP_STATUS_FINISHED
+                if self.__fingerprint_store is not None:
+                    self.__fingerprint_store.put(step.name, step.fingerprint)
+            self.__schedule_ready_steps()
+        return self.is_success()
+
+    def is_success(self):
+        return all([step.is_completed() for step in self.__steps.values()])
+
+    def get_step_status(self, name):
+        return self.__steps[name].status
+
+    def get_steps_status(self):
+        """
+        Get the status of every step in the workflow
+        :return: a dictionary step name -> status
+        """
+        return {name: step.status for name, step in self.__steps.items()}
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of an application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,38 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 16:02
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Exceptions related to the session manager
+"""
+
+from exceptions import AppException
+
+
+class SessionManagerException(AppException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+class SessionArchiveException(SessionManagerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+class ResultsStoreException(SessionManagerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+class StatusServerException(SessionManagerException):
+    def __init__(self, value):
+        super().__init__(value)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
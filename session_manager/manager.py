@@ -0,0 +1,350 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 16:05
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Session lifecycle management, i.e. unique session IDs, retention policies for the session working directories in the
+'run' folder, and a background compactor that archives old sessions
+"""
+
+import os
+import time
+import uuid
+import fcntl
+import shutil
+import socket
+import tarfile
+import threading
+# App imports
+from toolbox import general
+from .exceptions import SessionManagerException, SessionArchiveException
+
+# Every session working directory name ends with this suffix
+SESSION_SUFFIX = '-session'
+# Name of the folder, within the 'run' folder, where old sessions are archived
+ARCHIVE_FOLDER_NAME = 'archive'
+ARCHIVE_EXTENSION = '.tar.gz'
+# Lock file within every session working directory, held by the process running the session for as long as it runs
+SESSION_LOCK_FILE_NAME = '.session.lock'
+# Half written archives, and sessions moved aside for removal, left behind by interrupted compactions, are removed once
+# they have not been modified for this long
+_STALE_LEFTOVER_AGE_SECONDS = 3600
+
+
+def generate_session_id():
+    """
+    Build a unique session ID, it keeps the timestamp prefix, so session IDs still sort chronologically, but sessions
+    started within the same second will not collide
+    :return: a new session ID
+    """
+    return "{}-{}{}".format(time.strftime('%Y.%m.%d_%H.%M.%S'), uuid.uuid4().hex[:8], SESSION_SUFFIX)
+
+
+def get_folder_size(folder):
+    """
+    Compute the size, in bytes, of all the files within the given folder tree, symlinks are not followed
+    :param folder: path to the folder
+    :return: size in bytes
+    """
+    size = 0
+    folders_to_visit = [folder]
+    while folders_to_visit:
+        try:
+            with os.scandir(folders_to_visit.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        folders_to_visit.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        size += entry.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            # The folder may be going away while we look at it
+            pass
+    return size
+
+
+def is_session_in_use(session_path):
+    """
+    Tell whether the given session is still running, i.e. some process, on this or any other node sharing the 'run'
+    folder, holds its lock file. Sessions without a lock file are not in use
+    :param session_path: path to the session working directory
+    :return: True if the session is in use
+    """
+    try:
+        lock_file = open(os.path.join(session_path, SESSION_LOCK_FILE_NAME))
+    except FileNotFoundError:
+        return False
+    with lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_SH | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return False
+
+
+class Session:
+    """
+    A session working directory found in the 'run' folder
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.session_id = os.path.basename(path)
+        self.mtime = os.stat(path).st_mtime
+        self.__size = None
+
+    def get_size(self):
+        # Computing the size means walking the whole session tree, so it is done only when needed
+        if self.__size is None:
+            self.__size = get_folder_size(self.path)
+        return self.__size
+
+
+class SessionRetentionPolicy:
+    """
+    This class models the retention policy for session working directories. Any of the limits can be left out by
+    setting it to 'None'
+    """
+
+    def __init__(self, max_age_days=None, max_count=None, max_total_size_mb=None):
+        self.max_age_days = max_age_days
+        self.max_count = max_count
+        self.max_total_size_mb = max_total_size_mb
+
+    @staticmethod
+    def from_config(retention_config):
+        """
+        Build a retention policy from its configuration object, e.g.
+            {"max_age_days": 30, "max_count": 50, "max_total_size_mb": 10240}
+        :param retention_config: configuration object for the retention policy
+        :return: a retention policy
+        """
+        return SessionRetentionPolicy(max_age_days=retention_config.get('max_age_days'),
+                                      max_count=retention_config.get('max_count'),
+                                      max_total_size_mb=retention_config.get('max_total_size_mb'))
+
+    def get_expired_sessions(self, sessions, now=None):
+        """
+        Given a list of sessions, select those that are not within this retention policy
+        :param sessions: list of sessions to check
+        :param now: reference timestamp for computing the age of the sessions, current time by default
+        :return: list of expired sessions, oldest first
+        """
+        if now is None:
+            now = time.time()
+        sessions = sorted(sessions, key=lambda session: session.mtime, reverse=True)
+        expired = []
+        retained_size = 0
+        for index, session in enumerate(sessions):
+            if (self.max_age_days is not None) and ((now - session.mtime) > (self.max_age_days * 86400)):
+                expired.append(session)
+            elif (self.max_count is not None) and (index >= self.max_count):
+                expired.append(session)
+            elif self.max_total_size_mb is not None:
+                retained_size += session.get_size()
+                if retained_size > (self.max_total_size_mb * 1024 * 1024):
+                    expired.append(session)
+        expired.reverse()
+        return expired
+
+
+class SessionManager:
+    """
+    This class manages the session working directories living in the 'run' folder, applying a retention policy on
+    them, and archiving the expired ones into compressed tarballs
+    """
+
+    def __init__(self, folder_run, current_session_id, retention_policy, logger, archive=True):
+        self.__folder_run = folder_run
+        self.__current_session_id = current_session_id
+        self.__retention_policy = retention_policy
+        self.__logger = logger
+        self.__archive = archive
+        self.__compactor = None
+        self.__session_lock_file = None
+
+    def get_folder_run(self):
+        return self.__folder_run
+
+    def get_folder_archive(self):
+        return os.path.join(self.get_folder_run(), ARCHIVE_FOLDER_NAME)
+
+    def get_retention_policy(self):
+        return self.__retention_policy
+
+    def is_archive(self):
+        return self.__archive
+
+    def lock_current_session(self):
+        """
+        Hold the lock file of the current session, for as long as this process runs, so no compactor, of this or any
+        other process, ever removes it while it is in use
+        :return: no return value
+        """
+        if self.__session_lock_file is not None:
+            return
+        lock_file = open(os.path.join(self.get_folder_run(), self.__current_session_id, SESSION_LOCK_FILE_NAME), 'w')
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        lock_file.write("{} {}\n".format(socket.gethostname(), os.getpid()))
+        lock_file.flush()
+        self.__session_lock_file = lock_file
+
+    def list_sessions(self):
+        """
+        List the sessions in the 'run' folder, the current session is never part of the list
+        :return: a list of sessions
+        """
+        sessions = []
+        with os.scandir(self.get_folder_run()) as entries:
+            for entry in entries:
+                if entry.name.endswith(SESSION_SUFFIX) \
+                        and (entry.name != self.__current_session_id) \
+                        and entry.is_dir(follow_symlinks=False):
+                    try:
+                        sessions.append(Session(entry.path))
+                    except FileNotFoundError:
+                        pass
+        return sessions
+
+    def archive_session(self, session):
+        """
+        Archive the given session into a compressed tarball in the archive folder, the tarball is written under a
+        temporary name first, so a half written archive is never mistaken for a complete one
+        :param session: session to archive
+        :return: path to the archive
+        :except: SessionArchiveException if the session could not be archived
+        """
+        archive_path = os.path.join(self.get_folder_archive(), session.session_id + ARCHIVE_EXTENSION)
+        archive_path_tmp = "{}.{}.tmp".format(archive_path, uuid.uuid4().hex)
+        try:
+            general.check_create_folders([self.get_folder_archive()])
+            # WARNING! - MAGIC NUMBER AHEAD!!! - Compression level trading compression ratio for speed
+            # The tarball is compressed on every core, as a multi-member gzip file
+            with open(archive_path_tmp, 'wb') as archive_file, \
+                    general.ParallelGzipWriter(archive_file, compression_level=6) as compressed_archive_file, \
+                    tarfile.open(fileobj=compressed_archive_file, mode='w|') as tar:
+                tar.add(session.path, arcname=session.session_id)
+            os.replace(archive_path_tmp, archive_path)
+        except Exception as e:
+            if os.path.exists(archive_path_tmp):
+                os.remove(archive_path_tmp)
+            raise SessionArchiveException("ERROR archiving session '{}' ---> {}".format(session.path, e)) from e
+        return archive_path
+
+    def remove_stale_leftovers(self, max_age=_STALE_LEFTOVER_AGE_SECONDS, now=None):
+        """
+        Remove what interrupted compactions left behind, i.e. half written archives in the archive folder, and session
+        folders moved aside, but not deleted, in the 'run' folder. Only leftovers that have not been modified for
+        'max_age' seconds are removed, so those of a compaction in progress are left alone
+        :param max_age: seconds since the last modification of a leftover for it to be removed
+        :param now: reference timestamp, current time by default
+        :return: list of the paths that have been removed
+        """
+        if now is None:
+            now = time.time()
+        leftovers = []
+        for folder, is_leftover in ((self.get_folder_archive(), lambda name: name.endswith('.tmp')),
+                                    (self.get_folder_run(), lambda name: name.startswith('.')
+                                     and name.endswith('.trash')
+                                     and (SESSION_SUFFIX + '.') in name)):
+            try:
+                with os.scandir(folder) as entries:
+                    leftovers.extend([entry for entry in entries if is_leftover(entry.name)])
+            except FileNotFoundError:
+                pass
+        removed = []
+        for leftover in leftovers:
+            try:
+                if (now - leftover.stat(follow_symlinks=False).st_mtime) < max_age:
+                    continue
+                if leftover.is_dir(follow_symlinks=False):
+                    shutil.rmtree(leftover.path)
+                else:
+                    os.remove(leftover.path)
+                removed.append(leftover.path)
+            except OSError as e:
+                self.__logger.warning("Compaction leftover '{}' could NOT be removed ---> {}".format(leftover.path, e))
+        return removed
+
+    def collect_garbage(self):
+        """
+        Apply the retention policy on the sessions in the 'run' folder, archiving (if enabled) and removing those that
+        have expired, and are no longer in use, and remove the leftovers of interrupted compactions
+        :return: list of the session IDs that have been removed
+        """
+        for leftover in self.remove_stale_leftovers():
+            self.__logger.info("Compaction leftover '{}' removed".format(leftover))
+        expired_sessions = self.get_retention_policy().get_expired_sessions(self.list_sessions())
+        self.__logger.debug("Session garbage collection, #{} expired sessions".format(len(expired_sessions)))
+        removed_sessions = []
+        for session in expired_sessions:
+            if is_session_in_use(session.path):
+                # Sessions still running, e.g. in other processes sharing the 'run' folder, are never removed
+                self.__logger.debug("Session '{}' has expired, but it is still in use".format(session.session_id))
+                continue
+            if self.is_archive():
+                try:
+                    archive_path = self.archive_session(session)
+                    self.__logger.info("Session '{}' archived at '{}'".format(session.session_id, archive_path))
+                except SessionArchiveException as e:
+                    # Never remove a session we could not archive
+                    self.__logger.error(e.value)
+                    continue
+            folders_with_error = general.remove_folders_async([session.path])
+            if folders_with_error:
+                self.__logger.error("Session '{}' could not be removed, '{}'"
+                                    .format(session.session_id, folders_with_error))
+            else:
+                removed_sessions.append(session.session_id)
+        return removed_sessions
+
+    def start_compactor(self, interval):
+        """
+        Start the background compactor, that will collect garbage on the sessions every 'interval' seconds
+        :param interval: seconds between garbage collection rounds
+        :return: the compactor
+        """
+        if self.__compactor is not None:
+            raise SessionManagerException("The session compactor is already running")
+        self.__compactor = SessionCompactor(self, interval, self.__logger)
+        self.__compactor.start()
+        return self.__compactor
+
+    def stop_compactor(self):
+        if self.__compactor is not None:
+            self.__compactor.stop()
+            self.__compactor = None
+
+
+class SessionCompactor(threading.Thread):
+    """
+    Background thread that periodically runs the garbage collection on the sessions of a session manager
+    """
+
+    def __init__(self, session_manager, interval, logger):
+        super().__init__(name='SessionCompactor', daemon=True)
+        self.__session_manager = session_manager
+        self.__interval = interval
+        self.__logger = logger
+        self.__stop_event = threading.Event()
+
+    def run(self):
+        while not self.__stop_event.is_set():
+            try:
+                self.__session_manager.collect_garbage()
+            except Exception as e:
+                # This is a background thread, it must keep going whatever happens in a garbage collection round
+                self.__logger.error("Session garbage collection round FAILED ---> {}".format(e))
+            self.__stop_event.wait(self.__interval)
+
+    def stop(self):
+        self.__stop_event.set()
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
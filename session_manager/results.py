@@ -0,0 +1,282 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 06:40
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Session results store, i.e. an SQLite database, in the session working directory, with one row per finished parallel
+runner or download, indexed by status, duration, name (command or URL) and error type, so finding what failed, or what
+was slow, in batches of thousands of jobs, doesn't mean going through the logs.
+
+Results are written by a background thread, in batched transactions, so reporting a result never waits on the disk.
+"""
+
+import json
+import time
+import queue
+import sqlite3
+import threading
+# App imports
+from .exceptions import ResultsStoreException
+
+# Subsystems reporting results
+SUBSYSTEM_RUNNER = 'runner'
+SUBSYSTEM_DOWNLOAD = 'download'
+# Result status
+RESULT_STATUS_SUCCESS = 'success'
+RESULT_STATUS_ERROR = 'error'
+# Name of the results store database file, within the session working directory
+RESULTS_STORE_FILE_NAME = 'results.sqlite'
+# Columns results can be sorted by
+_ORDER_BY_COLUMNS = ('duration', 'finished_at', 'started_at', 'name', 'id')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    subsystem TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error_type TEXT,
+    error_message TEXT,
+    duration REAL,
+    started_at REAL,
+    finished_at REAL,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS results_status ON results (subsystem, status);
+CREATE INDEX IF NOT EXISTS results_duration ON results (duration);
+CREATE INDEX IF NOT EXISTS results_name ON results (name);
+CREATE INDEX IF NOT EXISTS results_error_type ON results (error_type);
+"""
+_INSERT = "INSERT INTO results (subsystem, name, status, error_type, error_message, duration, started_at, " \
+          "finished_at, details) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+class Result:
+    """
+    A finished runner or download
+    """
+
+    def __init__(self,
+                 subsystem,
+                 name,
+                 success,
+                 error_type=None,
+                 error_message=None,
+                 duration=None,
+                 started_at=None,
+                 finished_at=None,
+                 details=None):
+        self.subsystem = subsystem
+        self.name = name
+        self.status = RESULT_STATUS_SUCCESS if success else RESULT_STATUS_ERROR
+        self.error_type = error_type
+        self.error_message = error_message
+        self.duration = duration
+        self.started_at = started_at
+        self.finished_at = finished_at if finished_at is not None else time.time()
+        self.details = details
+
+    def to_row(self):
+        return (self.subsystem, self.name, self.status, self.error_type, self.error_message, self.duration,
+                self.started_at, self.finished_at, json.dumps(self.details) if self.details is not None else None)
+
+
+class ResultsStore:
+    """
+    This class models a results store, results are queued by 'add', and written by a background thread, in
+    transactions of up to 'batch_size' results, or every 'flush_interval' seconds, whatever comes first. Queries run on
+    their own connections, so they can be run while results are being written
+    """
+
+    def __init__(self, db_file, batch_size=500, flush_interval=1):
+        self.__db_file = db_file
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+        self.__queue = queue.Queue()
+        self.__writer_thread = None
+        self.__writer_error = None
+        self.__lock = threading.Lock()
+        self.__closed = False
+        connection = self.__connect()
+        try:
+            connection.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            raise ResultsStoreException("Results store '{}' could NOT be initialized ---> {}"
+                                        .format(self.__db_file, e)) from e
+        finally:
+            connection.close()
+
+    def __connect(self):
+        try:
+            connection = sqlite3.connect(self.__db_file, timeout=30)
+            # Readers don't block the writer, and the other way around
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.row_factory = sqlite3.Row
+            return connection
+        except sqlite3.Error as e:
+            raise ResultsStoreException("Results store '{}' could NOT be opened ---> {}"
+                                        .format(self.__db_file, e)) from e
+
+    def get_db_file(self):
+        return self.__db_file
+
+    def __start_writer(self):
+        with self.__lock:
+            if self.__closed:
+                raise ResultsStoreException("Results store '{}' is CLOSED".format(self.__db_file))
+            if self.__writer_thread is None:
+                self.__writer_thread = threading.Thread(target=self.__write_results,
+                                                        name='ResultsStoreWriter',
+                                                        daemon=True)
+                self.__writer_thread.start()
+
+    def __write_results(self):
+        connection = self.__connect()
+        try:
+            while True:
+                batch = [self.__queue.get()]
+                deadline = time.monotonic() + self.__flush_interval
+                while (batch[-1] is not None) and (len(batch) < self.__batch_size):
+                    try:
+                        batch.append(self.__queue.get(timeout=max(0, deadline - time.monotonic())))
+                    except queue.Empty:
+                        break
+                try:
+                    rows = []
+                    for result in batch:
+                        if result is None:
+                            continue
+                        try:
+                            rows.append(result.to_row())
+                        except (TypeError, ValueError) as e:
+                            # Results with details that can't be serialized are left out, the rest are still written
+                            self.__writer_error = e
+                    if rows:
+                        with connection:
+                            connection.executemany(_INSERT, rows)
+                except Exception as e:
+                    # The writer must keep going, otherwise anyone flushing the store would wait forever
+                    self.__writer_error = e
+                finally:
+                    for _ in batch:
+                        self.__queue.task_done()
+                if batch[-1] is None:
+                    return
+        finally:
+            connection.close()
+
+    def add(self, result):
+        """
+        Add a result to the store, it is written in the background
+        :param result: result
+        :return: no return value
+        """
+        self.__start_writer()
+        self.__queue.put(result)
+
+    def flush(self):
+        """
+        Wait for every result added so far to be written
+        :return: no return value
+        :except: ResultsStoreException if any result could not be written
+        """
+        self.__queue.join()
+        if self.__writer_error is not None:
+            error, self.__writer_error = self.__writer_error, None
+            raise ResultsStoreException("Results could NOT be written to '{}' ---> {}".format(self.__db_file, error))
+
+    def close(self):
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+            writer_thread = self.__writer_thread
+        if writer_thread is not None:
+            self.__queue.put(None)
+            writer_thread.join()
+
+    def query(self,
+              subsystem=None,
+              status=None,
+              error_type=None,
+              name_contains=None,
+              min_duration=None,
+              order_by='id',
+              descending=False,
+              limit=None):
+        """
+        Query the results in the store, all the filters are optional
+        :param subsystem: SUBSYSTEM_RUNNER or SUBSYSTEM_DOWNLOAD
+        :param status: RESULT_STATUS_SUCCESS or RESULT_STATUS_ERROR
+        :param error_type: error type
+        :param name_contains: text the name, i.e. command or URL, must contain
+        :param min_duration: minimum duration, in seconds
+        :param order_by: one of 'duration', 'finished_at', 'started_at', 'name' or 'id'
+        :param descending: whether to sort in descending order
+        :param limit: maximum number of results
+        :return: list of dictionaries, one per result
+        :except: ResultsStoreException if the query is not valid
+        """
+        if order_by not in _ORDER_BY_COLUMNS:
+            raise ResultsStoreException("INVALID order by '{}', valid columns are '{}'"
+                                        .format(order_by, _ORDER_BY_COLUMNS))
+        conditions = []
+        parameters = []
+        for column, value in (('subsystem', subsystem), ('status', status), ('error_type', error_type)):
+            if value is not None:
+                conditions.append("{} = ?".format(column))
+                parameters.append(value)
+        if name_contains is not None:
+            conditions.append("instr(name, ?) > 0")
+            parameters.append(name_contains)
+        if min_duration is not None:
+            conditions.append("duration >= ?")
+            parameters.append(min_duration)
+        sql = "SELECT * FROM results"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY {} {}".format(order_by, 'DESC' if descending else 'ASC')
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(int(limit))
+        return self.__fetch(sql, parameters)
+
+    def get_slowest(self, limit=10, subsystem=None):
+        return self.query(subsystem=subsystem, order_by='duration', descending=True, limit=limit)
+
+    def get_failed(self, subsystem=None, limit=None):
+        return self.query(subsystem=subsystem, status=RESULT_STATUS_ERROR, limit=limit)
+
+    def get_summary(self):
+        """
+        Get the number of results, and their total duration, by subsystem, status and error type
+        :return: list of dictionaries with 'subsystem', 'status', 'error_type', 'count' and 'total_duration'
+        """
+        return self.__fetch("SELECT subsystem, status, error_type, COUNT(*) AS count, SUM(duration) AS total_duration "
+                            "FROM results "
+                            "GROUP BY subsystem, status, error_type "
+                            "ORDER BY subsystem, status, error_type",
+                            [])
+
+    def __fetch(self, sql, parameters):
+        connection = self.__connect()
+        try:
+            rows = connection.execute(sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            raise ResultsStoreException("ERROR querying results store '{}' ---> {}".format(self.__db_file, e)) from e
+        finally:
+            connection.close()
+        results = [dict(row) for row in rows]
+        for result in results:
+            if result.get('details') is not None:
+                result['details'] = json.loads(result['details'])
+        return results
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
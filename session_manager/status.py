@@ -0,0 +1,200 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 10:40
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Live session status, i.e. a local HTTP endpoint, on TCP or on a Unix socket, serving JSON snapshots of the parallel
+runners and downloads in flight, and of the executor pools, so long batches can be watched, and tuned, while they run.
+
+Parallel runner managers and download managers register themselves as status sources when they are created, and they
+are asked for their status when a snapshot is requested, they take no locks for it, so watching a session never holds
+up its work. The endpoint serves
+
+    /status             the whole snapshot
+    /status/<section>   one of its sections, i.e. 'runners', 'downloads' or 'executor'
+"""
+
+import os
+import json
+import time
+import weakref
+import threading
+import http.server
+import socketserver
+# App imports
+import config_manager
+from executor.pool import get_executor_metrics
+from .exceptions import StatusServerException
+
+# Kinds of status sources, they are also sections of the status snapshots
+STATUS_SOURCE_RUNNERS = 'runners'
+STATUS_SOURCE_DOWNLOADS = 'downloads'
+STATUS_SECTION_EXECUTOR = 'executor'
+STATUS_SECTIONS = (STATUS_SOURCE_RUNNERS, STATUS_SOURCE_DOWNLOADS, STATUS_SECTION_EXECUTOR)
+# Addresses starting with this prefix are Unix socket paths, otherwise they are 'host:port'
+UNIX_SOCKET_ADDRESS_PREFIX = 'unix:'
+STATUS_PATH = '/status'
+
+# Status sources, by kind, they are not kept alive by the registry
+_status_sources = {STATUS_SOURCE_RUNNERS: weakref.WeakSet(), STATUS_SOURCE_DOWNLOADS: weakref.WeakSet()}
+_status_sources_lock = threading.Lock()
+_started_at = time.time()
+# Process wide status server, started on demand from the application configuration
+_status_server = None
+_status_server_lock = threading.Lock()
+
+
+def register_status_source(kind, source):
+    """
+    Register a status source, it has to provide a 'get_status' method giving back a JSON serializable dictionary
+    :param kind: one of 'STATUS_SOURCE_RUNNERS' and 'STATUS_SOURCE_DOWNLOADS'
+    :param source: status source
+    :return: no return value
+    """
+    with _status_sources_lock:
+        _status_sources[kind].add(source)
+
+
+def get_status_snapshot():
+    """
+    Get a snapshot of the session status
+    :return: a dictionary with 'session_id', 'timestamp', 'uptime_seconds', the status of every runner and download
+    manager alive, in 'runners' and 'downloads', and the metrics of the executor pools, in 'executor'
+    """
+    with _status_sources_lock:
+        sources = {kind: list(kind_sources) for kind, kind_sources in _status_sources.items()}
+    now = time.time()
+    snapshot = {'session_id': config_manager.get_app_config_manager().get_session_id(),
+                'timestamp': now,
+                'uptime_seconds': now - _started_at,
+                STATUS_SECTION_EXECUTOR: get_executor_metrics()}
+    snapshot.update({kind: [source.get_status() for source in kind_sources]
+                     for kind, kind_sources in sources.items()})
+    return snapshot
+
+
+def get_status_server():
+    """
+    Get the process wide status server, it is started the first time it is requested, if an address to serve on has
+    been configured for the application
+    :return: the status server, or None if no status address has been configured
+    """
+    global _status_server
+    with _status_server_lock:
+        if _status_server is None:
+            status_server_config = config_manager.get_app_config_manager().get_status_server_config()
+            if status_server_config.get('address'):
+                _status_server = StatusServer(status_server_config['address'])
+                _status_server.start()
+        return _status_server
+
+
+class _StatusRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        section = path[len(STATUS_PATH) + 1:] if path.startswith(STATUS_PATH + '/') else None
+        body = None
+        if path == STATUS_PATH:
+            body = get_status_snapshot()
+        elif section in STATUS_SECTIONS:
+            body = get_status_snapshot()[section]
+        if body is None:
+            self.send_error(404, "Unknown status section '{}'".format(self.path))
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        # Unix socket clients have no address
+        self.server.status_server._logger.debug("Status request - {}".format(format % args))
+
+
+class _UnixStatusHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class StatusServer:
+    """
+    This class models the status server, it serves status snapshots, over HTTP, in a background thread
+    """
+
+    def __init__(self, address='127.0.0.1:0'):
+        """
+        :param address: 'host:port' to listen on, port '0' picks a free port, or 'unix:<path>' for a Unix socket
+        :except: StatusServerException if the address is not valid
+        """
+        self._logger = config_manager \
+            .get_app_config_manager() \
+            .get_logger_for("{}.{}".format(__name__, type(self).__name__))
+        self.__unix_socket_path = None
+        self.__socket_address = None
+        if address.startswith(UNIX_SOCKET_ADDRESS_PREFIX):
+            self.__unix_socket_path = address[len(UNIX_SOCKET_ADDRESS_PREFIX):]
+        else:
+            host, _, port = address.rpartition(':')
+            try:
+                self.__socket_address = (host or '127.0.0.1', int(port))
+            except ValueError as e:
+                raise StatusServerException("INVALID status address '{}', expected 'host:port' or '{}<path>'"
+                                            .format(address, UNIX_SOCKET_ADDRESS_PREFIX)) from e
+        self.__server = None
+        self.__server_thread = None
+
+    def start(self):
+        """
+        Start serving status snapshots
+        :return: no return value
+        :except: StatusServerException if the server could not bind to its address
+        """
+        try:
+            if self.__unix_socket_path is not None:
+                # A socket left behind by a previous session would make binding fail
+                if os.path.exists(self.__unix_socket_path):
+                    os.remove(self.__unix_socket_path)
+                self.__server = _UnixStatusHTTPServer(self.__unix_socket_path, _StatusRequestHandler)
+            else:
+                self.__server = http.server.ThreadingHTTPServer(self.__socket_address, _StatusRequestHandler)
+        except OSError as e:
+            raise StatusServerException("Status server could NOT listen on '{}' ---> {}"
+                                        .format(self.get_address(), e)) from e
+        self.__server.status_server = self
+        self.__server_thread = threading.Thread(target=self.__server.serve_forever, name='StatusServer', daemon=True)
+        self.__server_thread.start()
+        self._logger.info("Session status served on '{}'".format(self.get_address()))
+
+    def stop(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+            if self.__unix_socket_path is not None:
+                try:
+                    os.remove(self.__unix_socket_path)
+                except OSError:
+                    pass
+
+    def get_address(self):
+        """
+        Get the address clients should use, i.e. with the actual port if the server was bound to port 0
+        :return: 'host:port', or 'unix:<path>'
+        """
+        if self.__unix_socket_path is not None:
+            return "{}{}".format(UNIX_SOCKET_ADDRESS_PREFIX, self.__unix_socket_path)
+        host, port = self.__server.server_address[:2] if self.__server is not None else self.__socket_address
+        return "{}:{}".format(host, port)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
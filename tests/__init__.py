@@ -0,0 +1,38 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 17:05
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests, and helpers shared by them
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import mock
+# App imports
+import config_manager
+from toolbox.timeouts import TimeoutHistory, TIMEOUT_HISTORY_FILE_NAME
+
+
+def use_temporary_timeout_history(test_case):
+    """
+    Point the application timeout history at a temporary file, for the duration of the given test, so the history
+    built up by tests never mixes with the one of the application, in its 'run' folder
+    :param test_case: test case, usually from its 'setUp'
+    :return: the temporary timeout history
+    """
+    folder = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, folder, ignore_errors=True)
+    timeout_history = TimeoutHistory(os.path.join(folder, TIMEOUT_HISTORY_FILE_NAME))
+    patch = mock.patch.object(config_manager.get_app_config_manager(),
+                              'get_timeout_history',
+                              return_value=timeout_history)
+    patch.start()
+    test_case.addCleanup(patch.stop)
+    return timeout_history
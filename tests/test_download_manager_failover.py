@@ -0,0 +1,154 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 09:00
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for downloads from equivalent mirrors, with failover and hedging
+"""
+
+import os
+import time
+import shutil
+import socket
+import tempfile
+import unittest
+import functools
+import threading
+import http.server
+# App imports
+from tests import use_temporary_timeout_history
+import config_manager
+from download_manager.manager import Manager as DownloadManager
+from download_manager.failover import FailoverAgent, MirrorRanker, get_mirror_key
+
+
+class _SlowRequestHandler(http.server.BaseHTTPRequestHandler):
+    data = b''
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.data)))
+        self.end_headers()
+        try:
+            for index in range(0, len(self.data), 1000):
+                self.wfile.write(self.data[index:index + 1000])
+                time.sleep(0.1)
+        except OSError:
+            # The client went away, it got the file from somewhere else
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _get_unused_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class TestMirrorRanker(unittest.TestCase):
+    def test_ranking(self):
+        ranker = MirrorRanker(ewma_alpha=0.5)
+        urls = ['http://a.example.org/f.bin', 'http://b.example.org/pub/f.bin', 'http://c.example.org/f.bin']
+        # Nothing known, the given order
+        self.assertEqual(ranker.rank(urls), urls)
+        ranker.record_success('http://a.example.org/other.bin', 1000, 1)
+        ranker.record_success('http://b.example.org/pub/other.bin', 4000, 1)
+        # Mirrors not tried yet first, then the fastest
+        self.assertEqual(ranker.rank(urls), [urls[2], urls[1], urls[0]])
+        ranker.record_failure(urls[2])
+        ranker.record_failure(urls[1])
+        self.assertEqual(ranker.rank(urls), [urls[1], urls[0], urls[2]])
+        stats = ranker.get_stats()
+        self.assertEqual(stats[get_mirror_key(urls[1])], {'throughput_ewma': 2000, 'transfers': 2, 'failures': 1})
+
+    def test_throughput_percentile(self):
+        ranker = MirrorRanker()
+        for throughput in range(1, 5):
+            ranker.record_success('http://a.example.org/f.bin', throughput, 1)
+        self.assertIsNone(ranker.get_throughput_percentile(5, min_samples=5))
+        ranker.record_success('http://a.example.org/f.bin', 5, 1)
+        self.assertEqual(ranker.get_throughput_percentile(5, min_samples=5), 1)
+        self.assertEqual(ranker.get_throughput_percentile(50, min_samples=5), 3)
+
+
+class TestFailoverAgent(unittest.TestCase):
+    def setUp(self):
+        use_temporary_timeout_history(self)
+        self.__mirror_folder = tempfile.mkdtemp()
+        self.__folder = tempfile.mkdtemp()
+        self.__data = os.urandom(100000)
+        with open(os.path.join(self.__mirror_folder, 'data.bin'), 'wb') as f:
+            f.write(self.__data)
+        handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=self.__mirror_folder)
+        slow_handler = type('SlowRequestHandler', (_SlowRequestHandler,), {'data': self.__data})
+        self.__servers = [http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler),
+                          http.server.ThreadingHTTPServer(('127.0.0.1', 0), slow_handler)]
+        for server in self.__servers:
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.__fast_url = "http://127.0.0.1:{}/data.bin".format(self.__servers[0].server_address[1])
+        self.__slow_url = "http://127.0.0.1:{}/data.bin".format(self.__servers[1].server_address[1])
+        self.__down_url = "http://127.0.0.1:{}/data.bin".format(_get_unused_port())
+
+    def tearDown(self):
+        for server in self.__servers:
+            server.shutdown()
+            server.server_close()
+        for folder in (self.__mirror_folder, self.__folder):
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def __assert_downloaded(self):
+        self.assertEqual(os.listdir(self.__folder), ['data.bin'])
+        with open(os.path.join(self.__folder, 'data.bin'), 'rb') as f:
+            self.assertEqual(f.read(), self.__data)
+
+    def test_failover(self):
+        ranker = MirrorRanker()
+        download_manager = DownloadManager([],
+                                           self.__folder,
+                                           config_manager.get_app_config_manager().get_logger_for(__name__),
+                                           download_attempts=2,
+                                           mirror_ranker=ranker)
+        download_manager.start_mirrored_downloads([[self.__down_url, self.__fast_url]], hedge=False)
+        download_manager.wait_all()
+        self.assertTrue(download_manager.is_success())
+        self.__assert_downloaded()
+        stats = ranker.get_stats()
+        self.assertEqual(stats[get_mirror_key(self.__down_url)]['failures'], 1)
+        self.assertEqual(stats[get_mirror_key(self.__fast_url)]['failures'], 0)
+        # The broken mirror goes to the back of the queue
+        self.assertEqual(ranker.rank([self.__down_url, self.__fast_url]), [self.__fast_url, self.__down_url])
+
+    def test_hedging(self):
+        ranker = MirrorRanker()
+        # The slow mirror looks like the best one, previous transfers were fast
+        for _ in range(5):
+            ranker.record_success(self.__slow_url, 10 * 1024 * 1024, 1)
+        ranker.record_success(self.__fast_url, 1024 * 1024, 1)
+        agent = FailoverAgent([self.__slow_url, self.__fast_url],
+                              self.__folder,
+                              ranker,
+                              download_attempts=1,
+                              hedge=True,
+                              hedge_grace_period=0.5)
+        result = agent.wait()
+        self.assertTrue(result['success'], result['msg'])
+        self.assertTrue(result['hedged'])
+        self.assertEqual(result['mirror'], self.__fast_url)
+        self.__assert_downloaded()
+
+    def test_all_mirrors_down(self):
+        agent = FailoverAgent([self.__down_url], self.__folder, MirrorRanker(), download_attempts=2)
+        result = agent.wait()
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error_type'], 'download_failed')
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,150 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 01:30
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the download manifests
+"""
+
+import gc
+import os
+import json
+import time
+import weakref
+import shutil
+import tempfile
+import unittest
+import threading
+from unittest import mock
+# App imports
+import config_manager
+from executor.pool import PooledTask, EXECUTOR_QUEUE_IO
+from download_manager.manager import Manager as DownloadManager
+from download_manager.exceptions import ManifestException
+from download_manager.manifest import Manifest, ManifestEntry, parse_shard, ORDER_PRIORITY, ORDER_LARGEST_FIRST
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+        self.__manifest_file = os.path.join(self.__folder, 'manifest.txt')
+        with open(self.__manifest_file, 'w') as f:
+            f.write("# Sample manifest\n\nhttp://example.org/plain\n")
+            for index in range(10):
+                f.write("{}\n".format(json.dumps({'url': "http://example.org/{}".format(index),
+                                                  'size': (index * 7) % 10,
+                                                  'priority': index % 3})))
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def test_manifest_file_is_read_in_order(self):
+        urls = list(Manifest(self.__manifest_file).urls())
+        self.assertEqual(urls, ['http://example.org/plain'] + ["http://example.org/{}".format(index)
+                                                               for index in range(10)])
+
+    def test_largest_first_ordering(self):
+        entries = list(Manifest(self.__manifest_file, order=ORDER_LARGEST_FIRST, window_size=None))
+        self.assertEqual([entry.size for entry in entries], list(range(9, -1, -1)) + [None])
+
+    def test_windowed_priority_ordering(self):
+        entries = [ManifestEntry("http://example.org/{}".format(index), priority=index) for index in range(100)]
+        ordered = [entry.priority for entry in Manifest(entries, order=ORDER_PRIORITY, window_size=10)]
+        self.assertEqual(sorted(ordered), list(range(100)))
+        # Higher priority entries jump ahead of, at most, a window of entries
+        self.assertEqual(ordered[:10], list(range(10, 20)))
+        self.assertEqual(ordered[-10:], list(range(9, -1, -1)))
+
+    def test_shards_split_the_manifest(self):
+        urls = ["http://example.org/file_{}".format(index) for index in range(1000)]
+        shards = [list(Manifest(urls, shard_index=shard_index, shard_count=4).urls()) for shard_index in range(4)]
+        self.assertEqual(sorted(sum(shards, [])), sorted(urls))
+        self.assertTrue(all([len(shard) > 150 for shard in shards]))
+        self.assertEqual(shards[1], list(Manifest(urls, shard_index=1, shard_count=4).urls()))
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('2/5'), (2, 5))
+        for shard in ('5/5', '1', 'a/b', '-1/2'):
+            with self.assertRaises(ManifestException):
+                parse_shard(shard)
+
+
+class _FakeAgent(PooledTask):
+    """
+    Download agent that takes a while to download nothing, keeping track of how many agents are in flight at once
+    """
+    executor_queue = EXECUTOR_QUEUE_IO
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+    downloaded_urls = []
+    failing_urls = set()
+    agents = weakref.WeakSet()
+
+    def __init__(self, url, dst_folder, **kwargs):
+        super().__init__()
+        self.__url = url
+        with _FakeAgent.lock:
+            _FakeAgent.agents.add(self)
+            _FakeAgent.in_flight += 1
+            _FakeAgent.max_in_flight = max(_FakeAgent.max_in_flight, _FakeAgent.in_flight)
+        self.start()
+
+    def run(self):
+        time.sleep(0.05)
+        with _FakeAgent.lock:
+            _FakeAgent.downloaded_urls.append(self.__url)
+            _FakeAgent.in_flight -= 1
+
+    def wait(self):
+        self.join()
+        return {'msg': '', 'success': self.__url not in _FakeAgent.failing_urls, 'url': self.__url}
+
+
+class TestManifestDownloads(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def test_agents_in_flight_are_bounded(self):
+        urls = ["http://example.org/file_{}".format(index) for index in range(10)]
+        with mock.patch('download_manager.manager.Agent', _FakeAgent):
+            download_manager = DownloadManager(Manifest(urls, shard_index=1, shard_count=2),
+                                               self.__folder,
+                                               config_manager.get_app_config_manager().get_logger_for(__name__),
+                                               max_agents_in_flight=2)
+            download_manager.start_downloads()
+            download_manager.wait_all()
+        self.assertTrue(download_manager.is_success())
+        self.assertEqual(_FakeAgent.max_in_flight, 2)
+        self.assertEqual(sorted(_FakeAgent.downloaded_urls),
+                         sorted(Manifest(urls, shard_index=1, shard_count=2).urls()))
+
+    def test_finished_agents_are_dropped(self):
+        urls = ["http://example.org/file_{}".format(index) for index in range(20)]
+        _FakeAgent.failing_urls = {urls[3]}
+        self.addCleanup(setattr, _FakeAgent, 'failing_urls', set())
+        with mock.patch('download_manager.manager.Agent', _FakeAgent):
+            download_manager = DownloadManager(iter(urls),
+                                               self.__folder,
+                                               config_manager.get_app_config_manager().get_logger_for(__name__),
+                                               max_agents_in_flight=2)
+            download_manager.start_downloads()
+            # Only the results of failed downloads are kept
+            self.assertEqual(list(download_manager.wait_all()), [urls[3]])
+        self.assertFalse(download_manager.is_success())
+        gc.collect()
+        self.assertEqual(len(_FakeAgent.agents), 0)
+        status = download_manager.get_status()
+        self.assertEqual(status['finished'], 20)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
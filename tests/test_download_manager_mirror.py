@@ -0,0 +1,159 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 08:05
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the download manager mirror mode
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import functools
+import threading
+import http.server
+# App imports
+from tests import use_temporary_timeout_history
+import config_manager
+from download_manager.exceptions import MirrorException
+from download_manager.mirror import Mirror, parse_index_links, crawl_index
+
+
+class _FailingHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Serves the upstream folder, answering with a server error when downloading any of the given paths
+    """
+
+    def __init__(self, *args, failing_paths=None, **kwargs):
+        self.__failing_paths = failing_paths if failing_paths is not None else set()
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.path in self.__failing_paths:
+            self.send_error(500, "Upstream error")
+            return
+        super().do_GET()
+
+
+class TestParseIndexLinks(unittest.TestCase):
+    def test_only_directory_entries(self):
+        index_html = """<html><body><h1>Index of /pub/data</h1>
+        <a href="?C=N;O=D">Name</a> <a href="?C=M;O=A">Last modified</a>
+        <a href="/pub/">Parent Directory</a> <a href="../">../</a>
+        <a href="release/"><img src="/icons/folder.gif"></a> <a href="release/">release/</a>
+        <a href="data%201.tsv.gz">data 1.tsv.gz</a>
+        <a href="http://elsewhere.example.org/data.tsv.gz">mirror</a>
+        </body></html>"""
+        file_urls, folder_urls = parse_index_links(index_html, 'http://example.org/pub/data/')
+        self.assertEqual(file_urls, ['http://example.org/pub/data/data%201.tsv.gz'])
+        self.assertEqual(folder_urls, ['http://example.org/pub/data/release/'])
+
+
+class TestMirror(unittest.TestCase):
+    def setUp(self):
+        use_temporary_timeout_history(self)
+        self.__upstream_folder = tempfile.mkdtemp()
+        self.__folder = tempfile.mkdtemp()
+        self.__write_upstream('a.bin', os.urandom(30000))
+        self.__write_upstream(os.path.join('sub', 'b.bin'), os.urandom(20000))
+        self.__failing_paths = set()
+        handler = functools.partial(_FailingHandler,
+                                    directory=self.__upstream_folder,
+                                    failing_paths=self.__failing_paths)
+        self.__upstream = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=self.__upstream.serve_forever, daemon=True).start()
+        self.__upstream_url = "http://127.0.0.1:{}/".format(self.__upstream.server_address[1])
+        self.__logger = config_manager.get_app_config_manager().get_logger_for(__name__)
+
+    def tearDown(self):
+        self.__upstream.shutdown()
+        self.__upstream.server_close()
+        for folder in (self.__upstream_folder, self.__folder):
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def __write_upstream(self, relative_path, data):
+        upstream_file = os.path.join(self.__upstream_folder, relative_path)
+        os.makedirs(os.path.dirname(upstream_file), exist_ok=True)
+        with open(upstream_file, 'wb') as f:
+            f.write(data)
+
+    def __assert_mirrored(self, relative_path):
+        with open(os.path.join(self.__upstream_folder, relative_path), 'rb') as upstream_file, \
+                open(os.path.join(self.__folder, relative_path), 'rb') as local_file:
+            self.assertEqual(upstream_file.read(), local_file.read())
+
+    def __mirror(self, **kwargs):
+        return Mirror(self.__upstream_url, self.__folder, self.__logger, download_attempts=2, **kwargs)
+
+    def test_crawl_index(self):
+        self.assertEqual(crawl_index(self.__upstream_url),
+                         [self.__upstream_url + 'a.bin', self.__upstream_url + 'sub/b.bin'])
+        self.assertEqual(crawl_index(self.__upstream_url, recursive=False), [self.__upstream_url + 'a.bin'])
+        with self.assertRaises(MirrorException):
+            crawl_index(self.__upstream_url + 'missing/')
+
+    def test_incremental_sync(self):
+        report = self.__mirror().sync()
+        self.assertEqual(report.new, ['a.bin', 'sub/b.bin'])
+        self.assertEqual(report.failed, [])
+        self.__assert_mirrored('a.bin')
+        self.__assert_mirrored(os.path.join('sub', 'b.bin'))
+        # Nothing changed, nothing downloaded
+        report = self.__mirror().sync()
+        self.assertEqual(report.unchanged, ['a.bin', 'sub/b.bin'])
+        self.assertEqual(report.get_transferred_count(), 0)
+        # Changed, new and removed files
+        self.__write_upstream('a.bin', os.urandom(35000))
+        self.__write_upstream('c.txt', b'new file')
+        os.remove(os.path.join(self.__upstream_folder, 'sub', 'b.bin'))
+        with open(os.path.join(self.__folder, 'not_mirrored.txt'), 'w') as f:
+            f.write('local file')
+        report = self.__mirror(delete=True).sync(dry_run=True)
+        self.assertEqual(report.to_dict(), {'new': ['c.txt'], 'changed': ['a.bin'], 'unchanged': [],
+                                            'deleted': ['sub/b.bin'], 'failed': []})
+        self.assertTrue(os.path.isfile(os.path.join(self.__folder, 'sub', 'b.bin')))
+        report = self.__mirror(delete=True).sync()
+        self.assertEqual(report.get_transferred_count(), 2)
+        self.__assert_mirrored('a.bin')
+        self.__assert_mirrored('c.txt')
+        self.assertFalse(os.path.exists(os.path.join(self.__folder, 'sub', 'b.bin')))
+        # Only files downloaded by the mirror are ever deleted
+        self.assertTrue(os.path.isfile(os.path.join(self.__folder, 'not_mirrored.txt')))
+
+    def test_failed_download_keeps_previous_copy(self):
+        self.__mirror().sync()
+        with open(os.path.join(self.__folder, 'a.bin'), 'rb') as f:
+            previous_data = f.read()
+        self.__write_upstream('a.bin', os.urandom(35000))
+        self.__failing_paths.add('/a.bin')
+        report = self.__mirror().sync()
+        self.assertEqual(report.changed, ['a.bin'])
+        self.assertEqual(report.failed, ['a.bin'])
+        with open(os.path.join(self.__folder, 'a.bin'), 'rb') as f:
+            self.assertEqual(f.read(), previous_data)
+        with open(self.__mirror().get_state_file()) as f:
+            self.assertNotIn('a.bin', json.load(f))
+        # The file is downloaded again once upstream recovers
+        self.__failing_paths.clear()
+        report = self.__mirror().sync()
+        self.assertEqual(report.changed, ['a.bin'])
+        self.assertEqual(report.failed, [])
+        self.__assert_mirrored('a.bin')
+
+    def test_listing(self):
+        report = self.__mirror(listing=[self.__upstream_url + 'sub/b.bin']).sync()
+        self.assertEqual(report.new, ['sub/b.bin'])
+        self.assertFalse(os.path.exists(os.path.join(self.__folder, 'a.bin')))
+        with self.assertRaises(MirrorException):
+            self.__mirror(listing=['http://elsewhere.example.org/a.bin']).sync()
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
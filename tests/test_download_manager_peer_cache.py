@@ -0,0 +1,175 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 04:55
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the download manager peer caches
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import functools
+import threading
+import http.server
+from unittest import mock
+import requests
+# App imports
+from tests import use_temporary_timeout_history
+import config_manager
+from download_manager.manager import Manager as DownloadManager
+from download_manager.peer_cache import PeerCacheServer, get_peer_url, parse_range
+
+
+class TestPeerCacheServer(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+        self.__data = os.urandom(200000)
+        with open(os.path.join(self.__folder, 'data.bin'), 'wb') as f:
+            f.write(self.__data)
+        with open(os.path.join(self.__folder, 'partial.bin.part'), 'wb') as f:
+            f.write(self.__data[:100])
+        self.__peer_cache = PeerCacheServer(self.__folder, '127.0.0.1:0')
+        self.__peer_cache.start()
+        self.assertTrue(self.__peer_cache.add_file(self.__get_upstream_url('data.bin'),
+                                                   os.path.join(self.__folder, 'data.bin')))
+
+    def tearDown(self):
+        self.__peer_cache.stop()
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    @staticmethod
+    def __get_upstream_url(file_name, upstream='upstream.example.org'):
+        return "http://{}/files/{}".format(upstream, file_name)
+
+    def __get_url(self, file_name, upstream='upstream.example.org'):
+        return get_peer_url(self.__peer_cache.get_address(), self.__get_upstream_url(file_name, upstream))
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=50-1000', 100), (50, 99))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=100-', 100)
+
+    def test_get_whole_file(self):
+        response = requests.get(self.__get_url('data.bin'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.__data)
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.__peer_cache.get_stats(), {'served_requests': 1, 'served_bytes': len(self.__data)})
+
+    def test_get_range(self):
+        response = requests.get(self.__get_url('data.bin'), headers={'Range': 'bytes=1000-1999'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.__data[1000:2000])
+        self.assertEqual(response.headers['Content-Range'], "bytes 1000-1999/{}".format(len(self.__data)))
+        response = requests.get(self.__get_url('data.bin'), headers={'Range': "bytes={}-".format(len(self.__data))})
+        self.assertEqual(response.status_code, 416)
+
+    def test_head(self):
+        response = requests.head(self.__get_url('data.bin'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response.headers['Content-Length']), len(self.__data))
+        self.assertIn('ETag', response.headers)
+
+    def test_files_not_served(self):
+        self.assertEqual(requests.get(self.__get_url('missing.bin')).status_code, 404)
+        # Only files added to the peer cache are served, whatever is in its folder
+        self.assertEqual(requests.get(self.__get_url('partial.bin.part')).status_code, 404)
+        self.assertEqual(requests.get("http://{}/..%2Fetc%2Fpasswd".format(self.__peer_cache.get_address()))
+                         .status_code, 404)
+        # A file with the same name, from a different URL, is a different file
+        self.assertEqual(requests.get(self.__get_url('data.bin', upstream='other.example.org')).status_code, 404)
+        # Files outside the folder of the peer cache are never added
+        self.assertFalse(self.__peer_cache.add_file(self.__get_upstream_url('passwd'), '/etc/passwd'))
+        # Files modified after being added are not served anymore
+        with open(os.path.join(self.__folder, 'data.bin'), 'ab') as f:
+            f.write(b'more data')
+        self.assertEqual(requests.get(self.__get_url('data.bin')).status_code, 404)
+
+
+class TestDownloadsFromPeerCaches(unittest.TestCase):
+    def setUp(self):
+        use_temporary_timeout_history(self)
+        self.__peer_folder = tempfile.mkdtemp()
+        self.__upstream_folder = tempfile.mkdtemp()
+        self.__folder = tempfile.mkdtemp()
+        self.__peer_data = os.urandom(50000)
+        self.__upstream_data = os.urandom(40000)
+        with open(os.path.join(self.__peer_folder, 'cached.bin'), 'wb') as f:
+            f.write(self.__peer_data)
+        with open(os.path.join(self.__upstream_folder, 'upstream.bin'), 'wb') as f:
+            f.write(self.__upstream_data)
+        handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=self.__upstream_folder)
+        self.__upstream = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=self.__upstream.serve_forever, daemon=True).start()
+        self.__upstream_url = "http://127.0.0.1:{}".format(self.__upstream.server_address[1])
+        self.__peer_cache = PeerCacheServer(self.__peer_folder, '127.0.0.1:0')
+        self.__peer_cache.start()
+        self.__peer_cache.add_file("{}/cached.bin".format(self.__upstream_url),
+                                   os.path.join(self.__peer_folder, 'cached.bin'))
+
+    def tearDown(self):
+        self.__peer_cache.stop()
+        self.__upstream.shutdown()
+        self.__upstream.server_close()
+        for folder in (self.__peer_folder, self.__upstream_folder, self.__folder):
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def test_peer_caches_first_upstream_second(self):
+        urls = ["{}/{}".format(self.__upstream_url, file_name) for file_name in ('cached.bin', 'upstream.bin')]
+        download_manager = DownloadManager(urls,
+                                           self.__folder,
+                                           config_manager.get_app_config_manager().get_logger_for(__name__),
+                                           download_attempts=2,
+                                           peer_caches=[self.__peer_cache.get_address()])
+        # This node serves its completed downloads to its peers
+        node_peer_cache = PeerCacheServer(self.__folder, '127.0.0.1:0')
+        node_peer_cache.start()
+        try:
+            with mock.patch('download_manager.manager.get_peer_cache_server', return_value=node_peer_cache):
+                download_manager.start_downloads()
+                download_manager.wait_all()
+            self.assertEqual(requests.get(get_peer_url(node_peer_cache.get_address(), urls[1])).content,
+                             self.__upstream_data)
+        finally:
+            node_peer_cache.stop()
+        self.assertTrue(download_manager.is_success())
+        self.assertEqual(sorted(os.listdir(self.__folder)), ['cached.bin', 'upstream.bin'])
+        # Upstream doesn't have 'cached.bin', it can only come from the peer cache
+        with open(os.path.join(self.__folder, 'cached.bin'), 'rb') as f:
+            self.assertEqual(f.read(), self.__peer_data)
+        with open(os.path.join(self.__folder, 'upstream.bin'), 'rb') as f:
+            self.assertEqual(f.read(), self.__upstream_data)
+
+    def test_direct_downloads_are_served_once_in_place(self):
+        url = "{}/upstream.bin".format(self.__upstream_url)
+        download_manager = DownloadManager([url],
+                                           self.__folder,
+                                           config_manager.get_app_config_manager().get_logger_for(__name__),
+                                           download_attempts=2,
+                                           peer_caches=[])
+        node_peer_cache = PeerCacheServer(self.__folder, '127.0.0.1:0')
+        node_peer_cache.start()
+        try:
+            with mock.patch('download_manager.manager.get_peer_cache_server', return_value=node_peer_cache):
+                # Batched fsync, files are moved in place only when flushing
+                download_manager.start_direct_downloads()
+                download_manager.wait_all()
+            self.assertEqual(requests.get(get_peer_url(node_peer_cache.get_address(), url)).content,
+                             self.__upstream_data)
+        finally:
+            node_peer_cache.stop()
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,130 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 02:40
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the download planner
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import threading
+import http.server
+# App imports
+from tests import use_temporary_timeout_history
+import config_manager
+from download_manager.manager import Manager as DownloadManager
+from download_manager.planner import DownloadPlanner
+
+
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """
+    Static files handler with support for single byte ranges
+    """
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return None
+        size = os.path.getsize(path)
+        first_byte, last_byte = 0, size - 1
+        range_header = self.headers.get('Range')
+        if range_header:
+            first, last = range_header.replace('bytes=', '').split('-')
+            first_byte, last_byte = int(first), min(int(last), size - 1) if last else size - 1
+            self.send_response(206)
+            self.send_header('Content-Range', "bytes {}-{}/{}".format(first_byte, last_byte, size))
+        else:
+            self.send_response(200)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(last_byte - first_byte + 1))
+        self.end_headers()
+        f = open(path, 'rb')
+        f.seek(first_byte)
+        return _LimitedReader(f, last_byte - first_byte + 1)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _LimitedReader:
+    def __init__(self, f, length):
+        self.__file = f
+        self.__remaining = length
+
+    def read(self, size=-1):
+        size = self.__remaining if size < 0 else min(size, self.__remaining)
+        data = self.__file.read(size)
+        self.__remaining -= len(data)
+        return data
+
+    def close(self):
+        self.__file.close()
+
+
+class TestDownloadPlanner(unittest.TestCase):
+    def setUp(self):
+        use_temporary_timeout_history(self)
+        self.__served_folder = tempfile.mkdtemp()
+        self.__dst_folder = tempfile.mkdtemp()
+        self.__files = {'big.bin': os.urandom(3 * 1024 * 1024 + 123),
+                        'medium.bin': os.urandom(64 * 1024),
+                        'present.bin': os.urandom(10 * 1024)}
+        self.__files.update({"small_{}.bin".format(index): os.urandom(1000 + index) for index in range(5)})
+        for name, data in self.__files.items():
+            with open(os.path.join(self.__served_folder, name), 'wb') as f:
+                f.write(data)
+        shutil.copy(os.path.join(self.__served_folder, 'present.bin'), self.__dst_folder)
+        handler = lambda *args, **kwargs: RangeRequestHandler(*args, directory=self.__served_folder, **kwargs)
+        self.__server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=self.__server.serve_forever, daemon=True).start()
+        self.__urls = ["http://127.0.0.1:{}/{}".format(self.__server.server_address[1], name)
+                       for name in sorted(self.__files)]
+
+    def tearDown(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        shutil.rmtree(self.__served_folder, ignore_errors=True)
+        shutil.rmtree(self.__dst_folder, ignore_errors=True)
+
+    def test_plan_and_download(self):
+        planner = DownloadPlanner(self.__dst_folder,
+                                  segment_threshold_mb=1,
+                                  segment_size_mb=1,
+                                  small_file_threshold_kb=4,
+                                  small_files_batch_size=2)
+        plan = planner.plan(self.__urls)
+        self.assertEqual([planned.get_url().split('/')[-1] for planned in plan.get_skipped()], ['present.bin'])
+        self.assertEqual([planned.get_url().split('/')[-1] for planned in plan.get_single()], ['medium.bin'])
+        self.assertEqual([len(planned.segments) for planned in plan.get_segmented()], [4])
+        self.assertEqual([len(batch) for batch in plan.get_batches()], [2, 2, 1])
+        self.assertEqual(plan.get_total_bytes(),
+                         sum([len(data) for name, data in self.__files.items() if name != 'present.bin']))
+        # Segmenting the big file cuts the tail of the transfer
+        self.assertLess(plan.estimate_duration(4 * 1024 * 1024, concurrency=4, request_latency=0), 1.1)
+        download_manager = DownloadManager([],
+                                           self.__dst_folder,
+                                           config_manager.get_app_config_manager().get_logger_for(__name__),
+                                           download_attempts=2)
+        download_manager.start_planned_downloads(plan)
+        download_manager.wait_all()
+        self.assertTrue(download_manager.is_success())
+        for name, data in self.__files.items():
+            with open(os.path.join(self.__dst_folder, name), 'rb') as f:
+                self.assertEqual(f.read(), data, name)
+        self.assertEqual(sorted(os.listdir(self.__dst_folder)), sorted(self.__files))
+        forecast = download_manager.get_download_forecast()
+        self.assertEqual(forecast['downloaded_bytes'], forecast['total_bytes'])
+        self.assertEqual(forecast['eta_seconds'], 0)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,91 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 00:40
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the download manager streaming pipelines
+"""
+
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import tempfile
+import unittest
+import functools
+import threading
+import http.server
+# App imports
+from tests import use_temporary_timeout_history
+import config_manager
+from download_manager.manager import Manager as DownloadManager
+from download_manager.exceptions import StreamingPipelineException
+from download_manager.streaming import StreamingPipeline, DecompressStage, ChecksumStage, ParseLinesStage, \
+    TeeToFileStage
+
+
+class TestStreamingPipeline(unittest.TestCase):
+    def setUp(self):
+        use_temporary_timeout_history(self)
+        self.__folder = tempfile.mkdtemp()
+        self.__lines = [json.dumps({'id': index, 'value': 'x' * (index % 17)}).encode() for index in range(5000)]
+        self.__data = b'\n'.join(self.__lines) + b'\n'
+        # Two gzip members, the way parallel compressors write them
+        self.__compressed_data = gzip.compress(self.__data[:40000]) + gzip.compress(self.__data[40000:])
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def __build_pipeline(self, records, expected_checksum=None):
+        return StreamingPipeline([TeeToFileStage(os.path.join(self.__folder, 'data.jsonl.gz')),
+                                  DecompressStage(),
+                                  ChecksumStage(expected_checksum=expected_checksum),
+                                  ParseLinesStage(records.append)])
+
+    def test_stages_process_data_in_chunks(self):
+        records = []
+        pipeline = self.__build_pipeline(records, expected_checksum=hashlib.sha256(self.__data).hexdigest())
+        for offset in range(0, len(self.__compressed_data), 777):
+            pipeline.feed(self.__compressed_data[offset:offset + 777])
+        pipeline.finish()
+        self.assertEqual(records, [json.loads(line) for line in self.__lines])
+        with open(os.path.join(self.__folder, 'data.jsonl.gz'), 'rb') as f:
+            self.assertEqual(f.read(), self.__compressed_data)
+
+    def test_checksum_mismatch(self):
+        pipeline = self.__build_pipeline([], expected_checksum='0' * 64)
+        pipeline.feed(self.__compressed_data)
+        with self.assertRaises(StreamingPipelineException):
+            pipeline.finish()
+
+    def test_streaming_downloads(self):
+        with open(os.path.join(self.__folder, 'served.jsonl.gz'), 'wb') as f:
+            f.write(self.__compressed_data)
+        handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=self.__folder)
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            records = []
+            url = "http://127.0.0.1:{}/served.jsonl.gz".format(server.server_address[1])
+            download_manager = DownloadManager([url],
+                                               self.__folder,
+                                               config_manager.get_app_config_manager().get_logger_for(__name__),
+                                               download_attempts=2)
+            download_manager.start_streaming_downloads(lambda download_url: self.__build_pipeline(records))
+            download_manager.wait_all()
+            self.assertTrue(download_manager.is_success())
+            self.assertEqual(len(records), len(self.__lines))
+            self.assertEqual(records[-1], json.loads(self.__lines[-1]))
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
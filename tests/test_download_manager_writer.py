@@ -0,0 +1,167 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 03:40
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the download manager write path
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import functools
+import threading
+import http.server
+# App imports
+from tests import use_temporary_timeout_history
+import config_manager
+from download_manager.manager import Manager as DownloadManager
+from download_manager.exceptions import DownloadWriterException
+from download_manager.writer import DownloadFileWriter, FsyncBatcher, FSYNC_POLICY_DEFERRED, FSYNC_POLICY_ALWAYS, \
+    FSYNC_POLICY_BATCH, PART_FILE_EXTENSION
+
+
+class TestDownloadFileWriter(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+        self.__data = os.urandom(300000)
+        self.__dst_file = os.path.join(self.__folder, 'data.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def __write(self, writer, data):
+        for offset in range(0, len(data), 4096):
+            writer.write(data[offset:offset + 4096])
+
+    def test_preallocated_file_is_committed(self):
+        writer = DownloadFileWriter(self.__dst_file, expected_size=len(self.__data), buffer_size=65536)
+        self.__write(writer, self.__data)
+        writer.commit()
+        self.assertFalse(os.path.exists(self.__dst_file + PART_FILE_EXTENSION))
+        self.assertEqual(os.listdir(self.__folder), ['data.bin'])
+        with open(self.__dst_file, 'rb') as f:
+            self.assertEqual(f.read(), self.__data)
+
+    def test_incomplete_file_is_not_committed(self):
+        writer = DownloadFileWriter(self.__dst_file, expected_size=len(self.__data) + 1)
+        self.__write(writer, self.__data)
+        with self.assertRaises(DownloadWriterException):
+            writer.commit()
+        self.assertFalse(os.path.exists(self.__dst_file))
+        self.assertTrue(os.path.exists(self.__dst_file + PART_FILE_EXTENSION))
+
+    def test_resume_after_abort(self):
+        writer = DownloadFileWriter(self.__dst_file, expected_size=len(self.__data))
+        self.__write(writer, self.__data[:100000])
+        writer.abort()
+        # Preallocated part files are bigger than what was written
+        self.assertEqual(os.path.getsize(self.__dst_file + PART_FILE_EXTENSION), len(self.__data))
+        writer = DownloadFileWriter(self.__dst_file, expected_size=len(self.__data))
+        self.assertEqual(writer.get_written_bytes(), 100000)
+        self.__write(writer, self.__data[100000:])
+        writer.commit()
+        with open(self.__dst_file, 'rb') as f:
+            self.assertEqual(f.read(), self.__data)
+
+    def test_resume_without_preallocation(self):
+        writer = DownloadFileWriter(self.__dst_file, preallocate=False)
+        self.__write(writer, self.__data[:8192])
+        writer.abort()
+        writer = DownloadFileWriter(self.__dst_file, preallocate=False)
+        self.assertEqual(writer.get_written_bytes(), 8192)
+        self.__write(writer, self.__data[8192:])
+        writer.commit()
+        with open(self.__dst_file, 'rb') as f:
+            self.assertEqual(f.read(), self.__data)
+
+
+class TestFsyncBatcher(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def __write_files(self, fsync_batcher, count):
+        for index in range(count):
+            writer = DownloadFileWriter(os.path.join(self.__folder, "file_{}".format(index)),
+                                        expected_size=5,
+                                        fsync_batcher=fsync_batcher)
+            writer.write(b'12345')
+            writer.commit()
+
+    def test_deferred_policy(self):
+        fsync_batcher = FsyncBatcher(FSYNC_POLICY_DEFERRED)
+        self.__write_files(fsync_batcher, 10)
+        self.assertEqual(fsync_batcher.get_pending_count(), 10)
+        self.assertFalse(os.path.exists(os.path.join(self.__folder, 'file_0')))
+        self.assertEqual(fsync_batcher.flush(), 10)
+        self.assertEqual(sorted(os.listdir(self.__folder)), sorted(["file_{}".format(index) for index in range(10)]))
+
+    def test_batch_policy_flushes_full_batches(self):
+        fsync_batcher = FsyncBatcher(FSYNC_POLICY_BATCH, max_batch_files=4, max_batch_delay=60)
+        self.__write_files(fsync_batcher, 10)
+        self.assertEqual(fsync_batcher.get_pending_count(), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.__folder, 'file_7')))
+        self.assertFalse(os.path.exists(os.path.join(self.__folder, 'file_8')))
+        fsync_batcher.flush()
+        self.assertEqual(len(os.listdir(self.__folder)), 10)
+
+    def test_always_policy(self):
+        fsync_batcher = FsyncBatcher(FSYNC_POLICY_ALWAYS)
+        self.__write_files(fsync_batcher, 3)
+        self.assertEqual(fsync_batcher.get_pending_count(), 0)
+        self.assertEqual(len(os.listdir(self.__folder)), 3)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(DownloadWriterException):
+            FsyncBatcher('sometimes')
+
+
+class TestDirectDownloads(unittest.TestCase):
+    def setUp(self):
+        use_temporary_timeout_history(self)
+        self.__served_folder = tempfile.mkdtemp()
+        self.__folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__served_folder, ignore_errors=True)
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def test_direct_downloads(self):
+        contents = {"file_{}.bin".format(index): os.urandom(1000 * (index + 1)) for index in range(5)}
+        for file_name, data in contents.items():
+            with open(os.path.join(self.__served_folder, file_name), 'wb') as f:
+                f.write(data)
+        handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=self.__served_folder)
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            urls = {"http://127.0.0.1:{}/{}".format(server.server_address[1], file_name): file_name
+                    for file_name in contents}
+            download_manager = DownloadManager(list(urls),
+                                               self.__folder,
+                                               config_manager.get_app_config_manager().get_logger_for(__name__),
+                                               download_attempts=2)
+            download_manager.start_direct_downloads(sizes={url: len(contents[urls[url]]) for url in urls},
+                                                    fsync_policy=FSYNC_POLICY_DEFERRED)
+            download_manager.wait_all()
+            self.assertTrue(download_manager.is_success())
+            self.assertEqual(sorted(os.listdir(self.__folder)), sorted(contents))
+            for file_name, data in contents.items():
+                with open(os.path.join(self.__folder, file_name), 'rb') as f:
+                    self.assertEqual(f.read(), data)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
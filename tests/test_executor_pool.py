@@ -0,0 +1,119 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 22:20
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the process wide executor pools
+"""
+
+import time
+import threading
+import unittest
+# App imports
+from executor.exceptions import ExecutorShutdownException, TaskCancelledException
+from executor.pool import WorkStealingThreadPool, PooledTask, get_executor_pool, EXECUTOR_QUEUE_IO
+
+
+class TestWorkStealingThreadPool(unittest.TestCase):
+    def setUp(self):
+        self.__pool = WorkStealingThreadPool('test', 4)
+
+    def tearDown(self):
+        self.__pool.shutdown()
+
+    def test_tasks_run_and_return_results(self):
+        tasks = [self.__pool.submit(pow, number, 2) for number in range(100)]
+        self.assertEqual([task.get_result(timeout=10) for task in tasks], [number ** 2 for number in range(100)])
+        metrics = self.__pool.get_metrics()
+        self.assertEqual(metrics['submitted'], 100)
+        self.assertEqual(metrics['completed'], 100)
+        self.assertEqual(metrics['queue_depth'], 0)
+
+    def test_idle_workers_steal_tasks(self):
+        def spawn_children():
+            # Tasks submitted from a worker go to its own queue, so the other workers must steal them
+            return [self.__pool.submit(time.sleep, 0.1) for _ in range(8)]
+
+        children = self.__pool.submit(spawn_children).get_result(timeout=10)
+        start = time.time()
+        for child in children:
+            child.wait(timeout=10)
+        self.assertLess(time.time() - start, 0.7)
+        self.assertGreater(self.__pool.get_metrics()['stolen'], 0)
+
+    def test_task_exceptions_are_reported(self):
+        task = self.__pool.submit(int, 'not a number')
+        with self.assertRaises(ValueError):
+            task.get_result(timeout=10)
+        self.assertEqual(self.__pool.get_metrics()['failed'], 1)
+
+    def test_pending_tasks_can_be_cancelled(self):
+        release = threading.Event()
+        blockers = [self.__pool.submit(release.wait) for _ in range(4)]
+        task = self.__pool.submit(time.sleep, 0)
+        self.assertTrue(task.cancel())
+        release.set()
+        for blocker in blockers:
+            blocker.wait(timeout=10)
+        with self.assertRaises(TaskCancelledException):
+            task.get_result(timeout=10)
+
+    def test_waiting_for_tasks_from_workers_does_not_deadlock(self):
+        pool = WorkStealingThreadPool('nested', 1)
+        try:
+            def parent():
+                # The only worker of the pool is running this task, so its children would never run if it just blocked
+                return sum([child.get_result() for child in [pool.submit(pow, number, 2) for number in range(4)]])
+
+            self.assertEqual(pool.submit(parent).get_result(timeout=10), 14)
+            metrics = pool.get_metrics()
+            self.assertEqual(metrics['completed'], 5)
+            self.assertEqual(metrics['cancelled'], 0)
+        finally:
+            pool.shutdown()
+
+    def test_tasks_waited_for_from_other_pools_run_on_their_own_pool(self):
+        other_pool = WorkStealingThreadPool('other', 1)
+        try:
+            def waiter():
+                return other_pool.submit(lambda: threading.current_thread().name).get_result(timeout=10)
+
+            self.assertTrue(self.__pool.submit(waiter).get_result(timeout=10).startswith('Executor-other-'))
+        finally:
+            other_pool.shutdown()
+
+    def test_no_submissions_after_shutdown(self):
+        self.__pool.shutdown()
+        with self.assertRaises(ExecutorShutdownException):
+            self.__pool.submit(time.sleep, 0)
+
+
+class TestPooledTask(unittest.TestCase):
+    def test_pooled_tasks_run_on_the_named_pool(self):
+        class ThreadNameTask(PooledTask):
+            executor_queue = EXECUTOR_QUEUE_IO
+
+            def __init__(self):
+                super().__init__()
+                self.thread_name = None
+
+            def run(self):
+                self.thread_name = threading.current_thread().name
+
+        pooled_task = ThreadNameTask()
+        pooled_task.start()
+        pooled_task.join(timeout=10)
+        self.assertFalse(pooled_task.is_alive())
+        self.assertTrue(pooled_task.thread_name.startswith("Executor-{}-".format(EXECUTOR_QUEUE_IO)))
+        self.assertIs(get_executor_pool(EXECUTOR_QUEUE_IO), get_executor_pool(EXECUTOR_QUEUE_IO))
+        with self.assertRaises(RuntimeError):
+            pooled_task.start()
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of an application and it is not meant to be run in stand alone mode")
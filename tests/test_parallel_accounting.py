@@ -0,0 +1,63 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 12:00
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the parallel runners resource accounting
+"""
+
+import time
+import signal
+import threading
+import subprocess
+import unittest
+# App imports
+from parallel.accounting import AccountedPopen
+
+
+class TestAccountedPopen(unittest.TestCase):
+    def test_resource_usage_is_recorded_on_wait(self):
+        process = AccountedPopen(['sh', '-c', 'exit 3'])
+        self.assertEqual(process.wait(timeout=30), 3)
+        resource_usage = process.get_resource_usage()
+        self.assertIsNotNone(resource_usage)
+        self.assertIsNotNone(resource_usage.get_cpu_time())
+        self.assertGreater(resource_usage.max_rss_kb, 0)
+
+    def test_resource_usage_is_recorded_on_poll(self):
+        process = AccountedPopen(['true'])
+        deadline = time.monotonic() + 30
+        while (process.poll() is None) and (time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(process.returncode, 0)
+        self.assertIsNotNone(process.get_resource_usage())
+
+    def test_wait_with_timeout(self):
+        process = AccountedPopen(['sleep', '5'])
+        with self.assertRaises(subprocess.TimeoutExpired):
+            process.wait(timeout=0.1)
+        self.assertIsNone(process.get_resource_usage())
+        process.kill()
+        self.assertEqual(process.wait(timeout=30), -signal.SIGKILL)
+        self.assertIsNotNone(process.get_resource_usage())
+
+    def test_waiting_from_several_threads(self):
+        process = AccountedPopen(['sleep', '0.2'], stdout=subprocess.PIPE)
+        return_codes = []
+        threads = [threading.Thread(target=lambda: return_codes.append(process.wait())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        self.assertEqual(process.communicate(timeout=30), (b'', None))
+        for thread in threads:
+            thread.join()
+        self.assertEqual(return_codes, [0] * 4)
+        self.assertIsNotNone(process.get_resource_usage())
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,179 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 23:20
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the distributed execution of command line runners
+"""
+
+import os
+import time
+import shutil
+import socket
+import tempfile
+import unittest
+# App imports
+from executor.pool import get_executor_pool, EXECUTOR_QUEUE_IO
+from parallel.models import CommandLineRunnerFactory, ParallelRunnerManagerFactory
+from parallel.exceptions import DistributedRunnerException
+from parallel.distributed import Coordinator, Worker, parse_address, send_message, receive_message, \
+    worker_handshake, MESSAGE_HELLO, MESSAGE_REQUEST_JOB, MESSAGE_JOB
+
+_TOKEN = 'shared token'
+
+
+class TestDistributedRunners(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+        self.__coordinator = Coordinator("unix:{}".format(os.path.join(self.__folder, 'coordinator.sock')),
+                                         _TOKEN,
+                                         heartbeat_timeout=1,
+                                         poll_interval=0.5)
+        self.__coordinator.start()
+        self.__workers = []
+
+    def tearDown(self):
+        for worker in self.__workers:
+            worker.stop()
+        self.__coordinator.stop()
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def __start_workers(self, count, token=_TOKEN):
+        for index in range(count):
+            worker = Worker(self.__coordinator.get_address(),
+                            token,
+                            worker_id="worker-{}".format(index),
+                            heartbeat_interval=0.2,
+                            reconnect_interval=0.2)
+            worker.start()
+            self.__workers.append(worker)
+
+    def __get_runner(self, command, use_shell=False, timeout=None):
+        runner = CommandLineRunnerFactory.get_remote_command_line_runner(self.__coordinator)
+        runner.command = command
+        runner.use_shell = use_shell
+        runner.timeout = timeout
+        return runner
+
+    def test_commands_are_spread_over_workers(self):
+        self.__start_workers(3)
+        manager = ParallelRunnerManagerFactory.get_parallel_runner_manager()
+        runners = [self.__get_runner("sleep 0.3; echo job {}; echo errors >&2".format(index), use_shell=True)
+                   for index in range(6)]
+        manager.add_runners(runners)
+        manager.start_runners()
+        manager.wait_all()
+        self.assertTrue(all([runner.command_success for runner in runners]))
+        self.assertEqual([runner.get_stdout() for runner in runners],
+                         ["job {}\n".format(index).encode() for index in range(6)])
+        self.assertEqual(runners[0].get_stderr(), b"errors\n")
+        self.assertGreater(len(set([runner.get_worker_id() for runner in runners])), 1)
+        self.assertIsNotNone(runners[0].get_resource_usage().user_cpu_time)
+
+    def test_failed_and_timed_out_commands(self):
+        self.__start_workers(2)
+        failing_runner = self.__get_runner(['false'])
+        slow_runner = self.__get_runner(['sleep', '30'], timeout=0.5)
+        for runner in (failing_runner, slow_runner):
+            runner.start()
+        for runner in (failing_runner, slow_runner):
+            runner.wait()
+            self.assertTrue(runner.is_error())
+            self.assertFalse(runner.command_success)
+        self.assertEqual(failing_runner.command_return_code, 1)
+
+    def __connect(self):
+        family, socket_address = parse_address(self.__coordinator.get_address())
+        connection = socket.socket(family, socket.SOCK_STREAM)
+        connection.connect(socket_address)
+        return connection, connection.makefile('rwb')
+
+    def test_workers_and_coordinator_must_share_the_token(self):
+        with self.assertRaises(DistributedRunnerException):
+            Worker(self.__coordinator.get_address(), None)
+        self.assertEqual(parse_address(':8000'), (socket.AF_INET, ('127.0.0.1', 8000)))
+        # Workers with the wrong token are never accepted
+        self.__start_workers(1, token='wrong token')
+        time.sleep(1)
+        self.assertEqual(self.__coordinator.get_worker_count(), 0)
+        self.assertEqual(self.__workers[0].get_jobs_run(), 0)
+        # Nor is anyone skipping the handshake
+        connection, stream = self.__connect()
+        try:
+            send_message(stream, {'type': MESSAGE_HELLO, 'worker_id': 'intruder', 'nonce': 'nonce'})
+            self.assertEqual(receive_message(stream)['type'], MESSAGE_HELLO)
+            send_message(stream, {'type': MESSAGE_REQUEST_JOB})
+            self.assertIsNone(receive_message(stream))
+        finally:
+            stream.close()
+            connection.close()
+        # Workers don't take jobs from a coordinator that doesn't know the token
+        connection, stream = self.__connect()
+        try:
+            with self.assertRaises(ConnectionError):
+                worker_handshake(stream, 'worker', 'wrong token')
+        finally:
+            stream.close()
+            connection.close()
+
+    def test_lost_jobs_are_requeued(self):
+        # A worker that takes a job, and never sends a heartbeat for it
+        silent_worker, stream = self.__connect()
+        try:
+            worker_handshake(stream, 'silent', _TOKEN)
+            runner = self.__get_runner(['echo', 'recovered'])
+            runner.start()
+            send_message(stream, {'type': MESSAGE_REQUEST_JOB})
+            self.assertEqual(receive_message(stream)['type'], MESSAGE_JOB)
+            self.__start_workers(1)
+            start = time.time()
+            runner.wait()
+            self.assertLess(time.time() - start, 10)
+            self.assertTrue(runner.command_success)
+            self.assertEqual(runner.get_stdout(), b"recovered\n")
+            self.assertTrue(runner.get_worker_id().startswith('worker-0'))
+        finally:
+            stream.close()
+            silent_worker.close()
+
+    def test_waiting_runners_do_not_hold_executor_workers(self):
+        # More runners than workers in their executor pool, all of them waiting for their job at the same time
+        manager = ParallelRunnerManagerFactory.get_parallel_runner_manager()
+        runners = [self.__get_runner(['echo', str(index)])
+                   for index in range(get_executor_pool(EXECUTOR_QUEUE_IO).get_size() + 1)]
+        manager.add_runners(runners)
+        manager.start_runners()
+        deadline = time.time() + 10
+        while (self.__coordinator.get_pending_job_count() < len(runners)) and (time.time() < deadline):
+            time.sleep(0.05)
+        self.assertEqual(self.__coordinator.get_pending_job_count(), len(runners))
+        self.__start_workers(2)
+        manager.wait_all()
+        self.assertTrue(all([runner.command_success for runner in runners]))
+        self.assertEqual(self.__coordinator.get_job_count(), 0)
+
+    def test_cancel_running_job(self):
+        self.__start_workers(1)
+        runner = self.__get_runner(['sleep', '30'])
+        runner.start()
+        time.sleep(0.5)
+        start = time.time()
+        runner.cancel()
+        runner.wait()
+        self.assertLess(time.time() - start, 5)
+        self.assertTrue(runner.is_error())
+        self.assertEqual(self.__coordinator.get_job_count(), 0)
+        # The worker is free to run other jobs
+        other_runner = self.__get_runner(['true'])
+        other_runner.start()
+        other_runner.wait()
+        self.assertTrue(other_runner.command_success)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of an application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,333 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 19:20
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the parallel runners models
+"""
+
+import os
+import time
+import uuid
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+# App imports
+from tests import use_temporary_timeout_history
+from parallel.cache import CommandResultCache
+from parallel.admission import AdmissionController
+from parallel.models import CommandLineRunnerFactory, ParallelRunnerManagerFactory
+
+
+class TestCommandLineRunner(unittest.TestCase):
+    @staticmethod
+    def __get_runner(command, timeout=60, use_shell=False):
+        runner = CommandLineRunnerFactory.get_multithread_command_line_runner()
+        runner.command = command
+        runner.use_shell = use_shell
+        runner.timeout = timeout
+        return runner
+
+    def test_cancel_terminates_the_whole_process_tree(self):
+        runner = self.__get_runner("sleep 30 | sleep 30", use_shell=True)
+        runner.start()
+        time.sleep(0.5)
+        start = time.time()
+        runner.cancel()
+        runner.wait()
+        self.assertLess(time.time() - start, 10)
+        self.assertTrue(runner.is_error())
+        self.assertFalse(runner.command_success)
+
+    def test_manager_cancel_all(self):
+        manager = ParallelRunnerManagerFactory.get_parallel_runner_manager()
+        manager.add_runners([self.__get_runner(['sleep', '30']) for _ in range(3)])
+        manager.start_runners()
+        start = time.time()
+        manager.cancel_all()
+        manager.wait_all()
+        self.assertLess(time.time() - start, 10)
+        self.assertTrue(all([runner.is_error() for runner in manager.get_finished_runners()]))
+        # Runners started once the manager is shutting down never run
+        runner = self.__get_runner(['sleep', '30'])
+        manager.add_runner(runner)
+        manager.start_runners()
+        runner.wait()
+        self.assertTrue(runner.is_error())
+
+    def test_commands_run_without_shell_by_default(self):
+        runner = self.__get_runner("printf '%s|' 'quoted argument' $HOME;")
+        runner.start()
+        runner.wait()
+        self.assertTrue(runner.command_success)
+        self.assertEqual(runner.get_stdout(), b"quoted argument|$HOME;|")
+
+    def test_timeout_history_is_opt_in(self):
+        timeout_history = use_temporary_timeout_history(self)
+        runner = self.__get_runner(['true'], timeout=None)
+        self.assertIsNone(runner.get_timeout_key())
+        self.assertIsNone(runner._get_effective_timeout())
+        runner.timeout_key = "test:{}".format(uuid.uuid4())
+        runner.start()
+        runner.wait()
+        self.assertTrue(runner.command_success)
+        self.assertEqual(len(timeout_history.get_samples(runner.get_timeout_key())), 1)
+        # Keyed on the program they run, except for shell commands, where the program is the shell
+        runner = self.__get_runner(['/bin/true', '--version'], timeout=None)
+        runner.timeout_history_by_program = True
+        self.assertEqual(runner.get_timeout_key(), 'command:true')
+        runner = self.__get_runner("if true; then true; fi", timeout=None, use_shell=True)
+        runner.timeout_history_by_program = True
+        self.assertIsNone(runner.get_timeout_key())
+
+    def test_resource_usage_is_accounted(self):
+        manager = ParallelRunnerManagerFactory.get_parallel_runner_manager()
+        runner = self.__get_runner(['python', '-c', "x = bytearray(64 * 1024 * 1024); sum(range(3000000))"])
+        manager.add_runner(runner)
+        manager.start_runners()
+        manager.wait_all()
+        resource_usage = runner.get_resource_usage()
+        self.assertGreater(resource_usage.get_cpu_time(), 0)
+        self.assertGreater(resource_usage.max_rss_kb, 64 * 1024)
+        self.assertGreaterEqual(resource_usage.wall_time, resource_usage.user_cpu_time)
+        self.assertEqual(manager.get_resource_usage_summary()['runners'], 1)
+        self.assertTrue(os.path.isfile(manager.get_resource_usage_report_file()))
+
+    def test_results_are_stored(self):
+        manager = ParallelRunnerManagerFactory.get_parallel_runner_manager()
+        token = uuid.uuid4().hex
+        succeeding_runner = self.__get_runner(['echo', token])
+        failing_runner = self.__get_runner(['false', token])
+        timing_out_runner = self.__get_runner("sleep 30 # {}".format(token), timeout=0.5, use_shell=True)
+        manager.add_runners([succeeding_runner, failing_runner, timing_out_runner])
+        manager.start_runners()
+        manager.wait_all()
+        results = {result['name']: result
+                   for result in manager.get_results_store().query(subsystem='runner', name_contains=token)}
+        self.assertEqual(results[succeeding_runner.get_description()]['status'], 'success')
+        self.assertEqual(results[failing_runner.get_description()]['error_type'], 'return_code')
+        self.assertEqual(results[timing_out_runner.get_description()]['error_type'], 'timeout')
+        self.assertGreaterEqual(results[timing_out_runner.get_description()]['duration'], 0.5)
+
+    def test_stalled_commands_are_stopped(self):
+        stalled_runner = self.__get_runner(['sh', '-c', 'echo started; sleep 30'])
+        stalled_runner.stall_window = 1
+        busy_runner = self.__get_runner(['sh', '-c', 'for i in 1 2 3 4 5 6; do echo tick; sleep 0.3; done'])
+        busy_runner.stall_window = 1
+        start = time.time()
+        for runner in (stalled_runner, busy_runner):
+            runner.start()
+        for runner in (stalled_runner, busy_runner):
+            runner.wait()
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(stalled_runner.get_error_type(), 'stalled')
+        self.assertEqual(stalled_runner.get_stdout(), b'started\n')
+        self.assertTrue(busy_runner.command_success)
+
+    def test_commands_run_concurrently_regardless_of_the_number_of_cpus(self):
+        manager = ParallelRunnerManagerFactory.get_parallel_runner_manager()
+        runners = [self.__get_runner(['sleep', '1']) for _ in range(4)]
+        manager.add_runners(runners)
+        start = time.time()
+        manager.start_runners()
+        manager.wait_all()
+        self.assertLess(time.time() - start, 3)
+        self.assertTrue(all([runner.command_success for runner in runners]))
+
+    def test_admission_control_limits_concurrency(self):
+        admission_controller = AdmissionController(max_concurrency=1, max_load_per_cpu=None, check_interval=0.1)
+        manager = ParallelRunnerManagerFactory.get_parallel_runner_manager(admission_controller=admission_controller)
+        runners = [self.__get_runner(['sleep', '0.3']) for _ in range(3)]
+        manager.add_runners(runners)
+        start = time.time()
+        manager.start_runners()
+        manager.wait_all()
+        self.assertGreaterEqual(time.time() - start, 0.9)
+        self.assertTrue(all([runner.command_success for runner in runners]))
+
+    def test_out_of_memory_killed_commands_are_retried(self):
+        folder = tempfile.mkdtemp()
+        try:
+            admission_controller = AdmissionController(max_concurrency=4, max_load_per_cpu=None)
+            manager = ParallelRunnerManagerFactory.get_parallel_runner_manager(
+                admission_controller=admission_controller)
+            # The first run simulates being killed by the OOM killer
+            runner = self.__get_runner("if [ -f killed ]; then echo survived; else touch killed; kill -9 $$; fi",
+                                       use_shell=True)
+            runner.current_working_directory = folder
+            manager.add_runner(runner)
+            manager.start_runners()
+            manager.wait_all()
+            self.assertTrue(runner.command_success)
+            self.assertEqual(runner.get_stdout(), b"survived\n")
+            self.assertEqual(admission_controller.get_max_concurrency(), 1)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def test_commands_killed_under_a_shell_are_taken_as_out_of_memory(self):
+        # The shell reports a child killed by SIGKILL as exit code 137
+        runner = self.__get_runner("sh -c 'kill -9 $$'; exit $?", use_shell=True)
+        runner.start()
+        runner.wait()
+        self.assertEqual(runner.command_return_code, 137)
+        self.assertEqual(runner.get_error_type(), 'out_of_memory')
+
+    def test_concurrency_limit_recovers_after_successful_runs(self):
+        admission_controller = AdmissionController(max_concurrency=4, max_load_per_cpu=None, recovery_runs=2)
+        runners = [mock.Mock(required_memory_mb=None, required_cpus=None) for _ in range(4)]
+        for runner in runners:
+            self.assertTrue(admission_controller.acquire(runner))
+        self.assertEqual(admission_controller.report_out_of_memory(runners[0]), 2)
+        for runner in runners:
+            admission_controller.release(runner)
+        self.assertEqual([admission_controller.report_success(runners[0]) for _ in range(6)], [2, 3, 3, 4, 4, 4])
+        self.assertEqual(admission_controller.get_max_concurrency(), 4)
+        # With no configured limit, it recovers up to the number of runners admitted when the system ran out of memory
+        admission_controller = AdmissionController(max_load_per_cpu=None, recovery_runs=1)
+        for runner in runners[:3]:
+            self.assertTrue(admission_controller.acquire(runner))
+        self.assertEqual(admission_controller.report_out_of_memory(runners[0]), 1)
+        self.assertEqual([admission_controller.report_success(runners[0]) for _ in range(3)], [2, None, None])
+
+
+class TestCommandLineRunnerPipeline(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    @staticmethod
+    def __run(pipeline):
+        pipeline.start()
+        pipeline.wait()
+        return pipeline
+
+    def test_stages_stream_from_file_to_file(self):
+        with open(os.path.join(self.__folder, 'input.txt'), 'w') as f:
+            f.write("".join(["{}\n".format(number % 3) for number in range(30000)]))
+        pipeline = CommandLineRunnerFactory.get_command_line_runner_pipeline()
+        pipeline.current_working_directory = self.__folder
+        pipeline.stdin_file = 'input.txt'
+        pipeline.stdout_file = 'output.txt'
+        pipeline.add_stage(['sort'])
+        pipeline.add_stage("uniq -c | awk '{print $2 \":\" $1}'", use_shell=True)
+        self.__run(pipeline)
+        self.assertTrue(pipeline.command_success, pipeline.get_error_messages())
+        self.assertEqual(pipeline.get_stage_return_codes(), [0, 0])
+        # Shell stages say nothing about the programs they run
+        self.assertIsNone(pipeline.get_timeout_key())
+        pipeline.timeout_history_by_program = True
+        self.assertIsNone(pipeline.get_timeout_key())
+        pipeline.stages[1].use_shell = False
+        self.assertEqual(pipeline.get_timeout_key(), 'command:sort|uniq')
+        with open(os.path.join(self.__folder, 'output.txt')) as f:
+            self.assertEqual(f.read(), "0:10000\n1:10000\n2:10000\n")
+
+    def test_early_exit_downstream_is_not_an_error(self):
+        pipeline = CommandLineRunnerFactory.get_command_line_runner_pipeline()
+        pipeline.add_stage(['yes'])
+        pipeline.add_stage(['head', '-n', '3'])
+        self.__run(pipeline)
+        self.assertTrue(pipeline.command_success, pipeline.get_error_messages())
+        self.assertEqual(pipeline.get_stdout(), b"y\ny\ny\n")
+        self.assertEqual(pipeline.get_stage_return_codes()[1], 0)
+
+    def test_stage_errors_are_reported(self):
+        pipeline = CommandLineRunnerFactory.get_command_line_runner_pipeline()
+        failing_stage = pipeline.add_stage(['sh', '-c', 'echo partial; echo broken >&2; exit 3'])
+        pipeline.add_stage(['cat'])
+        self.__run(pipeline)
+        self.assertTrue(pipeline.is_error())
+        self.assertEqual(pipeline.get_error_type(), 'return_code')
+        self.assertEqual(pipeline.get_stage_return_codes(), [3, 0])
+        self.assertEqual(pipeline.command_return_code, 3)
+        self.assertEqual(failing_stage.stderr, b"broken\n")
+        self.assertEqual(pipeline.get_stdout(), b"partial\n")
+        self.assertEqual([stage['return_code'] for stage in pipeline.get_result_details()['stages']], [3, 0])
+
+    def test_stage_timeout(self):
+        pipeline = CommandLineRunnerFactory.get_command_line_runner_pipeline()
+        pipeline.timeout = 60
+        slow_stage = pipeline.add_stage(['sleep', '30'], timeout=0.5)
+        pipeline.add_stage(['cat'])
+        start = time.time()
+        self.__run(pipeline)
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(pipeline.get_error_type(), 'timeout')
+        self.assertTrue(slow_stage.timed_out)
+        self.assertEqual(pipeline.get_stage_return_codes()[1], 0)
+
+
+class TestCommandResultCache(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+        self.__cache = CommandResultCache(os.path.join(self.__folder, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def __run(self, command):
+        runner = CommandLineRunnerFactory.get_multithread_command_line_runner()
+        runner.command = command
+        runner.use_shell = True
+        runner.current_working_directory = self.__folder
+        runner.result_cache = self.__cache
+        runner.input_files = ['input.txt']
+        runner.output_files = ['output.txt']
+        runner.start()
+        runner.wait()
+        return runner
+
+    def test_cache_hits_restore_results_and_outputs(self):
+        with open(os.path.join(self.__folder, 'input.txt'), 'w') as f:
+            f.write("input\n")
+        command = "echo run >> runs.txt; cat input.txt > output.txt; echo done"
+        first = self.__run(command)
+        self.assertFalse(first.cache_hit)
+        os.remove(os.path.join(self.__folder, 'output.txt'))
+        second = self.__run(command)
+        self.assertTrue(second.cache_hit)
+        self.assertTrue(second.command_success)
+        self.assertEqual(second.get_stdout(), b"done\n")
+        with open(os.path.join(self.__folder, 'output.txt')) as f:
+            self.assertEqual(f.read(), "input\n")
+        with open(os.path.join(self.__folder, 'runs.txt')) as f:
+            self.assertEqual(f.read(), "run\n")
+        # Changing the input files invalidates the cached result
+        with open(os.path.join(self.__folder, 'input.txt'), 'w') as f:
+            f.write("changed input\n")
+        self.assertFalse(self.__run(command).cache_hit)
+
+    def test_eviction_keeps_the_cache_within_its_size_limit(self):
+        # Room for two entries, of 100 bytes of standard output each, plus their result files
+        cache = CommandResultCache(os.path.join(self.__folder, 'small_cache'), max_size_mb=300 / (1024 * 1024))
+        cache.put('aa01', 0, b'x' * 100, b'')
+        # Folders moved aside for removal don't count towards the size of the cache, and they are never evicted
+        trash_folder = os.path.join(cache.get_cache_folder(), 'aa', ".aa00.{}.trash".format(uuid.uuid4().hex))
+        os.makedirs(trash_folder)
+        with open(os.path.join(trash_folder, 'stdout'), 'wb') as f:
+            f.write(b'x' * 1000)
+        entry_size = cache.get_size()
+        cache.put('aa02', 0, b'x' * 100, b'')
+        self.assertEqual(cache.get_size(), 2 * entry_size)
+        self.assertIsNotNone(cache.get('aa01'))
+        time.sleep(0.01)
+        # Using the first entry makes the second one the least recently used
+        cache.get('aa01')
+        cache.put('aa03', 0, b'x' * 100, b'')
+        self.assertEqual(cache.get_size(), 2 * entry_size)
+        self.assertIsNotNone(cache.get('aa01'))
+        self.assertIsNone(cache.get('aa02'))
+        self.assertIsNotNone(cache.get('aa03'))
+        self.assertTrue(os.path.isdir(trash_folder))
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
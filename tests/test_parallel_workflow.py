@@ -0,0 +1,77 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 18:40
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the parallel runners workflow module
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+# App imports
+from parallel.models import CommandLineRunnerFactory
+from parallel.workflow import WorkflowManager, STEP_STATUS_FINISHED, STEP_STATUS_CACHED, STEP_STATUS_FAILED, \
+    STEP_STATUS_CANCELLED
+
+
+class TestWorkflowManager(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def __get_runner(self, command):
+        runner = CommandLineRunnerFactory.get_multithread_command_line_runner()
+        runner.command = command
+        runner.use_shell = True
+        runner.current_working_directory = self.__folder
+        runner.timeout = 30
+        return runner
+
+    def __build_workflow(self, fingerprint_store_file=None):
+        workflow = WorkflowManager(fingerprint_store_file=fingerprint_store_file)
+        workflow.add_runner('download', self.__get_runner("echo data > downloaded.txt"))
+        workflow.add_runner('process', self.__get_runner("cat downloaded.txt >> processed.txt"),
+                            depends_on=['download'])
+        workflow.add_runner('publish', self.__get_runner("cat processed.txt >> published.txt"),
+                            depends_on=['process'],
+                            input_files=[os.path.join(self.__folder, 'processed.txt')])
+        return workflow
+
+    def test_steps_run_in_dependency_order(self):
+        workflow = self.__build_workflow()
+        self.assertTrue(workflow.run())
+        with open(os.path.join(self.__folder, 'published.txt')) as f:
+            self.assertEqual(f.read(), "data\n")
+
+    def test_failed_steps_cancel_their_dependants(self):
+        workflow = WorkflowManager()
+        workflow.add_runner('fail', self.__get_runner(['false']))
+        workflow.add_runner('dependant', self.__get_runner(['touch', 'never.txt']), depends_on=['fail'])
+        workflow.add_runner('independent', self.__get_runner(['touch', 'always.txt']))
+        self.assertFalse(workflow.run())
+        self.assertEqual(workflow.get_steps_status(), {'fail': STEP_STATUS_FAILED,
+                                                       'dependant': STEP_STATUS_CANCELLED,
+                                                       'independent': STEP_STATUS_FINISHED})
+        self.assertFalse(os.path.exists(os.path.join(self.__folder, 'never.txt')))
+
+    def test_unchanged_steps_are_skipped(self):
+        fingerprint_store_file = os.path.join(self.__folder, 'fingerprints.json')
+        self.assertTrue(self.__build_workflow(fingerprint_store_file).run())
+        workflow = self.__build_workflow(fingerprint_store_file)
+        self.assertTrue(workflow.run())
+        self.assertEqual(set(workflow.get_steps_status().values()), {STEP_STATUS_CACHED})
+        with open(os.path.join(self.__folder, 'published.txt')) as f:
+            self.assertEqual(f.read(), "data\n")
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
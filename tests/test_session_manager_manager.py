@@ -0,0 +1,162 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 11:40
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the session lifecycle management
+"""
+
+import os
+import time
+import shutil
+import tarfile
+import tempfile
+import unittest
+from unittest import mock
+# App imports
+import config_manager
+from toolbox import general
+from session_manager.exceptions import SessionArchiveException, SessionManagerException
+from session_manager.manager import SessionManager, SessionRetentionPolicy, Session, generate_session_id, \
+    is_session_in_use, SESSION_SUFFIX, ARCHIVE_EXTENSION
+
+
+class TestSessionManager(unittest.TestCase):
+    def setUp(self):
+        self.__folder_run = tempfile.mkdtemp()
+        self.__logger = config_manager.get_app_config_manager().get_logger_for(__name__)
+        self.__now = time.time()
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder_run, ignore_errors=True)
+
+    def __create_session(self, name, age_days=0, size=10):
+        session_path = os.path.join(self.__folder_run, "{}{}".format(name, SESSION_SUFFIX))
+        os.makedirs(os.path.join(session_path, 'logs'))
+        with open(os.path.join(session_path, 'logs', 'session.log'), 'wb') as f:
+            f.write(b'x' * size)
+        mtime = self.__now - (age_days * 86400)
+        os.utime(session_path, (mtime, mtime))
+        return session_path
+
+    def __get_session_manager(self, retention_policy, archive=True, current_session_id='current'):
+        return SessionManager(self.__folder_run,
+                              current_session_id + SESSION_SUFFIX,
+                              retention_policy,
+                              self.__logger,
+                              archive=archive)
+
+    @staticmethod
+    def __get_ids(sessions):
+        return [session.session_id for session in sessions]
+
+    def test_session_ids_are_unique_and_sort_chronologically(self):
+        session_ids = [generate_session_id() for _ in range(100)]
+        self.assertEqual(len(set(session_ids)), 100)
+        self.assertTrue(all([session_id.endswith(SESSION_SUFFIX) for session_id in session_ids]))
+        self.assertLessEqual(session_ids[0][:19], session_ids[-1][:19])
+
+    def test_retention_by_count_age_and_size(self):
+        sessions = [Session(self.__create_session("s{}".format(index), age_days=index, size=1024 * 1024))
+                    for index in range(5)]
+        ids = self.__get_ids(sessions)
+        # Oldest first
+        self.assertEqual(self.__get_ids(SessionRetentionPolicy(max_count=2)
+                                        .get_expired_sessions(sessions, now=self.__now)),
+                         [ids[4], ids[3], ids[2]])
+        self.assertEqual(self.__get_ids(SessionRetentionPolicy(max_age_days=2.5)
+                                        .get_expired_sessions(sessions, now=self.__now)),
+                         [ids[4], ids[3]])
+        self.assertEqual(self.__get_ids(SessionRetentionPolicy(max_total_size_mb=3)
+                                        .get_expired_sessions(sessions, now=self.__now)),
+                         [ids[4], ids[3]])
+        self.assertEqual(SessionRetentionPolicy().get_expired_sessions(sessions, now=self.__now), [])
+        policy = SessionRetentionPolicy.from_config({'max_age_days': 30, 'max_count': 50})
+        self.assertEqual((policy.max_age_days, policy.max_count, policy.max_total_size_mb), (30, 50, None))
+
+    def test_collect_garbage_archives_and_removes_expired_sessions(self):
+        old_session = self.__create_session('old', age_days=10)
+        recent_session = self.__create_session('recent')
+        current_session = self.__create_session('current', age_days=20)
+        session_manager = self.__get_session_manager(SessionRetentionPolicy(max_age_days=5))
+        self.assertEqual(session_manager.collect_garbage(), [os.path.basename(old_session)])
+        general.wait_for_folder_removals()
+        self.assertFalse(os.path.exists(old_session))
+        # The current session is never collected, whatever its age
+        self.assertTrue(os.path.isdir(recent_session))
+        self.assertTrue(os.path.isdir(current_session))
+        archive_path = os.path.join(session_manager.get_folder_archive(),
+                                    os.path.basename(old_session) + ARCHIVE_EXTENSION)
+        with tarfile.open(archive_path) as tar:
+            self.assertIn("{}/logs/session.log".format(os.path.basename(old_session)), tar.getnames())
+        self.assertEqual([name for name in os.listdir(session_manager.get_folder_archive()) if name.endswith('.tmp')],
+                         [])
+
+    def test_sessions_that_fail_to_archive_are_kept(self):
+        old_session = self.__create_session('old', age_days=10)
+        session_manager = self.__get_session_manager(SessionRetentionPolicy(max_age_days=5))
+        with mock.patch.object(tarfile.TarFile, 'add', side_effect=OSError("disk full")):
+            with self.assertRaises(SessionArchiveException):
+                session_manager.archive_session(Session(old_session))
+            self.assertEqual(session_manager.collect_garbage(), [])
+        self.assertTrue(os.path.isdir(old_session))
+        # No complete, nor half written, archive is left behind
+        self.assertEqual(os.listdir(session_manager.get_folder_archive()), [])
+        # Without archiving, expired sessions are just removed
+        self.assertEqual(self.__get_session_manager(SessionRetentionPolicy(max_age_days=5), archive=False)
+                         .collect_garbage(),
+                         [os.path.basename(old_session)])
+        general.wait_for_folder_removals()
+        self.assertFalse(os.path.exists(old_session))
+
+    def test_sessions_in_use_are_kept(self):
+        old_session = self.__create_session('old', age_days=10)
+        self.assertFalse(is_session_in_use(old_session))
+        # The process running the old session still holds its lock
+        running_session_manager = self.__get_session_manager(SessionRetentionPolicy(), current_session_id='old')
+        running_session_manager.lock_current_session()
+        self.assertTrue(is_session_in_use(old_session))
+        session_manager = self.__get_session_manager(SessionRetentionPolicy(max_age_days=5), archive=False)
+        self.assertEqual(session_manager.collect_garbage(), [])
+        self.assertTrue(os.path.isdir(old_session))
+
+    def test_interrupted_compaction_leftovers_are_removed(self):
+        session_manager = self.__get_session_manager(SessionRetentionPolicy())
+        general.check_create_folders([session_manager.get_folder_archive()])
+        stale_archive = os.path.join(session_manager.get_folder_archive(), "old-session.tar.gz.0123.tmp")
+        fresh_archive = os.path.join(session_manager.get_folder_archive(), "new-session.tar.gz.4567.tmp")
+        for archive in (stale_archive, fresh_archive):
+            with open(archive, 'wb') as f:
+                f.write(b'half written')
+        stale_trash = general.move_folder_aside(self.__create_session('removed'))
+        for stale in (stale_archive, stale_trash):
+            os.utime(stale, (self.__now - 7200, self.__now - 7200))
+        self.assertEqual(sorted(session_manager.remove_stale_leftovers(max_age=3600)),
+                         sorted([stale_archive, stale_trash]))
+        self.assertFalse(os.path.exists(stale_archive))
+        self.assertFalse(os.path.exists(stale_trash))
+        # A compaction in progress is left alone
+        self.assertTrue(os.path.isfile(fresh_archive))
+
+    def test_compactor(self):
+        old_session = self.__create_session('old', age_days=10)
+        session_manager = self.__get_session_manager(SessionRetentionPolicy(max_age_days=5), archive=False)
+        session_manager.start_compactor(0.1)
+        try:
+            with self.assertRaises(SessionManagerException):
+                session_manager.start_compactor(0.1)
+            deadline = time.time() + 10
+            while os.path.exists(old_session) and (time.time() < deadline):
+                time.sleep(0.1)
+        finally:
+            session_manager.stop_compactor()
+        self.assertFalse(os.path.exists(old_session))
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
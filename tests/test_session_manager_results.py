@@ -0,0 +1,87 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 07:15
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the session results store
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+# App imports
+from session_manager.exceptions import ResultsStoreException
+from session_manager.results import ResultsStore, Result, SUBSYSTEM_RUNNER, SUBSYSTEM_DOWNLOAD, \
+    RESULT_STATUS_ERROR
+
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+        self.__results_store = ResultsStore(os.path.join(self.__folder, 'results.sqlite'),
+                                            batch_size=100,
+                                            flush_interval=0.1)
+        for index in range(1000):
+            failed = (index % 10) == 0
+            self.__results_store.add(Result(SUBSYSTEM_RUNNER if index % 2 else SUBSYSTEM_DOWNLOAD,
+                                            "job-{:04d}".format(index),
+                                            not failed,
+                                            error_type=('timeout' if index % 20 == 0 else 'return_code')
+                                            if failed else None,
+                                            duration=float(index),
+                                            details={'index': index}))
+        self.__results_store.flush()
+
+    def tearDown(self):
+        self.__results_store.close()
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def test_query_filters(self):
+        self.assertEqual(len(self.__results_store.query()), 1000)
+        failed = self.__results_store.get_failed()
+        self.assertEqual(len(failed), 100)
+        self.assertTrue(all([result['status'] == RESULT_STATUS_ERROR for result in failed]))
+        timeouts = self.__results_store.query(error_type='timeout')
+        self.assertEqual([result['name'] for result in timeouts][:2], ['job-0000', 'job-0020'])
+        self.assertEqual(self.__results_store.query(name_contains='job-012')[0]['details'], {'index': 120})
+        self.assertEqual(len(self.__results_store.query(subsystem=SUBSYSTEM_RUNNER, min_duration=900)), 50)
+
+    def test_slowest(self):
+        self.assertEqual([result['name'] for result in self.__results_store.get_slowest(3)],
+                         ['job-0999', 'job-0998', 'job-0997'])
+        with self.assertRaises(ResultsStoreException):
+            self.__results_store.query(order_by='duration; DROP TABLE results')
+
+    def test_summary(self):
+        summary = {(entry['subsystem'], entry['status'], entry['error_type']): entry['count']
+                   for entry in self.__results_store.get_summary()}
+        self.assertEqual(summary[(SUBSYSTEM_DOWNLOAD, 'error', 'timeout')], 50)
+        self.assertEqual(summary[(SUBSYSTEM_DOWNLOAD, 'error', 'return_code')], 50)
+        self.assertEqual(summary[(SUBSYSTEM_RUNNER, 'success', None)], 500)
+
+    def test_results_that_cannot_be_serialized_are_reported(self):
+        self.__results_store.add(Result(SUBSYSTEM_RUNNER, 'broken', True, details={'value': object()}))
+        self.__results_store.add(Result(SUBSYSTEM_RUNNER, 'fine', True))
+        with self.assertRaises(ResultsStoreException):
+            self.__results_store.flush()
+        # The writer keeps going
+        self.__results_store.add(Result(SUBSYSTEM_RUNNER, 'after', True))
+        self.__results_store.flush()
+        self.assertEqual([result['name'] for result in self.__results_store.query(order_by='id')][1000:],
+                         ['fine', 'after'])
+
+    def test_results_are_kept_across_instances(self):
+        self.__results_store.close()
+        with self.assertRaises(ResultsStoreException):
+            self.__results_store.add(Result(SUBSYSTEM_RUNNER, 'late', True))
+        self.assertEqual(len(ResultsStore(self.__results_store.get_db_file()).query()), 1000)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,123 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 11:10
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the live session status
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import tempfile
+import unittest
+import http.client
+# App imports
+import config_manager
+from parallel.models import CommandLineRunnerFactory, ParallelRunnerManagerFactory
+from download_manager.manager import Manager as DownloadManager
+from session_manager.exceptions import StatusServerException
+from session_manager.status import StatusServer, get_status_snapshot
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, unix_socket_path):
+        super().__init__('localhost')
+        self.__unix_socket_path = unix_socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.__unix_socket_path)
+
+
+class TestStatus(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    @staticmethod
+    def __get(connection, path):
+        connection.request('GET', path)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response.status, json.loads(body) if response.status == 200 else None
+
+    def test_runners_status(self):
+        token = uuid.uuid4().hex
+        manager = ParallelRunnerManagerFactory.get_parallel_runner_manager()
+        running_runner = CommandLineRunnerFactory.get_multithread_command_line_runner()
+        running_runner.command = ['sh', '-c', "printf '%01000d' 0; sleep 2 # {}".format(token)]
+        manager.add_runner(running_runner)
+        manager.start_runners()
+        time.sleep(1)
+        status = manager.get_status()
+        self.assertEqual((status['queued'], status['running'], status['finished']), (0, 1, 0))
+        self.assertEqual(status['in_flight'][0]['runner'], running_runner.get_description())
+        self.assertEqual(status['in_flight'][0]['progress_bytes'], 1000)
+        # Managers are part of the session status snapshot
+        self.assertIn(token, json.dumps(get_status_snapshot()['runners']))
+        failing_runner = CommandLineRunnerFactory.get_multithread_command_line_runner()
+        failing_runner.command = ['false', token]
+        manager.add_runner(failing_runner)
+        manager.start_runners()
+        manager.wait_all()
+        status = manager.get_status()
+        self.assertEqual((status['queued'], status['running'], status['finished'], status['failed']), (0, 0, 2, 1))
+        self.assertEqual(status['error_types'], {'return_code': 1})
+        self.assertEqual(status['error_rate'], 0.5)
+
+    def test_downloads_status(self):
+        download_manager = DownloadManager([],
+                                           self.__folder,
+                                           config_manager.get_app_config_manager().get_logger_for(__name__))
+        status = download_manager.get_status()
+        self.assertEqual((status['queued'], status['running'], status['finished']), (0, 0, 0))
+        self.assertIsNone(status['error_rate'])
+        self.assertIn(status, get_status_snapshot()['downloads'])
+
+    def test_status_server(self):
+        status_server = StatusServer('127.0.0.1:0')
+        status_server.start()
+        try:
+            host, port = status_server.get_address().rsplit(':', 1)
+            status, snapshot = self.__get(http.client.HTTPConnection(host, int(port), timeout=10), '/status')
+            self.assertEqual(status, 200)
+            self.assertEqual(snapshot['session_id'], config_manager.get_app_config_manager().get_session_id())
+            self.assertTrue({'runners', 'downloads', 'executor'}.issubset(snapshot))
+            status, executor_status = self.__get(http.client.HTTPConnection(host, int(port), timeout=10),
+                                                 '/status/executor')
+            self.assertEqual(status, 200)
+            self.assertIsInstance(executor_status, dict)
+            status, _ = self.__get(http.client.HTTPConnection(host, int(port), timeout=10), '/status/session_id')
+            self.assertEqual(status, 404)
+        finally:
+            status_server.stop()
+
+    def test_status_server_on_unix_socket(self):
+        unix_socket_path = os.path.join(self.__folder, 'status.sock')
+        status_server = StatusServer('unix:' + unix_socket_path)
+        status_server.start()
+        try:
+            status, runners_status = self.__get(_UnixHTTPConnection(unix_socket_path), '/status/runners')
+            self.assertEqual(status, 200)
+            self.assertIsInstance(runners_status, list)
+        finally:
+            status_server.stop()
+        self.assertFalse(os.path.exists(unix_socket_path))
+        with self.assertRaises(StatusServerException):
+            StatusServer('localhost')
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
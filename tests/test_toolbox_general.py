@@ -0,0 +1,199 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 15:40
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the general toolbox module
+"""
+
+import io
+import os
+import gzip
+import zlib
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+# App imports
+from toolbox import general
+from exceptions import ToolBoxException
+
+
+class TestFolderOperations(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        general.wait_for_folder_removals()
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def test_create_folders_parallel_reports_errors_per_folder(self):
+        not_a_folder = os.path.join(self.__folder, 'file')
+        open(not_a_folder, 'w').close()
+        folders = [os.path.join(self.__folder, 'a', 'b'), os.path.join(self.__folder, 'c'), not_a_folder]
+        folders_with_error = general.create_folders_parallel(folders)
+        self.assertEqual([folder for (folder, error) in folders_with_error], [not_a_folder])
+        self.assertTrue(os.path.isdir(folders[0]))
+        self.assertTrue(os.path.isdir(folders[1]))
+
+    def test_check_create_folders_overwrite_empties_folders(self):
+        folder = os.path.join(self.__folder, 'session')
+        os.makedirs(os.path.join(folder, 'subfolder'))
+        open(os.path.join(folder, 'subfolder', 'file'), 'w').close()
+        general.check_create_folders_overwrite([folder])
+        self.assertEqual(os.listdir(folder), [])
+        self.assertEqual(general.wait_for_folder_removals(), [])
+        self.assertEqual(os.listdir(self.__folder), ['session'])
+
+    def test_folder_removals_are_pruned_and_failures_reported(self):
+        folder = os.path.join(self.__folder, 'to_remove')
+        os.makedirs(folder)
+        with mock.patch('shutil.rmtree', side_effect=OSError("device busy")):
+            self.assertEqual(general.remove_folders_async([folder]), [])
+            deadline = time.time() + 10
+            while general._folder_removal_pending and (time.time() < deadline):
+                time.sleep(0.05)
+        # Finished deletions don't pile up until someone waits for them
+        self.assertEqual(general._folder_removal_pending, [])
+        folders_with_error = general.wait_for_folder_removals()
+        self.assertEqual([folder for (folder, error) in folders_with_error], [folder])
+        self.assertIn("device busy", folders_with_error[0][1])
+        self.assertEqual(general.wait_for_folder_removals(), [])
+
+
+class TestReleases(unittest.TestCase):
+    def setUp(self):
+        self.__releases_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        general.wait_for_folder_removals()
+        shutil.rmtree(self.__releases_folder, ignore_errors=True)
+
+    def __publish(self, version, keep_releases=None):
+        staging_folder = general.create_release_staging_folder(self.__releases_folder)
+        with open(os.path.join(staging_folder, 'version.txt'), 'w') as version_file:
+            version_file.write(version)
+        return general.publish_release(staging_folder, self.__releases_folder, version=version,
+                                       keep_releases=keep_releases)
+
+    def test_latest_points_to_the_last_published_release(self):
+        self.__publish('v1')
+        release_folder = self.__publish('v2')
+        latest = os.path.join(self.__releases_folder, 'latest')
+        self.assertEqual(os.readlink(latest), release_folder)
+        with open(os.path.join(latest, 'version.txt')) as version_file:
+            self.assertEqual(version_file.read(), 'v2')
+
+    def test_old_releases_are_pruned(self):
+        for version in ['v1', 'v2', 'v3']:
+            self.__publish(version, keep_releases=2)
+        self.assertEqual(general.wait_for_folder_removals(), [])
+        self.assertEqual([os.path.basename(release) for release in general.get_releases(self.__releases_folder)],
+                         ['v2', 'v3'])
+        self.assertEqual(sorted(os.listdir(self.__releases_folder)), ['latest', 'v2', 'v3'])
+
+    def test_releases_are_pruned_by_publish_time(self):
+        # Sorted by name, 'v10' and 'v11' would come before 'v9'
+        for version in ['v9', 'v10', 'v11']:
+            self.__publish(version, keep_releases=2)
+        self.assertEqual(general.wait_for_folder_removals(), [])
+        self.assertEqual([os.path.basename(release) for release in general.get_releases(self.__releases_folder)],
+                         ['v10', 'v11'])
+        self.assertEqual(sorted(os.listdir(self.__releases_folder)), ['latest', 'v10', 'v11'])
+
+
+class TestBuildCommandArguments(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def __create_executable(self, folder_name, executable_name):
+        folder = os.path.join(self.__folder, folder_name)
+        os.makedirs(folder)
+        executable = os.path.join(folder, executable_name)
+        with open(executable, 'w') as f:
+            f.write("#!/bin/sh\n")
+        os.chmod(executable, 0o755)
+        return folder, executable
+
+    def test_executables_are_resolved_in_the_current_path(self):
+        first_folder, first_executable = self.__create_executable('first', 'tool')
+        second_folder, second_executable = self.__create_executable('second', 'tool')
+        with mock.patch.dict(os.environ, {'PATH': first_folder}):
+            self.assertEqual(general.build_command_arguments("tool --flag"), [first_executable, '--flag'])
+        with mock.patch.dict(os.environ, {'PATH': second_folder}):
+            self.assertEqual(general.build_command_arguments(['tool']), [second_executable])
+        self.assertEqual(general.build_command_arguments("tool", shell=True), "tool")
+
+
+class TestParallelGzip(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+        # Some of it compressible, some of it not
+        self.__data = b''.join([os.urandom(1000) + (b'%08d' % index) * 500 for index in range(200)])
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def __count_members(self, compressed_data):
+        members = 0
+        while compressed_data:
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            decompressor.decompress(compressed_data)
+            compressed_data = decompressor.unused_data
+            members += 1
+        return members
+
+    def test_roundtrip_multi_member(self):
+        destination = io.BytesIO()
+        bytes_in, bytes_out = general.gzip_stream(io.BytesIO(self.__data),
+                                                  destination,
+                                                  compression_level=1,
+                                                  block_size=64 * 1024,
+                                                  max_workers=4)
+        compressed_data = destination.getvalue()
+        self.assertEqual((bytes_in, bytes_out), (len(self.__data), len(compressed_data)))
+        self.assertEqual(gzip.decompress(compressed_data), self.__data)
+        self.assertEqual(self.__count_members(compressed_data), -(-len(self.__data) // (64 * 1024)))
+
+    def test_output_does_not_depend_on_workers(self):
+        outputs = []
+        for max_workers in (1, 3):
+            destination = io.BytesIO()
+            general.gzip_stream(io.BytesIO(self.__data), destination, block_size=100000, max_workers=max_workers)
+            outputs.append(destination.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_empty_input(self):
+        destination = io.BytesIO()
+        general.gzip_stream(io.BytesIO(b''), destination)
+        self.assertEqual(gzip.decompress(destination.getvalue()), b'')
+
+    def test_invalid_compression_level(self):
+        with self.assertRaises(ToolBoxException):
+            general.ParallelGzipWriter(io.BytesIO(), compression_level=0)
+
+    def test_gzip_files_then_gunzip_files(self):
+        file = os.path.join(self.__folder, 'data.txt')
+        with open(file, 'wb') as f:
+            f.write(self.__data)
+        missing_file = os.path.join(self.__folder, 'missing.txt')
+        self.assertEqual([file_with_error for (file_with_error, error)
+                          in general.gzip_files([file, missing_file], block_size=32 * 1024)],
+                         [missing_file])
+        self.assertEqual(os.listdir(self.__folder), ['data.txt.gz'])
+        self.assertEqual(general.gunzip_files([file + '.gz']), [])
+        with open(file, 'rb') as f:
+            self.assertEqual(f.read(), self.__data)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,72 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 06:05
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the session profiling module
+"""
+
+import os
+import time
+import pstats
+import shutil
+import tempfile
+import unittest
+import threading
+import tracemalloc
+# App imports
+from exceptions import ToolBoxException
+from toolbox.profiling import SessionProfiler, parse_profiling_modes, PROFILING_MODES
+
+
+def _busy_work(deadline):
+    values = []
+    while time.monotonic() < deadline:
+        values.append(sum([index * index for index in range(1000)]))
+    return values
+
+
+class TestSessionProfiler(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def test_parse_profiling_modes(self):
+        self.assertEqual(parse_profiling_modes('cprofile, sampling'), ['cprofile', 'sampling'])
+        self.assertEqual(parse_profiling_modes([]), [])
+        with self.assertRaises(ToolBoxException):
+            parse_profiling_modes('cprofile,perf')
+
+    def test_all_profiling_modes(self):
+        output_folder = os.path.join(self.__folder, 'profiling')
+        profiler = SessionProfiler(PROFILING_MODES, output_folder, tracemalloc_interval=0.2, sampling_interval=0.005)
+        profiler.start()
+        worker = threading.Thread(target=_busy_work, args=(time.monotonic() + 0.5,), name='ProfiledWorker')
+        worker.start()
+        _busy_work(time.monotonic() + 0.5)
+        worker.join()
+        output_files = [os.path.basename(output_file) for output_file in profiler.stop()]
+        self.assertIn('profile.pstats', output_files)
+        self.assertIn('stacks.collapsed', output_files)
+        self.assertIn('tracemalloc-0001.txt', output_files)
+        self.assertFalse(tracemalloc.is_tracing())
+        # Outputs can be read back with the standard tools
+        function_names = [function[2] for function in pstats.Stats(os.path.join(output_folder, 'profile.pstats')).stats]
+        self.assertIn('_busy_work', function_names)
+        snapshot_files = sorted([output_file for output_file in output_files if output_file.endswith('.snapshot')])
+        self.assertTrue(tracemalloc.Snapshot.load(os.path.join(output_folder, snapshot_files[-1])).traces)
+        with open(os.path.join(output_folder, 'stacks.collapsed')) as f:
+            stacks = [line.rsplit(' ', 1) for line in f.read().splitlines()]
+        self.assertTrue(any([stack.startswith('ProfiledWorker;') and ('_busy_work' in stack) and int(count) > 0
+                             for stack, count in stacks]))
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
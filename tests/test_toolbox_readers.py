@@ -0,0 +1,90 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 17:40
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for the fast readers toolbox module
+"""
+
+import os
+import json
+import math
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+# App imports
+from toolbox import readers
+
+
+class TestReaders(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def __write_file(self, name, content):
+        file_path = os.path.join(self.__folder, name)
+        with open(file_path, 'w') as f:
+            f.write(content)
+        return file_path
+
+    def test_iter_json_lines_skips_empty_lines(self):
+        file_path = self.__write_file('data.jsonl', '{"a": 1}\n\n[1, 2]\n"last"')
+        self.assertEqual(list(readers.iter_json_lines(file_path)), [{'a': 1}, [1, 2], 'last'])
+        self.assertEqual(list(readers.iter_json_lines(self.__write_file('empty.jsonl', ''))), [])
+
+    def test_iter_json_array_with_elements_split_across_chunks(self):
+        elements = [12345, "a string, with ] inside", {"nested": [1, 2, {"x": None}]}, 1.5e10, True, []]
+        file_path = self.__write_file('data.json', json.dumps(elements, indent=2))
+        self.assertEqual(list(readers.iter_json_array(file_path, chunk_size=3)), elements)
+        self.assertEqual(list(readers.iter_json_array(self.__write_file('empty.json', ' [ ] '))), [])
+
+    def test_iter_json_array_with_numbers_split_across_chunks(self):
+        self.assertEqual(list(readers.iter_json_array(self.__write_file('float.json', '[1.5, 2]'), chunk_size=3)),
+                         [1.5, 2])
+        self.assertEqual(list(readers.iter_json_array(self.__write_file('exponent.json', '[123e5]'), chunk_size=5)),
+                         [12300000.0])
+
+    def test_iter_json_array_decodes_every_element_once(self):
+        elements = [{"text": "escaped \\ \" ] } characters " * 50, "list": list(range(500))}, "last"]
+        file_path = self.__write_file('big.json', json.dumps(elements))
+        with mock.patch.object(json.JSONDecoder, 'raw_decode', autospec=True,
+                               side_effect=json.JSONDecoder.raw_decode) as raw_decode:
+            self.assertEqual(list(readers.iter_json_array(file_path, chunk_size=7)), elements)
+        self.assertEqual(raw_decode.call_count, len(elements))
+
+    def test_json_loads_uses_the_standard_library_by_default(self):
+        self.assertTrue(math.isnan(readers.json_loads('NaN')))
+        self.assertEqual(readers.json_loads(str(2 ** 70)), 2 ** 70)
+
+    def test_iter_json_array_rejects_malformed_documents(self):
+        with self.assertRaises(ValueError):
+            list(readers.iter_json_array(self.__write_file('object.json', '{"a": 1}')))
+        with self.assertRaises(ValueError):
+            list(readers.iter_json_array(self.__write_file('unclosed.json', '[1, 2')))
+        with self.assertRaises(ValueError):
+            list(readers.iter_json_array(self.__write_file('trailing_comma.json', '[1, 2,]')))
+        with self.assertRaises(ValueError):
+            list(readers.iter_json_array(self.__write_file('trailing_data.json', '[1, 2] \n[3]')))
+        with self.assertRaises(ValueError):
+            list(readers.iter_json_array(self.__write_file('truncated_number.json', '[1, 2e'), chunk_size=5))
+        self.assertEqual(list(readers.iter_json_array(self.__write_file('trailing_space.json', '[1, 2] \n'))), [1, 2])
+
+    def test_parsed_file_cache_reloads_modified_files(self):
+        file_path = self.__write_file('config.json', '{"version": 1}')
+        cache = readers.ParsedFileCache()
+        first = cache.get(file_path)
+        self.assertIs(cache.get(file_path), first)
+        self.__write_file('config.json', '{"version": 22}')
+        self.assertEqual(cache.get(file_path), {'version': 22})
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,111 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 10:20
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Unit Tests for stall detection and adaptive timeouts
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+# App imports
+from toolbox import general
+from toolbox.timeouts import TimeoutHistory, build_stall_detector, get_command_history_key, get_download_history_key
+
+
+class TestStallDetection(unittest.TestCase):
+    def test_stall_detector(self):
+        stall_detector = general.StallDetector(min_rate=100, window=10)
+        stall_detector.update(0, now=0)
+        stall_detector.update(500, now=5)
+        # Not observed for long enough
+        self.assertFalse(stall_detector.is_stalled(now=9))
+        stall_detector.update(1500, now=10)
+        self.assertFalse(stall_detector.is_stalled(now=10))
+        # Only 500 bytes over the last 10 seconds
+        stall_detector.update(2000, now=20)
+        self.assertTrue(stall_detector.is_stalled(now=20))
+        stall_detector.update(4000, now=25)
+        self.assertFalse(stall_detector.is_stalled(now=25))
+
+    def test_stalled_process_is_stopped(self):
+        process = general.spawn_subprocess(['sh', '-c', 'echo started; sleep 30'])
+        start = time.monotonic()
+        stdout, stderr, stop_reason = general.communicate_with_progress(process,
+                                                                        stall_detector=general.StallDetector(1, 1))
+        self.assertEqual(stop_reason, general.STOP_REASON_STALLED)
+        self.assertEqual(stdout, b'started\n')
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertIsNotNone(process.returncode)
+
+    def test_process_making_progress_is_not_stopped(self):
+        process = general.spawn_subprocess(['sh', '-c', 'for i in 1 2 3 4 5 6; do echo tick; sleep 0.3; done'])
+        stdout, stderr, stop_reason = general.communicate_with_progress(process,
+                                                                        stall_detector=general.StallDetector(1, 1))
+        self.assertIsNone(stop_reason)
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(stdout.count(b'tick'), 6)
+
+    def test_timeout(self):
+        process = general.spawn_subprocess(['sh', '-c', 'while true; do echo busy; sleep 0.1; done'])
+        stdout, stderr, stop_reason = general.communicate_with_progress(process, timeout=1)
+        self.assertEqual(stop_reason, general.STOP_REASON_TIMEOUT)
+
+
+class TestTimeoutHistory(unittest.TestCase):
+    def setUp(self):
+        self.__folder = tempfile.mkdtemp()
+        self.__history_file = os.path.join(self.__folder, 'timeout_history.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.__folder, ignore_errors=True)
+
+    def test_history_keys(self):
+        self.assertEqual(get_command_history_key("/usr/bin/gunzip -k 'some file.gz'"), 'command:gunzip')
+        self.assertEqual(get_command_history_key(['samtools', 'sort']), 'command:samtools')
+        self.assertEqual(get_download_history_key('https://ftp.example.org:8443/pub/data.gz'),
+                         'download:https://ftp.example.org:8443')
+
+    def test_estimates(self):
+        history = TimeoutHistory(self.__history_file, max_samples=100)
+        self.assertIsNone(history.estimate_timeout('command:slow', min_samples=10))
+        for duration in range(1, 201):
+            history.record('command:slow', duration)
+        # Only the latest 100 durations, from 101 to 200, are kept
+        self.assertEqual(len(history.get_samples('command:slow')), 100)
+        self.assertEqual(history.estimate_timeout('command:slow', percentile_rank=100, multiplier=2), 400)
+        self.assertEqual(history.estimate_timeout('command:slow', percentile_rank=0, multiplier=0.1, min_timeout=60),
+                         60)
+        for throughput in range(10):
+            history.record('download:http://example.org', 1000 * (throughput + 1))
+        self.assertEqual(history.estimate_min_rate('download:http://example.org', percentile_rank=0, divisor=10), 100)
+        stall_detector = build_stall_detector({'stall_window_seconds': 5, 'stall_min_rate_bytes_per_second': 10,
+                                               'history_percentile': 0, 'history_divisor': 10},
+                                              history,
+                                              'download:http://example.org')
+        self.assertEqual(stall_detector.get_min_rate(), 100)
+        self.assertEqual(stall_detector.get_window(), 5)
+        self.assertIsNone(build_stall_detector({'stall_window_seconds': None}, history, 'download:http://example.org'))
+
+    def test_history_is_kept_across_instances(self):
+        history = TimeoutHistory(self.__history_file)
+        for duration in range(20):
+            history.record('command:gunzip', duration)
+        history.save()
+        self.assertEqual(TimeoutHistory(self.__history_file).get_samples('command:gunzip'), list(range(20)))
+        # A broken history file is not an error, the history starts over
+        with open(self.__history_file, 'w') as f:
+            f.write('{broken')
+        self.assertEqual(TimeoutHistory(self.__history_file).get_samples('command:gunzip'), [])
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
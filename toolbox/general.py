@@ -12,12 +12,51 @@ Application general toolbox module
 """
 
 import os
+import gzip
 import json
+import time
+import uuid
+import shlex
+import signal
+import selectors
+import functools
+import itertools
+import hashlib
 import shutil
+import logging
+import threading
 import subprocess
+import collections
+from concurrent.futures import ThreadPoolExecutor
 # App modules
 from exceptions import ToolBoxException
 
+# Bulk folder operations
+# WARNING! - MAGIC NUMBER AHEAD!!! - Folder operations are I/O bound, mostly waiting on metadata round trips to the
+# (possibly network) file system, so we can afford more workers than cores
+_folder_operations_max_workers = 8
+# Background executor for deleting folders that have been moved aside, the deletions it's still working on, and the
+# latest of those that failed, not yet reported by 'wait_for_folder_removals'
+_folder_removal_executor = None
+_folder_removal_condition = threading.Condition()
+_folder_removal_pending = []
+# WARNING! - MAGIC NUMBER AHEAD!!! - Failed deletions are logged anyway, only the latest ones are kept for reporting
+_folder_removal_errors = collections.deque(maxlen=1000)
+# Parallel gzip compression
+# WARNING! - MAGIC NUMBER AHEAD!!! - Blocks big enough for the compression ratio to be close to the one of a single
+# stream, and small enough for keeping every core busy on medium sized files
+_gzip_block_size_default = 4 * 1024 * 1024
+_gzip_compression_level_default = 6
+# Stall detection for subprocesses, processes stopped for making no progress, or for taking too long
+STOP_REASON_STALLED = 'stalled'
+STOP_REASON_TIMEOUT = 'timeout'
+# WARNING! - MAGIC NUMBER AHEAD!!! - Seconds between progress checks, and size of the reads from subprocess pipes
+_progress_poll_interval = 0.5
+_subprocess_read_size = 64 * 1024
+# WARNING! - MAGIC NUMBER AHEAD!!! - A gunzip process not writing, at least, 1KB/s over 30 seconds is hung
+_gunzip_stall_window_default = 30
+_gunzip_stall_min_rate_default = 1024
+
 
 def read_json(json_file="json_file_not_specified.json"):
     """
@@ -37,15 +76,9 @@ def check_create_folders(folders):
     :param folders: list of folder paths to check
     :return: no return value
     """
-    for folder in folders:
-        if not os.path.exists(folder):
-            try:
-                os.makedirs(folder)
-            except Exception as e:
-                raise ToolBoxException(str(e))
-        else:
-            if not os.path.isdir(folder):
-                raise ToolBoxException("'{}' is not a folder".format(folder))
+    folders_with_error = create_folders_parallel(folders)
+    if folders_with_error:
+        raise ToolBoxException("; ".join([error for (folder, error) in folders_with_error]))
 
 
 def check_create_folders_overwrite(folders):
@@ -64,13 +97,123 @@ def check_create_folders_overwrite(folders):
         # If there's any invalid folder, we don't make any change, and we report the situation by raising an exception
         raise ToolBoxException("The following folders ARE NOT FOLDERS - '{}'"
                                .format(invalid_folders))
+    # Fast path delete, the folders are moved out of the way and their content is removed in the background
+    folders_with_error = remove_folders_async(folders)
+    if folders_with_error:
+        raise ToolBoxException("The following folders COULD NOT BE REMOVED - '{}'".format(folders_with_error))
+    folders_with_error = create_folders_parallel(folders)
+    if folders_with_error:
+        raise ToolBoxException("The following folders COULD NOT BE CREATED - '{}'".format(folders_with_error))
+
+
+def _get_folder_removal_executor():
+    global _folder_removal_executor
+    if _folder_removal_executor is None:
+        _folder_removal_executor = ThreadPoolExecutor(max_workers=_folder_operations_max_workers,
+                                                      thread_name_prefix='FolderRemoval')
+    return _folder_removal_executor
+
+
+def move_folder_aside(folder):
+    """
+    Atomically rename the given folder to a hidden 'trash' name in its same parent folder, so it is gone from its
+    original path, but its content is still there to be removed later on.
+
+    As the new name lives in the same parent folder, this is a rename within the same file system, i.e. a single
+    metadata operation no matter how big the folder tree is.
+    :param folder: path to the folder to move aside
+    :return: the path where the folder has been moved to
+    """
+    folder = os.path.normpath(folder)
+    trash_path = os.path.join(os.path.dirname(folder),
+                              ".{}.{}.trash".format(os.path.basename(folder), uuid.uuid4().hex))
+    os.rename(folder, trash_path)
+    return trash_path
+
+
+def remove_folders_async(folders):
+    """
+    Remove the given folders without waiting for their content to be deleted, i.e. every folder is moved aside
+    atomically, and then deleted by a background pool of threads. Folders that don't exist are ignored.
+
+    The paths are free to be re-used as soon as this method returns, use 'wait_for_folder_removals' to wait for the
+    background deletions to complete.
+    :param folders: list of folder paths to remove
+    :return: a list of (folder, error message) for those folders that could not be moved aside
+    """
+    folders_with_error = []
     for folder in folders:
+        if not os.path.lexists(folder):
+            continue
+        if not os.path.isdir(folder) or os.path.islink(folder):
+            folders_with_error.append((folder, "it IS NOT A FOLDER"))
+            continue
         try:
-            shutil.rmtree(folder)
-        except FileNotFoundError as e:
-            # It is find if the folder is not there
-            pass
-    check_create_folders(folders)
+            trash_path = move_folder_aside(folder)
+        except Exception as e:
+            folders_with_error.append((folder, "ERROR moving folder aside ---> {}".format(e)))
+            continue
+        future = _get_folder_removal_executor().submit(shutil.rmtree, trash_path)
+        with _folder_removal_condition:
+            _folder_removal_pending.append((folder, future))
+        future.add_done_callback(functools.partial(_on_folder_removal_done, folder))
+    return folders_with_error
+
+
+def _on_folder_removal_done(folder, future):
+    with _folder_removal_condition:
+        _folder_removal_pending.remove((folder, future))
+        if future.exception() is not None:
+            _folder_removal_errors.append((folder, "ERROR deleting folder content ---> {}".format(future.exception())))
+        _folder_removal_condition.notify_all()
+    if future.exception() is not None:
+        logging.getLogger(__name__).error("Folder '{}' content could NOT be deleted ---> {}"
+                                          .format(folder, future.exception()))
+
+
+def wait_for_folder_removals(timeout=None):
+    """
+    Wait for the background folder deletions started via 'remove_folders_async' to finish
+    :param timeout: maximum number of seconds to wait, 'None' means waiting for as long as it takes
+    :return: a list of (folder, error message) for those folders whose content could not be deleted, since the last
+    time this was called
+    """
+    with _folder_removal_condition:
+        pending = list(_folder_removal_pending)
+        # Deletions are over once they are no longer pending, i.e. their outcome has been recorded
+        _folder_removal_condition.wait_for(lambda: not any([removal in _folder_removal_pending for removal in pending]),
+                                           timeout=timeout)
+        folders_with_error = list(_folder_removal_errors)
+        _folder_removal_errors.clear()
+    return folders_with_error
+
+
+def _create_folder(folder):
+    if os.path.exists(folder):
+        if not os.path.isdir(folder):
+            return "'{}' is not a folder".format(folder)
+        return None
+    try:
+        os.makedirs(folder, exist_ok=True)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def create_folders_parallel(folders):
+    """
+    Check if folders exist, creating them otherwise, this is done in parallel, and, unlike 'check_create_folders', it
+    won't raise an exception, but report every folder that could not be created
+    :param folders: list of folder paths to check
+    :return: a list of (folder, error message) for those folders that could not be created
+    """
+    folders = list(folders)
+    if not folders:
+        return []
+    with ThreadPoolExecutor(max_workers=min(_folder_operations_max_workers, len(folders)),
+                            thread_name_prefix='FolderCreation') as executor:
+        results = executor.map(_create_folder, folders)
+        return [(folder, error) for (folder, error) in zip(folders, results) if error is not None]
 
 
 def create_latest_symlink(destination_path):
@@ -90,51 +233,546 @@ def create_latest_symlink_overwrite(destination_path):
     Create a symlink 'latest' to the given destination_path in its parent folder, i.e. if the given path is
     '/nfs/production/folder', the symlink will be
             /nfs/production/latest -> /nfs/production/folder
-    If there already is a 'latest' symlink, it will be overwritten
+    If there already is a 'latest' symlink, it will be atomically overwritten
     :param destination_path: destination path where the symlink will point to
     :return: no return value
     """
-    symlink_path = os.path.join(os.path.dirname(destination_path), 'latest')
-    if os.path.islink(symlink_path):
-        os.unlink(symlink_path)
-    os.symlink(destination_path, symlink_path)
+    parent_folder = os.path.dirname(destination_path)
+    symlink_path = os.path.join(parent_folder, 'latest')
+    _remove_stale_temporary_symlinks(symlink_path)
+    # The new symlink is created under a temporary name, and then renamed over the current one, so 'latest' is always
+    # there for readers, pointing either to the previous destination or the new one
+    symlink_path_tmp = "{}.{}.tmp".format(symlink_path, uuid.uuid4().hex)
+    os.symlink(destination_path, symlink_path_tmp)
+    try:
+        os.replace(symlink_path_tmp, symlink_path)
+    except Exception:
+        os.unlink(symlink_path_tmp)
+        raise
+    # Make the switch durable, so a crash doesn't bring back the previous 'latest' symlink
+    fsync_folder(parent_folder)
+
+
+def _remove_stale_temporary_symlinks(symlink_path):
+    """
+    Remove temporary symlinks, for the given symlink path, left behind by a crash in the middle of switching it
+    :param symlink_path: path to the symlink
+    :return: no return value
+    """
+    parent_folder = os.path.dirname(symlink_path)
+    prefix = os.path.basename(symlink_path) + '.'
+    # WARNING! - MAGIC NUMBER AHEAD!!! - Temporary symlinks younger than this could belong to a switch in progress
+    stale_after_seconds = 60
+    now = time.time()
+    with os.scandir(parent_folder) as entries:
+        for entry in entries:
+            if entry.name.startswith(prefix) and entry.name.endswith('.tmp') and entry.is_symlink():
+                try:
+                    if (now - entry.stat(follow_symlinks=False).st_mtime) > stale_after_seconds:
+                        os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+def fsync_folder(folder):
+    """
+    Flush the given folder entries (i.e. file creations, renames, deletions within the folder) to disk
+    :param folder: path to the folder
+    :return: no return value
+    """
+    folder_fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(folder_fd)
+    finally:
+        os.close(folder_fd)
+
+
+def fsync_folder_tree(folder):
+    """
+    Flush every file and folder within the given folder tree to disk, symlinks are not followed
+    :param folder: path to the root of the folder tree
+    :return: no return value
+    """
+    for (root, folders, files) in os.walk(folder):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if os.path.islink(file_path):
+                continue
+            file_fd = os.open(file_path, os.O_RDONLY)
+            try:
+                os.fsync(file_fd)
+            finally:
+                os.close(file_fd)
+        fsync_folder(root)
+
+
+def create_release_staging_folder(releases_folder):
+    """
+    Create a staging folder where a new release can be prepared before publishing it via 'publish_release'. The
+    staging folder lives within the releases folder, so publishing it is just a rename within the same file system
+    :param releases_folder: folder where the releases live
+    :return: path to the new staging folder
+    """
+    check_create_folders([releases_folder])
+    staging_folder = os.path.join(releases_folder, ".staging.{}".format(uuid.uuid4().hex))
+    os.makedirs(staging_folder)
+    return staging_folder
+
+
+def _get_releases_with_publish_time(releases_folder):
+    releases = []
+    with os.scandir(releases_folder) as entries:
+        for entry in entries:
+            if (not entry.name.startswith('.')) and entry.is_dir(follow_symlinks=False):
+                releases.append((entry.stat(follow_symlinks=False).st_mtime_ns, entry.path))
+    return sorted(releases)
+
+
+def get_releases(releases_folder):
+    """
+    Get the published releases in the given releases folder, staging folders and the 'latest' symlink are not releases.
+    Releases are ordered by publish time, stamped by 'publish_release' as the modification time of the release folder,
+    whatever their version names
+    :param releases_folder: folder where the releases live
+    :return: list of release paths, oldest first
+    """
+    return [release for publish_time, release in _get_releases_with_publish_time(releases_folder)]
+
+
+def publish_release(staging_folder, releases_folder, version=None, keep_releases=None):
+    """
+    Publish a new release from the given staging folder with zero downtime for readers going through the 'latest'
+    symlink, i.e.
+        - The staging folder content is flushed to disk
+        - It is renamed to its version folder within the releases folder
+        - 'latest' is atomically switched to the new version
+        - Old versions are pruned, in the background, leaving the most recent 'keep_releases' versions
+    A crash at any point leaves 'latest' pointing to a complete release.
+    :param staging_folder: folder with the content of the new release
+    :param releases_folder: folder where the releases live
+    :param version: release version name, by default, a timestamp, so versions sort chronologically
+    :param keep_releases: number of releases to keep, including the new one, 'None' means keeping all of them
+    :return: path to the published release
+    :except: ToolBoxException if the release could not be published
+    """
+    if version is None:
+        version = time.strftime('%Y.%m.%d_%H.%M.%S') + "-{}".format(uuid.uuid4().hex[:8])
+    release_folder = os.path.join(releases_folder, version)
+    if os.path.lexists(release_folder):
+        raise ToolBoxException("Release '{}' ALREADY EXISTS".format(release_folder))
+    try:
+        fsync_folder_tree(staging_folder)
+        # The publish time is always later than the one of any release already published, even with a coarse clock
+        publish_time = max([time.time_ns()] + [published_at + 1 for published_at, release
+                                               in _get_releases_with_publish_time(releases_folder)])
+        os.utime(staging_folder, ns=(publish_time, publish_time))
+        os.rename(staging_folder, release_folder)
+        fsync_folder(releases_folder)
+        create_latest_symlink_overwrite(release_folder)
+    except ToolBoxException:
+        raise
+    except Exception as e:
+        raise ToolBoxException("ERROR publishing release '{}' ---> {}".format(release_folder, e)) from e
+    if keep_releases is not None:
+        latest_release = os.path.realpath(release_folder)
+        old_releases = [release for release in get_releases(releases_folder)
+                        if os.path.realpath(release) != latest_release]
+        # Releases are sorted by publish time, oldest first
+        releases_to_remove = old_releases[:max(0, len(old_releases) - max(0, keep_releases - 1))]
+        folders_with_error = remove_folders_async(releases_to_remove)
+        if folders_with_error:
+            raise ToolBoxException("Release '{}' published, but old releases could not be removed - '{}'"
+                                   .format(release_folder, folders_with_error))
+    return release_folder
+
+
+def compute_files_fingerprint(files, use_content_hash=False):
+    """
+    Compute a fingerprint for the given list of files, that changes whenever any of them changes. By default, a file is
+    identified by its size and modification time, which is cheap, but it can be identified by its content instead.
+    Missing files are part of the fingerprint as well.
+    :param files: list of paths to the files
+    :param use_content_hash: whether to hash the files content rather than looking at their size and modification time
+    :return: a hex string fingerprint
+    """
+    fingerprint = hashlib.sha256()
+    for file in sorted([os.path.abspath(file) for file in files]):
+        fingerprint.update(file.encode('utf8'))
+        try:
+            file_stat = os.stat(file)
+        except FileNotFoundError:
+            fingerprint.update(b'\0missing')
+            continue
+        if use_content_hash:
+            with open(file, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    fingerprint.update(block)
+        else:
+            fingerprint.update("\0{}\0{}".format(file_stat.st_size, file_stat.st_mtime_ns).encode('utf8'))
+    return fingerprint.hexdigest()
+
+
+@functools.lru_cache(maxsize=1024)
+def _resolve_executable_in_path(executable, path):
+    return shutil.which(executable, path=path) or executable
+
+
+def _resolve_executable(executable):
+    # Executables are looked up only once per value of PATH, rather than by the child process on every spawn
+    return _resolve_executable_in_path(executable, os.environ.get('PATH', os.defpath))
+
+
+def build_command_arguments(command, shell=False):
+    """
+    Build the arguments for spawning the given command
+    :param command: command as a list of arguments or as a string, that will be split following shell quoting rules
+    unless it is run through a shell
+    :param shell: whether the command will be run through a shell
+    :return: the command arguments, as expected by subprocess.Popen
+    """
+    if shell:
+        if isinstance(command, str):
+            return command
+        return " ".join([shlex.quote(str(argument)) for argument in command])
+    if isinstance(command, str):
+        arguments = shlex.split(command)
+    else:
+        arguments = [str(argument) for argument in command]
+    if not arguments:
+        raise ToolBoxException("EMPTY command, nothing to run")
+    if os.sep not in arguments[0]:
+        arguments[0] = _resolve_executable(arguments[0])
+    return arguments
+
+
+def spawn_subprocess(command,
+                     shell=False,
+                     cwd=None,
+                     env=None,
+                     stdin=subprocess.DEVNULL,
+                     stdout=subprocess.PIPE,
+                     stderr=subprocess.PIPE,
+                     new_session=True,
+                     close_fds=True,
+                     popen_class=subprocess.Popen):
+    """
+    Spawn a subprocess for the given command, by default, without going through a shell, i.e. there is no extra
+    '/bin/sh' fork and exec per command, and no quoting risks.
+
+    No 'preexec_fn' is ever used, so the child can be spawned via vfork (or posix_spawn when there is no working
+    directory, no new session and 'close_fds' is False, which is safe for file descriptors opened by Python, as they are
+    not inheritable), instead of copying the parent process page tables, which is expensive for big processes.
+    :param command: command as a list of arguments, or a string
+    :param shell: whether to run the command through a shell, only when explicitly needed
+    :param cwd: working directory for the command
+    :param env: environment for the command, the current environment by default
+    :param stdin: standard input for the command, no standard input by default
+    :param stdout: standard output for the command, piped by default
+    :param stderr: standard error for the command, piped by default
+    :param new_session: whether the command leads its own process group, so it can be terminated with all its children
+    :param close_fds: whether to close all file descriptors but the standard ones in the child
+    :param popen_class: subprocess.Popen or a subclass of it
+    :return: subprocess.Popen object
+    """
+    return popen_class(build_command_arguments(command, shell=shell),
+                       shell=shell,
+                       cwd=cwd,
+                       env=env,
+                       stdin=stdin,
+                       stdout=stdout,
+                       stderr=stderr,
+                       start_new_session=new_session,
+                       close_fds=close_fds)
 
 
-def gunzip_files(files):
+def terminate_process_group(process, grace_period=5):
+    """
+    Terminate the process group led by the given subprocess, i.e. the subprocess has to be started as the leader of a
+    new session ('start_new_session=True'), so any child it spawns is terminated as well.
+
+    The process group is sent SIGTERM straight away, and SIGKILL after the grace period if the subprocess is still
+    running, this method does not wait for the grace period to expire.
+    :param process: subprocess.Popen object
+    :param grace_period: seconds to wait for the process group to terminate before killing it
+    :return: no return value
+    """
+    if process.poll() is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+
+    def kill_process_group():
+        if process.poll() is None:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    killer = threading.Timer(grace_period, kill_process_group)
+    killer.daemon = True
+    killer.start()
+
+
+def _stop_process(process):
+    try:
+        is_process_group_leader = os.getpgid(process.pid) == process.pid
+    except ProcessLookupError:
+        return
+    if is_process_group_leader:
+        terminate_process_group(process, grace_period=0)
+    else:
+        process.kill()
+
+
+class StallDetector:
+    """
+    This class tells whether something in progress, e.g. a download or a command writing its output, is stalled, i.e.
+    its progress, over the last 'window' seconds, has been slower than 'min_rate' units per second. Nothing is stalled
+    before being observed for, at least, 'window' seconds
+    """
+
+    def __init__(self, min_rate, window):
+        """
+        :param min_rate: minimum progress rate, in units, e.g. bytes, per second
+        :param window: seconds the progress rate is measured over
+        """
+        self.__min_rate = min_rate
+        self.__window = window
+        self.__samples = collections.deque()
+
+    def get_min_rate(self):
+        return self.__min_rate
+
+    def get_window(self):
+        return self.__window
+
+    def update(self, progress, now=None):
+        """
+        Record the progress so far
+        :param progress: total progress, in units, e.g. bytes downloaded so far
+        :param now: time of the observation, from 'time.monotonic'
+        :return: no return value
+        """
+        now = time.monotonic() if now is None else now
+        self.__samples.append((now, progress))
+        # Keep the latest sample that is, at least, as old as the window, as the reference
+        while (len(self.__samples) > 1) and (self.__samples[1][0] <= now - self.__window):
+            self.__samples.popleft()
+
+    def is_stalled(self, now=None):
+        if not self.__samples:
+            return False
+        now = time.monotonic() if now is None else now
+        reference_time, reference_progress = self.__samples[0]
+        elapsed = now - reference_time
+        if elapsed < self.__window:
+            return False
+        return (self.__samples[-1][1] - reference_progress) < (self.__min_rate * elapsed)
+
+
+def communicate_with_progress(process, progress=None, stall_detector=None, timeout=None):
+    """
+    Like 'subprocess.Popen.communicate', but the subprocess is stopped, with all its process group, if it has a process
+    group of its own, when it stalls, i.e. its progress rate drops below the floor set by the stall detector, or when
+    it runs for longer than the timeout, if any
+    :param process: subprocess.Popen object, its standard output and error, if piped, are read by this function
+    :param progress: callable that, given the number of bytes read from the subprocess standard output and error, gives
+    back its progress, e.g. the size of the file it is writing, the number of bytes read by default
+    :param stall_detector: stall detector, no stall detection if not given
+    :param timeout: seconds the subprocess is given to finish, no time limit if not given
+    :return: (stdout, stderr, stop reason), the stop reason is None if the subprocess finished on its own, or one of
+    'STOP_REASON_STALLED' and 'STOP_REASON_TIMEOUT'
+    """
+    outputs, stop_reasons = communicate_all_with_progress([process],
+                                                          progress=progress,
+                                                          stall_detector=stall_detector,
+                                                          timeout=timeout)
+    return outputs[0][0], outputs[0][1], stop_reasons[0]
+
+
+def communicate_all_with_progress(processes, progress=None, stall_detector=None, timeout=None, timeouts=None):
+    """
+    Like 'communicate_with_progress', for subprocesses that work together, e.g. the stages of a pipeline, their piped
+    standard outputs and errors are read at the same time, so none of them blocks on a full pipe.
+
+    A stall, or the timeout, stops all the subprocesses, while the per subprocess timeouts only stop the subprocess
+    running for too long
+    :param processes: list of subprocess.Popen objects
+    :param progress: callable that, given the number of bytes read from all the subprocesses standard outputs and
+    errors, gives back their progress, the number of bytes read by default
+    :param stall_detector: stall detector, no stall detection if not given
+    :param timeout: seconds the subprocesses are given to finish, no time limit if not given
+    :param timeouts: list with the seconds every subprocess is given to finish, 'None' meaning no time limit
+    :return: (outputs, stop reasons), a list of (stdout, stderr) and a list of stop reasons, see
+    'communicate_with_progress', for every subprocess
+    """
+    started_at = time.monotonic()
+    last_check_at = started_at
+    timeouts = list(timeouts) if timeouts is not None else [None] * len(processes)
+    streams = [(process.stdout, process.stderr) for process in processes]
+    outputs = {}
+    output_bytes = 0
+    stop_reasons = [None] * len(processes)
+    with selectors.DefaultSelector() as selector:
+        for stream in itertools.chain.from_iterable(streams):
+            if stream is not None:
+                outputs[stream.fileno()] = []
+                selector.register(stream.fileno(), selectors.EVENT_READ)
+        while selector.get_map() or any(process.poll() is None for process in processes):
+            if selector.get_map():
+                for key, events in selector.select(timeout=_progress_poll_interval):
+                    data = os.read(key.fd, _subprocess_read_size)
+                    if data:
+                        outputs[key.fd].append(data)
+                        output_bytes += len(data)
+                    else:
+                        selector.unregister(key.fd)
+            else:
+                try:
+                    next(process for process in processes if process.poll() is None) \
+                        .wait(timeout=_progress_poll_interval)
+                except (subprocess.TimeoutExpired, StopIteration):
+                    pass
+            now = time.monotonic()
+            if now - last_check_at < _progress_poll_interval:
+                continue
+            last_check_at = now
+            stop_reason = None
+            # Progress is checked even without stall detection, so progress callables can keep track of it
+            current_progress = progress(output_bytes) if progress is not None else output_bytes
+            if (timeout is not None) and (now - started_at >= timeout):
+                stop_reason = STOP_REASON_TIMEOUT
+            elif stall_detector is not None:
+                stall_detector.update(current_progress, now)
+                if stall_detector.is_stalled(now):
+                    stop_reason = STOP_REASON_STALLED
+            for index, process in enumerate(processes):
+                if (stop_reasons[index] is not None) or (process.poll() is not None):
+                    continue
+                if stop_reason is not None:
+                    stop_reasons[index] = stop_reason
+                elif (timeouts[index] is not None) and (now - started_at >= timeouts[index]):
+                    stop_reasons[index] = STOP_REASON_TIMEOUT
+                if stop_reasons[index] is not None:
+                    _stop_process(process)
+    results = []
+    for process, process_streams in zip(processes, streams):
+        process.wait()
+        process_results = []
+        for stream in process_streams:
+            if stream is None:
+                process_results.append(None)
+                continue
+            process_results.append(b''.join(outputs[stream.fileno()]))
+            stream.close()
+        results.append(tuple(process_results))
+    return results, stop_reasons
+
+
+def install_shutdown_signal_handlers(on_drain, on_cancel, drain_deadline, signals=(signal.SIGINT, signal.SIGTERM)):
+    """
+    Install handlers for shutdown signals that drain the work in progress, i.e. on the first signal, 'on_drain' is
+    called, so no more work is started, and 'on_cancel' is called once the drain deadline expires, or straight away if
+    a second signal is received.
+
+    This method must be called from the main thread.
+    :param on_drain: callable, with no parameters, to call on the first signal
+    :param on_cancel: callable, with no parameters, to cancel the work still in progress
+    :param drain_deadline: seconds to wait for the work in progress to finish before cancelling it
+    :param signals: signals to handle
+    :return: a dictionary with the previous handlers, by signal, so they can be restored
+    """
+    drain_timer = []
+
+    def handle_shutdown_signal(signal_number, frame):
+        if drain_timer:
+            drain_timer[0].cancel()
+            on_cancel()
+            return
+        on_drain()
+        timer = threading.Timer(drain_deadline, on_cancel)
+        timer.daemon = True
+        drain_timer.append(timer)
+        timer.start()
+
+    return {signal_number: signal.signal(signal_number, handle_shutdown_signal) for signal_number in signals}
+
+
+def restore_signal_handlers(previous_handlers):
+    """
+    Restore the signal handlers given as returned by 'install_shutdown_signal_handlers'
+    :param previous_handlers: dictionary with the handlers, by signal
+    :return: no return value
+    """
+    for signal_number, handler in previous_handlers.items():
+        signal.signal(signal_number, handler)
+
+
+def _get_gunzip_output_file(file):
+    for suffix, replacement in (('.tgz', '.tar'), ('.taz', '.tar'), ('.gz', ''), ('-gz', ''), ('.z', ''), ('-z', ''),
+                                ('_z', ''), ('.Z', '')):
+        if file.endswith(suffix):
+            return file[:-len(suffix)] + replacement
+    return None
+
+
+def _get_file_size(file):
+    try:
+        return os.path.getsize(file)
+    except (OSError, TypeError):
+        return 0
+
+
+def gunzip_files(files,
+                 stall_window=_gunzip_stall_window_default,
+                 stall_min_rate=_gunzip_stall_min_rate_default,
+                 timeout=None):
     """
     Given a list of paths for Gzip compressed files, this method will uncompress them, returning a list with the files
-    that could not be gunzipped and the reason why that happened
+    that could not be gunzipped and the reason why that happened.
+
+    Instead of guessing a time limit from the size of the file, a gunzip process is stopped when it stalls, i.e. when
+    it writes the uncompressed file slower than 'stall_min_rate' bytes per second over 'stall_window' seconds
     :param files: list of paths to files that will be un-compressed
+    :param stall_window: seconds the output rate is measured over, no stall detection if None
+    :param stall_min_rate: minimum output rate, in bytes per second
+    :param timeout: seconds every file is given to be uncompressed, no time limit by default
     :return: a list of possible failing to uncompress files
     """
-    gunzip_command_template = "gunzip {}"
     files_with_error = []
     for file in files:
         if os.path.isfile(file):
+            stdout = b''
+            stderr = b''
+            output_file = _get_gunzip_output_file(file)
             try:
-                gunzip_subprocess = subprocess.Popen(gunzip_command_template.format(file),
-                                                     stdout=subprocess.PIPE,
-                                                     stderr=subprocess.PIPE,
-                                                     shell=True)
-                # Timeout, in seconds, is either 10 seconds or the size of the file in MB * 10, e.g. 1MB -> 10 seconds
-                file_size_mb = os.path.getsize(file) / (1024 * 1024)
-                timeout = max(10, int(file_size_mb))
-                (stdout, stderr) = gunzip_subprocess.communicate(timeout=timeout)
-                if gunzip_subprocess.poll() is not None:
-                    if gunzip_subprocess.returncode != 0:
-                        # ERROR - Report this
-                        err_msg = "ERROR decompressing file '{}' output from subprocess STDOUT: {}\nSTDERR: {}" \
-                            .format(file, stdout.decode('utf8'), stderr.decode('utf8'))
-                        files_with_error.append((file, err_msg))
-            except subprocess.TimeoutExpired as e:
-                err_msg = "TIMEOUT ERROR decompressing file '{}', size {}MB, given timeframe of '{}seconds', output " \
-                          "from subprocess STDOUT: {}\nSTDERR: {}" \
-                    .format(file_size_mb,
-                            timeout,
-                            file,
-                            stdout.decode('utf8'),
-                            stderr.decode('utf8'))
-                files_with_error.append((file, err_msg))
+                gunzip_subprocess = spawn_subprocess(['gunzip', file], new_session=False)
+                (stdout, stderr, stop_reason) = \
+                    communicate_with_progress(gunzip_subprocess,
+                                              progress=lambda output_bytes: _get_file_size(output_file),
+                                              stall_detector=StallDetector(stall_min_rate, stall_window)
+                                              if stall_window is not None else None,
+                                              timeout=timeout)
+                if stop_reason is not None:
+                    # Don't leave a half uncompressed file behind
+                    if (output_file is not None) and os.path.isfile(file) and os.path.isfile(output_file):
+                        os.remove(output_file)
+                    err_msg = "{} ERROR decompressing file '{}', size {}MB, #{} bytes uncompressed, output from " \
+                              "subprocess STDOUT: {}\nSTDERR: {}" \
+                        .format(stop_reason.upper(),
+                                file,
+                                _get_file_size(file) / (1024 * 1024),
+                                _get_file_size(output_file),
+                                stdout.decode('utf8'),
+                                stderr.decode('utf8'))
+                    files_with_error.append((file, err_msg))
+                elif gunzip_subprocess.returncode != 0:
+                    # ERROR - Report this
+                    err_msg = "ERROR decompressing file '{}' output from subprocess STDOUT: {}\nSTDERR: {}" \
+                        .format(file, stdout.decode('utf8'), stderr.decode('utf8'))
+                    files_with_error.append((file, err_msg))
             except Exception as e:
                 err_msg = "UNKNOWN ERROR decompressing file '{}' ---> {}\nOutput from subprocess " \
                           "STDOUT: {}\nSTDERR: {}" \
@@ -148,5 +786,171 @@ def gunzip_files(files):
     return files_with_error
 
 
+def _gzip_compress_block(data, compression_level):
+    # A whole gzip member, with a fixed mtime, so the output only depends on the input
+    return gzip.compress(data, compresslevel=compression_level, mtime=0)
+
+
+class ParallelGzipWriter:
+    """
+    File like object that gzip compresses whatever is written to it into the given binary file object, the way 'pigz'
+    does, i.e. data is split into blocks compressed in parallel, and written, in order, as the members of a standard
+    multi-member gzip file, that any gzip reader can decompress.
+
+    zlib releases the GIL while compressing, so blocks are compressed by a pool of threads, using every core, without
+    copying them across processes. Only a bounded number of blocks is in flight, so memory usage doesn't depend on the
+    size of the data.
+    """
+
+    def __init__(self,
+                 fileobj,
+                 compression_level=_gzip_compression_level_default,
+                 block_size=_gzip_block_size_default,
+                 max_workers=None):
+        """
+        :param fileobj: binary file object the compressed data is written to, it is not closed by this writer
+        :param compression_level: gzip compression level, from 1 (fastest) to 9 (best compression)
+        :param block_size: size, in bytes, of the blocks compressed in parallel
+        :param max_workers: number of threads compressing blocks, the number of cores by default
+        """
+        if not (1 <= compression_level <= 9):
+            raise ToolBoxException("INVALID gzip compression level '{}', it must be within [1, 9]"
+                                   .format(compression_level))
+        if block_size < 1:
+            raise ToolBoxException("INVALID gzip block size '{}'".format(block_size))
+        self.__fileobj = fileobj
+        self.__compression_level = compression_level
+        self.__block_size = block_size
+        self.__max_workers = max_workers or os.cpu_count() or 1
+        self.__executor = ThreadPoolExecutor(max_workers=self.__max_workers, thread_name_prefix='GzipCompressor')
+        self.__pending_blocks = collections.deque()
+        self.__buffer = bytearray()
+        self.__bytes_in = 0
+        self.__bytes_out = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __write_completed_blocks(self, max_pending):
+        while len(self.__pending_blocks) > max_pending:
+            compressed_block = self.__pending_blocks.popleft().result()
+            self.__fileobj.write(compressed_block)
+            self.__bytes_out += len(compressed_block)
+
+    def __submit_block(self, block):
+        self.__pending_blocks.append(self.__executor.submit(_gzip_compress_block, block, self.__compression_level))
+        # Two blocks per worker keep every worker busy while the oldest block is written
+        self.__write_completed_blocks(2 * self.__max_workers)
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to a closed parallel gzip writer")
+        self.__buffer += data
+        self.__bytes_in += len(data)
+        while len(self.__buffer) >= self.__block_size:
+            self.__submit_block(bytes(self.__buffer[:self.__block_size]))
+            del self.__buffer[:self.__block_size]
+        return len(data)
+
+    def flush(self):
+        """
+        Compress and write all the data written so far, the last block may be smaller than the block size
+        :return: no return value
+        """
+        if self.__buffer:
+            self.__submit_block(bytes(self.__buffer))
+            self.__buffer = bytearray()
+        self.__write_completed_blocks(0)
+        self.__fileobj.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.__bytes_in == 0:
+                # Empty input still makes a valid gzip file
+                self.__submit_block(b'')
+            self.flush()
+        finally:
+            self.closed = True
+            self.__executor.shutdown(wait=True, cancel_futures=True)
+
+    def writable(self):
+        return True
+
+    def get_bytes_in(self):
+        return self.__bytes_in
+
+    def get_bytes_out(self):
+        return self.__bytes_out
+
+
+def gzip_stream(source,
+                destination,
+                compression_level=_gzip_compression_level_default,
+                block_size=_gzip_block_size_default,
+                max_workers=None):
+    """
+    Gzip compress a binary stream into another one, in parallel, see 'ParallelGzipWriter'
+    :param source: binary file object to read from
+    :param destination: binary file object the compressed data is written to
+    :param compression_level: gzip compression level, from 1 (fastest) to 9 (best compression)
+    :param block_size: size, in bytes, of the blocks compressed in parallel
+    :param max_workers: number of threads compressing blocks, the number of cores by default
+    :return: (number of bytes read, number of compressed bytes written)
+    """
+    with ParallelGzipWriter(destination,
+                            compression_level=compression_level,
+                            block_size=block_size,
+                            max_workers=max_workers) as writer:
+        shutil.copyfileobj(source, writer, block_size)
+    return writer.get_bytes_in(), writer.get_bytes_out()
+
+
+def gzip_files(files,
+               compression_level=_gzip_compression_level_default,
+               block_size=_gzip_block_size_default,
+               max_workers=None,
+               keep_original=False):
+    """
+    Given a list of paths to files, this method will gzip compress every one of them into '<file>.gz', in parallel, as
+    'gzip' does, the original file is removed once its compressed version is in place, unless told otherwise. This is
+    the counterpart of 'gunzip_files'
+    :param files: list of paths to files that will be compressed
+    :param compression_level: gzip compression level, from 1 (fastest) to 9 (best compression)
+    :param block_size: size, in bytes, of the blocks compressed in parallel
+    :param max_workers: number of threads compressing blocks, the number of cores by default
+    :param keep_original: whether to keep the original files
+    :return: a list of (file, error message) for those files that could not be compressed
+    """
+    files_with_error = []
+    for file in files:
+        if not os.path.isfile(file):
+            files_with_error.append((file, "it IS NOT A FILE"))
+            continue
+        compressed_file = file + '.gz'
+        compressed_file_tmp = "{}.{}.tmp".format(compressed_file, uuid.uuid4().hex)
+        try:
+            with open(file, 'rb') as source, open(compressed_file_tmp, 'wb') as destination:
+                gzip_stream(source,
+                            destination,
+                            compression_level=compression_level,
+                            block_size=block_size,
+                            max_workers=max_workers)
+            shutil.copystat(file, compressed_file_tmp)
+            os.replace(compressed_file_tmp, compressed_file)
+            if not keep_original:
+                os.remove(file)
+        except Exception as e:
+            if os.path.exists(compressed_file_tmp):
+                os.remove(compressed_file_tmp)
+            files_with_error.append((file, "ERROR compressing file '{}' ---> {}".format(file, e)))
+    return files_with_error
+
+
 if __name__ == '__main__':
     print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,234 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 05:30
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Session profiling, i.e. deterministic profiling of the main thread with cProfile, periodic tracemalloc snapshots of
+the top allocations, and a low overhead sampling profiler recording the stacks of every thread, e.g. executor workers
+running download agents and parallel runners.
+
+Outputs are written in standard formats, so the usual tools can read them:
+    'profile.pstats'            cProfile statistics, for 'pstats', 'snakeviz'...
+    'tracemalloc-NNNN.txt'      top allocations, by line, at every snapshot
+    'tracemalloc-NNNN.snapshot' raw snapshot, see 'tracemalloc.Snapshot.load'
+    'stacks.collapsed'          sampled stacks, in collapsed format, one 'frame;frame;... count' per line, for flame
+                                graph tools
+"""
+
+import os
+import sys
+import time
+import cProfile
+import threading
+import tracemalloc
+import collections
+# App modules
+from exceptions import ToolBoxException
+from toolbox import general
+
+# Profiling modes
+PROFILING_MODE_CPROFILE = 'cprofile'
+PROFILING_MODE_TRACEMALLOC = 'tracemalloc'
+PROFILING_MODE_SAMPLING = 'sampling'
+PROFILING_MODES = (PROFILING_MODE_CPROFILE, PROFILING_MODE_TRACEMALLOC, PROFILING_MODE_SAMPLING)
+
+_CPROFILE_OUTPUT_FILE = 'profile.pstats'
+_COLLAPSED_STACKS_OUTPUT_FILE = 'stacks.collapsed'
+# WARNING! - MAGIC NUMBER AHEAD!!! - Frames recorded for every allocation, more frames, more overhead
+_TRACEMALLOC_FRAMES = 16
+
+
+def parse_profiling_modes(modes):
+    """
+    Parse a list of profiling modes
+    :param modes: comma separated profiling modes, or a list of them
+    :return: list of profiling modes
+    :except: ToolBoxException if any of the modes is not known
+    """
+    if isinstance(modes, str):
+        modes = [mode.strip() for mode in modes.split(',') if mode.strip()]
+    unknown_modes = [mode for mode in modes if mode not in PROFILING_MODES]
+    if unknown_modes:
+        raise ToolBoxException("UNKNOWN profiling modes '{}', valid modes are '{}'"
+                               .format(unknown_modes, PROFILING_MODES))
+    return list(modes)
+
+
+def _format_frame(frame):
+    code = frame.f_code
+    return "{} ({}:{})".format(getattr(code, 'co_qualname', code.co_name),
+                               os.path.basename(code.co_filename),
+                               code.co_firstlineno)
+
+
+class StackSampler:
+    """
+    Sampling profiler, every 'interval' seconds, a background thread records the stack of every other thread, stacks
+    are aggregated by thread name and frames, in collapsed format
+    """
+
+    def __init__(self, interval=0.01, thread_name_prefixes=None):
+        """
+        :param interval: seconds between samples
+        :param thread_name_prefixes: only threads whose name starts with any of these prefixes are sampled, all of them
+        if not given
+        """
+        self.__interval = interval
+        self.__thread_name_prefixes = tuple(thread_name_prefixes) if thread_name_prefixes else None
+        self.__stacks = collections.Counter()
+        self.__sample_count = 0
+        self.__shutdown = threading.Event()
+        self.__thread = None
+
+    def __sample(self):
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == threading.get_ident():
+                continue
+            thread_name = thread_names.get(thread_id, str(thread_id))
+            if (self.__thread_name_prefixes is not None) and not thread_name.startswith(self.__thread_name_prefixes):
+                continue
+            frames = []
+            while frame is not None:
+                frames.append(_format_frame(frame))
+                frame = frame.f_back
+            # Outermost frame first, with the thread as the root of the stack
+            self.__stacks[';'.join([thread_name] + frames[::-1])] += 1
+        self.__sample_count += 1
+
+    def __run(self):
+        while not self.__shutdown.wait(self.__interval):
+            self.__sample()
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__run, name='StackSampler', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__shutdown.set()
+        if self.__thread is not None:
+            self.__thread.join()
+
+    def get_sample_count(self):
+        return self.__sample_count
+
+    def get_collapsed_stacks(self):
+        """
+        Get the sampled stacks
+        :return: a dictionary collapsed stack -> number of samples
+        """
+        return dict(self.__stacks)
+
+    def write_collapsed_stacks(self, output_file):
+        with open(output_file, 'w') as f:
+            for stack, count in self.__stacks.most_common():
+                f.write("{} {}\n".format(stack, count))
+
+
+class SessionProfiler:
+    """
+    This class models the profiling of an application session, with any combination of profiling modes, outputs are
+    written to the given folder when the profiler is stopped, except for tracemalloc snapshots, written as they are
+    taken.
+
+    cProfile only sees the thread that started the profiler, i.e. the main thread, use sampling for background
+    threads.
+    """
+
+    def __init__(self,
+                 modes,
+                 output_folder,
+                 tracemalloc_interval=60,
+                 tracemalloc_top=25,
+                 sampling_interval=0.01,
+                 sampling_thread_name_prefixes=None):
+        """
+        :param modes: profiling modes, see 'PROFILING_MODES'
+        :param output_folder: folder where profiling outputs are written
+        :param tracemalloc_interval: seconds between tracemalloc snapshots
+        :param tracemalloc_top: number of top allocation lines in every snapshot report
+        :param sampling_interval: seconds between stack samples
+        :param sampling_thread_name_prefixes: only threads whose name starts with any of these prefixes are sampled,
+        all of them if not given
+        """
+        self.__modes = parse_profiling_modes(modes)
+        self.__output_folder = output_folder
+        self.__tracemalloc_interval = tracemalloc_interval
+        self.__tracemalloc_top = tracemalloc_top
+        self.__profile = None
+        self.__sampler = None
+        self.__snapshot_count = 0
+        self.__snapshot_thread = None
+        self.__shutdown = threading.Event()
+        if PROFILING_MODE_SAMPLING in self.__modes:
+            self.__sampler = StackSampler(sampling_interval, thread_name_prefixes=sampling_thread_name_prefixes)
+
+    def get_modes(self):
+        return self.__modes
+
+    def get_output_folder(self):
+        return self.__output_folder
+
+    def __take_snapshot(self):
+        self.__snapshot_count += 1
+        snapshot = tracemalloc.take_snapshot()
+        snapshot_prefix = os.path.join(self.get_output_folder(), "tracemalloc-{:04d}".format(self.__snapshot_count))
+        snapshot.dump(snapshot_prefix + '.snapshot')
+        current_size, peak_size = tracemalloc.get_traced_memory()
+        with open(snapshot_prefix + '.txt', 'w') as f:
+            f.write("# {}, traced memory #{} bytes, peak #{} bytes\n"
+                    .format(time.strftime('%Y.%m.%d %H:%M:%S'), current_size, peak_size))
+            for statistic in snapshot.statistics('lineno')[:self.__tracemalloc_top]:
+                f.write("{}\n".format(statistic))
+
+    def __take_snapshots(self):
+        while not self.__shutdown.wait(self.__tracemalloc_interval):
+            self.__take_snapshot()
+
+    def start(self):
+        """
+        Start profiling, in the calling thread, for cProfile
+        :return: no return value
+        """
+        general.check_create_folders([self.get_output_folder()])
+        if PROFILING_MODE_TRACEMALLOC in self.__modes:
+            tracemalloc.start(_TRACEMALLOC_FRAMES)
+            self.__snapshot_thread = threading.Thread(target=self.__take_snapshots,
+                                                      name='TracemallocSnapshots',
+                                                      daemon=True)
+            self.__snapshot_thread.start()
+        if self.__sampler is not None:
+            self.__sampler.start()
+        if PROFILING_MODE_CPROFILE in self.__modes:
+            self.__profile = cProfile.Profile()
+            self.__profile.enable()
+
+    def stop(self):
+        """
+        Stop profiling, and write the profiling outputs
+        :return: list of the profiling output files
+        """
+        if self.__profile is not None:
+            self.__profile.disable()
+            self.__profile.dump_stats(os.path.join(self.get_output_folder(), _CPROFILE_OUTPUT_FILE))
+        if self.__sampler is not None:
+            self.__sampler.stop()
+            self.__sampler.write_collapsed_stacks(os.path.join(self.get_output_folder(),
+                                                               _COLLAPSED_STACKS_OUTPUT_FILE))
+        if self.__snapshot_thread is not None:
+            self.__shutdown.set()
+            self.__snapshot_thread.join()
+            # Last snapshot, at the end of the session
+            self.__take_snapshot()
+            tracemalloc.stop()
+        return sorted([os.path.join(self.get_output_folder(), file_name)
+                       for file_name in os.listdir(self.get_output_folder())])
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,277 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 19-10-2026 17:10
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Fast readers for big JSON and JSON-lines files, i.e. memory mapped and streaming readers, and a parsed file cache
+"""
+
+import os
+import re
+import json
+import mmap
+import threading
+import collections
+# Faster JSON backend, if it is available. It is only used when explicitly asked for, as it doesn't parse exactly the
+# same documents the standard library does, e.g. it rejects 'NaN', and it parses integers beyond 64 bits as floats
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Characters that matter when scanning for the end of a JSON value, see '_JsonValueScanner'
+_STRING_SPECIAL = re.compile(r'["\\]')
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_SCALAR_END = re.compile(r'[\s,\]}]')
+
+
+def is_fast_backend_available():
+    return orjson is not None
+
+
+def json_loads(data, fast_backend=False):
+    """
+    Parse the given JSON document
+    :param data: JSON document, as bytes or str
+    :param fast_backend: whether to use the faster JSON backend, if it is available, see 'orjson' above
+    :return: an object representation of the JSON document
+    """
+    if fast_backend and (orjson is not None):
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_json_file(json_file, fast_backend=False):
+    """
+    Read and parse a JSON file
+    :param json_file: path to the file in json format to read
+    :param fast_backend: whether to use the faster JSON backend, if it is available, see 'orjson' above
+    :return: an object representation of the data in the json file
+    """
+    if fast_backend and (orjson is not None):
+        with open(json_file, 'rb') as jf:
+            return orjson.loads(jf.read())
+    with open(json_file) as jf:
+        return json.load(jf)
+
+
+def iter_json_lines(json_lines_file, fast_backend=False):
+    """
+    Iterate over the objects in a JSON-lines file, the file is memory mapped, so lines are sliced out of the page cache
+    without going through buffered reads, and only the line being parsed is ever copied. Empty lines are skipped.
+    :param json_lines_file: path to the file in JSON-lines format
+    :param fast_backend: whether to use the faster JSON backend, if it is available, see 'orjson' above
+    :return: a generator of the object representation for every line in the file
+    """
+    with open(json_lines_file, 'rb') as jf:
+        if os.fstat(jf.fileno()).st_size == 0:
+            # Empty files can't be memory mapped
+            return
+        with mmap.mmap(jf.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            start = 0
+            end_of_file = len(mm)
+            while start < end_of_file:
+                end = mm.find(b'\n', start)
+                if end == -1:
+                    end = end_of_file
+                line = mm[start:end].strip()
+                if line:
+                    yield json_loads(line, fast_backend=fast_backend)
+                start = end + 1
+
+
+class _JsonValueScanner:
+    """
+    Scanner for the end of a JSON value, i.e. it follows strings and the nesting of arrays and objects, without decoding
+    anything, and it goes on from where it left off when more text is appended, so a value read in chunks is scanned
+    only once, and decoded once, after it has been read in full
+    """
+
+    def __init__(self):
+        # Scanning position, relative to the start of the value, as the text before the value may be dropped
+        self.__offset = 0
+        self.__depth = 0
+        self.__in_string = False
+
+    def scan(self, text, start, end_of_text):
+        """
+        Scan the JSON value starting at the given position of the text, which may have grown since the last call
+        :param text: text the value is in
+        :param start: position of the first character of the value
+        :param end_of_text: whether there is no more text to come after the given one
+        :return: the position right after the value, or None if the text ends before the value does
+        """
+        position = start + self.__offset
+        if text[start] not in '"[{':
+            # Numbers and literals end wherever the next separator is
+            match = _SCALAR_END.search(text, position)
+            if match:
+                return match.start()
+            position = len(text)
+        else:
+            while True:
+                match = (_STRING_SPECIAL if self.__in_string else _STRUCTURE).search(text, position)
+                if not match:
+                    position = len(text)
+                    break
+                position = match.end()
+                character = match.group()
+                if character == '\\':
+                    if position >= len(text):
+                        # The escaped character is yet to be read, scanning goes on from the backslash
+                        position = match.start()
+                        break
+                    position += 1
+                elif character == '"':
+                    self.__in_string = not self.__in_string
+                elif character in '[{':
+                    self.__depth += 1
+                else:
+                    self.__depth -= 1
+                if (self.__depth <= 0) and not self.__in_string:
+                    return position
+        if end_of_text:
+            return len(text)
+        self.__offset = position - start
+        return None
+
+
+def iter_json_array(json_file, chunk_size=1024 * 1024):
+    """
+    Incrementally parse a JSON file whose top level element is an array, yielding its elements one by one, so the
+    whole document never needs to be in memory at once
+    :param json_file: path to the file in json format
+    :param chunk_size: number of characters to read from the file every time more data is needed
+    :return: a generator of the object representation of every element in the top level array
+    :except: ValueError if the file content is not a JSON array, or there is anything but whitespace after it
+    """
+    decoder = json.JSONDecoder()
+    with open(json_file) as jf:
+        buffer = ''
+        position = 0
+        end_of_file = False
+
+        def read_more(size=chunk_size):
+            nonlocal buffer, position, end_of_file
+            chunk = jf.read(size)
+            if not chunk:
+                end_of_file = True
+            buffer = buffer[position:] + chunk
+            position = 0
+
+        def skip_whitespace():
+            nonlocal position
+            while True:
+                while (position < len(buffer)) and buffer[position].isspace():
+                    position += 1
+                if (position < len(buffer)) or end_of_file:
+                    return
+                read_more()
+
+        skip_whitespace()
+        if (position >= len(buffer)) or (buffer[position] != '['):
+            raise ValueError("'{}' top level element IS NOT AN ARRAY".format(json_file))
+        position += 1
+        expecting_element = True
+        empty_array = True
+        while True:
+            skip_whitespace()
+            if position >= len(buffer):
+                raise ValueError("'{}' UNEXPECTED END OF FILE, the array is not closed".format(json_file))
+            if (buffer[position] == ']') and (empty_array or not expecting_element):
+                position += 1
+                skip_whitespace()
+                if position < len(buffer):
+                    raise ValueError("'{}' UNEXPECTED DATA after the array, at character '{}'"
+                                     .format(json_file, buffer[position]))
+                return
+            if not expecting_element:
+                if buffer[position] != ',':
+                    raise ValueError("'{}' EXPECTED ',' at character '{}'".format(json_file, buffer[position]))
+                position += 1
+                expecting_element = True
+                continue
+            # The element is decoded once it has been read in full, reading more as it spans chunks, in ever bigger
+            # ones, as the partial element is carried over every time
+            scanner = _JsonValueScanner()
+            while scanner.scan(buffer, position, end_of_file) is None:
+                read_more(max(chunk_size, len(buffer) - position))
+            element, position = decoder.raw_decode(buffer, position)
+            expecting_element = False
+            empty_array = False
+            yield element
+
+
+class ParsedFileCache:
+    """
+    Cache of parsed files, keyed by their path, and invalidated when the file modification time or size change. The
+    least recently used entries are evicted when the cache is full.
+
+    Parsed objects are shared between the callers reading the same file, so they must not be modified.
+    """
+
+    def __init__(self, loader=load_json_file, max_entries=32):
+        self.__loader = loader
+        self.__max_entries = max_entries
+        self.__entries = collections.OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, file_path):
+        """
+        Get the parsed representation of the given file, parsing it only if it is not in the cache or it has changed
+        :param file_path: path to the file
+        :return: the parsed representation of the file
+        """
+        file_path = os.path.abspath(file_path)
+        file_stat = os.stat(file_path)
+        signature = (file_stat.st_mtime_ns, file_stat.st_size)
+        with self.__lock:
+            entry = self.__entries.get(file_path)
+            if (entry is not None) and (entry[0] == signature):
+                self.__entries.move_to_end(file_path)
+                return entry[1]
+        # Parsing happens out of the lock, so big files don't block readers of other files
+        parsed = self.__loader(file_path)
+        with self.__lock:
+            self.__entries[file_path] = (signature, parsed)
+            self.__entries.move_to_end(file_path)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+        return parsed
+
+    def invalidate(self, file_path=None):
+        """
+        Remove the given file from the cache, or every file if no file is given
+        :param file_path: path to the file
+        :return: no return value
+        """
+        with self.__lock:
+            if file_path is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(os.path.abspath(file_path), None)
+
+
+# Process wide parsed JSON files cache
+_json_file_cache = ParsedFileCache()
+
+
+def read_json_cached(json_file):
+    """
+    Read a json file through the process wide parsed files cache, so the same file is parsed only once as long as it
+    doesn't change. The returned object is shared, it must not be modified.
+    :param json_file: path to the file in json format to read
+    :return: an object representation of the data in the json file
+    """
+    return _json_file_cache.get(json_file)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")
@@ -0,0 +1,198 @@
+# 
+# Author    : Manuel Bernal Llinares
+# Project   : python-app-template
+# Timestamp : 20-10-2026 09:40
+# ---
+# © 2026 Manuel Bernal Llinares <mbdebian@gmail.com>
+# All rights reserved.
+# 
+
+"""
+Adaptive timeouts, i.e. a history, kept across sessions, of how long commands take to run, and of the throughput of
+downloads from every host, so timeouts, and stall detection floors, are estimated from percentiles of what has been
+observed before, instead of fixed values that are too short for big jobs and too long for small hung ones.
+
+History keys are made of a kind and a name, e.g. 'download:https://ftp.example.org' or 'command:samtools'
+"""
+
+import os
+import json
+import time
+import shlex
+import threading
+import urllib.parse
+# App modules
+from toolbox import general
+
+# Name of the timeout history file, in the 'run' folder, shared by every session
+TIMEOUT_HISTORY_FILE_NAME = 'timeout_history.json'
+HISTORY_KEY_DOWNLOAD = 'download'
+HISTORY_KEY_COMMAND = 'command'
+
+
+def get_download_history_key(url):
+    """
+    Downloads are told apart by scheme and host, the throughput of a host says little about the file being downloaded
+    :param url: URL being downloaded
+    :return: history key
+    """
+    url_parts = urllib.parse.urlsplit(str(url))
+    return "{}:{}://{}".format(HISTORY_KEY_DOWNLOAD, url_parts.scheme, url_parts.netloc)
+
+
+def get_command_history_key(command):
+    """
+    Commands are told apart by the program they run, their arguments, e.g. file names, change from one run to the next
+    :param command: command, as a list of arguments, or a string
+    :return: history key
+    """
+    arguments = shlex.split(command) if isinstance(command, str) else [str(argument) for argument in command or []]
+    return "{}:{}".format(HISTORY_KEY_COMMAND, os.path.basename(arguments[0]) if arguments else '')
+
+
+def percentile(values, percentile_rank):
+    """
+    Nearest rank percentile
+    :param values: values, not empty
+    :param percentile_rank: percentile, between 0 and 100
+    :return: the value at the given percentile
+    """
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round((percentile_rank / 100) * (len(values) - 1)))))
+    return values[index]
+
+
+class TimeoutHistory:
+    """
+    This class models a history of samples, e.g. durations or throughputs, by key, only the latest 'max_samples' of
+    every key are kept. The history is saved to a JSON file, atomically, when asked to, and every 'save_interval'
+    seconds while samples are being recorded. It is thread safe
+    """
+
+    def __init__(self, history_file, max_samples=200, save_interval=30):
+        self.__history_file = history_file
+        self.__max_samples = max_samples
+        self.__save_interval = save_interval
+        self.__lock = threading.Lock()
+        self.__samples = {}
+        self.__dirty = False
+        self.__saved_at = time.monotonic()
+        if os.path.isfile(history_file):
+            try:
+                self.__samples = {key: list(values)[-max_samples:]
+                                  for key, values in general.read_json(history_file).items()}
+            except Exception:
+                # Without history, timeouts fall back to their defaults, until the history builds up again
+                self.__samples = {}
+
+    def get_history_file(self):
+        return self.__history_file
+
+    def record(self, key, value):
+        with self.__lock:
+            samples = self.__samples.setdefault(key, [])
+            samples.append(value)
+            if len(samples) > self.__max_samples:
+                del samples[:len(samples) - self.__max_samples]
+            self.__dirty = True
+            save = (time.monotonic() - self.__saved_at) >= self.__save_interval
+        if save:
+            try:
+                self.save()
+            except OSError:
+                # Recording samples never fails, the history is saved again later on
+                pass
+
+    def get_samples(self, key):
+        with self.__lock:
+            return list(self.__samples.get(key, []))
+
+    def get_percentile(self, key, percentile_rank, min_samples=10):
+        """
+        Get a percentile of the samples for the given key
+        :param key: history key
+        :param percentile_rank: percentile, between 0 and 100
+        :param min_samples: minimum number of samples for the percentile to be meaningful
+        :return: the percentile, or None if there are not enough samples
+        """
+        samples = self.get_samples(key)
+        if len(samples) < max(1, min_samples):
+            return None
+        return percentile(samples, percentile_rank)
+
+    def estimate_timeout(self, key, percentile_rank=99, multiplier=3, min_samples=10, min_timeout=0):
+        """
+        Estimate a timeout from the durations recorded for the given key
+        :param key: history key
+        :param percentile_rank: percentile of the durations
+        :param multiplier: safety margin over the percentile
+        :param min_samples: minimum number of durations for an estimate
+        :param min_timeout: lower bound for the timeout, in seconds
+        :return: timeout, in seconds, or None if there are not enough durations recorded
+        """
+        duration = self.get_percentile(key, percentile_rank, min_samples=min_samples)
+        if duration is None:
+            return None
+        return max(min_timeout, duration * multiplier)
+
+    def estimate_min_rate(self, key, percentile_rank=5, divisor=20, min_samples=10):
+        """
+        Estimate a stall detection floor from the throughputs recorded for the given key, i.e. something going much
+        slower than the slowest transfers seen before is, most likely, stalled
+        :param key: history key
+        :param percentile_rank: percentile of the throughputs
+        :param divisor: safety margin under the percentile
+        :param min_samples: minimum number of throughputs for an estimate
+        :return: minimum rate, in units per second, or None if there are not enough throughputs recorded
+        """
+        throughput = self.get_percentile(key, percentile_rank, min_samples=min_samples)
+        if throughput is None:
+            return None
+        return throughput / divisor
+
+    def save(self):
+        with self.__lock:
+            if not self.__dirty:
+                return
+            samples = {key: list(values) for key, values in self.__samples.items()}
+            self.__dirty = False
+            self.__saved_at = time.monotonic()
+        history_file_tmp = "{}.{}-{}.tmp".format(self.__history_file, os.getpid(), threading.get_ident())
+        try:
+            with open(history_file_tmp, 'w') as f:
+                json.dump(samples, f)
+            os.replace(history_file_tmp, self.__history_file)
+        except OSError:
+            with self.__lock:
+                self.__dirty = True
+            if os.path.exists(history_file_tmp):
+                os.remove(history_file_tmp)
+            raise
+
+
+def build_stall_detector(stall_config, history=None, history_key=None):
+    """
+    Build a stall detector, its floor is the highest of the configured one and the one estimated from the history
+    :param stall_config: dictionary with 'stall_window_seconds', no stall detection if None,
+    'stall_min_rate_bytes_per_second', and, optionally, 'history_percentile', 'history_divisor' and
+    'history_min_samples', see 'TimeoutHistory.estimate_min_rate'
+    :param history: timeout history, if any
+    :param history_key: history key of the throughputs, if any
+    :return: stall detector, or None if there is no stall detection
+    """
+    window = stall_config.get('stall_window_seconds')
+    if window is None:
+        return None
+    min_rate = stall_config.get('stall_min_rate_bytes_per_second', 1)
+    if (history is not None) and (history_key is not None):
+        estimated_min_rate = history.estimate_min_rate(history_key,
+                                                       percentile_rank=stall_config.get('history_percentile', 5),
+                                                       divisor=stall_config.get('history_divisor', 20),
+                                                       min_samples=stall_config.get('history_min_samples', 10))
+        if estimated_min_rate is not None:
+            min_rate = max(min_rate, estimated_min_rate)
+    return general.StallDetector(min_rate, window)
+
+
+if __name__ == '__main__':
+    print("ERROR: This script is part of a application and it is not meant to be run in stand alone mode")